@@ -3,10 +3,12 @@
 处理多轮对话请求，支持流式和非流式响应
 """
 
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.models.schemas import ChatRequest, ChatResponse
 from app.services.llm_service import get_llm_service
+from app.services.llm_metrics import StreamTimer
+from app.utils.streaming import DisconnectAwareStream
 import asyncio
 import json
 
@@ -43,7 +45,7 @@ async def chat(request: ChatRequest, x_api_key: str = Header(None)):
         # 调用 LLM 生成回复
         # 思考模式：调整temperature（思考模式用低temperature，快速模式用高temperature）
         thinking_mode = request.thinking_mode if hasattr(request, 'thinking_mode') else True
-        response_message = llm_service.chat(
+        response_message = await llm_service.achat(
             message=request.message,
             history=history,
             temperature=0.3 if thinking_mode else 0.9,  # 思考模式：0.3，快速模式：0.9
@@ -60,13 +62,15 @@ async def chat(request: ChatRequest, x_api_key: str = Header(None)):
 
 
 @router.post("/stream")
-async def chat_stream(request: ChatRequest, x_api_key: str = Header(None)):
+async def chat_stream(request: ChatRequest, http_request: Request, x_api_key: str = Header(None)):
     """
     术语通 - 流式聊天响应
     使用 Server-Sent Events (SSE) 实时流式传输 AI 回复
+    客户端断开时立即中止上游生成，并记录首 token 延迟和 tokens/s
     
     Args:
         request: 聊天请求
+        http_request: 原始 HTTP 请求（用于检测客户端断开）
         x_api_key: API Key
     
     Returns:
@@ -76,6 +80,8 @@ async def chat_stream(request: ChatRequest, x_api_key: str = Header(None)):
         raise HTTPException(status_code=401, detail="API Key is required")
     
     async def generate_stream():
+        timer = StreamTimer("chat")
+        status = "completed"
         try:
             # 获取 LLM 服务实例（使用用户指定的模型）
             llm_service = get_llm_service(api_key=x_api_key, model=request.model)
@@ -91,17 +97,17 @@ async def chat_stream(request: ChatRequest, x_api_key: str = Header(None)):
             # 思考模式
             thinking_mode = request.thinking_mode if hasattr(request, 'thinking_mode') else True
             
-            # 调用 LLM 的流式方法（如果 LLM 服务支持）
-            # 使用 stream_chat 方法来获取流式响应
-            stream_response = llm_service.stream_chat(
+            # 使用异步流式方法获取响应，等待模型输出时不阻塞事件循环
+            stream_response = DisconnectAwareStream(http_request, llm_service.astream(
                 message=request.message,
                 history=history,
                 temperature=0.3 if thinking_mode else 0.9,
                 system_prompt=request.system_prompt,  # 使用用户自定义的 system prompt
-            )
+            ))
             
             # 发送流式数据
-            for chunk in stream_response:
+            async for chunk in stream_response:
+                timer.chunk(chunk)
                 # 返回 SSE 格式的数据
                 data = {
                     "type": "content",
@@ -109,22 +115,34 @@ async def chat_stream(request: ChatRequest, x_api_key: str = Header(None)):
                     "session_id": request.session_id,
                 }
                 yield f"data: {json.dumps(data)}\n\n"
-                await asyncio.sleep(0)  # 让出控制权
             
-            # 发送完成信号
+            if stream_response.disconnected:
+                status = "disconnected"
+                return
+            
+            # 发送完成信号（附带本次生成的 TTFT 和速度）
             data = {
                 "type": "done",
                 "session_id": request.session_id,
+                "ttft_ms": round(timer.ttft * 1000) if timer.ttft is not None else None,
+                "tokens_per_second": round(timer.tokens_per_second() or 0, 1),
             }
             yield f"data: {json.dumps(data)}\n\n"
             
+        except (asyncio.CancelledError, GeneratorExit):
+            # 响应写入失败（客户端已断开）
+            status = "disconnected"
+            raise
         except Exception as e:
+            status = "error"
             # 发送错误信号
             data = {
                 "type": "error",
                 "error": str(e),
             }
             yield f"data: {json.dumps(data)}\n\n"
+        finally:
+            timer.finish(status)
     
     return StreamingResponse(
         generate_stream(),
@@ -8,6 +8,7 @@ from fastapi import APIRouter, HTTPException, Header, BackgroundTasks
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import json
+import time
 import asyncio
 from pathlib import Path
 from datetime import datetime
@@ -23,8 +24,13 @@ from ..services.crawler_service import (
     extract_unique_authors,
     save_authors_data,
     load_sources,
-    CRAWL_DATA_BASE_PATH
+    CRAWL_DATA_BASE_PATH,
+    SOURCES_PATH,
 )
+from ..services import crawl_metrics
+from ..services.search_index import get_search_index, sync_search_index, parse_timestamp_strict
+from ..services.dedup_service import annotate_duplicates, collapse_to_canonical
+from ..services.rollup_service import ingest_tweets
 
 router = APIRouter(prefix="/crawler", tags=["crawler"])
 
@@ -86,7 +92,9 @@ async def background_crawl_single_source(source: Dict[str, str], platform: str):
         print(f"[Background] Crawling {platform} source: {source['name']}")
 
         if platform == "twitter":
+            source_start = time.perf_counter()
             result = await crawl_twitter_source(source)
+            crawl_metrics.record_source("twitter", time.perf_counter() - source_start, result)
             new_items = result.get("items", [])
 
             # 更新 sources.json 中的名称和username为真实信息
@@ -114,28 +122,36 @@ async def background_crawl_single_source(source: Dict[str, str], platform: str):
             if new_items:
                 # 合并新数据（去重 + 补充缺失字段如 quoted_tweet）
                 existing_map = {item["id"]: item for item in existing_data.get("items", [])}
+                added = updated = 0
                 for item in new_items:
                     if item["id"] not in existing_map:
                         existing_data["items"].append(item)
+                        added += 1
                     else:
                         # 补充已有推文缺失的 quoted_tweet 字段
                         existing_item = existing_map[item["id"]]
                         if item.get("quoted_tweet") and not existing_item.get("quoted_tweet"):
                             existing_item["quoted_tweet"] = item["quoted_tweet"]
+                            updated += 1
+                crawl_metrics.record_items_saved("twitter", added, updated)
 
                 # 按时间排序
                 existing_data["items"].sort(key=lambda x: x.get("created_at", ""), reverse=True)
                 existing_data["total_count"] = len(existing_data["items"])
                 existing_data["scraped_at"] = datetime.now().isoformat()
                 existing_data.pop("sources", None)  # 清理历史遗留的 sources 字段
+                annotate_duplicates(existing_data["items"], "twitter")
 
                 # 保存
                 filepath.parent.mkdir(parents=True, exist_ok=True)
-                with open(filepath, "w", encoding="utf-8") as f:
-                    json.dump(existing_data, f, ensure_ascii=False, indent=2)
+                with crawl_metrics.WRITE_SECONDS.time(platform="twitter"):
+                    with open(filepath, "w", encoding="utf-8") as f:
+                        json.dump(existing_data, f, ensure_ascii=False, indent=2)
 
-                # 更新缓存
+                # 更新缓存和检索索引
                 _data_cache["twitter"] = existing_data
+                sync_search_index("twitter", new_items, full=False)
+                await ingest_tweets(new_items)
 
                 print(f"[Background] Added {len(new_items)} new tweets from {result.get('source_name', source['name'])}")
 
@@ -155,7 +171,9 @@ async def background_crawl_single_source(source: Dict[str, str], platform: str):
             save_authors_data(authors)
 
         elif platform == "youtube":
+            source_start = time.perf_counter()
             result = await crawl_youtube_source(source)
+            crawl_metrics.record_source("youtube", time.perf_counter() - source_start, result)
             new_items = result.get("items", [])
             
             if new_items:
@@ -165,10 +183,21 @@ async def background_crawl_single_source(source: Dict[str, str], platform: str):
                     with open(filepath, "r", encoding="utf-8") as f:
                         existing_data = json.load(f)
                 
-                existing_ids = {item["id"] for item in existing_data.get("items", [])}
+                existing_map = {item["id"]: item for item in existing_data.get("items", [])}
+                added = updated = 0
                 for item in new_items:
-                    if item["id"] not in existing_ids:
+                    if item["id"] not in existing_map:
                         existing_data["items"].append(item)
+                        existing_map[item["id"]] = item
+                        added += 1
+                    else:
+                        # 补充已有视频缺失的字段（与推文补充 quoted_tweet 一致），只统计确实有变化的条目
+                        existing_item = existing_map[item["id"]]
+                        missing = {k: v for k, v in item.items() if v and not existing_item.get(k)}
+                        if missing:
+                            existing_item.update(missing)
+                            updated += 1
+                crawl_metrics.record_items_saved("youtube", added, updated)
                 
                 source_names = {s["name"] for s in existing_data.get("sources", [])}
                 if result["source_name"] not in source_names:
@@ -182,10 +211,12 @@ async def background_crawl_single_source(source: Dict[str, str], platform: str):
                 existing_data["scraped_at"] = datetime.now().isoformat()
                 
                 filepath.parent.mkdir(parents=True, exist_ok=True)
-                with open(filepath, "w", encoding="utf-8") as f:
-                    json.dump(existing_data, f, ensure_ascii=False, indent=2)
+                with crawl_metrics.WRITE_SECONDS.time(platform="youtube"):
+                    with open(filepath, "w", encoding="utf-8") as f:
+                        json.dump(existing_data, f, ensure_ascii=False, indent=2)
                 
                 _data_cache["youtube"] = existing_data
+                sync_search_index("youtube", new_items, full=False)
                 
                 print(f"[Background] Added {len(new_items)} new videos from {source['name']}")
     
@@ -340,8 +371,7 @@ def parse_source_url(url: str) -> Dict[str, str]:
 
 def save_sources(sources: Dict[str, List[Dict[str, str]]]) -> None:
     """保存信源配置到文件"""
-    sources_path = Path(__file__).parent.parent / "Info_sources" / "sources.json"
-    with open(sources_path, "w", encoding="utf-8") as f:
+    with open(SOURCES_PATH, "w", encoding="utf-8") as f:
         json.dump(sources, f, ensure_ascii=False, indent=2)
 
 
@@ -566,6 +596,20 @@ async def delete_source(request: DeleteSourceRequest):
 class TranslateRequest(BaseModel):
     text: str
     target_language: str = "zh"  # 默认翻译为中文
+    id: Optional[str] = None  # 推文 / 视频 ID，提供时译文按 ID + 原文哈希保存，所有用户共享
+
+
+class TranslateBatchItem(BaseModel):
+    id: str
+    text: str
+
+
+class TranslateBatchRequest(BaseModel):
+    items: List[TranslateBatchItem]
+    target_language: str = "zh"
+
+
+TRANSLATE_BATCH_MAX_ITEMS = 200
 
 
 @router.post("/translate")
@@ -575,15 +619,11 @@ async def translate_text(
 ):
     """
     翻译文本内容
-    使用小模型进行快速翻译，优化速度
+    使用小模型进行快速翻译，译文持久化，同一条内容只翻译一次
     """
-    from langchain_openai import ChatOpenAI
-    try:
-        from langchain_core.messages import HumanMessage
-    except ImportError:
-        from langchain.schema import HumanMessage
+    from ..services.llm_service import get_llm_service
+    from ..services.tweet_translation_service import TWEET_TRANSLATE_MODEL, translate_tweets
     import os
-    import re
     
     # 从 Header 获取 API Key，或从环境变量获取
     api_key = x_api_key or os.getenv("SILICONFLOW_API_KEY")
@@ -592,37 +632,14 @@ async def translate_text(
         raise HTTPException(status_code=401, detail="API Key is required")
     
     try:
-        # 预处理文本：移除链接，只保留正文内容
-        text = request.text
-        # 移除 URL
-        text = re.sub(r'https?://\S+', '', text)
-        # 移除多余空白
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # 如果处理后文本为空，直接返回原文
-        if not text:
-            return {
-                "success": True,
-                "original": request.text,
-                "translated": request.text,
-                "target_language": request.target_language
-            }
-        
-        # 使用小模型进行快速翻译
-        small_llm = ChatOpenAI(
-            model="Qwen/Qwen2.5-7B-Instruct",  # 使用 7B 小模型，速度更快
-            openai_api_key=api_key,
-            openai_api_base="https://api.siliconflow.cn/v1",
-            temperature=0.1,  # 低温度，翻译更准确
-            max_tokens=1024,
-            request_timeout=30.0,  # 缩短超时时间
+        small_llm = get_llm_service(api_key=api_key, model=TWEET_TRANSLATE_MODEL)
+        tweet_id = request.id or ""
+        results = await translate_tweets(
+            small_llm, [{"id": tweet_id, "text": request.text}], request.target_language
         )
-        
-        # 简化 prompt，减少 token 消耗
-        prompt = f"将以下英文翻译成中文，只返回翻译结果：\n{text}"
-        
-        response = small_llm.invoke([HumanMessage(content=prompt)])
-        translated = response.content.strip()
+        translated = results[tweet_id]["translated"]
+        if translated is None:
+            raise Exception("翻译失败")
         
         return {
             "success": True,
@@ -634,9 +651,63 @@ async def translate_text(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/translate/batch")
+async def translate_batch(
+    request: TranslateBatchRequest,
+    x_api_key: str = Header(None, alias="X-API-Key")
+):
+    """
+    批量翻译推文 / 视频标题
+    
+    已翻译过的条目（按 ID + 原文哈希）直接返回，其余多条合并为一次 LLM 调用；
+    返回 translations: {id: {"translated": 译文（失败时为 null）, "source": cached / skipped / translated / failed}}
+    """
+    from ..services.llm_service import get_llm_service
+    from ..services.tweet_translation_service import TWEET_TRANSLATE_MODEL, translate_tweets
+    import os
+    
+    api_key = x_api_key or os.getenv("SILICONFLOW_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=401, detail="API Key is required")
+    
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items 不能为空")
+    if len(request.items) > TRANSLATE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单次最多翻译 {TRANSLATE_BATCH_MAX_ITEMS} 条")
+    # 结果按 ID 返回，空 ID 或重复 ID 会互相覆盖
+    ids = [item.id for item in request.items]
+    if any(not item_id for item_id in ids):
+        raise HTTPException(status_code=400, detail="items 中的 id 不能为空")
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="items 中的 id 不能重复")
+    
+    try:
+        small_llm = get_llm_service(api_key=api_key, model=TWEET_TRANSLATE_MODEL)
+        results = await translate_tweets(
+            small_llm, [item.model_dump() for item in request.items], request.target_language
+        )
+        counts: Dict[str, int] = {}
+        for result in results.values():
+            counts[result["source"]] = counts.get(result["source"], 0) + 1
+        
+        return {
+            "success": True,
+            "target_language": request.target_language,
+            "translations": results,
+            "stats": counts
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/data/twitter")
-async def get_twitter_data():
-    """获取已爬取的 Twitter 数据 - 优先读取文件（保证最新），备选内存缓存"""
+async def get_twitter_data(collapse: bool = False):
+    """
+    获取已爬取的 Twitter 数据 - 优先读取文件（保证最新），备选内存缓存
+
+    参数:
+    - collapse: 折叠近重复推文，每个簇只返回代表推文
+    """
     try:
         data = None
         source = None
@@ -656,6 +727,13 @@ async def get_twitter_data():
         if data is None:
             return {"success": True, "data": None, "message": "No data available. Please run crawler first."}
 
+        if collapse:
+            items = data.get("items", [])
+            if any("cluster_id" not in item for item in items):
+                annotate_duplicates(items, "twitter")
+            data = {**data, "items": collapse_to_canonical(items)}
+            data["collapsed_count"] = len(items) - len(data["items"])
+
         # 3. 同时返回 authors 信息（解决线上环境前端无法访问静态文件的问题）
         authors = None
         authors_filepath = CRAWL_DATA_BASE_PATH / "twitter" / "authors.json"
@@ -703,6 +781,66 @@ async def get_youtube_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/search")
+async def search_crawled_data(
+    q: str,
+    platform: Optional[str] = None,
+    author: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    prefix: bool = True,
+):
+    """
+    全文检索已爬取的内容（推文、引用推文、视频标题、作者名、国内平台内容）
+
+    参数:
+    - q: 查询文本，多个词同时命中，最后一个英文词支持前缀匹配
+    - platform: 平台过滤，逗号分隔（twitter,youtube,bili,xhs,zhihu）
+    - author: 作者用户名或显示名
+    - since / until: 时间范围，ISO 时间或 Unix 时间戳
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q is required")
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+    try:
+        since_ts = parse_timestamp_strict(since) if since else None
+        until_ts = parse_timestamp_strict(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    index = get_search_index()
+    if not index.loaded:
+        await asyncio.get_event_loop().run_in_executor(None, index.load_from_disk)
+
+    start = time.perf_counter()
+    result = index.search(
+        q,
+        platforms=[p.strip() for p in platform.split(",") if p.strip()] if platform else None,
+        author=author,
+        since=since_ts,
+        until=until_ts,
+        limit=limit,
+        offset=offset,
+        prefix=prefix,
+    )
+    return {
+        "success": True,
+        "query": q,
+        "total": result["total"],
+        "items": result["items"],
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+@router.get("/search/stats")
+async def get_search_stats():
+    """检索索引状态"""
+    return {"success": True, "stats": get_search_index().stats()}
+
+
 # ==================== 爬虫配置管理 API ====================
 
 class CrawlerConfigModel(BaseModel):
@@ -210,6 +210,20 @@ API_DOCUMENTATION: List[APICategory] = [
                 category="crawler",
                 curl_example='''curl "https://athena-backend-lh6o.onrender.com/api/crawler/data/youtube"''',
             ),
+            APIEndpoint(
+                method="GET",
+                path="/api/crawler/search",
+                name="全文检索",
+                description="BM25 全文检索推文、视频标题、作者名及国内平台内容，支持前缀匹配和平台/作者/时间过滤",
+                category="crawler",
+                response_example={
+                    "success": True,
+                    "total": 12,
+                    "items": [{"id": "...", "platform": "twitter", "title": "...", "author": "karpathy", "score": 7.2}],
+                    "took_ms": 3.1
+                },
+                curl_example='''curl "https://athena-backend-lh6o.onrender.com/api/crawler/search?q=agent&platform=twitter&since=2025-01-01"''',
+            ),
         ]
     ),
     APICategory(
@@ -452,6 +466,15 @@ API_DOCUMENTATION: List[APICategory] = [
                 },
                 curl_example='''curl "https://athena-backend-lh6o.onrender.com/api/system/health/all"''',
             ),
+            APIEndpoint(
+                method="GET",
+                path="/metrics",
+                name="Prometheus 指标",
+                description="Prometheus 文本格式的运行指标（爬虫请求延迟、下载字节、解析/写入耗时、条目数、错误类型等）",
+                category="system",
+                response_example={"content_type": "text/plain; version=0.0.4"},
+                curl_example='''curl "https://athena-backend-lh6o.onrender.com/metrics"''',
+            ),
         ]
     ),
 ]
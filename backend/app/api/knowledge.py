@@ -8,6 +8,8 @@ from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Bo
 from pydantic import BaseModel
 from typing import Optional, List
 from app.services.llm_service import get_llm_service
+from app.services.summarize_service import condense_document
+from app.services.token_budget import context_budget
 from app.config import settings
 from supabase import create_client, Client
 import fitz  # PyMuPDF
@@ -79,14 +81,14 @@ async def background_analyze_document(document_id: str, text: str, api_key: str)
         # 调用 LLM 分析
         llm_service = get_llm_service(api_key=api_key)
         
-        # 限制文本长度
-        truncated_text = text[:8000] if len(text) > 8000 else text
-        
-        analysis_prompt = f"""
+        system_prompt = "你是一个专业的文档分析师，善于从复杂的文档中提取关键信息并生成结构化的HTML报告。"
+
+        def build_prompt(document_text: str) -> str:
+            return f"""
 请对以下文档进行深度分析，生成一份专业的HTML格式分析报告。
 
 **文档内容：**
-{truncated_text}
+{document_text}
 
 请生成包含以下部分的HTML报告（使用现代卡片式布局，带有优雅的样式）：
 
@@ -122,11 +124,16 @@ async def background_analyze_document(document_id: str, text: str, api_key: str)
 2. 使用简洁清晰的语言
 3. 只返回HTML内容，不要包含```html标记
 """
+
+        # 超出 token 预算的长文档先分章节并发提炼要点（map-reduce），而不是按字符截断
+        budget = context_budget(build_prompt(""), system_prompt, model=llm_service.model)
+        analysis_prompt = build_prompt(await condense_document(llm_service, text, budget))
         
-        report = llm_service.chat(
+        report = await llm_service.achat(
             message=analysis_prompt,
-            system_prompt="你是一个专业的文档分析师，善于从复杂的文档中提取关键信息并生成结构化的HTML报告。",
+            system_prompt=system_prompt,
             temperature=0.5,
+            feature="knowledge",
         )
         
         # 清理可能的代码块标记
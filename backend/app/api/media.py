@@ -0,0 +1,51 @@
+"""
+媒体代理 API
+代理头像、推文配图、YouTube 缩略图，命中本地缓存时直接返回
+"""
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+import httpx
+
+from app.services.media_service import (
+    MEDIA_SIZES,
+    MediaNotAllowedError,
+    get_media_cache,
+)
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+# 缓存 key 包含 URL 和尺寸，内容不会变化，可以让浏览器 / CDN 永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/proxy")
+async def proxy_media(
+    request: Request,
+    url: str = Query(..., description="原始媒体 URL"),
+    size: str = Query("original", description="尺寸预设: " + " / ".join(MEDIA_SIZES.keys())),
+):
+    """获取（缩放后的）媒体内容"""
+    if size not in MEDIA_SIZES:
+        raise HTTPException(status_code=400, detail=f"不支持的尺寸: {size}")
+
+    try:
+        data, content_type, digest = await get_media_cache().fetch(url, size)
+    except MediaNotAllowedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"上游返回 HTTP {e.response.status_code}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=504, detail=f"上游请求失败: {e}")
+
+    etag = f'"{digest}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=content_type, headers=headers)
+
+
+@router.get("/stats")
+async def media_cache_stats():
+    """获取媒体缓存统计"""
+    return {"success": True, "stats": get_media_cache().stats()}
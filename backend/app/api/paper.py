@@ -7,6 +7,7 @@ from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Bo
 from app.models.schemas import PaperAnalysisResponse, PaperSummary, PaperQAPair
 from app.services.llm_service import get_llm_service
 from app.services.paper_service import PaperService
+from app.services.token_budget import context_budget, pack_document
 import os
 import tempfile
 
@@ -69,24 +70,12 @@ async def analyze_paper(
         # 并行执行分析和讲解生成，提升响应速度
         import asyncio
         
-        async def run_analysis():
-            loop = asyncio.get_event_loop()
-            # 在线程池中运行 CPU 密集的 LLM 调用
-            summary_data = await loop.run_in_executor(None, llm_service.analyze_paper_structured, paper_text)
-            return summary_data
-        
-        async def run_speech_generation():
-            loop = asyncio.get_event_loop()
-            # 在线程池中运行讲解生成
-            speech = await loop.run_in_executor(None, llm_service.generate_speech, paper_text)
-            return speech
-        
         # 并行执行分析和讲解生成
         try:
-            # 使用 asyncio.gather 并行执行两个任务
+            # 使用 asyncio.gather 并行执行两个异步 LLM 调用
             summary_data, speech = await asyncio.gather(
-                run_analysis(),
-                run_speech_generation(),
+                llm_service.aanalyze_paper_structured(paper_text),
+                llm_service.agenerate_speech(paper_text),
                 return_exceptions=True  # 允许一个任务失败不影响另一个
             )
             
@@ -157,7 +146,7 @@ async def generate_speech(
     
     try:
         llm_service = get_llm_service(api_key=x_api_key)
-        speech = llm_service.generate_speech(paper_text)
+        speech = await llm_service.agenerate_speech(paper_text)
         return {"speech": speech}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating speech: {str(e)}")
@@ -183,7 +172,7 @@ async def generate_qa(
     
     try:
         llm_service = get_llm_service(api_key=x_api_key)
-        qa = llm_service.generate_qa(paper_text)
+        qa = await llm_service.agenerate_qa(paper_text)
         qa_pairs = [
             {"question": q["question"], "answer": q["answer"]}
             for q in qa
@@ -220,20 +209,25 @@ async def chat_with_paper(
         
         llm_service = get_llm_service(api_key=x_api_key)
         
+        # 使用自定义 system_prompt，如果没有则使用默认值
+        final_system_prompt = system_prompt if system_prompt else PAPER_CHAT_SYSTEM_PROMPT
+
         # 构建提示词，将论文内容作为上下文
-        prompt = f"""以下是用户正在阅读的论文内容：
+        def build_prompt(context: str) -> str:
+            return f"""以下是用户正在阅读的论文内容：
 
 ---论文内容开始---
-{paper_text[:5000]}
+{context}
 ---论文内容结束---
 
 用户问题：{question}
 
 请基于论文内容回答用户的问题。"""
-        
-        # 使用自定义 system_prompt，如果没有则使用默认值
-        final_system_prompt = system_prompt if system_prompt else PAPER_CHAT_SYSTEM_PROMPT
-        answer = llm_service.chat(prompt, system_prompt=final_system_prompt)
+
+        # 按 token 预算挑选章节，与问题相关的章节优先放入
+        budget = context_budget(build_prompt(""), final_system_prompt, model=llm_service.model)
+        prompt = build_prompt(pack_document(paper_text, budget, llm_service.model, query=question))
+        answer = await llm_service.achat(prompt, system_prompt=final_system_prompt, feature="paper")
         
         return {"answer": answer}
         
@@ -230,6 +230,10 @@ async def analyze_pdf_stream(
     2. 提供 URL：url (直接传给 MinerU API)
     
     使用任务管理器统一管理任务生命周期
+    
+    translate=true 时翻译在解析完成后于后台进行，不阻塞分析结果：
+    每翻译完一段推送 translating 事件（data.translatedSection，按原文顺序，各段 text 以换行拼接即为完整译文），
+    complete 事件之后继续推送剩余段落，全部完成后推送 translated 事件（data.total / data.failed）
     """
     
     if not x_api_key:
@@ -266,6 +270,26 @@ async def analyze_pdf_stream(
     async def generate_events():
         sse = SSEEventGenerator(task)
         current_session_id = None  # 用于跟踪当前会话的图片
+        # 后台翻译：translation_callback 把完成的段落放入队列，由本生成器按顺序推送
+        translation_queue: asyncio.Queue = asyncio.Queue()
+        translation_ready = asyncio.Event()
+        translation_state = {"task": None, "total": 0, "failed": 0}
+        
+        async def translation_callback(section: dict):
+            translation_queue.put_nowait(section)
+            translation_ready.set()
+        
+        async def drain_translation():
+            """推送队列中已完成的译文段落"""
+            events = []
+            while not translation_queue.empty():
+                section = translation_queue.get_nowait()
+                translation_state["total"] = section["total"]
+                translation_state["failed"] += int(section["failed"])
+                event = await sse.send_translation(section)
+                if event:
+                    events.append(event)
+            return events
         
         try:
             # 检查客户端连接
@@ -363,7 +387,8 @@ async def analyze_pdf_stream(
                         pdf_url=pdf_url,
                         translate=translate,
                         extract_charts=extract_charts,
-                        progress_callback=progress_callback
+                        progress_callback=progress_callback,
+                        translation_callback=translation_callback
                     )
                     analysis_result["result"] = result
                 except Exception as e:
@@ -404,6 +429,9 @@ async def analyze_pdf_stream(
                         if event:
                             yield event
                     
+                    for event in await drain_translation():
+                        yield event
+                    
                     heartbeat_count += 1
                 
             except asyncio.CancelledError:
@@ -422,6 +450,7 @@ async def analyze_pdf_stream(
             result = analysis_result["result"]
             if result is None:
                 raise Exception("分析返回空结果")
+            translation_state["task"] = result.pop("translation_task", None)
             
             # 检查取消
             if task.is_cancelled() or await request.is_disconnected():
@@ -448,6 +477,9 @@ async def analyze_pdf_stream(
             # 添加图表信息到结果
             result["charts"] = charts
             
+            for event in await drain_translation():
+                yield event
+            
             # 论文分析（如果启用）
             paper_analysis_result = None
             if enable_paper_analysis:
@@ -462,13 +494,7 @@ async def analyze_pdf_stream(
                             from app.services.paper_service import PaperService
                             
                             llm_service = get_llm_service(api_key=x_api_key)
-                            loop = asyncio.get_event_loop()
-                            
-                            summary_data = await loop.run_in_executor(
-                                None, 
-                                llm_service.analyze_paper_structured, 
-                                paper_text
-                            )
+                            summary_data = await llm_service.aanalyze_paper_structured(paper_text)
                             parsed_summary = PaperService.parse_structured_summary(summary_data["raw_response"])
                             
                             if isinstance(parsed_summary, dict):
@@ -482,6 +508,9 @@ async def analyze_pdf_stream(
             
             result["paperAnalysis"] = paper_analysis_result
             
+            for event in await drain_translation():
+                yield event
+            
             # 检查取消
             if task.is_cancelled() or await request.is_disconnected():
                 return
@@ -525,12 +554,41 @@ async def analyze_pdf_stream(
             # 标记任务完成
             task.status = TaskStatus.COMPLETE
             
+            # 分析结果已发送，继续推送后台翻译的剩余段落
+            translation_task = translation_state["task"]
+            if translation_task is not None:
+                while True:
+                    translation_ready.clear()
+                    finished = translation_task.done()
+                    for event in await drain_translation():
+                        yield event
+                    if finished:
+                        break
+                    if task.is_cancelled() or await request.is_disconnected():
+                        return
+                    # 等待下一段完成或翻译结束（超时后重新检查客户端连接）
+                    waiter = asyncio.ensure_future(translation_ready.wait())
+                    await asyncio.wait({translation_task, waiter}, timeout=3.0, return_when=asyncio.FIRST_COMPLETED)
+                    waiter.cancel()
+                
+                error = None
+                if not translation_task.cancelled() and translation_task.exception() is not None:
+                    error = str(translation_task.exception())
+                event = await sse.send_translation_complete(
+                    translation_state["total"], translation_state["failed"], error
+                )
+                if event:
+                    yield event
+            
         except asyncio.CancelledError:
             task.cancel()
         except Exception as e:
             error_event = await sse.send_error(str(e))
             yield error_event
         finally:
+            # 客户端断开或分析失败时停止后台翻译
+            if translation_state["task"] is not None and not translation_state["task"].done():
+                translation_state["task"].cancel()
             sse.close()
             # 延迟清理任务（让客户端有时间接收最后的消息）
             asyncio.create_task(_delayed_task_cleanup(task.task_id, 30))
@@ -664,7 +722,7 @@ async def analyze_image(
 只返回JSON，不要添加解释或其他文字。"""
 
         # 调用多模态模型
-        response = llm_service.chat_with_image(
+        response = await llm_service.achat_with_image(
             message=user_prompt,
             image_base64=base64_data,
             system_prompt=system_prompt,
@@ -15,6 +15,7 @@ from ..services.report_service import (
     REPORT_OUTPUT_DIR,
 )
 from ..services.dingtalk_service import DingTalkService
+from ..services.rollup_service import rollup_trend, rollup_window
 from ..config import settings
 
 router = APIRouter(prefix="/report", tags=["report"])
@@ -42,6 +43,7 @@ class GenerateReportRequest(BaseModel):
     hours: int = 24
     authors: Optional[List[str]] = None
     top_n: int = 10
+    collapse_duplicates: bool = True
 
     # 报告配置
     report_style: str = "daily_insight"
@@ -101,6 +103,7 @@ async def api_generate_report(request: GenerateReportRequest):
             hours=request.hours,
             authors=request.authors,
             top_n=request.top_n,
+            collapse_duplicates=request.collapse_duplicates,
             report_style=request.report_style,
             storage_config=storage_config,
             llm_config=llm_config,
@@ -222,6 +225,44 @@ async def list_reports():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/rollup")
+async def get_rollup(hours: int = 24, authors: Optional[str] = None):
+    """
+    按小时桶汇总的统计（帖子数、互动、关键词、活跃作者）
+
+    - **hours**: 时间窗口（小时，按整点对齐）
+    - **authors**: 逗号分隔的用户名，只统计这些作者
+    """
+    if hours <= 0 or hours > 24 * 90:
+        raise HTTPException(status_code=400, detail="hours 需在 1 到 2160 之间")
+    try:
+        author_list = [a.strip() for a in authors.split(",") if a.strip()] if authors else None
+        data = await rollup_window(hours, authors=author_list)
+        return {"success": True, "data": data}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/trends")
+async def get_trends(days: int = 7, bucket_hours: int = 24, top_keywords: int = 5):
+    """
+    趋势序列：按 bucket_hours 聚合最近 days 天的小时桶
+
+    - **days**: 天数
+    - **bucket_hours**: 每个点覆盖的小时数（默认 24，即按天）
+    - **top_keywords**: 每个点返回的热门关键词数量
+    """
+    if days <= 0 or days > 90:
+        raise HTTPException(status_code=400, detail="days 需在 1 到 90 之间")
+    if bucket_hours <= 0 or bucket_hours > days * 24:
+        raise HTTPException(status_code=400, detail="bucket_hours 需在 1 到 days*24 之间")
+    try:
+        series = await rollup_trend(days=days, bucket_hours=bucket_hours, top_keywords=top_keywords)
+        return {"success": True, "days": days, "bucket_hours": bucket_hours, "series": series}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ==================== 定时报告管理 API ====================
 
 class ReportSchedulerConfig(BaseModel):
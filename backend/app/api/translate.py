@@ -1,13 +1,20 @@
 """
 文本翻译 API
-使用 LLM 进行快速翻译
+使用 LLM 进行快速翻译，按 Markdown 结构只翻译正文、分块并发翻译；/translate/stream 以 SSE 按原文顺序流式返回译文
 """
 
-from fastapi import APIRouter, HTTPException, Header
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
+from app.services.llm_metrics import StreamTimer
 from app.services.llm_service import get_llm_service
+from app.services.translation_service import segment_document, stream_translation, translate_text as translate_document
+from app.utils.streaming import DisconnectAwareStream
 
 
 router = APIRouter()
@@ -18,7 +25,13 @@ class TranslateRequest(BaseModel):
     text: str
     source_lang: str = "en"  # 源语言
     target_lang: str = "zh"  # 目标语言
-    max_chunk_size: int = 3000  # 单次翻译最大字符数
+    max_chunk_size: int = 3000  # 单次翻译最大字符数（同时受 TRANSLATE_BATCH_TOKENS 限制）
+    concurrency: Optional[int] = None  # 同时翻译的块数，默认 TRANSLATE_CONCURRENCY
+
+
+class TranslateStreamRequest(TranslateRequest):
+    """流式翻译请求"""
+    start_chunk: int = 0  # 断线续传：从该块开始翻译（text、语言和 max_chunk_size 需与之前一致，块序号才不变）
 
 
 class TranslateResponse(BaseModel):
@@ -38,7 +51,8 @@ async def translate_text(
     """
     翻译文本
     
-    支持大文本分块翻译
+    公式、代码、表格、图片、参考文献和已是目标语言的段落原样保留；
+    正文按 token 数分块，各块在并发上限内同时翻译，失败的块单独重试
     """
     if not x_api_key:
         raise HTTPException(status_code=401, detail="API Key is required")
@@ -49,23 +63,15 @@ async def translate_text(
     try:
         llm_service = get_llm_service(api_key=x_api_key)
         
-        # 如果文本较短，直接翻译
-        if len(request.text) <= request.max_chunk_size:
-            translated = _translate_chunk(
-                llm_service,
-                request.text,
-                request.source_lang,
-                request.target_lang
-            )
-        else:
-            # 分块翻译
-            translated = _translate_large_text(
-                llm_service,
-                request.text,
-                request.source_lang,
-                request.target_lang,
-                request.max_chunk_size
-            )
+        # 只翻译正文段落，分块并发翻译，译文回填到原位置
+        translated = await translate_document(
+            llm_service,
+            request.text,
+            request.source_lang,
+            request.target_lang,
+            max_chunk_size=request.max_chunk_size,
+            concurrency=request.concurrency,
+        )
         
         return TranslateResponse(
             success=True,
@@ -79,90 +85,69 @@ async def translate_text(
         raise HTTPException(status_code=500, detail=f"翻译失败: {str(e)}")
 
 
-def _translate_chunk(
-    llm_service,
-    text: str,
-    source_lang: str,
-    target_lang: str
-) -> str:
-    """翻译单个文本块"""
-    lang_names = {
-        "en": "英语",
-        "zh": "中文",
-        "ja": "日语",
-        "ko": "韩语",
-        "fr": "法语",
-        "de": "德语",
-        "es": "西班牙语"
-    }
-    
-    source_name = lang_names.get(source_lang, source_lang)
-    target_name = lang_names.get(target_lang, target_lang)
-    
-    prompt = f"""请将以下{source_name}文本翻译成{target_name}。
-
-要求：
-1. 保持原文的段落结构和格式
-2. 保留 Markdown 标记（如 #、**、`等）
-3. 数学公式和代码不翻译
-4. 专业术语保持准确性
-5. 只返回翻译结果，不要有任何解释
+@router.post("/translate/stream")
+async def translate_text_stream(
+    request: TranslateStreamRequest,
+    http_request: Request,
+    x_api_key: str = Header(None)
+):
+    """
+    流式翻译文本（SSE）
 
-原文：
-{text}
+    各块并发翻译，按原文顺序推送：当前块逐 token 推送（delta），块完成时推送整块译文和进度（chunk，done/total），
+    后续块已翻译好的部分在轮到它时立即补发。断线后以 start_chunk 重新请求即可从该块续传，
+    已翻译过的块命中 LLM 响应缓存直接回放。各块的 text 以换行拼接即为完整译文。
 
-翻译："""
-    
-    try:
-        translated = llm_service.chat(
-            message=prompt,
-            temperature=0.3,
-            max_tokens=4000
-        )
-        return translated.strip()
-    except Exception as e:
-        print(f"[翻译] 调用 LLM 失败: {e}")
-        raise Exception(f"翻译失败: {str(e)}")
-
-
-def _translate_large_text(
-    llm_service,
-    text: str,
-    source_lang: str,
-    target_lang: str,
-    max_chunk_size: int
-) -> str:
-    """分块翻译大文本"""
-    # 按段落分割
-    paragraphs = text.split('\n\n')
-    
-    chunks = []
-    current_chunk = []
-    current_length = 0
+    事件类型：start / delta / reset（该块重试，丢弃已收到的增量）/ chunk / done / error
+    """
+    if not x_api_key:
+        raise HTTPException(status_code=401, detail="API Key is required")
     
-    for para in paragraphs:
-        if current_length + len(para) > max_chunk_size and current_chunk:
-            chunks.append('\n\n'.join(current_chunk))
-            current_chunk = [para]
-            current_length = len(para)
-        else:
-            current_chunk.append(para)
-            current_length += len(para)
+    if not request.text or not request.text.strip():
+        raise HTTPException(status_code=400, detail="文本不能为空")
     
-    if current_chunk:
-        chunks.append('\n\n'.join(current_chunk))
+    chunks = segment_document(
+        request.text, request.source_lang, request.target_lang, request.max_chunk_size
+    ).units()
+    if request.start_chunk < 0 or request.start_chunk > len(chunks):
+        raise HTTPException(status_code=400, detail=f"start_chunk 超出范围（共 {len(chunks)} 块）")
     
-    # 逐块翻译
-    translated_chunks = []
-    for i, chunk in enumerate(chunks):
-        print(f"[翻译] 正在翻译第 {i+1}/{len(chunks)} 块...")
-        translated = _translate_chunk(
-            llm_service,
-            chunk,
-            source_lang,
-            target_lang
-        )
-        translated_chunks.append(translated)
+    async def generate_stream():
+        timer = StreamTimer("translate")
+        status = "completed"
+        try:
+            llm_service = get_llm_service(api_key=x_api_key)
+            events = DisconnectAwareStream(http_request, stream_translation(
+                llm_service,
+                chunks,
+                request.source_lang,
+                request.target_lang,
+                start_chunk=request.start_chunk,
+                concurrency=request.concurrency,
+            ))
+            async for event in events:
+                if event["type"] == "delta":
+                    timer.chunk(event["delta"])
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if events.disconnected:
+                status = "disconnected"
+        except (asyncio.CancelledError, GeneratorExit):
+            status = "disconnected"
+            raise
+        except Exception as e:
+            status = "error"
+            # index 为失败的块，客户端可据此以 start_chunk 重试
+            data = {"type": "error", "error": f"翻译失败: {str(e)}", "index": getattr(e, "index", None)}
+            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            timer.finish(status)
     
-    return '\n\n'.join(translated_chunks)
-
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
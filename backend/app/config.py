@@ -38,6 +38,8 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
     
     # LLM 配置
+    # OpenAI 兼容接口地址，为空时使用 SiliconFlow（压测时可指向 benchmarks/mock_llm.py 桩服务）
+    LLM_BASE_URL: str = ""
     # 默认主模型（用于术语通等需要高质量推理的场景）
     LLM_MODEL: str = "Qwen/Qwen2.5-7B-Instruct"
     # 小模型（用于论文分析等追求速度的场景）
@@ -49,6 +51,61 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = 2000
     # LLM 请求超时时间（秒）
     LLM_REQUEST_TIMEOUT: float = 180.0  # 3分钟
+    # 上下文 token 预算（tiktoken 计数）
+    LLM_CONTEXT_WINDOW: int = 32768  # 模型上下文窗口
+    LLM_DOC_TOKEN_BUDGET: int = 6000  # 单次调用中文档正文最多占用的 token
+    TIKTOKEN_CACHE_DIR: str = ""  # tiktoken 编码文件缓存目录（可预先放入编码文件，避免运行时下载）
+    TIKTOKEN_LOAD_TIMEOUT: float = 10.0  # 启动时等待编码加载的最长时间（秒），超时后继续在后台加载
+    # 长文档分段摘要（map-reduce）
+    SUMMARY_CHUNK_TOKENS: int = 3000  # 每个摘要块的 token 上限
+    SUMMARY_NOTE_TOKENS: int = 400  # 每块要点的输出 token 上限
+    SUMMARY_CONCURRENCY: int = 8  # 单篇文档并发摘要的块数
+    # LLM 客户端注册表与共享连接池
+    LLM_CLIENT_CACHE_SIZE: int = 64  # 缓存的 ChatOpenAI 实例数（按 base_url/API Key/model）
+    LLM_POOL_MAX_CONNECTIONS: int = 100
+    LLM_POOL_MAX_KEEPALIVE: int = 20
+    # LLM 多端点路由（JSON：{"chat": [{"name", "base_url", "api_key", "model"}], "small": [...], "vision": [...]}）
+    LLM_ENDPOINTS: str = ""  # 为空时只使用 SiliconFlow
+    LLM_ROUTER_WINDOW: float = 60.0  # 错误率统计的滚动窗口（秒）
+    LLM_ROUTER_ERROR_THRESHOLD: float = 0.5  # 窗口内错误率超过该值视为不健康
+    LLM_ROUTER_COOLDOWN: float = 30.0  # 429/5xx 后端点冷却时间（秒，上游返回 Retry-After 时以其为准）
+    # 按 API Key 的准入控制（对话 > 翻译 > 批量）
+    LLM_KEY_MAX_INFLIGHT: int = 6  # 每个 Key 同时进行的上游调用数
+    LLM_KEY_TOKENS_PER_MINUTE: int = 0  # 每个 Key 每分钟的 token 预算，0 表示不限制
+    LLM_GOVERNOR_AGING: float = 5.0  # 排队每满该秒数提升一级优先级，防止低优先级请求饿死
+    LLM_GOVERNOR_MAX_RETRIES: int = 3  # 429/5xx 的统一重试次数
+    LLM_GOVERNOR_BACKOFF_MAX: float = 30.0  # 退避上限（秒）
+    # LLM 调用指标
+    LLM_METRICS_WINDOW: int = 3600  # 滚动百分位统计窗口（秒）
+    LLM_PRICING: str = ""  # JSON：{"模型": {"input": 每百万输入 token 价格, "output": 每百万输出 token 价格}}，为空时不计费用
+    # 文本翻译（长文本分块并发）
+    TRANSLATE_CONCURRENCY: int = 4  # 单个请求默认同时翻译的块数
+    TRANSLATE_MAX_CONCURRENCY: int = 16  # 请求可指定的并发上限
+    TRANSLATE_CHUNK_RETRIES: int = 2  # 单块失败后的重试次数
+    TRANSLATE_BATCH_TOKENS: int = 1500  # 相邻待翻译段落打包成一次 LLM 调用的 token 上限
+    # 推文 / 视频标题批量翻译（/crawler/translate/batch），译文按 ID + 原文哈希持久化
+    TWEET_TRANSLATE_BATCH_SIZE: int = 20  # 每次 LLM 调用最多合并的条数
+    TWEET_TRANSLATE_CONCURRENCY: int = 4  # 同时进行的批数
+    TWEET_TRANSLATION_PATH: str = ""  # 为空时使用 UPLOAD_DIR/tweet_translations.sqlite
+    # 爬虫完成后后台预翻译高互动推文和视频标题，译文写回 posts.json / videos.json
+    PRETRANSLATE_AFTER_CRAWL: bool = False
+    PRETRANSLATE_MAX_ITEMS: int = 100  # 每次爬取最多送去翻译的条数（已翻译过的不计入）
+    PRETRANSLATE_MIN_ENGAGEMENT: float = 100.0  # 推文互动分（点赞 + 2×转推 + 0.01×浏览 + 3×引用）阈值
+    PRETRANSLATE_MIN_FOLLOWERS: int = 100000  # 作者粉丝数达到该值的推文不看互动分
+    PRETRANSLATE_TARGET_LANG: str = "zh"
+    # PDF 全文翻译（解析完成后后台进行，通过 SSE 逐段推送）
+    PDF_TRANSLATE_CONCURRENCY: int = 8  # 单个 PDF 同时翻译的段数
+    PDF_TRANSLATE_CHUNK_CHARS: int = 3000  # 每段最大字符数
+    # 段落级翻译记忆（/api/translate、PDF 翻译共享）
+    TRANSLATION_MEMORY_ENABLED: bool = True
+    TRANSLATION_MEMORY_PATH: str = ""  # 为空时使用 UPLOAD_DIR/translation_memory.sqlite
+    TRANSLATION_MEMORY_MAX_BYTES: int = 100 * 1024 * 1024  # 100MB，超出后按最近访问时间淘汰
+    TRANSLATION_MEMORY_TTL: int = 90 * 24 * 3600  # 条目有效期（秒），0 表示不过期
+    # LLM 响应缓存（请求头 X-LLM-Cache: off 可跳过）
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = ""  # 为空时使用 UPLOAD_DIR/llm_cache.sqlite
+    LLM_CACHE_MAX_BYTES: int = 200 * 1024 * 1024  # 200MB，超出后按最近访问时间淘汰
+    LLM_CACHE_DEFAULT_TTL: int = 24 * 3600  # 未单独配置 TTL 的功能使用（秒）
 
     # 钉钉机器人配置
     DINGTALK_WEBHOOK_URL: str = ""
@@ -59,6 +116,14 @@ class Settings(BaseSettings):
     REPORT_DEFAULT_HOURS: int = 24  # 默认报告时间窗口（小时）
     REPORT_DEFAULT_TOP_N: int = 10  # 默认 Top N 推文数量
     AUTO_SEND_REPORT_AFTER_CRAWL: bool = False  # 爬虫完成后自动发送报告
+    ROLLUP_DB_PATH: str = ""  # 小时汇总桶 SQLite 路径，为空时使用 UPLOAD_DIR/rollups.sqlite
+    ROLLUP_RETENTION_DAYS: int = 90  # 小时汇总桶保留天数，更早的桶和推文记录会被清理
+
+    # 媒体缓存代理配置
+    MEDIA_CACHE_DIR: str = ""  # 为空时使用 UPLOAD_DIR/media_cache
+    MEDIA_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB，超出后按 LRU 淘汰
+    MEDIA_PREFETCH_AFTER_CRAWL: bool = False  # 爬虫完成后后台预取头像/配图/缩略图
+    MEDIA_PROXY_BASE_URL: str = ""  # 报告中图片使用的代理地址（后端公网地址），为空时保留原始链接
 
     # 定时日报配置
     ENABLE_AUTO_REPORT: bool = False  # 是否启用自动日报生成
@@ -7,14 +7,22 @@ import asyncio
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from app.config import settings
-from app.api import chat, paper, knowledge, crawler, pdf_analyzer, translate, docs, report
+from app.api import chat, paper, knowledge, crawler, pdf_analyzer, translate, docs, report, media
 from app.utils.resilience import get_all_health_status
+from app.utils.metrics import get_metrics_registry, PROMETHEUS_CONTENT_TYPE
+from app.services.crawl_metrics import get_crawl_metrics_summary
+from app.services.llm_cache import LLMCacheBypassMiddleware, get_llm_cache_stats
+from app.services.llm_governor import get_llm_governor
+from app.services.llm_metrics import get_llm_metrics_summary
+from app.services.llm_router import get_llm_router
+from app.services.translation_memory import get_translation_memory_stats
+from app.services.tweet_translation_service import get_tweet_translation_stats
 
 # API Documentation module loaded
 
@@ -232,6 +240,10 @@ async def lifespan(app: FastAPI):
     print("[Athena] Services: PDF Analyzer, Crawler, Knowledge Base, Chat")
     print("=" * 60)
 
+    # 加载 tiktoken 编码（后台线程，有等待上限）
+    from app.services.token_budget import preload_encodings
+    await preload_encodings()
+
     # 从配置文件加载配置（向后兼容环境变量）
     config = CrawlerConfigService.init_from_env(ENABLE_AUTO_CRAWL, CRAWLER_INTERVAL)
 
@@ -281,6 +293,10 @@ async def lifespan(app: FastAPI):
     # 停止报告调度器
     shutdown_report_scheduler()
 
+    # 关闭 LLM 共享连接池
+    from app.services.llm_clients import get_llm_client_registry
+    await get_llm_client_registry().aclose()
+
     print("[Athena] Backend shutting down...")
 
 
@@ -300,6 +316,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(LLMCacheBypassMiddleware)
 
 # 注册路由
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
@@ -310,6 +327,7 @@ app.include_router(pdf_analyzer.router, prefix="/api/pdf-analyzer", tags=["PDF A
 app.include_router(translate.router, prefix="/api", tags=["Translate"])
 app.include_router(docs.router, prefix="/api", tags=["Documentation"])
 app.include_router(report.router, prefix="/api", tags=["Report"])
+app.include_router(media.router, prefix="/api", tags=["Media"])
 
 # 挂载报告静态文件目录
 _reports_dir = Path(__file__).parent.parent.parent / "frontend" / "public" / "crawl-data" / "reports"
@@ -347,6 +365,19 @@ async def all_services_health():
     return {
         "overall": "healthy" if all_healthy else "degraded",
         "services": health_status,
+        "crawl_metrics": get_crawl_metrics_summary(),
+        "llm_cache": get_llm_cache_stats(),
+        "translation_memory": get_translation_memory_stats(),
+        "tweet_translations": get_tweet_translation_stats(),
+        "llm_router": get_llm_router().stats(),
+        "llm_governor": get_llm_governor().stats(),
+        "llm_calls": get_llm_metrics_summary(),
         "version": "0.1.0"
     }
 
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式指标"""
+    return Response(content=get_metrics_registry().render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
@@ -11,8 +11,7 @@ PDF_TRANSLATION_SYSTEM_PROMPT = """你是一位专业的学术翻译专家，擅
 2. 使用通顺自然的中文表达
 3. 专业术语首次出现时可保留英文原文，格式：中文译文（English Term）
 4. 保留原文的段落结构和格式
-5. 数字、公式、引用等保持原样
-6. 表格内容也需要翻译
+5. 数字、公式、引用等保持原样，形如 ⟦1⟧ 的占位符原样保留
 
 请直接输出翻译结果，不要添加任何解释或注释。"""
 
@@ -0,0 +1,30 @@
+"""
+长文档分段摘要（map-reduce）的 Prompt
+map 阶段逐章节提炼要点，要点过多时再分组合并，最终交给论文分析 / 知识分析的原有提示词
+"""
+
+SECTION_SUMMARY_PROMPT = """你是一名严谨的学术阅读助手。下面是一篇长文档中的一个片段（章节：{section}）。
+
+请用中文提炼该片段的要点，供后续整体分析使用：
+1. 保留研究问题、核心方法与关键步骤、实验设置、关键数据与结论、作者提到的局限
+2. 数字、模型名、数据集名、术语保持原文
+3. 使用条目列表，每条一句话，总长度不超过 {max_words} 字
+4. 只输出要点列表，不要添加前言或总结
+
+片段内容：
+
+{content}
+"""
+
+NOTES_MERGE_PROMPT = """你是一名严谨的学术阅读助手。下面是同一篇文档中连续若干章节的要点笔记。
+
+请将它们合并为一份更精简的要点笔记：
+1. 按章节顺序组织，合并重复信息
+2. 保留关键数据、方法细节、结论和局限
+3. 使用条目列表，总长度不超过 {max_words} 字
+4. 只输出要点列表，不要添加前言或总结
+
+要点笔记：
+
+{content}
+"""
@@ -0,0 +1,221 @@
+"""
+列式分析引擎
+把帖子一次性加载为 NumPy 列（时间戳、互动数、作者编码），
+时间窗口过滤、互动打分、Top N、按作者分组和汇总统计均为向量化操作，
+避免对全部帖子做多轮 Python 循环和逐条 strptime。
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+_MONTHS = {
+    "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04", "May": "05", "Jun": "06",
+    "Jul": "07", "Aug": "08", "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12",
+}
+
+# 互动分数权重：likes + retweets*2 + views*0.01 + quotes*3
+ENGAGEMENT_WEIGHTS = {"likes": 1.0, "retweets": 2.0, "views": 0.01, "quotes": 3.0}
+
+
+def engagement_score(item: Dict[str, Any]) -> float:
+    """单条帖子的互动分数（与 PostColumns.engagement 相同的权重）"""
+    stats = item.get("stats") or {}
+    score = 0.0
+    for name, weight in ENGAGEMENT_WEIGHTS.items():
+        try:
+            score += float(stats.get(name) or 0) * weight
+        except (TypeError, ValueError):
+            pass
+    return score
+
+
+def _parse_one(ts: Any) -> float:
+    try:
+        return datetime.strptime(ts, "%a %b %d %H:%M:%S %z %Y").timestamp()
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _fixed_width(chars: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """从 (n, 30) 的单字符矩阵中截取一段并视为定长字符串数组"""
+    return np.ascontiguousarray(chars[:, start:stop]).view(f"U{stop - start}").ravel()
+
+
+def parse_twitter_times(values: Sequence[Any]) -> np.ndarray:
+    """
+    批量解析 Twitter 时间格式 'Wed Sep 27 13:40:54 +0000 2023' 为 Unix 秒（float64）
+    该格式定长 30 字符，直接在字符矩阵上切片拼出 ISO 字符串交给 NumPy 转换；
+    格式不符的条目回退到 strptime，失败为 NaN
+    """
+    n = len(values)
+    out = np.full(n, np.nan, dtype=np.float64)
+    if n == 0:
+        return out
+    strings = np.asarray([v if isinstance(v, str) and len(v) == 30 else "" for v in values], dtype="U30")
+    chars = strings.view("U1").reshape(n, 30)
+
+    valid = (chars[:, 3] == " ") & (chars[:, 10] == " ") & (chars[:, 19] == " ") & (chars[:, 25] == " ")
+    months, inverse = np.unique(_fixed_width(chars, 4, 7), return_inverse=True)
+    month_digits = np.array([_MONTHS.get(m, "00") for m in months], dtype="U2")[inverse.ravel()]
+    valid &= month_digits != "00"
+
+    iso = np.empty((n, 19), dtype="U1")
+    iso[:, 0:4] = chars[:, 26:30]
+    iso[:, 4] = "-"
+    iso[:, 5:7] = month_digits.view("U1").reshape(n, 2)
+    iso[:, 7] = "-"
+    iso[:, 8:10] = chars[:, 8:10]
+    iso[:, 10] = "T"
+    iso[:, 11:19] = chars[:, 11:19]
+    iso_strings = iso.view("U19").ravel()
+
+    rows = np.flatnonzero(valid)
+    try:
+        parsed = iso_strings[rows].astype("datetime64[s]").astype(np.int64)
+        tz = chars[rows, 20:25]
+        sign = np.where(tz[:, 0] == "-", -1, 1)
+        hh = _fixed_width(tz, 1, 3).astype(np.int64)
+        mm = _fixed_width(tz, 3, 5).astype(np.int64)
+        out[rows] = parsed - sign * (hh * 3600 + mm * 60)
+    except ValueError:
+        valid[:] = False
+
+    for i in np.flatnonzero(~valid):
+        if values[i]:
+            out[i] = _parse_one(values[i])
+    return out
+
+
+class PostColumns:
+    """帖子数据的列式视图，行号与原始 items 列表一一对应"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        n = len(items)
+        authors = [item.get("author") or {} for item in items]
+
+        self.timestamps = parse_twitter_times([item.get("created_at", "") for item in items])
+
+        # 单次遍历取出所有数值列
+        numeric = np.array(
+            [
+                (
+                    s.get("likes") or 0, s.get("retweets") or 0, s.get("views") or 0,
+                    s.get("quotes") or 0, a.get("followers") or 0,
+                )
+                for s, a in zip((item.get("stats") or {} for item in items), authors)
+            ],
+            dtype=np.int64,
+        ).reshape(n, 5)
+        self.likes, self.retweets, self.views, self.quotes, self.followers = (
+            np.ascontiguousarray(numeric[:, i]) for i in range(5)
+        )
+
+        # 作者编码：按首次出现顺序编号，无用户名为 -1
+        self.author_names: List[str] = []
+        codes: Dict[str, int] = {}
+        author_codes = np.empty(n, dtype=np.int32)
+        for i, author in enumerate(authors):
+            username = author.get("username")
+            if username:
+                code = codes.get(username)
+                if code is None:
+                    code = codes[username] = len(self.author_names)
+                    self.author_names.append(username)
+                author_codes[i] = code
+            else:
+                author_codes[i] = -1
+        self.author_codes = author_codes
+        self._codes_lower: Dict[str, List[int]] = {}
+        for username, code in codes.items():
+            self._codes_lower.setdefault(username.lower(), []).append(code)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def engagement(self) -> np.ndarray:
+        w = ENGAGEMENT_WEIGHTS
+        return (
+            self.likes * w["likes"]
+            + self.retweets * w["retweets"]
+            + self.views * w["views"]
+            + self.quotes * w["quotes"]
+        )
+
+    def author_mask(self, authors: Sequence[str]) -> np.ndarray:
+        """按用户名过滤（不区分大小写，忽略 @ 前缀）"""
+        wanted: List[int] = []
+        for a in authors:
+            wanted.extend(self._codes_lower.get(a.lower().lstrip("@"), []))
+        return np.isin(self.author_codes, np.asarray(wanted, dtype=np.int32))
+
+    def window_mask(self, now_ts: float, hours: float) -> np.ndarray:
+        """时间窗口内（含未来时间）的帖子，时间无法解析的帖子不计入"""
+        with np.errstate(invalid="ignore"):
+            return (now_ts - self.timestamps) / 3600 <= hours
+
+    def top_n(self, rows: np.ndarray, n: int, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        返回 rows 中互动分数最高的 n 个行号（降序；分数相同时保持原始顺序）
+        """
+        if n <= 0 or len(rows) == 0:
+            return rows[:0]
+        if scores is None:
+            scores = self.engagement()
+        sub = scores[rows]
+        if n < len(rows):
+            # argpartition 先取出前 n 名（含并列的边界值），再做稳定排序
+            kth = np.partition(-sub, n - 1)[n - 1]
+            candidates = np.flatnonzero(-sub <= kth)
+        else:
+            candidates = np.arange(len(rows))
+        order = np.lexsort((candidates, -sub[candidates]))
+        return rows[candidates[order][:n]]
+
+    def author_activity(self, rows: np.ndarray, limit: int = 10) -> List[Dict[str, Any]]:
+        """按作者分组统计发帖数，返回最活跃的作者（发帖数相同时按首次出现顺序）"""
+        codes = self.author_codes[rows]
+        keep = codes >= 0
+        rows, codes = rows[keep], codes[keep]
+        if len(rows) == 0:
+            return []
+        uniq, first_pos, counts = np.unique(codes, return_index=True, return_counts=True)
+
+        # 每个作者粉丝数最多的那条（并列取最早出现的）
+        order = np.lexsort((np.arange(len(rows)), -self.followers[rows], codes))
+        sorted_codes = codes[order]
+        first_of_group = np.ones(len(order), dtype=bool)
+        first_of_group[1:] = sorted_codes[1:] != sorted_codes[:-1]
+        max_rows = rows[order[first_of_group]]
+
+        ranking = np.lexsort((first_pos, -counts))[:limit]
+        result = []
+        for idx in ranking:
+            first_item = self.items[rows[first_pos[idx]]]
+            best_item = self.items[max_rows[idx]]
+            author = first_item.get("author") or {}
+            best_author = best_item.get("author") or {}
+            username = self.author_names[uniq[idx]]
+            followers = int(self.followers[max_rows[idx]])
+            first_followers = int(self.followers[rows[first_pos[idx]]])
+            result.append({
+                "username": username,
+                "name": author.get("name") or username,
+                # 首条帖子的头像，除非后续帖子的粉丝数更高
+                "avatar": (best_author if followers > first_followers else author).get("avatar", ""),
+                "followers": followers,
+                "verified": author.get("verified", False),
+                "post_count": int(counts[idx]),
+            })
+        return result
+
+    def totals(self, rows: np.ndarray) -> Dict[str, int]:
+        codes = self.author_codes[rows]
+        return {
+            "total_likes": int(self.likes[rows].sum()),
+            "total_retweets": int(self.retweets[rows].sum()),
+            "total_views": int(self.views[rows].sum()),
+            "active_authors": int(len(np.unique(codes[codes >= 0]))),
+        }
@@ -4,6 +4,7 @@
 """
 
 import json
+import os
 from pathlib import Path
 from typing import Dict, Any, Optional
 from datetime import datetime
@@ -12,8 +13,11 @@ from datetime import datetime
 class CrawlerConfigService:
     """爬虫配置管理服务"""
 
-    # 配置文件路径
-    config_file = Path(__file__).parent.parent / "Info_sources" / "crawler_config.json"
+    # 配置文件路径（压测等场景可通过 CRAWLER_CONFIG_PATH 指向临时文件）
+    config_file = Path(
+        os.getenv("CRAWLER_CONFIG_PATH")
+        or Path(__file__).parent.parent / "Info_sources" / "crawler_config.json"
+    )
 
     # 默认配置
     DEFAULT_CONFIG = {
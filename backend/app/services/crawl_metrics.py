@@ -0,0 +1,152 @@
+"""
+爬虫指标服务
+按平台聚合请求延迟、下载字节数、解析/写入耗时、条目数和错误类型，
+同时同步到 CRAWLER_HEALTH 健康检查器
+"""
+
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ..utils.metrics import DEFAULT_SIZE_BUCKETS, get_metrics_registry
+from ..utils.resilience import CRAWLER_HEALTH
+
+_registry = get_metrics_registry()
+
+REQUEST_SECONDS = _registry.histogram(
+    "athena_crawl_request_seconds",
+    "Upstream request latency during crawls",
+    ("platform", "endpoint"),
+)
+RESPONSE_BYTES = _registry.histogram(
+    "athena_crawl_response_bytes",
+    "Upstream response body size",
+    ("platform", "endpoint"),
+    buckets=DEFAULT_SIZE_BUCKETS,
+)
+DOWNLOADED_BYTES = _registry.counter(
+    "athena_crawl_downloaded_bytes_total",
+    "Total bytes downloaded from upstreams",
+    ("platform",),
+)
+SOURCE_SECONDS = _registry.histogram(
+    "athena_crawl_source_seconds",
+    "End-to-end time to crawl a single source",
+    ("platform",),
+)
+SOURCES_TOTAL = _registry.counter(
+    "athena_crawl_sources_total",
+    "Crawled sources by outcome",
+    ("platform", "status"),
+)
+PARSE_SECONDS = _registry.histogram(
+    "athena_crawl_parse_seconds",
+    "Time spent parsing upstream payloads",
+    ("platform",),
+)
+WRITE_SECONDS = _registry.histogram(
+    "athena_crawl_write_seconds",
+    "Time spent writing crawl data files",
+    ("platform",),
+)
+ITEMS_TOTAL = _registry.counter(
+    "athena_crawl_items_total",
+    "Crawled items by kind (parsed / new / updated)",
+    ("platform", "kind"),
+)
+ERRORS_TOTAL = _registry.counter(
+    "athena_crawl_errors_total",
+    "Crawl errors by stage and error class",
+    ("platform", "stage", "error"),
+)
+LAST_RUN_SECONDS = _registry.gauge(
+    "athena_crawl_last_run_seconds",
+    "Duration of the most recent full crawl",
+    ("platform",),
+)
+LAST_RUN_TIMESTAMP = _registry.gauge(
+    "athena_crawl_last_run_timestamp_seconds",
+    "Unix time the most recent full crawl finished",
+    ("platform",),
+)
+
+
+def classify_error(exc: Optional[BaseException] = None, status_code: Optional[int] = None) -> str:
+    """把异常或 HTTP 状态码归类为较粗粒度的错误类型，避免标签基数过高"""
+    if status_code is not None:
+        if status_code == 429:
+            return "http_429"
+        if status_code >= 500:
+            return "http_5xx"
+        return "http_4xx" if status_code >= 400 else f"http_{status_code}"
+    if exc is None:
+        return "unknown"
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.ConnectError):
+        return "connect"
+    if isinstance(exc, (ValueError, KeyError)):
+        return "parse"
+    return type(exc).__name__
+
+
+def record_request(platform: str, endpoint: str, seconds: float, response: Optional[httpx.Response] = None):
+    """记录一次上游请求"""
+    REQUEST_SECONDS.observe(seconds, platform=platform, endpoint=endpoint)
+    if response is not None:
+        size = len(response.content)
+        RESPONSE_BYTES.observe(size, platform=platform, endpoint=endpoint)
+        DOWNLOADED_BYTES.inc(size, platform=platform)
+        if response.status_code >= 400:
+            record_error(platform, endpoint, classify_error(status_code=response.status_code))
+
+
+def record_error(platform: str, stage: str, error: str):
+    ERRORS_TOTAL.inc(platform=platform, stage=stage, error=error)
+
+
+def record_source(platform: str, seconds: float, result: Dict[str, Any]):
+    """记录单个信源的爬取结果，并同步健康状态"""
+    SOURCE_SECONDS.observe(seconds, platform=platform)
+    items = len(result.get("items", []))
+    ITEMS_TOTAL.inc(items, platform=platform, kind="parsed")
+    if result.get("error"):
+        SOURCES_TOTAL.inc(platform=platform, status="failed")
+        CRAWLER_HEALTH.record_failure(f"{platform}:{result.get('source_name')}: {result['error']}")
+    else:
+        SOURCES_TOTAL.inc(platform=platform, status="success")
+        CRAWLER_HEALTH.record_success()
+
+
+def record_items_saved(platform: str, new: int, updated: int):
+    ITEMS_TOTAL.inc(new, platform=platform, kind="new")
+    ITEMS_TOTAL.inc(updated, platform=platform, kind="updated")
+
+
+def record_run(platform: str, seconds: float, finished_at: float):
+    LAST_RUN_SECONDS.set(seconds, platform=platform)
+    LAST_RUN_TIMESTAMP.set(finished_at, platform=platform)
+
+
+def get_crawl_metrics_summary() -> Dict[str, Any]:
+    """按平台汇总的爬虫指标（JSON 格式）"""
+    summary: Dict[str, Dict[str, Any]] = {}
+
+    def platform_entry(platform: str) -> Dict[str, Any]:
+        return summary.setdefault(platform, {
+            "sources": {}, "items": {}, "errors": 0, "downloaded_bytes": 0,
+        })
+
+    for (platform, status), value in SOURCES_TOTAL.items():
+        platform_entry(platform)["sources"][status] = int(value)
+    for (platform, kind), value in ITEMS_TOTAL.items():
+        platform_entry(platform)["items"][kind] = int(value)
+    for (platform, _stage, _error), value in ERRORS_TOTAL.items():
+        platform_entry(platform)["errors"] += int(value)
+    for (platform,), value in DOWNLOADED_BYTES.items():
+        platform_entry(platform)["downloaded_bytes"] = int(value)
+
+    for platform, entry in summary.items():
+        entry["avg_source_seconds"] = round(SOURCE_SECONDS.summary(platform=platform)["avg"], 3)
+        entry["last_run_seconds"] = round(LAST_RUN_SECONDS.get(platform=platform), 3)
+    return summary
@@ -9,29 +9,46 @@ import json
 import re
 import httpx
 import subprocess
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 
-# API 配置
-TWITTER_API_URL = "https://api.twitterapi.io/twitter/user/last_tweets"
-TWITTER_API_KEY = "new1_7590bc837c4d4104ada0ef3419ab7d6c"
-FIRECRAWL_API_URL = "https://firecrawl.ihainan.me/v1/scrape"
+from app.services.media_service import schedule_media_prefetch
+from app.services.tweet_translation_service import schedule_pretranslation
+from app.services import crawl_metrics
+from app.services.search_index import sync_search_index
+from app.services.dedup_service import annotate_duplicates
+from app.services.rollup_service import sync_tweets
+
+# API 配置（可通过环境变量覆盖，便于基准测试指向本地模拟上游）
+TWITTER_API_URL = os.getenv("TWITTER_API_URL", "https://api.twitterapi.io/twitter/user/last_tweets")
+TWITTER_API_KEY = os.getenv("TWITTER_API_KEY", "new1_7590bc837c4d4104ada0ef3419ab7d6c")
+FIRECRAWL_API_URL = os.getenv("FIRECRAWL_API_URL", "https://firecrawl.ihainan.me/v1/scrape")
+YOUTUBE_RSS_URL = os.getenv("YOUTUBE_RSS_URL", "https://www.youtube.com/feeds/videos.xml")
 
 # 数据保存路径 - 保存到 public 目录，前端可直接访问
-CRAWL_DATA_BASE_PATH = Path(__file__).parent.parent.parent.parent / "frontend" / "public" / "crawl-data"
+CRAWL_DATA_BASE_PATH = Path(
+    os.getenv("CRAWL_DATA_DIR")
+    or Path(__file__).parent.parent.parent.parent / "frontend" / "public" / "crawl-data"
+)
+
+# 信源配置文件路径
+SOURCES_PATH = Path(
+    os.getenv("CRAWLER_SOURCES_PATH")
+    or Path(__file__).parent.parent / "Info_sources" / "sources.json"
+)
 
 
 def load_sources() -> Dict[str, List[Dict[str, str]]]:
     """加载信源配置"""
-    sources_path = Path(__file__).parent.parent / "Info_sources" / "sources.json"
-    with open(sources_path, "r", encoding="utf-8") as f:
+    with open(SOURCES_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 def update_sources_names(name_updates: Dict[str, str]):
     """使用爬取到的真实显示名称更新 sources.json"""
-    sources_path = Path(__file__).parent.parent / "Info_sources" / "sources.json"
+    sources_path = SOURCES_PATH
     try:
         with open(sources_path, "r", encoding="utf-8") as f:
             sources = json.load(f)
@@ -73,6 +90,7 @@ async def fetch_twitter_user_tweets(username: str, timeout: int = 30) -> Optiona
     """
     try:
         async with httpx.AsyncClient(timeout=timeout) as client:
+            start = time.perf_counter()
             response = await client.get(
                 TWITTER_API_URL,
                 params={"userName": username},
@@ -81,6 +99,7 @@ async def fetch_twitter_user_tweets(username: str, timeout: int = 30) -> Optiona
                     "x-api-key": TWITTER_API_KEY
                 }
             )
+            crawl_metrics.record_request("twitter", "last_tweets", time.perf_counter() - start, response)
             
             if response.status_code == 200:
                 return response.json()
@@ -89,6 +108,7 @@ async def fetch_twitter_user_tweets(username: str, timeout: int = 30) -> Optiona
                 return None
                 
     except Exception as e:
+        crawl_metrics.record_error("twitter", "last_tweets", crawl_metrics.classify_error(e))
         print(f"[Twitter API] Error @{username}: {str(e)}")
         return None
 
@@ -229,7 +249,8 @@ async def crawl_twitter_source(source: Dict[str, str]) -> Dict[str, Any]:
                 }
                 break
 
-    items = transform_twitter_data(raw_data, real_name)
+    with crawl_metrics.PARSE_SECONDS.time(platform="twitter"):
+        items = transform_twitter_data(raw_data, real_name)
 
     return {
         "source_name": real_name,
@@ -318,6 +339,30 @@ def save_authors_data(authors: List[Dict[str, Any]]) -> str:
     return str(filepath)
 
 
+def _record_new_and_updated(platform: str, filepath: Path, items: List[Dict[str, Any]]):
+    """
+    对比上一次保存的数据，统计新增和更新的条目数
+
+    已存在的条目只有爬取到的字段确实变化（如互动数）时才算更新；
+    只比较本次爬取带有的字段，簇标注、译文等入库后补充的字段不参与比较
+    """
+    existing: Dict[Any, Dict[str, Any]] = {}
+    if filepath.exists():
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                existing = {item.get("id"): item for item in json.load(f).get("items", [])}
+        except (OSError, ValueError) as e:
+            crawl_metrics.record_error(platform, "read_existing", crawl_metrics.classify_error(e))
+    new = updated = 0
+    for item in items:
+        old = existing.get(item.get("id"))
+        if old is None:
+            new += 1
+        elif any(old.get(k) != v for k, v in item.items()):
+            updated += 1
+    crawl_metrics.record_items_saved(platform, new, updated)
+
+
 def save_twitter_data(sources_data: List[Dict[str, Any]]) -> str:
     """保存 Twitter 数据 - 直接覆盖文件"""
     # 合并所有推文
@@ -335,6 +380,10 @@ def save_twitter_data(sources_data: List[Dict[str, Any]]) -> str:
     
     filename = "posts.json"
     filepath = platform_dir / filename
+    _record_new_and_updated("twitter", filepath, all_tweets)
+
+    # 标注近重复簇（cluster_id / canonical_id）
+    annotate_duplicates(all_tweets, "twitter")
     
     output = {
         "platform": "twitter",
@@ -370,9 +419,11 @@ async def get_youtube_channel_id(url: str, timeout: int = 60) -> Optional[str]:
                 return channel_match.group(1)
             
             # 访问频道页面获取真实的 channel_id
+            start = time.perf_counter()
             response = await client.get(url, headers={
                 'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
             })
+            crawl_metrics.record_request("youtube", "channel_page", time.perf_counter() - start, response)
             
             if response.status_code == 200:
                 html = response.text
@@ -398,10 +449,12 @@ async def get_youtube_channel_id(url: str, timeout: int = 60) -> Optional[str]:
                     return browse_match.group(1)
             
             return None
-    except httpx.TimeoutException:
+    except httpx.TimeoutException as e:
+        crawl_metrics.record_error("youtube", "channel_page", crawl_metrics.classify_error(e))
         print(f"[YouTube] Timeout getting channel_id for {url} after {timeout}s")
         return None
     except Exception as e:
+        crawl_metrics.record_error("youtube", "channel_page", crawl_metrics.classify_error(e))
         print(f"[YouTube] Error getting channel_id for {url}: {e}")
         return None
 
@@ -412,18 +465,22 @@ async def fetch_youtube_rss_feed(channel_id: str, timeout: int = 60) -> Optional
     增加超时时间以适应生产环境
     """
     try:
-        rss_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+        rss_url = f"{YOUTUBE_RSS_URL}?channel_id={channel_id}"
         async with httpx.AsyncClient(timeout=timeout) as client:
+            start = time.perf_counter()
             response = await client.get(rss_url)
+            crawl_metrics.record_request("youtube", "rss", time.perf_counter() - start, response)
             if response.status_code == 200:
                 print(f"[YouTube RSS] Success for {channel_id}: got feed content")
                 return response.text
             print(f"[YouTube RSS] Failed for {channel_id}: HTTP {response.status_code}")
             return None
-    except httpx.TimeoutException:
+    except httpx.TimeoutException as e:
+        crawl_metrics.record_error("youtube", "rss", crawl_metrics.classify_error(e))
         print(f"[YouTube RSS] Timeout for {channel_id} after {timeout}s")
         return None
     except Exception as e:
+        crawl_metrics.record_error("youtube", "rss", crawl_metrics.classify_error(e))
         print(f"[YouTube RSS] Error for {channel_id}: {e}")
         return None
 
@@ -463,11 +520,13 @@ async def fetch_youtube_channel_page(url: str, timeout: int = 90) -> Optional[Di
         # 如果 RSS 失败，尝试 FireCrawl 作为备选
         print(f"[YouTube] RSS failed, trying FireCrawl for {url}")
         async with httpx.AsyncClient(timeout=timeout) as client:
+            start = time.perf_counter()
             response = await client.post(
                 FIRECRAWL_API_URL,
                 json={"url": url},
                 headers={"Content-Type": "application/json"}
             )
+            crawl_metrics.record_request("youtube", "firecrawl", time.perf_counter() - start, response)
             
             if response.status_code == 200:
                 data = response.json()
@@ -478,10 +537,12 @@ async def fetch_youtube_channel_page(url: str, timeout: int = 90) -> Optional[Di
             print(f"[FireCrawl] Failed {url}: HTTP {response.status_code}")
             return None
     
-    except httpx.TimeoutException:
+    except httpx.TimeoutException as e:
+        crawl_metrics.record_error("youtube", "firecrawl", crawl_metrics.classify_error(e))
         print(f"[YouTube] Timeout for {url} after {timeout}s")
         return None
     except Exception as e:
+        crawl_metrics.record_error("youtube", "firecrawl", crawl_metrics.classify_error(e))
         print(f"[YouTube] Error {url}: {str(e)}")
         return None
 
@@ -604,10 +665,11 @@ async def crawl_youtube_source(source: Dict[str, str]) -> Dict[str, Any]:
     is_rss = data.get("is_rss", False)
     
     # 根据数据类型选择解析方法
-    if is_rss:
-        items = extract_youtube_videos_from_rss(markdown, source["name"])
-    else:
-        items = extract_youtube_videos_from_markdown(markdown, source["name"])
+    with crawl_metrics.PARSE_SECONDS.time(platform="youtube"):
+        if is_rss:
+            items = extract_youtube_videos_from_rss(markdown, source["name"])
+        else:
+            items = extract_youtube_videos_from_markdown(markdown, source["name"])
     
     # 提取频道信息
     metadata = raw_data.get("data", {}).get("metadata", {})
@@ -641,6 +703,7 @@ def save_youtube_data(sources_data: List[Dict[str, Any]]) -> str:
     
     filename = "videos.json"
     filepath = platform_dir / filename
+    _record_new_and_updated("youtube", filepath, all_videos)
     
     output = {
         "platform": "youtube",
@@ -663,11 +726,14 @@ async def crawl_all_twitter() -> Dict[str, Any]:
     sources = load_sources()
     twitter_sources = sources.get("twitter", [])
 
+    run_start = time.perf_counter()
     results = []
     for source in twitter_sources:
         safe_name = source['name'].encode('ascii', 'replace').decode('ascii')
         print(f"[Twitter] Crawling: {safe_name}...")
+        source_start = time.perf_counter()
         result = await crawl_twitter_source(source)
+        crawl_metrics.record_source("twitter", time.perf_counter() - source_start, result)
         results.append(result)
 
     # 使用 API 返回的真实显示名称更新 sources.json
@@ -698,9 +764,25 @@ async def crawl_all_twitter() -> Dict[str, Any]:
     # 尝试保存到文件（本地开发时有效）
     filepath = None
     try:
-        filepath = save_twitter_data(results)
+        with crawl_metrics.WRITE_SECONDS.time(platform="twitter"):
+            filepath = save_twitter_data(results)
     except Exception as e:
+        crawl_metrics.record_error("twitter", "write", crawl_metrics.classify_error(e))
         print(f"[Warning] Could not save to file: {e}")
+    crawl_metrics.record_run("twitter", time.perf_counter() - run_start, time.time())
+
+    # posts.json 已整体覆盖，小时汇总桶随之对账
+    if filepath:
+        await sync_tweets(all_tweets)
+
+    # 同步全文检索索引
+    sync_search_index("twitter", all_tweets)
+
+    # 后台预取头像和配图（可选）
+    schedule_media_prefetch(all_tweets)
+
+    # 后台预翻译高互动推文（可选）
+    schedule_pretranslation("twitter", all_tweets, filepath)
 
     return {
         "success": True,
@@ -717,11 +799,14 @@ async def crawl_all_youtube() -> Dict[str, Any]:
     sources = load_sources()
     youtube_sources = sources.get("youtube", [])
     
+    run_start = time.perf_counter()
     results = []
     for source in youtube_sources:
         safe_name = source['name'].encode('ascii', 'replace').decode('ascii')
         print(f"[YouTube] Crawling: {safe_name}...")
+        source_start = time.perf_counter()
         result = await crawl_youtube_source(source)
+        crawl_metrics.record_source("youtube", time.perf_counter() - source_start, result)
         results.append(result)
     
     # 合并所有视频
@@ -742,9 +827,21 @@ async def crawl_all_youtube() -> Dict[str, Any]:
     # 尝试保存到文件
     filepath = None
     try:
-        filepath = save_youtube_data(results)
+        with crawl_metrics.WRITE_SECONDS.time(platform="youtube"):
+            filepath = save_youtube_data(results)
     except Exception as e:
+        crawl_metrics.record_error("youtube", "write", crawl_metrics.classify_error(e))
         print(f"[Warning] Could not save to file: {e}")
+    crawl_metrics.record_run("youtube", time.perf_counter() - run_start, time.time())
+
+    # 同步全文检索索引
+    sync_search_index("youtube", all_videos)
+
+    # 后台预取缩略图（可选）
+    schedule_media_prefetch(all_videos)
+
+    # 后台预翻译视频标题（可选）
+    schedule_pretranslation("youtube", all_videos, filepath)
     
     return {
         "success": True,
@@ -0,0 +1,237 @@
+"""
+近重复检测服务
+多个信源经常引用或转述同一条公告，导致报告 Top N 和前端列表被近似内容占满。
+这里在入库时增量计算 MinHash 签名，通过 LSH 分桶找出候选对，
+再用签名估计的 Jaccard 相似度确认。只按帖子自身文本聚类：引用同一条推文的不同评论不会因此被合并。
+
+每个条目会被标注：
+- cluster_id: 簇 ID（簇内最小的条目 ID，推文 ID 按时间递增即最早的帖子；与入库顺序无关，重启后不变）
+- canonical_id: 簇代表（互动分数最高的条目）
+- cluster_size: 簇大小
+"""
+
+import hashlib
+import re
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.services.analytics_engine import engagement_score
+from app.services.search_index import tokenize
+
+# MinHash 参数：20 个分桶 × 每桶 3 行，Jaccard 0.5 时命中率约 93%
+NUM_BANDS = 20
+ROWS_PER_BAND = 3
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+# 签名估计的 Jaccard 相似度阈值
+JACCARD_THRESHOLD = 0.5
+
+# 少于该数量的 shingle 不参与文本聚类（太短无法可靠判断）
+MIN_SHINGLES = 4
+
+_MASK32 = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_URL_RE = re.compile(r"https?://\S+")
+_MENTION_RE = re.compile(r"@\w+")
+
+
+def _item_text(item: Dict[str, Any]) -> str:
+    """用于近重复判断的文本：推文正文或视频标题，去掉链接和 @"""
+    text = item.get("text") or item.get("title") or ""
+    text = _URL_RE.sub(" ", text)
+    return _MENTION_RE.sub(" ", text)
+
+
+def _shingles(text: str) -> Set[str]:
+    tokens = tokenize(text)
+    if len(tokens) < 2:
+        return set(tokens)
+    return {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """计算 MinHash 签名，文本过短时返回 None"""
+    shingles = _shingles(text)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # (a * x + b) mod 2^32，对每个排列取最小值
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) & _MASK32
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def _id_key(item_id: str):
+    """ID 排序键：数字 ID 按数值（推文 ID 即按时间），其余按字符串"""
+    return (len(item_id), item_id) if item_id.isdigit() else (float("inf"), item_id)
+
+
+class NearDuplicateIndex:
+    """
+    增量维护的 MinHash-LSH 索引 + 并查集
+
+    签名按 (id, 文本摘要) 缓存，重复入库的条目不会重新计算。
+    相似对记录为边；条目文本变化时先移出旧的分桶并删除旧边，再按剩余的边重建并查集。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Optional[np.ndarray]] = {}
+        self._digests: Dict[str, str] = {}
+        self._band_keys: Dict[str, List[bytes]] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [dict() for _ in range(NUM_BANDS)]
+        self._edges: Dict[str, Set[str]] = {}
+        self._parent: Dict[str, str] = {}
+
+    # ==================== 并查集 ====================
+
+    def _find(self, x: str) -> str:
+        root = x
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[x] != root:
+            self._parent[x], x = root, self._parent[x]
+        return root
+
+    def _union(self, a: str, b: str):
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return
+        # 以最小的 ID 作为根，cluster_id 与入库顺序无关
+        if _id_key(ra) <= _id_key(rb):
+            self._parent[rb] = ra
+        else:
+            self._parent[ra] = rb
+
+    def _rebuild_unions(self):
+        """删除边之后按剩余的边重建并查集"""
+        self._parent = {item_id: item_id for item_id in self._parent}
+        for a, neighbours in self._edges.items():
+            for b in neighbours:
+                self._union(a, b)
+
+    # ==================== 入库 ====================
+
+    def _remove(self, item_id: str) -> bool:
+        """把条目移出分桶并删除它的边，返回是否删除了边"""
+        for band, key in enumerate(self._band_keys.pop(item_id, [])):
+            bucket = self._buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.remove(item_id)
+            if not bucket:
+                del self._buckets[band][key]
+        neighbours = self._edges.pop(item_id, set())
+        for other in neighbours:
+            self._edges[other].discard(item_id)
+        return bool(neighbours)
+
+    def _add(self, item_id: str, item: Dict[str, Any]) -> bool:
+        """加入或更新条目，返回是否删除了旧边（需要重建并查集）"""
+        text = _item_text(item)
+        digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+        if self._digests.get(item_id) == digest:
+            return False
+        # 文本变化：旧分桶和旧的相似关系都不再成立
+        removed = self._remove(item_id) if item_id in self._digests else False
+        self._parent.setdefault(item_id, item_id)
+        self._edges.setdefault(item_id, set())
+        self._digests[item_id] = digest
+
+        signature = minhash_signature(text)
+        self._signatures[item_id] = signature
+        if signature is None:
+            return removed
+        keys = [
+            signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+            for band in range(NUM_BANDS)
+        ]
+        self._band_keys[item_id] = keys
+        candidates: Set[str] = set()
+        for band, key in enumerate(keys):
+            bucket = self._buckets[band].setdefault(key, [])
+            candidates.update(bucket)
+            bucket.append(item_id)
+        # 同簇的候选也要比较并记录边，删除其它条目时才能正确拆分
+        for other in candidates:
+            other_sig = self._signatures.get(other)
+            if other_sig is not None and np.mean(other_sig == signature) >= JACCARD_THRESHOLD:
+                self._edges[item_id].add(other)
+                self._edges[other].add(item_id)
+                self._union(item_id, other)
+        return removed
+
+    def annotate(
+        self,
+        items: List[Dict[str, Any]],
+        score: Callable[[Dict[str, Any]], float] = engagement_score,
+    ) -> Dict[str, int]:
+        """
+        把条目加入索引并写入 cluster_id / canonical_id / cluster_size 字段
+
+        Returns:
+            {"clusters": 含多个条目的簇数量, "duplicates": 非代表条目数量}
+        """
+        with self._lock:
+            rebuild = False
+            for item in items:
+                if item.get("id"):
+                    rebuild = self._add(str(item["id"]), item) or rebuild
+            if rebuild:
+                self._rebuild_unions()
+
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for item in items:
+                if item.get("id"):
+                    groups.setdefault(self._find(str(item["id"])), []).append(item)
+
+        clusters = duplicates = 0
+        for root, members in groups.items():
+            canonical = min(members, key=lambda m: (-score(m), _id_key(str(m["id"]))))
+            for member in members:
+                member["cluster_id"] = root
+                member["canonical_id"] = str(canonical["id"])
+                member["cluster_size"] = len(members)
+            if len(members) > 1:
+                clusters += 1
+                duplicates += len(members) - 1
+        return {"clusters": clusters, "duplicates": duplicates}
+
+
+_dedup_indexes: Dict[str, NearDuplicateIndex] = {}
+
+
+def get_dedup_index(platform: str = "twitter") -> NearDuplicateIndex:
+    """获取指定平台的近重复索引"""
+    if platform not in _dedup_indexes:
+        _dedup_indexes[platform] = NearDuplicateIndex()
+    return _dedup_indexes[platform]
+
+
+def annotate_duplicates(items: List[Dict[str, Any]], platform: str = "twitter") -> Dict[str, int]:
+    """为条目标注近重复簇信息（入库时调用）"""
+    try:
+        result = get_dedup_index(platform).annotate(items)
+        if result["clusters"]:
+            print(f"[Dedup] {platform}: {result['clusters']} clusters, {result['duplicates']} near-duplicates")
+        return result
+    except Exception as e:
+        print(f"[Dedup] Failed to annotate {platform}: {e}")
+        return {"clusters": 0, "duplicates": 0}
+
+
+def collapse_to_canonical(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """只保留每个簇的代表条目（用于数据接口），未标注的条目原样保留"""
+    return [
+        item for item in items
+        if not item.get("canonical_id") or str(item.get("id")) == item["canonical_id"]
+    ]
@@ -0,0 +1,324 @@
+"""
+LLM 响应缓存
+相同的提示词（同一术语解释、同一条推文翻译、同一篇论文分析、重复生成的报告）
+直接返回缓存结果，不再重复请求模型。
+
+- 键：model + base_url + 规范化后的消息 + 采样参数 的 SHA-256
+- 存储：本地 SQLite，按总字节数做 LRU 淘汰；访问时间先记在内存中，批量写回
+- 过期：按功能（chat / translate / paper / report / vision）设置 TTL
+- 请求头 X-LLM-Cache: off（或 Cache-Control: no-cache）可跳过缓存
+- 命中只提供给成功调用过上游的 API Key：缓存跨用户共享，但无效 Key 不能借缓存拿到结果
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.llm_clients import _key_digest
+from app.utils.metrics import get_metrics_registry
+
+# 各功能的缓存有效期（秒），未列出的功能使用 LLM_CACHE_DEFAULT_TTL
+FEATURE_TTLS: Dict[str, int] = {
+    "chat": 24 * 3600,
+    "translate": 30 * 24 * 3600,
+    "pdf": 30 * 24 * 3600,
+    "pretranslate": 30 * 24 * 3600,
+    "paper": 7 * 24 * 3600,
+    "knowledge": 7 * 24 * 3600,
+    "summary": 30 * 24 * 3600,
+    "vision": 7 * 24 * 3600,
+    "report": 6 * 3600,
+}
+
+# 内存中积累多少条访问时间后批量写回
+TOUCH_FLUSH_SIZE = 256
+# 过期条目清理的最小间隔（秒）
+EXPIRE_SWEEP_INTERVAL = 60
+
+# 当前请求是否跳过缓存（由 HTTP 中间件根据请求头设置）
+llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+_registry = get_metrics_registry()
+CACHE_REQUESTS = _registry.counter(
+    "athena_llm_cache_requests_total",
+    "LLM response cache lookups by feature and result (hit / miss / bypass / unverified)",
+    ("feature", "result"),
+)
+CACHE_BYTES = _registry.gauge(
+    "athena_llm_cache_bytes",
+    "Total size of cached LLM responses",
+)
+CACHE_EVICTIONS = _registry.counter(
+    "athena_llm_cache_evictions_total",
+    "LLM cache entries removed by reason (expired / lru)",
+    ("reason",),
+)
+
+
+# 成功调用过上游的 API Key 摘要（LRU），只有这些 Key 的请求才会读取缓存
+VERIFIED_KEYS_MAX = 10000
+_verified_keys: "OrderedDict[str, None]" = OrderedDict()
+_verified_lock = threading.Lock()
+
+
+def mark_key_verified(api_key: str):
+    """记录 API Key 已成功完成过一次上游调用"""
+    digest = _key_digest(api_key)
+    with _verified_lock:
+        _verified_keys[digest] = None
+        _verified_keys.move_to_end(digest)
+        while len(_verified_keys) > VERIFIED_KEYS_MAX:
+            _verified_keys.popitem(last=False)
+
+
+def is_key_verified(api_key: str) -> bool:
+    with _verified_lock:
+        return _key_digest(api_key) in _verified_keys
+
+
+def _normalize_content(content: Any) -> Any:
+    if isinstance(content, str):
+        return "\n".join(line.rstrip() for line in content.replace("\r\n", "\n").strip().split("\n"))
+    return content
+
+
+def normalize_messages(messages: list) -> list:
+    """把 LangChain 消息或 OpenAI 格式的字典统一成 [(role, content)]，去掉首尾和行尾空白"""
+    normalized = []
+    for msg in messages:
+        if isinstance(msg, dict):
+            role, content = msg.get("role"), msg.get("content")
+        else:
+            role, content = getattr(msg, "type", type(msg).__name__), getattr(msg, "content", msg)
+        normalized.append([role, _normalize_content(content)])
+    return normalized
+
+
+def make_cache_key(model: str, messages: list, params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": normalize_messages(messages), "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite 持久化的响应缓存（TTL + 按总字节数 LRU 淘汰）"""
+
+    def __init__(self, db_path: Path, max_bytes: int):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, feature TEXT NOT NULL, response TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);"
+            "CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses(expires_at);"
+        )
+        # 命中时不立即 UPDATE，访问时间在内存中累积，写入 / 淘汰前或积累到 TOUCH_FLUSH_SIZE 条时批量写回
+        self._touched: Dict[str, float] = {}
+        self._last_sweep = 0.0
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        CACHE_BYTES.set(self._total_bytes)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, size, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._touched.pop(key, None)
+                self._total_bytes -= size
+                CACHE_BYTES.set(self._total_bytes)
+                CACHE_EVICTIONS.inc(reason="expired")
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_FLUSH_SIZE:
+                self._flush_touched()
+                self._conn.commit()
+            return response
+
+    def _flush_touched(self):
+        """把累积的访问时间写回数据库（调用方负责提交）"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def set(self, key: str, feature: str, response: str, ttl: int):
+        if not response:
+            return
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, feature, response, size, created_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, feature, response, size, now, now + ttl, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict(now)
+            self._conn.commit()
+            CACHE_BYTES.set(self._total_bytes)
+
+    def _evict(self, now: float):
+        """
+        先删除过期条目（最多每 EXPIRE_SWEEP_INTERVAL 秒一次，超出容量时立即清理），
+        仍超出容量时按 last_access 从旧到新删除
+        """
+        over_capacity = self._total_bytes > self.max_bytes
+        if over_capacity or now - self._last_sweep >= EXPIRE_SWEEP_INTERVAL:
+            self._last_sweep = now
+            expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE expires_at <= ?", (now,)
+            ).fetchone()
+            if expired[0]:
+                self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                self._total_bytes -= expired[1]
+                CACHE_EVICTIONS.inc(expired[0], reason="expired")
+        if self._total_bytes <= self.max_bytes:
+            return
+        self._flush_touched()
+        removed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ).fetchall():
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            removed += 1
+        CACHE_EVICTIONS.inc(removed, reason="lru")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._touched.clear()
+            self._total_bytes = 0
+            CACHE_BYTES.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        features: Dict[str, Dict[str, int]] = {}
+        for (feature, result), value in CACHE_REQUESTS.items():
+            features.setdefault(feature, {"hit": 0, "miss": 0, "bypass": 0, "unverified": 0})[result] = int(value)
+        for counts in features.values():
+            lookups = counts["hit"] + counts["miss"]
+            counts["hit_rate"] = round(counts["hit"] / lookups, 3) if lookups else 0.0
+        return {
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "features": features,
+        }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """获取全局 LLM 响应缓存，LLM_CACHE_ENABLED=false 时返回 None"""
+    global _llm_cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        db_path = Path(settings.LLM_CACHE_PATH or Path(settings.UPLOAD_DIR) / "llm_cache.sqlite")
+        _llm_cache = LLMResponseCache(db_path, settings.LLM_CACHE_MAX_BYTES)
+    return _llm_cache
+
+
+async def cache_lookup(feature: str, key: str, api_key: str) -> Optional[str]:
+    """
+    查询缓存并记录命中率
+
+    请求要求跳过缓存，或 api_key 还没有成功调用过上游时返回 None（由上游校验 Key）。
+    SQLite 读取在线程中执行，不阻塞事件循环
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return None
+    if llm_cache_bypass.get():
+        CACHE_REQUESTS.inc(feature=feature, result="bypass")
+        return None
+    if not is_key_verified(api_key):
+        CACHE_REQUESTS.inc(feature=feature, result="unverified")
+        return None
+    try:
+        response = await asyncio.to_thread(cache.get, key)
+    except sqlite3.Error as e:
+        print(f"[LLMCache] Lookup failed: {e}")
+        return None
+    CACHE_REQUESTS.inc(feature=feature, result="hit" if response is not None else "miss")
+    return response
+
+
+async def cache_store(feature: str, key: str, response: str, api_key: str):
+    """上游调用成功后写入缓存（在线程中执行），并把 api_key 记为已验证（跳过缓存的请求不写入）"""
+    mark_key_verified(api_key)
+    cache = get_llm_cache()
+    if cache is None or llm_cache_bypass.get():
+        return
+    try:
+        await asyncio.to_thread(
+            cache.set, key, feature, response, FEATURE_TTLS.get(feature, settings.LLM_CACHE_DEFAULT_TTL)
+        )
+    except sqlite3.Error as e:
+        print(f"[LLMCache] Store failed: {e}")
+
+
+class LLMCacheBypassMiddleware:
+    """
+    ASGI 中间件：请求头 X-LLM-Cache: off / bypass 或 Cache-Control: no-cache 时，
+    本次请求内的 LLM 调用跳过缓存（包括流式响应和后台任务）
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        opt_out = headers.get(b"x-llm-cache", b"").lower() in (b"off", b"bypass", b"0", b"false")
+        opt_out = opt_out or b"no-cache" in headers.get(b"cache-control", b"").lower()
+        token = llm_cache_bypass.set(opt_out)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            llm_cache_bypass.reset(token)
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -0,0 +1,179 @@
+"""
+LLM 客户端注册表
+按 (base_url, API Key 摘要, model) 复用 ChatOpenAI 实例，所有实例共享同一组 httpx 连接池。
+temperature / max_tokens / timeout 等采样参数通过 bind() 按次覆盖，不再为每次调用新建客户端。
+"""
+
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+from app.utils.background import spawn_background
+
+# SiliconFlow 兼容 OpenAI API 格式
+SILICONFLOW_BASE_URL = "https://api.siliconflow.cn/v1"
+
+
+def default_base_url() -> str:
+    """未指定端点时使用的接口地址（LLM_BASE_URL，默认 SiliconFlow）"""
+    return settings.LLM_BASE_URL or SILICONFLOW_BASE_URL
+
+
+def _key_digest(api_key: str) -> str:
+    """API Key 只以摘要形式出现在注册表键中"""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+async def _aclose_quietly(client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception as e:
+        print(f"[LLMClients] Closing stale AsyncClient failed: {e}")
+
+
+def _schedule_aclose(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+    """
+    关闭旧事件循环上的 AsyncClient，释放连接池中的 socket
+
+    旧循环仍在运行（其它线程）时交给它关闭；已停止时在当前循环中关闭
+    """
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_aclose_quietly(client), loop)
+    else:
+        spawn_background(_aclose_quietly(client), name="llm-client-aclose")
+
+
+class LLMClientRegistry:
+    """
+    ChatOpenAI 实例注册表（LRU，容量 LLM_CLIENT_CACHE_SIZE）
+
+    同步调用共享一个 httpx.Client；异步调用共享一个 httpx.AsyncClient。
+    AsyncClient 的连接绑定在创建它的事件循环上，检测到事件循环变化时关闭旧连接池、重建并清空注册表。
+    """
+
+    def __init__(self, max_clients: int = None):
+        self.max_clients = max_clients or settings.LLM_CLIENT_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._clients: "OrderedDict[Tuple[str, str, str, Optional[int]], ChatOpenAI]" = OrderedDict()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.created = 0
+        self.reused = 0
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+        )
+
+    def _check_loop(self):
+        """事件循环变化时关闭旧的 AsyncClient，并丢弃依赖它的 ChatOpenAI 实例"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._async_loop is not None and self._async_loop is not loop:
+            self._clients.clear()
+            if self._async_client is not None:
+                _schedule_aclose(self._async_client, self._async_loop)
+            self._async_client = None
+        self._async_loop = loop
+
+    def _http_clients(self) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        timeout = httpx.Timeout(settings.LLM_REQUEST_TIMEOUT)
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=self._limits(), timeout=timeout)
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=self._limits(), timeout=timeout)
+        return self._http_client, self._async_client
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        """共享的异步 httpx 连接池（多模态等直接调用 REST 接口时使用）"""
+        with self._lock:
+            self._check_loop()
+            return self._http_clients()[1]
+
+    def get(self, api_key: str, model: str, base_url: str = None, max_retries: int = None) -> ChatOpenAI:
+        """获取（或创建）共享连接池的 ChatOpenAI 实例，默认采样参数取自配置"""
+        base_url = base_url or default_base_url()
+        key = (base_url, _key_digest(api_key), model, max_retries)
+        with self._lock:
+            self._check_loop()
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return client
+
+            http_client, async_client = self._http_clients()
+            options = {} if max_retries is None else {"max_retries": max_retries}
+            client = ChatOpenAI(
+                model=model,
+                openai_api_key=api_key,
+                openai_api_base=base_url,
+                temperature=settings.TEMPERATURE,
+                max_tokens=settings.MAX_TOKENS,
+                request_timeout=settings.LLM_REQUEST_TIMEOUT,
+                http_client=http_client,
+                http_async_client=async_client,
+                **options,
+            )
+            self._clients[key] = client
+            self.created += 1
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return client
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+    async def aclose(self):
+        """关闭共享连接池（应用关闭时调用）"""
+        with self._lock:
+            http_client, async_client = self._http_client, self._async_client
+            self._clients.clear()
+            self._http_client = self._async_client = None
+        if async_client is not None:
+            await async_client.aclose()
+        if http_client is not None:
+            http_client.close()
+
+
+_registry: Optional[LLMClientRegistry] = None
+
+
+def get_llm_client_registry() -> LLMClientRegistry:
+    """获取全局 LLM 客户端注册表"""
+    global _registry
+    if _registry is None:
+        _registry = LLMClientRegistry()
+    return _registry
+
+
+def get_llm_client(
+    api_key: str,
+    model: str,
+    base_url: str = None,
+    max_retries: int = None,
+    **overrides: Any,
+):
+    """
+    获取共享的 LLM 客户端，overrides 为本次调用的采样参数
+    （temperature / max_tokens / timeout 等，原样传给 chat/completions 请求）
+    """
+    client = get_llm_client_registry().get(api_key, model, base_url, max_retries)
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return client.bind(**overrides) if overrides else client
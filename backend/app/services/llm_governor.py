@@ -0,0 +1,347 @@
+"""
+LLM 准入控制（按 API Key）
+用户使用自己的 X-API-Key 调用上游，同一个 Key 的并发请求过多会被上游 429 限流，
+长文档翻译 / 批量分析还会把同一用户的对话请求饿死。准入控制器对每个 Key：
+
+- 限制同时进行的上游调用数（LLM_KEY_MAX_INFLIGHT）和每分钟 token 数（LLM_KEY_TOKENS_PER_MINUTE）
+- 排队时按功能优先级放行：对话 > 翻译 > 批量（摘要 / 报告）> 后台任务（PDF 全文翻译 / 爬虫后预翻译），排队越久优先级越高，低优先级不会被饿死
+- 统一处理 429：暂停该 Key 的所有新请求（Retry-After 或指数退避），并重试被限流的调用
+- 记录排队等待时间（athena_llm_queue_wait_seconds）
+- 空闲的 Key（无进行中 / 排队的调用、TPM 窗口已清空、不在退避中）定期清理，避免状态无限增长
+"""
+
+import asyncio
+import hashlib
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from app.config import settings
+from app.services.llm_router import error_status, is_retryable, retry_after
+from app.utils.metrics import get_metrics_registry
+
+T = TypeVar("T")
+
+# 功能 -> 优先级（数值越小越先放行）
+PRIORITY_CLASSES: Dict[str, int] = {
+    "chat": 0,
+    "paper": 0,
+    "vision": 0,
+    "translate": 1,
+    "knowledge": 1,
+    "summary": 2,
+    "report": 2,
+    # 后台 PDF 全文翻译：排在同一 Key 的论文分析（分块摘要 summary / 最终 paper 调用）之后，分析结果不等翻译
+    "pdf": 3,
+    # 爬虫后的后台预翻译：排在用户点击翻译（translate）之后
+    "pretranslate": 3,
+}
+DEFAULT_PRIORITY = 1
+# 429 退避起始时间（秒），连续限流时翻倍
+BACKOFF_INITIAL = 1.0
+# 等待被唤醒的最长间隔（秒），到期后重新检查 TPM 窗口和暂停状态
+MAX_WAIT_SLICE = 1.0
+# 每入队多少次清理一次空闲 Key 的状态
+PRUNE_EVERY = 256
+
+QUEUE_WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = get_metrics_registry()
+QUEUE_WAIT_SECONDS = _registry.histogram(
+    "athena_llm_queue_wait_seconds",
+    "Time LLM calls waited for admission under the per-key limits",
+    ("feature",),
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+QUEUE_DEPTH = _registry.gauge(
+    "athena_llm_queue_depth",
+    "LLM calls currently waiting for admission",
+)
+THROTTLED_TOTAL = _registry.counter(
+    "athena_llm_throttled_total",
+    "Upstream rate-limit responses handled by the governor",
+    ("feature",),
+)
+
+
+def _key_digest(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+
+
+class _Waiter:
+    """排队中的调用，用所在事件循环的 asyncio.Event 唤醒"""
+
+    def __init__(self, feature: str, tokens: int, seq: int, loop: asyncio.AbstractEventLoop):
+        self.feature = feature
+        self.priority = PRIORITY_CLASSES.get(feature, DEFAULT_PRIORITY)
+        self.tokens = tokens
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def rank(self, now: float) -> Tuple[float, int]:
+        # 每等待 LLM_GOVERNOR_AGING 秒提升一级，避免低优先级请求被持续插队
+        aging = settings.LLM_GOVERNOR_AGING
+        boost = (now - self.enqueued) / aging if aging > 0 else 0.0
+        return self.priority - boost, self.seq
+
+    def wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    def reset(self):
+        self.event.clear()
+
+
+class _KeyState:
+    """单个 API Key 的并发、token 窗口和退避状态"""
+
+    def __init__(self):
+        self.inflight = 0
+        self.waiters: List[_Waiter] = []
+        self.window: Deque[Tuple[float, int]] = deque()
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.admitted = 0
+        self.throttled = 0
+
+    def window_tokens(self, now: float) -> int:
+        while self.window and self.window[0][0] <= now - 60.0:
+            self.window.popleft()
+        return sum(tokens for _, tokens in self.window)
+
+    def idle(self, now: float) -> bool:
+        return (
+            not self.inflight and not self.waiters and now >= self.paused_until
+            and not self.window_tokens(now)
+        )
+
+    def wait_hint(self, now: float) -> float:
+        """距离下一次可能放行的时间"""
+        hints = [MAX_WAIT_SLICE]
+        if self.paused_until > now:
+            hints.append(self.paused_until - now)
+        if self.window:
+            hints.append(self.window[0][0] + 60.0 - now)
+        return max(0.01, min(hints))
+
+
+class Admission:
+    """一次准入：释放时归还并发名额并补记输出 token"""
+
+    def __init__(self, key: str, feature: str, tokens: int, wait: float):
+        self.key = key
+        self.feature = feature
+        self.tokens = tokens
+        self.wait = wait
+        self.released = False
+
+
+class LLMGovernor:
+    """按 API Key 的准入控制器"""
+
+    def __init__(self, max_inflight: int = None, tokens_per_minute: int = None):
+        self.max_inflight = max(1, max_inflight or settings.LLM_KEY_MAX_INFLIGHT)
+        self.tokens_per_minute = settings.LLM_KEY_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self._lock = threading.Lock()
+        self._keys: Dict[str, _KeyState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, key: str) -> _KeyState:
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState()
+        return state
+
+    def _can_admit(self, state: _KeyState, waiter: _Waiter, now: float) -> bool:
+        if state.inflight >= self.max_inflight or now < state.paused_until:
+            return False
+        # 队首且并发 / TPM 均有余量时放行
+        ranked_at = time.monotonic()
+        if min(state.waiters, key=lambda w: w.rank(ranked_at)) is not waiter:
+            return False
+        if self.tokens_per_minute > 0:
+            used = state.window_tokens(now)
+            # 单个超大请求在窗口为空时也放行，否则永远无法执行
+            if used and used + waiter.tokens > self.tokens_per_minute:
+                return False
+        return True
+
+    def _try_admit(self, key: str, state: _KeyState, waiter: _Waiter) -> Optional[Admission]:
+        now = time.time()
+        if not self._can_admit(state, waiter, now):
+            return None
+        state.waiters.remove(waiter)
+        state.inflight += 1
+        state.admitted += 1
+        if waiter.tokens:
+            state.window.append((now, waiter.tokens))
+        QUEUE_DEPTH.dec()
+        wait = time.monotonic() - waiter.enqueued
+        QUEUE_WAIT_SECONDS.observe(wait, feature=waiter.feature)
+        if wait >= 1.0:
+            print(f"[LLMGovernor] {waiter.feature} call for key {key} waited {wait:.1f}s for admission")
+        # 放行后可能还有余量，唤醒下一个等待者
+        self._wake_all(state)
+        return Admission(key, waiter.feature, waiter.tokens, wait)
+
+    @staticmethod
+    def _wake_all(state: _KeyState):
+        for waiter in state.waiters:
+            waiter.wake()
+
+    def _prune_locked(self):
+        now = time.time()
+        for key in [key for key, state in self._keys.items() if state.idle(now)]:
+            del self._keys[key]
+
+    def _enqueue(self, key: str, feature: str, tokens: int, loop) -> Tuple[_KeyState, _Waiter]:
+        with self._lock:
+            seq = next(self._seq)
+            if seq % PRUNE_EVERY == 0:
+                self._prune_locked()
+            state = self._state(key)
+            waiter = _Waiter(feature, tokens, seq, loop)
+            state.waiters.append(waiter)
+            QUEUE_DEPTH.inc()
+            return state, waiter
+
+    def _abandon(self, state: _KeyState, waiter: _Waiter):
+        with self._lock:
+            if waiter in state.waiters:
+                state.waiters.remove(waiter)
+                QUEUE_DEPTH.dec()
+                self._wake_all(state)
+
+    async def acquire(self, api_key: str, feature: str, tokens: int = 0) -> Admission:
+        """等待准入"""
+        key = _key_digest(api_key)
+        state, waiter = self._enqueue(key, feature, tokens, asyncio.get_running_loop())
+        try:
+            while True:
+                with self._lock:
+                    admission = self._try_admit(key, state, waiter)
+                    hint = state.wait_hint(time.time())
+                    waiter.reset()
+                if admission is not None:
+                    return admission
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout=hint)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(state, waiter)
+            raise
+
+    def release(self, admission: Admission, output_tokens: int = 0, error: BaseException = None) -> Optional[float]:
+        """
+        归还并发名额；error 为上游 429 时暂停该 Key 的新请求
+
+        Returns:
+            429 时的暂停时长（秒），否则 None
+        """
+        if admission.released:
+            return None
+        admission.released = True
+        pause = None
+        with self._lock:
+            state = self._state(admission.key)
+            state.inflight -= 1
+            now = time.time()
+            if output_tokens:
+                state.window.append((now, output_tokens))
+            if error is not None and error_status(error) == 429:
+                state.throttled += 1
+                state.backoff = min(settings.LLM_GOVERNOR_BACKOFF_MAX, max(BACKOFF_INITIAL, state.backoff * 2))
+                pause = max(retry_after(error) or 0.0, state.backoff)
+                state.paused_until = max(state.paused_until, now + pause)
+            elif error is None:
+                state.backoff = 0.0
+            self._wake_all(state)
+        if pause is not None:
+            THROTTLED_TOTAL.inc(feature=admission.feature)
+            print(f"[LLMGovernor] Key {admission.key} rate limited, pausing {pause:.1f}s")
+        return pause
+
+    def retry_delay(self, error: BaseException, attempt: int, pause: Optional[float]) -> Optional[float]:
+        """
+        失败后的重试等待时间；不可重试或已达重试上限时返回 None
+        429 的暂停由准入队列执行（返回 0），其它可重试错误按指数退避
+        """
+        if attempt >= settings.LLM_GOVERNOR_MAX_RETRIES or not is_retryable(error):
+            return None
+        if pause is not None:
+            return 0.0
+        return min(settings.LLM_GOVERNOR_BACKOFF_MAX, BACKOFF_INITIAL * 2 ** attempt)
+
+    async def acall(
+        self,
+        api_key: str,
+        feature: str,
+        tokens: int,
+        fn: Callable[[], Awaitable[T]],
+        count_output: Callable[[T], int] = None,
+        on_admit: Callable[[Admission], None] = None,
+    ) -> T:
+        """
+        在准入控制下执行 fn，429 / 5xx 等可重试错误统一退避后重试
+
+        Args:
+            count_output: 根据结果计算输出 token（计入 TPM 窗口）
+            on_admit: 每次准入后回调（调用指标记录排队时间）
+        """
+        attempt = 0
+        while True:
+            admission = await self.acquire(api_key, feature, tokens)
+            if on_admit is not None:
+                on_admit(admission)
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, self.release(admission, error=e))
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.release(admission)
+                raise
+            self.release(admission, count_output(result) if count_output else 0)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return {
+                "max_inflight": self.max_inflight,
+                "tokens_per_minute": self.tokens_per_minute,
+                "keys": {
+                    key: {
+                        "inflight": state.inflight,
+                        "queued": len(state.waiters),
+                        "tokens_last_minute": state.window_tokens(now),
+                        "paused_s": round(max(0.0, state.paused_until - now), 1),
+                        "admitted": state.admitted,
+                        "throttled": state.throttled,
+                    }
+                    for key, state in self._keys.items()
+                    if state.inflight or state.waiters or state.window or state.paused_until > now
+                },
+            }
+
+
+_governor: Optional[LLMGovernor] = None
+
+
+def get_llm_governor() -> LLMGovernor:
+    """获取全局 LLM 准入控制器"""
+    global _governor
+    if _governor is None:
+        _governor = LLMGovernor()
+    return _governor
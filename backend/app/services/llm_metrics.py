@@ -0,0 +1,319 @@
+"""
+LLM 指标服务
+- StreamTimer：面向客户端的流式响应首 token 延迟（TTFT）、生成速度（tokens/s）和结束状态
+- LLMCallTimer：每次上游调用的模型、功能、排队时间、TTFT、总耗时、输入/输出 token、费用和错误，
+  写入 Prometheus 指标、LLM_HEALTH 健康检查器和按功能的滚动百分位统计
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from app.config import settings
+from app.services.llm_router import error_status, is_retryable
+from ..utils.metrics import get_metrics_registry
+from ..utils.resilience import LLM_HEALTH
+
+# tokens/s 分桶
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400)
+
+_registry = get_metrics_registry()
+
+STREAM_TTFT_SECONDS = _registry.histogram(
+    "athena_llm_stream_ttft_seconds",
+    "Time from request start to first streamed token",
+    ("feature",),
+)
+STREAM_TOKENS_PER_SECOND = _registry.histogram(
+    "athena_llm_stream_tokens_per_second",
+    "Streaming generation speed after the first token",
+    ("feature",),
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+STREAMS_TOTAL = _registry.counter(
+    "athena_llm_streams_total",
+    "Streaming LLM responses by outcome (completed / disconnected / error)",
+    ("feature", "status"),
+)
+CALL_SECONDS = _registry.histogram(
+    "athena_llm_call_seconds",
+    "Upstream LLM call latency after admission (excluding queue time)",
+    ("feature", "model"),
+)
+CALL_TTFT_SECONDS = _registry.histogram(
+    "athena_llm_call_ttft_seconds",
+    "Time from admission to the first token (full response for non-streaming calls)",
+    ("feature", "model"),
+)
+CALLS_TOTAL = _registry.counter(
+    "athena_llm_calls_total",
+    "Upstream LLM calls by outcome (success / error / cancelled)",
+    ("feature", "model", "status"),
+)
+TOKENS_TOTAL = _registry.counter(
+    "athena_llm_tokens_total",
+    "LLM tokens by kind (prompt / completion)",
+    ("feature", "model", "kind"),
+)
+COST_TOTAL = _registry.counter(
+    "athena_llm_cost_total",
+    "Estimated LLM spend from LLM_PRICING (currency units)",
+    ("feature", "model"),
+)
+CALL_ERRORS_TOTAL = _registry.counter(
+    "athena_llm_call_errors_total",
+    "Failed upstream LLM calls by error class",
+    ("feature", "error"),
+)
+
+
+class StreamTimer:
+    """
+    记录单次流式请求的 TTFT 和 tokens/s
+    token 数按上游增量块计数（OpenAI 兼容接口通常每块一个 token）
+    """
+
+    def __init__(self, feature: str):
+        self.feature = feature
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+        self.chars = 0
+
+    def chunk(self, text: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+        self.chars += len(text)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    def tokens_per_second(self, now: float = None) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        elapsed = (now or time.perf_counter()) - self.first_token_at
+        # 只有一个块时没有生成时长，不计速度
+        if self.tokens < 2 or elapsed <= 0:
+            return None
+        return (self.tokens - 1) / elapsed
+
+    def finish(self, status: str = "completed") -> dict:
+        """写入指标并返回本次请求的统计"""
+        now = time.perf_counter()
+        tps = self.tokens_per_second(now)
+        if self.ttft is not None:
+            STREAM_TTFT_SECONDS.observe(self.ttft, feature=self.feature)
+        if tps is not None:
+            STREAM_TOKENS_PER_SECOND.observe(tps, feature=self.feature)
+        STREAMS_TOTAL.inc(feature=self.feature, status=status)
+
+        stats = {
+            "ttft_ms": round(self.ttft * 1000) if self.ttft is not None else None,
+            "tokens": self.tokens,
+            "tokens_per_second": round(tps, 1) if tps is not None else None,
+            "duration_ms": round((now - self.started) * 1000),
+        }
+        print(
+            f"[LLM] Stream {self.feature} {status}: ttft={stats['ttft_ms']}ms, "
+            f"{self.tokens} tokens, {stats['tokens_per_second']} tok/s"
+        )
+        return stats
+
+
+# ==================== 上游调用 ====================
+
+@lru_cache(maxsize=1)
+def _pricing(raw: str) -> Dict[str, Dict[str, float]]:
+    """LLM_PRICING：{"模型": {"input": 每百万输入 token 价格, "output": 每百万输出 token 价格}}"""
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"[LLM] Invalid LLM_PRICING: {e}")
+        return {}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price = _pricing(settings.LLM_PRICING).get(model)
+    if not price:
+        return 0.0
+    return (prompt_tokens * price.get("input", 0.0) + completion_tokens * price.get("output", 0.0)) / 1_000_000
+
+
+def classify_llm_error(error: BaseException) -> str:
+    """错误归类（状态码或异常类名），控制标签基数"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        if status == 429:
+            return "http_429"
+        return "http_5xx" if status >= 500 else f"http_{status}"
+    name = type(error).__name__
+    return "timeout" if "Timeout" in name else name
+
+
+class _CallSample(NamedTuple):
+    at: float
+    ok: bool
+    queue: float
+    ttft: Optional[float]
+    latency: float
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+
+
+class RollingCallStats:
+    """按功能保存最近的调用样本（LLM_METRICS_WINDOW 秒内），计算滚动百分位"""
+
+    MAX_SAMPLES = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[_CallSample]] = {}
+
+    def add(self, feature: str, sample: _CallSample):
+        with self._lock:
+            samples = self._samples.setdefault(feature, deque(maxlen=self.MAX_SAMPLES))
+            samples.append(sample)
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, Optional[int]]:
+        """毫秒级 p50 / p95 / p99（最近秩法）"""
+        if not values:
+            return {"p50": None, "p95": None, "p99": None}
+        values = sorted(values)
+        pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000)
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def summary(self, now: float = None) -> Dict[str, Any]:
+        now = now or time.time()
+        cutoff = now - settings.LLM_METRICS_WINDOW
+        with self._lock:
+            windows = {}
+            for feature, samples in self._samples.items():
+                while samples and samples[0].at < cutoff:
+                    samples.popleft()
+                if samples:
+                    windows[feature] = list(samples)
+
+        total_tokens = sum(s.prompt_tokens + s.completion_tokens for w in windows.values() for s in w) or 1
+        total_time = sum(s.latency for w in windows.values() for s in w) or 1.0
+        features = {}
+        for feature, samples in sorted(windows.items()):
+            errors = sum(1 for s in samples if not s.ok)
+            tokens = sum(s.prompt_tokens + s.completion_tokens for s in samples)
+            busy = sum(s.latency for s in samples)
+            features[feature] = {
+                "calls": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 3),
+                "latency_ms": self._percentiles([s.latency for s in samples]),
+                "ttft_ms": self._percentiles([s.ttft for s in samples if s.ttft is not None]),
+                "queue_ms": self._percentiles([s.queue for s in samples]),
+                "prompt_tokens": sum(s.prompt_tokens for s in samples),
+                "completion_tokens": sum(s.completion_tokens for s in samples),
+                "cost": round(sum(s.cost for s in samples), 6),
+                # 该功能占窗口内总 token / 总上游耗时的比例
+                "token_share": round(tokens / total_tokens, 3),
+                "latency_share": round(busy / total_time, 3),
+            }
+        return {"window_seconds": settings.LLM_METRICS_WINDOW, "features": features}
+
+
+_rolling_stats = RollingCallStats()
+
+
+class LLMCallTimer:
+    """
+    记录单次上游 LLM 调用（重试计入同一次调用）
+
+    用法：
+        timer = LLMCallTimer("translate", model)
+        ... 准入后 timer.admitted(admission)，首个 token 到达时 timer.first_token()
+        timer.finish(prompt_tokens, completion_tokens) 或 timer.finish(error=e)
+    """
+
+    def __init__(self, feature: str, model: str):
+        self.feature = feature
+        self.model = model
+        self.started = time.perf_counter()
+        self.queue = 0.0
+        self.admitted_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.usage: Optional[Dict[str, int]] = None
+        self.finished = False
+
+    def admitted(self, admission=None):
+        """准入后调用；重试时排队时间累加"""
+        if admission is not None:
+            self.queue += admission.wait
+        self.admitted_at = time.perf_counter()
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def record_usage(self, usage: Optional[Dict[str, Any]], model: str = None):
+        """记录上游返回的 usage（OpenAI 的 usage 或 LangChain 的 usage_metadata）和实际使用的模型"""
+        if model:
+            self.model = model
+        if usage:
+            prompt = usage.get("prompt_tokens", usage.get("input_tokens"))
+            completion = usage.get("completion_tokens", usage.get("output_tokens"))
+            if prompt is not None and completion is not None:
+                self.usage = {"prompt_tokens": int(prompt), "completion_tokens": int(completion)}
+
+    def finish(
+        self,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: BaseException = None,
+        cancelled: bool = False,
+    ):
+        """写入指标；prompt_tokens / completion_tokens 为估算值，上游返回 usage 时以 usage 为准"""
+        if self.finished:
+            return
+        self.finished = True
+        now = time.perf_counter()
+        start = self.admitted_at if self.admitted_at is not None else self.started
+        latency = now - start
+        ttft = (self.first_token_at or now) - start if error is None and not cancelled else None
+        if self.usage:
+            prompt_tokens = self.usage["prompt_tokens"]
+            completion_tokens = self.usage["completion_tokens"]
+        cost = estimate_cost(self.model, prompt_tokens, completion_tokens)
+        labels = {"feature": self.feature, "model": self.model}
+
+        status = "cancelled" if cancelled else ("error" if error is not None else "success")
+        CALLS_TOTAL.inc(status=status, **labels)
+        if status == "success":
+            CALL_SECONDS.observe(latency, **labels)
+            CALL_TTFT_SECONDS.observe(ttft, **labels)
+            LLM_HEALTH.record_success()
+        elif status == "error":
+            CALL_ERRORS_TOTAL.inc(feature=self.feature, error=classify_llm_error(error))
+            # 只有上游故障（5xx / 超时 / 连接错误）反映服务健康；调用方的无效 Key、参数错误和按 Key 的 429 限流不计入
+            if is_retryable(error) and error_status(error) != 429:
+                LLM_HEALTH.record_failure(f"{self.feature}/{self.model}: {str(error)[:200]}")
+        if prompt_tokens:
+            TOKENS_TOTAL.inc(prompt_tokens, kind="prompt", **labels)
+        if completion_tokens:
+            TOKENS_TOTAL.inc(completion_tokens, kind="completion", **labels)
+        if cost:
+            COST_TOTAL.inc(cost, **labels)
+        if not cancelled:
+            _rolling_stats.add(self.feature, _CallSample(
+                time.time(), status == "success", self.queue, ttft, latency, prompt_tokens, completion_tokens, cost,
+            ))
+
+
+def get_llm_metrics_summary() -> Dict[str, Any]:
+    """按功能的滚动统计（JSON 格式）"""
+    return _rolling_stats.summary()
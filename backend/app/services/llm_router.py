@@ -0,0 +1,307 @@
+"""
+LLM 多端点路由
+按模型层级（chat / small / vision）配置多个 OpenAI 兼容端点，每次调用选择最快的健康端点：
+
+- 每个端点跟踪滚动窗口内的错误率和延迟（EWMA）
+- 5xx / 超时 / 连接错误时端点整体进入冷却（优先使用 Retry-After），并切换到下一个端点重试
+- 429 是按 API Key 的限流：只对 (端点, Key 摘要) 冷却，不影响其他用户使用该端点
+- 400 / 401 / 403 等请求本身的错误不重试，直接抛出，也不计入端点错误率（某个用户的无效 Key 不代表端点故障）
+
+端点通过 LLM_ENDPOINTS（JSON）配置，例如：
+
+    {"chat":   [{"name": "siliconflow", "base_url": "https://api.siliconflow.cn/v1"},
+                {"name": "backup", "base_url": "https://example.com/v1", "api_key": "sk-...", "model": "qwen2.5-7b"}],
+     "vision": [{"name": "local", "base_url": "http://127.0.0.1:18765/v1", "model": "stub"}]}
+
+api_key 为空时使用调用方的 X-API-Key，model 为空时使用调用方请求的模型；
+未配置的层级依次回退到 chat 层级和 LLM_BASE_URL（默认 SiliconFlow）。测试时可把端点指向本地的 OpenAI 兼容桩服务。
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.services.llm_clients import SILICONFLOW_BASE_URL, _key_digest, default_base_url
+from app.utils.metrics import get_metrics_registry
+
+T = TypeVar("T")
+
+TIERS = ("chat", "small", "vision")
+# 延迟 EWMA 平滑系数
+LATENCY_ALPHA = 0.3
+# 触发切换的状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# 调用方显式指定的端点（不参与路由）最多保留的统计条数，按最近使用淘汰
+PINNED_ENDPOINTS_MAX = 32
+# 每个端点最多记录的按 Key 冷却条数
+KEY_COOLDOWNS_MAX = 1024
+
+_registry = get_metrics_registry()
+ENDPOINT_REQUESTS_TOTAL = _registry.counter(
+    "athena_llm_endpoint_requests_total",
+    "LLM upstream calls per routed endpoint and outcome",
+    ("endpoint", "result"),
+)
+FAILOVERS_TOTAL = _registry.counter(
+    "athena_llm_failovers_total",
+    "LLM calls retried on another endpoint after a retryable error",
+    ("tier",),
+)
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """从 openai / httpx 异常中取 HTTP 状态码"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """上游返回的 Retry-After（秒）"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """429 / 5xx / 超时 / 连接错误可以换端点重试；其它错误（参数、鉴权）换端点也不会成功"""
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return any(k in name for k in ("Timeout", "Connect", "Connection", "Network", "Transport", "RemoteProtocol"))
+
+
+class Endpoint:
+    """单个 OpenAI 兼容端点及其滚动统计"""
+
+    def __init__(self, name: str, base_url: str, api_key: str = "", model: str = ""):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.latency: Optional[float] = None
+        self.cooldown_until = 0.0
+        # 429 限流按 API Key 生效：Key 摘要 -> 冷却结束时间
+        self.key_cooldowns: Dict[str, float] = {}
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+        self.last_error: Optional[str] = None
+
+    def _trim(self, now: float):
+        cutoff = now - settings.LLM_ROUTER_WINDOW
+        while self.outcomes and self.outcomes[0][0] < cutoff:
+            self.outcomes.popleft()
+
+    def error_rate(self, now: float) -> float:
+        self._trim(now)
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def key_cooldown_until(self, api_key: str) -> float:
+        return self.key_cooldowns.get(_key_digest(api_key), 0.0)
+
+    def available_at(self, api_key: str) -> float:
+        """该 Key 可以再次使用此端点的时间"""
+        return max(self.cooldown_until, self.key_cooldown_until(api_key))
+
+    def healthy(self, now: float, api_key: str = None) -> bool:
+        if now < self.cooldown_until:
+            return False
+        if api_key is not None and now < self.key_cooldown_until(api_key):
+            return False
+        # 样本过少时不按错误率判定
+        return len(self.outcomes) < 5 or self.error_rate(now) < settings.LLM_ROUTER_ERROR_THRESHOLD
+
+    def record_success(self, latency: float, now: float):
+        self.outcomes.append((now, True))
+        self.latency = latency if self.latency is None else LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+        self._trim(now)
+
+    def record_failure(self, error: BaseException, now: float, api_key: str = ""):
+        """
+        记录一次可重试的失败（由 LLMRouter 过滤）并进入冷却
+
+        429 只让 (端点, api_key) 冷却，不计入端点错误率；5xx / 超时 / 连接错误让端点整体冷却
+        """
+        self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+        until = now + (retry_after(error) or settings.LLM_ROUTER_COOLDOWN)
+        if error_status(error) == 429:
+            digest = _key_digest(api_key)
+            self.key_cooldowns[digest] = max(self.key_cooldowns.get(digest, 0.0), until)
+            if len(self.key_cooldowns) > KEY_COOLDOWNS_MAX:
+                self.key_cooldowns = {k: t for k, t in self.key_cooldowns.items() if t > now}
+                while len(self.key_cooldowns) > KEY_COOLDOWNS_MAX:
+                    del self.key_cooldowns[min(self.key_cooldowns, key=self.key_cooldowns.get)]
+            return
+        self.outcomes.append((now, False))
+        self.cooldown_until = max(self.cooldown_until, until)
+        self._trim(now)
+
+    def status(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "healthy": self.healthy(now),
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "error_rate": round(self.error_rate(now), 3),
+            "samples": len(self.outcomes),
+            "cooldown_s": round(max(0.0, self.cooldown_until - now), 1),
+            "rate_limited_keys": sum(1 for t in self.key_cooldowns.values() if t > now),
+            "last_error": self.last_error,
+        }
+
+
+class Route(NamedTuple):
+    """一次调用的目标：端点 + 实际使用的 API Key 和模型"""
+    endpoint: Endpoint
+    api_key: str
+    model: str
+    # 客户端内置重试次数：由路由器切换端点、由准入控制器统一退避重试，默认关闭
+    max_retries: Optional[int] = 0
+
+
+class LLMRouter:
+    """按层级选择端点，记录结果并在可重试错误时切换端点"""
+
+    def __init__(self, config: Dict[str, List[Dict[str, str]]] = None):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Endpoint] = {}
+        self._pinned: "OrderedDict[str, Endpoint]" = OrderedDict()
+        self._tiers: Dict[str, List[Endpoint]] = {}
+        for tier, entries in (config or {}).items():
+            self._tiers[tier] = [self._endpoint(**entry) for entry in entries]
+        if not self._tiers.get("chat"):
+            base_url = default_base_url()
+            self._tiers["chat"] = [self._endpoint(
+                base_url=base_url, name="siliconflow" if base_url == SILICONFLOW_BASE_URL else "",
+            )]
+
+    def _endpoint(self, base_url: str, name: str = "", api_key: str = "", model: str = "") -> Endpoint:
+        """按 (名称, base_url, 模型) 复用端点，同一端点在多个层级共享统计"""
+        name = name or urlparse(base_url).netloc or base_url
+        key = f"{name}|{base_url.rstrip('/')}|{model}"
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = self._endpoints[key] = Endpoint(name, base_url, api_key, model)
+        return endpoint
+
+    def _pinned_endpoint(self, base_url: str) -> Endpoint:
+        """调用方显式指定的端点：已配置的直接复用，其余放入有上限的 LRU，避免任意 base_url 无限增长"""
+        name = urlparse(base_url).netloc or base_url
+        key = f"{name}|{base_url.rstrip('/')}|"
+        endpoint = self._endpoints.get(key)
+        if endpoint is not None:
+            return endpoint
+        endpoint = self._pinned.pop(key, None) or Endpoint(name, base_url)
+        self._pinned[key] = endpoint
+        while len(self._pinned) > PINNED_ENDPOINTS_MAX:
+            self._pinned.popitem(last=False)
+        return endpoint
+
+    def routes(self, tier: str, api_key: str, model: str, base_url: str = None) -> List[Route]:
+        """
+        返回按优先级排序的候选路由：健康端点按延迟从低到高（尚无样本的端点优先试探），
+        不健康端点（含该 Key 被限流的端点）按冷却结束时间排在最后，作为兜底
+
+        Args:
+            base_url: 调用方显式指定的端点（如报告的自定义 LLM 配置），指定时不参与路由
+        """
+        with self._lock:
+            if base_url:
+                endpoints = [self._pinned_endpoint(base_url)]
+            else:
+                endpoints = self._tiers.get(tier) or self._tiers["chat"]
+            now = time.time()
+            order = {id(e): i for i, e in enumerate(endpoints)}
+            candidates = [Route(e, e.api_key or api_key, e.model or model) for e in endpoints]
+            healthy = sorted(
+                (r for r in candidates if r.endpoint.healthy(now, r.api_key)),
+                key=lambda r: (r.endpoint.latency if r.endpoint.latency is not None else 0.0, order[id(r.endpoint)]),
+            )
+            unhealthy = sorted(
+                (r for r in candidates if not r.endpoint.healthy(now, r.api_key)),
+                key=lambda r: r.endpoint.available_at(r.api_key),
+            )
+        return healthy + unhealthy
+
+    def record_success(self, route: Route, latency: float):
+        with self._lock:
+            route.endpoint.record_success(latency, time.time())
+        ENDPOINT_REQUESTS_TOTAL.inc(endpoint=route.endpoint.name, result="success")
+
+    def record_failure(self, route: Route, error: BaseException):
+        """只有可重试的错误（429 / 5xx / 超时 / 连接错误）反映端点健康状况；请求或鉴权错误只计数"""
+        if not is_retryable(error):
+            ENDPOINT_REQUESTS_TOTAL.inc(endpoint=route.endpoint.name, result="rejected")
+            return
+        with self._lock:
+            route.endpoint.record_failure(error, time.time(), route.api_key)
+        ENDPOINT_REQUESTS_TOTAL.inc(endpoint=route.endpoint.name, result="error")
+
+    def _should_failover(self, tier: str, routes: List[Route], index: int, error: BaseException) -> bool:
+        if index == len(routes) - 1 or not is_retryable(error):
+            return False
+        FAILOVERS_TOTAL.inc(tier=tier)
+        print(f"[LLMRouter] {routes[index].endpoint.name} failed ({error}), failing over to {routes[index + 1].endpoint.name}")
+        return True
+
+    async def acall(self, tier: str, routes: List[Route], fn: Callable[[Route], Awaitable[T]]) -> T:
+        """依次尝试候选路由直到成功或遇到不可重试的错误"""
+        for index, route in enumerate(routes):
+            start = time.perf_counter()
+            try:
+                result = await fn(route)
+            except Exception as e:
+                self.record_failure(route, e)
+                if self._should_failover(tier, routes, index, e):
+                    continue
+                raise
+            self.record_success(route, time.perf_counter() - start)
+            return result
+        raise RuntimeError("No LLM endpoint configured")
+
+    def stream_failed(self, tier: str, routes: List[Route], index: int, error: BaseException) -> bool:
+        """流式调用在产出首个块之前失败时调用：记录失败并返回是否切换到下一个端点"""
+        self.record_failure(routes[index], error)
+        return self._should_failover(tier, routes, index, error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return {
+                "tiers": {tier: [e.name for e in endpoints] for tier, endpoints in self._tiers.items()},
+                "endpoints": [e.status(now) for e in self._endpoints.values()],
+                "pinned": [e.status(now) for e in self._pinned.values()],
+            }
+
+
+def _load_config() -> Dict[str, List[Dict[str, str]]]:
+    if not settings.LLM_ENDPOINTS:
+        return {}
+    try:
+        config = json.loads(settings.LLM_ENDPOINTS)
+    except json.JSONDecodeError as e:
+        print(f"[LLMRouter] Invalid LLM_ENDPOINTS, using SiliconFlow only: {e}")
+        return {}
+    return {tier: entries for tier, entries in config.items() if tier in TIERS and isinstance(entries, list)}
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """获取全局 LLM 路由器"""
+    global _router
+    if _router is None:
+        _router = LLMRouter(_load_config())
+    return _router
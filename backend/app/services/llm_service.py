@@ -3,7 +3,10 @@ LLM 服务模块
 封装 LangChain 调用 SiliconFlow API 的逻辑
 """
 
-from langchain_openai import ChatOpenAI
+import asyncio
+import time
+
+import httpx
 try:
     from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 except ImportError:
@@ -12,54 +15,143 @@ from app.config import settings
 from app.prompts.chat_prompt import CHAT_SYSTEM_PROMPT
 from app.prompts.paper_prompt import PAPER_ANALYSIS_SYSTEM_PROMPT
 from app.prompts.knowledge_prompt import KNOWLEDGE_SYSTEM_PROMPT
-from typing import List, Dict, Any
+from app.services.llm_clients import _key_digest, default_base_url, get_llm_client, get_llm_client_registry
+from app.services.llm_cache import cache_lookup, cache_store, make_cache_key
+from app.services.llm_governor import get_llm_governor
+from app.services.llm_metrics import LLMCallTimer
+from app.services.llm_router import Route, get_llm_router
+from app.services.llm_singleflight import get_single_flight
+from app.services.summarize_service import condense_document
+from app.services.token_budget import context_budget, count_tokens
+from typing import List, Dict, Any, AsyncIterator
+
+# 流式接口回放缓存内容时每块的字符数
+STREAM_REPLAY_CHUNK_CHARS = 16
 
 
 class LLMService:
     """LLM 服务类 - 封装 LangChain 调用"""
     
-    def __init__(self, api_key: str = None, model: str = None):
+    def __init__(self, api_key: str = None, model: str = None, base_url: str = None):
         """
         初始化 LLM 服务
         
         Args:
             api_key: SiliconFlow API Key（如果为 None，使用环境变量）
             model: 模型ID（如果为 None，使用配置文件中的默认模型）
+            base_url: OpenAI 兼容接口地址（如果为 None，由 LLM 路由器在 LLM_ENDPOINTS 中选择端点）
         """
         self.api_key = api_key or settings.SILICONFLOW_API_KEY
         self.model = model or settings.LLM_MODEL
+        self.base_url = base_url or default_base_url()
+        # 显式指定的端点不参与路由
+        self._pinned_base_url = base_url
         
-        # 创建 LangChain ChatOpenAI 实例
-        # SiliconFlow 兼容 OpenAI API 格式
-        self.llm = ChatOpenAI(
-            model=self.model,
-            openai_api_key=self.api_key,
-            openai_api_base="https://api.siliconflow.cn/v1",  # SiliconFlow API 地址
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS,
-            request_timeout=settings.LLM_REQUEST_TIMEOUT,
-        )
-    
-    def chat(
-        self,
-        message: str,
-        history: List[Dict[str, str]] = None,
-        system_prompt: str = None,
-        temperature: float = None,
-        max_tokens: int = None
-    ) -> str:
+        # 共享的 LangChain ChatOpenAI 实例（按 base_url / API Key / model 复用）
+        self.llm = self._client()
+
+    def _tier(self, model: str = None) -> str:
+        """模型层级：小模型调用走 small 层级的端点，其余走 chat"""
+        if model and model != self.model and model == self.small_model:
+            return "small"
+        return "chat"
+
+    def _routes(self, tier: str, model: str = None) -> List[Route]:
+        return get_llm_router().routes(tier, self.api_key, model or self.model, self._pinned_base_url)
+
+    def _client(self, model: str = None, route: Route = None, **overrides):
+        """从注册表获取共享连接池的客户端（默认使用首选路由），overrides 为本次调用的采样参数"""
+        route = route or self._routes(self._tier(model), model)[0]
+        return get_llm_client(route.api_key, route.model, route.endpoint.base_url, route.max_retries, **overrides)
+
+    @property
+    def small_model(self) -> str:
+        """论文分析/讲解/Q&A 使用的小模型"""
+        return getattr(settings, "LLM_MODEL_SMALL", settings.LLM_MODEL)
+
+    def _cache_key(self, messages: list, model: str = None, **overrides) -> str:
         """
-        执行对话
-        
+        缓存键只包含影响输出的参数（timeout 等不计入）
+
+        不含 API Key：缓存只保存成功的响应，内容与调用者无关，不同用户的相同请求有意共享缓存命中；
+        但只有成功调用过上游的 Key 才能读取缓存（见 llm_cache.cache_lookup），无效 Key 不能借缓存拿到结果
+        """
+        temperature = overrides.get("temperature")
+        max_tokens = overrides.get("max_tokens")
+        return make_cache_key(model or self.model, messages, {
+            "base_url": self.base_url,
+            "temperature": temperature if temperature is not None else settings.TEMPERATURE,
+            "max_tokens": max_tokens if max_tokens is not None else settings.MAX_TOKENS,
+        })
+
+    def _flight_key(self, cache_key: str) -> str:
+        """
+        合并并发请求的键：缓存键 + API Key 摘要
+        上游调用使用调用者自己的 Key，不同用户的请求不能合并（否则会共享彼此的 401/429，并绕过按 Key 的准入控制）
+        """
+        return f"{cache_key}:{_key_digest(self.api_key)}"
+
+    @staticmethod
+    def _prompt_tokens(messages: list) -> int:
+        """估算消息的输入 token（准入控制的 TPM 计数）"""
+        return sum(count_tokens(m.content, None) for m in messages if isinstance(getattr(m, "content", None), str))
+
+    async def _ainstrumented(self, timer: LLMCallTimer, prompt_tokens: int, send) -> str:
+        """在准入控制下执行 send（429 统一退避重试），并记录排队时间、耗时、token 和错误；被取消的调用单独计数"""
+        try:
+            response = await get_llm_governor().acall(
+                self.api_key, timer.feature, prompt_tokens, send, count_tokens, on_admit=timer.admitted
+            )
+        except asyncio.CancelledError:
+            timer.finish(prompt_tokens, cancelled=True)
+            raise
+        except Exception as e:
+            timer.finish(prompt_tokens, error=e)
+            raise
+        timer.finish(prompt_tokens, count_tokens(response))
+        return response
+
+    async def ainvoke(self, messages: list, feature: str = "chat", model: str = None, **overrides) -> str:
+        """
+        发送消息列表并返回文本（带响应缓存）
+
         Args:
-            message: 用户消息
-            history: 对话历史 [{"role": "user/assistant", "content": "..."}]
-            system_prompt: 系统提示词
-        
-        Returns:
-            AI 回复内容
+            messages: LangChain 消息列表
+            feature: 功能名称，决定缓存 TTL、准入优先级和命中率统计分组
+            model: 模型ID（默认使用实例的模型）
+            overrides: 本次调用的采样参数（temperature / max_tokens / timeout）
         """
-        # 构建消息列表
+        key = self._cache_key(messages, model, **overrides)
+        cached = await cache_lookup(feature, key, self.api_key)
+        if cached is not None:
+            return cached
+
+        tier = self._tier(model)
+        timer = LLMCallTimer(feature, model or self.model)
+
+        async def send_to(route: Route) -> str:
+            message = await self._client(route=route, **overrides).ainvoke(messages)
+            timer.record_usage(getattr(message, "usage_metadata", None), route.model)
+            return message.content
+
+        async def send() -> str:
+            return await get_llm_router().acall(tier, self._routes(tier, model), send_to)
+
+        async def call() -> str:
+            response = await self._ainstrumented(timer, self._prompt_tokens(messages), send)
+            await cache_store(feature, key, response, self.api_key)
+            return response
+
+        # 并发的相同请求只发起一次上游调用
+        return await get_single_flight().do(self._flight_key(key), call)
+
+    @staticmethod
+    def _build_messages(
+        message: str,
+        history: List[Dict[str, str]] = None,
+        system_prompt: str = None,
+    ) -> list:
+        """构建消息列表：系统提示词 + 最近 5 轮历史 + 当前消息"""
         messages = []
         
         # 添加系统提示词（术语通模块的友好提示）
@@ -79,119 +171,155 @@ class LLMService:
         
         # 添加当前用户消息
         messages.append(HumanMessage(content=message))
-        
-        # 调用 LLM（如果指定了temperature或max_tokens，临时创建新的llm实例）
-        if temperature is not None or max_tokens is not None:
-            temp_llm = ChatOpenAI(
-                model=self.model,
-                openai_api_key=self.api_key,
-                openai_api_base="https://api.siliconflow.cn/v1",
-                temperature=temperature if temperature is not None else settings.TEMPERATURE,
-                max_tokens=max_tokens if max_tokens is not None else settings.MAX_TOKENS,
-                request_timeout=settings.LLM_REQUEST_TIMEOUT,
-            )
-            response = temp_llm.invoke(messages)
-        else:
-            response = self.llm.invoke(messages)
-        return response.content
-    
-    def stream_chat(
+        return messages
+
+    async def achat(
         self,
         message: str,
         history: List[Dict[str, str]] = None,
         system_prompt: str = None,
-        temperature: float = None
-    ):
+        temperature: float = None,
+        max_tokens: int = None,
+        feature: str = "chat"
+    ) -> str:
         """
-        流式执行对话 - 返回生成器以实时流式输出
+        执行对话，等待 LLM 响应期间不阻塞事件循环
         
         Args:
             message: 用户消息
-            history: 对话历史
+            history: 对话历史 [{"role": "user/assistant", "content": "..."}]
             system_prompt: 系统提示词
-            temperature: 温度参数
+            feature: 功能名称（用于缓存 TTL、准入优先级和命中率统计）
         
-        Yields:
-            单个字符或词块
+        Returns:
+            AI 回复内容
         """
-        # 构建消息列表（同 chat 方法）
-        messages = []
-        
-        if system_prompt:
-            messages.append(SystemMessage(content=system_prompt))
-        else:
-            messages.append(SystemMessage(content=CHAT_SYSTEM_PROMPT))
-        
-        if history:
-            for msg in history[-5:]:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-        
-        messages.append(HumanMessage(content=message))
-        
-        # 创建流式 LLM 实例
-        stream_llm = ChatOpenAI(
-            model=self.model,
-            openai_api_key=self.api_key,
-            openai_api_base="https://api.siliconflow.cn/v1",
-            temperature=temperature or settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS,
-            streaming=True,  # 启用流式模式
-            request_timeout=180.0,
-        )
-        
-        # 使用 stream 方法获取流式响应
-        full_response = ""
-        for chunk in stream_llm.stream(messages):
-            # 每个 chunk 可能包含一个或多个字符/词
-            content = chunk.content if hasattr(chunk, 'content') else str(chunk)
-            if content:
-                full_response += content
-                yield content  # 立即返回，实现流式效果
+        messages = self._build_messages(message, history, system_prompt)
+        return await self.ainvoke(messages, feature, temperature=temperature, max_tokens=max_tokens)
     
-
-    def analyze_paper_structured(self, paper_text: str) -> Dict[str, Any]:
+    async def astream(
+        self,
+        message: str,
+        history: List[Dict[str, str]] = None,
+        system_prompt: str = None,
+        temperature: float = None,
+        feature: str = "chat",
+        max_tokens: int = None,
+    ) -> AsyncIterator[str]:
         """
-        分析论文 - 生成结构化摘要
-        
-        Args:
-            paper_text: 论文文本内容
-        
-        Returns:
-            结构化摘要字典
+        流式对话（参数同 achat），逐块产出文本
+        命中缓存时按小块回放缓存内容；完整生成结束后才写入缓存（与 achat 使用相同的缓存键）。
+        并发的相同请求共享同一个上游流
         """
+        messages = self._build_messages(message, history, system_prompt)
+        if temperature is None:
+            temperature = settings.TEMPERATURE
+        key = self._cache_key(messages, temperature=temperature, max_tokens=max_tokens)
+        cached = await cache_lookup(feature, key, self.api_key)
+        if cached is not None:
+            for i in range(0, len(cached), STREAM_REPLAY_CHUNK_CHARS):
+                yield cached[i:i + STREAM_REPLAY_CHUNK_CHARS]
+            return
+
+        async def produce() -> AsyncIterator[str]:
+            governor = get_llm_governor()
+            timer = LLMCallTimer(feature, self.model)
+            prompt_tokens = self._prompt_tokens(messages)
+            attempt = 0
+            while True:
+                # 流式调用在整个生成期间占用一个准入名额
+                admission = await governor.acquire(self.api_key, feature, prompt_tokens)
+                timer.admitted(admission)
+                parts = []
+                try:
+                    async for content in self._astream_routed(messages, temperature, parts, timer, max_tokens):
+                        yield content
+                except Exception as e:
+                    delay = governor.retry_delay(e, attempt, governor.release(admission, error=e))
+                    # 已经产出内容后不能重试，否则客户端会收到重复内容
+                    if parts or delay is None:
+                        timer.finish(prompt_tokens, count_tokens("".join(parts)), error=e)
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    governor.release(admission)
+                    timer.finish(prompt_tokens, count_tokens("".join(parts)), cancelled=True)
+                    raise
+                completion_tokens = count_tokens("".join(parts))
+                governor.release(admission, completion_tokens)
+                timer.finish(prompt_tokens, completion_tokens)
+                await cache_store(feature, key, "".join(parts), self.api_key)
+                return
+
+        async for content in get_single_flight().stream(self._flight_key(key), produce):
+            yield content
+    
+
+    async def _astream_routed(
+        self,
+        messages: list,
+        temperature: float,
+        parts: List[str],
+        timer: LLMCallTimer,
+        max_tokens: int = None,
+    ) -> AsyncIterator[str]:
+        """按路由流式调用，产出的块同时追加到 parts；首个块之前失败时切换端点"""
+        router = get_llm_router()
+        routes = self._routes("chat")
+        overrides = {"temperature": temperature, "timeout": 180.0}
+        if max_tokens is not None:
+            overrides["max_tokens"] = max_tokens
+        for index, route in enumerate(routes):
+            start = time.perf_counter()
+            ttft = None
+            timer.record_usage(None, route.model)
+            try:
+                async for chunk in self._client(route=route, **overrides).astream(messages):
+                    content = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                    if content:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                            timer.first_token()
+                        parts.append(content)
+                        yield content
+            except Exception as e:
+                # 只有在产出首个块之前失败才切换端点，否则客户端会收到重复内容
+                if not parts and router.stream_failed("chat", routes, index, e):
+                    continue
+                if parts:
+                    router.record_failure(route, e)
+                raise
+            router.record_success(route, ttft if ttft is not None else time.perf_counter() - start)
+            return
+
+    async def _afit_paper(self, build_prompt, paper_text: str) -> str:
+        """按小模型的 token 预算填入论文：超出预算的长论文先分章节并发提炼要点（map-reduce），再填入提示词"""
+        budget = context_budget(build_prompt(""), model=self.small_model)
+        return build_prompt(await condense_document(self, paper_text, budget, self.small_model))
+
+    @staticmethod
+    def _paper_analysis_prompt(text: str) -> str:
         # 直接使用 PAPER_ANALYSIS_SYSTEM_PROMPT 中定义的 JSON 格式
-        prompt = f"""{PAPER_ANALYSIS_SYSTEM_PROMPT}
+        return f"""{PAPER_ANALYSIS_SYSTEM_PROMPT}
 
 论文内容如下：
 
-{paper_text[:10000]}
+{text}
 """
-        # 论文分析使用小模型以提升速度，关闭“思考模式”（较低 temperature）
-        small_llm = ChatOpenAI(
-            model=getattr(settings, "LLM_MODEL_SMALL", settings.LLM_MODEL),
-            openai_api_key=self.api_key,
-            openai_api_base="https://api.siliconflow.cn/v1",
-            temperature=0.3,
-            max_tokens=settings.MAX_TOKENS,
-            request_timeout=180.0,
+
+    async def aanalyze_paper_structured(self, paper_text: str) -> Dict[str, Any]:
+        """分析论文，生成结构化摘要（小模型、较低 temperature；长论文走分章节 map-reduce 而不是截断）"""
+        prompt = await self._afit_paper(self._paper_analysis_prompt, paper_text)
+        response = await self.ainvoke(
+            [HumanMessage(content=prompt)], "paper", self.small_model, temperature=0.3, timeout=180.0
         )
-        response = small_llm.invoke([HumanMessage(content=prompt)])
-        return {"raw_response": response.content}
-    
-    def generate_speech(self, paper_text: str) -> str:
-        """
-        生成结构化讲解建议
-        
-        Args:
-            paper_text: 论文文本内容
-        
-        Returns:
-            JSON 格式的结构化讲解建议
-        """
-        prompt = f"""请将以下论文内容转换为结构化的讲解建议，以 JSON 格式返回。
+        return {"raw_response": response}
+
+    @staticmethod
+    def _speech_prompt(text: str) -> str:
+        return f"""请将以下论文内容转换为结构化的讲解建议，以 JSON 格式返回。
 
 你必须返回有效的 JSON，格式如下：
 
@@ -216,32 +344,17 @@ class LLMService:
 
 论文内容：
 
-{paper_text[:10000]}
+{text}
 """
-        # 使用小模型生成讲解建议以提升速度
-        small_llm = ChatOpenAI(
-            model=getattr(settings, "LLM_MODEL_SMALL", settings.LLM_MODEL),
-            openai_api_key=self.api_key,
-            openai_api_base="https://api.siliconflow.cn/v1",
-            temperature=0.4,
-            max_tokens=settings.MAX_TOKENS,
-            request_timeout=180.0,
-        )
-        response = small_llm.invoke([HumanMessage(content=prompt)])
-        return response.content
-    
-    def generate_qa(self, paper_text: str, num_questions: int = 3) -> List[Dict[str, str]]:
-        """
-        生成预测问题及答案
-        
-        Args:
-            paper_text: 论文文本内容
-            num_questions: 问题数量
-        
-        Returns:
-            Q&A 列表
-        """
-        prompt = f"""基于以下论文内容，生成 {num_questions} 个可能被问到的问题，并提供简洁易懂的答案。
+
+    async def agenerate_speech(self, paper_text: str) -> str:
+        """生成 JSON 格式的结构化讲解建议"""
+        messages = [HumanMessage(content=await self._afit_paper(self._speech_prompt, paper_text))]
+        return await self.ainvoke(messages, "paper", self.small_model, temperature=0.4, timeout=180.0)
+
+    @staticmethod
+    def _qa_prompt(text: str, num_questions: int) -> str:
+        return f"""基于以下论文内容，生成 {num_questions} 个可能被问到的问题，并提供简洁易懂的答案。
 每个问题应该：
 1. 针对论文的核心内容
 2. 适合非技术背景的提问者
@@ -249,26 +362,27 @@ class LLMService:
 
 论文内容：
 
-{paper_text[:8000]}
+{text}
 """
-        # 使用小模型生成 Q&A 以提升速度
-        small_llm = ChatOpenAI(
-            model=getattr(settings, "LLM_MODEL_SMALL", settings.LLM_MODEL),
-            openai_api_key=self.api_key,
-            openai_api_base="https://api.siliconflow.cn/v1",
-            temperature=0.4,
-            max_tokens=settings.MAX_TOKENS,
-            request_timeout=180.0,
-        )
-        response = small_llm.invoke([HumanMessage(content=prompt)])
+
+    @staticmethod
+    def _parse_qa(content: str) -> List[Dict[str, str]]:
         # 简单解析：按换行分割问题和答案，对格式要求不严格时至少给出原始文本
-        content = response.content.strip()
+        content = content.strip()
         if not content:
             return []
         # 这里保持兼容，返回一个包含整体内容的 Q&A
         return [{"question": "关于这篇论文可能被问到的问题及答案", "answer": content}]
+
+    async def agenerate_qa(self, paper_text: str, num_questions: int = 3) -> List[Dict[str, str]]:
+        """生成预测问题及答案"""
+        prompt = await self._afit_paper(lambda text: self._qa_prompt(text, num_questions), paper_text)
+        response = await self.ainvoke(
+            [HumanMessage(content=prompt)], "paper", self.small_model, temperature=0.4, timeout=180.0
+        )
+        return self._parse_qa(response)
     
-    def chat_with_image(
+    def _vision_request(
         self,
         message: str,
         image_base64: str,
@@ -276,27 +390,8 @@ class LLMService:
         temperature: float = 0.3,
         max_tokens: int = 2000,
         vision_model: str = None
-    ) -> str:
-        """
-        多模态对话 - 支持图片输入
-
-        Args:
-            message: 文本消息
-            image_base64: Base64 编码的图片
-            system_prompt: 系统提示词
-            temperature: 温度参数
-            max_tokens: 最大 token 数
-            vision_model: 指定视觉模型（可选，默认从配置读取）
-
-        Returns:
-            AI 回复内容
-        """
-        import httpx
-        import json
-
-        # 使用 SiliconFlow 的多模态模型 API
-        api_url = "https://api.siliconflow.cn/v1/chat/completions"
-
+    ):
+        """构建多模态请求体（模型为调用方请求的模型，实际端点和模型由路由决定）"""
         # 构建多模态消息
         messages = []
 
@@ -323,12 +418,6 @@ class LLMService:
             ]
         })
 
-        # 调用 API
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
         # 优先使用传入的 vision_model，否则从配置读取
         model = (vision_model.strip() if vision_model and vision_model.strip() else None) or getattr(settings, "VISION_MODEL", "Qwen/Qwen3-VL-8B-Instruct")
 
@@ -339,28 +428,90 @@ class LLMService:
             "max_tokens": max_tokens,
             "stream": False
         }
+        return payload
+
+    @staticmethod
+    def _vision_target(route: Route, payload: Dict[str, Any]):
+        """按路由生成 (url, headers, payload)"""
+        api_url = f"{route.endpoint.base_url}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {route.api_key}",
+            "Content-Type": "application/json"
+        }
+        return api_url, headers, {**payload, "model": route.model}
+
+    def _vision_cache_key(self, payload: Dict[str, Any]) -> str:
+        return make_cache_key(payload["model"], payload["messages"], {
+            "base_url": self.base_url,
+            "temperature": payload["temperature"],
+            "max_tokens": payload["max_tokens"],
+        })
+
+    @staticmethod
+    def _vision_forbidden(model: str) -> Exception:
+        print(f"[LLM] 多模态模型 '{model}' 返回 403 Forbidden")
+        return Exception(
+            f"多模态模型 '{model}' 返回 403 错误，请在设置中检查视觉模型配置。"
+            f"推荐使用: Qwen/Qwen3-VL-8B-Instruct 或 Qwen/Qwen3-VL-32B-Instruct"
+        )
+
+    async def achat_with_image(
+        self,
+        message: str,
+        image_base64: str,
+        system_prompt: str = None,
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        vision_model: str = None
+    ) -> str:
+        """
+        多模态对话 - 支持图片输入
+
+        Args:
+            message: 文本消息
+            image_base64: Base64 编码的图片
+            system_prompt: 系统提示词
+            temperature: 温度参数
+            max_tokens: 最大 token 数
+            vision_model: 指定视觉模型（可选，默认从配置读取）
+
+        Returns:
+            AI 回复内容
+        """
+        payload = self._vision_request(
+            message, image_base64, system_prompt, temperature, max_tokens, vision_model
+        )
+        model = payload["model"]
+        key = self._vision_cache_key(payload)
+        cached = await cache_lookup("vision", key, self.api_key)
+        if cached is not None:
+            return cached
+
+        timer = LLMCallTimer("vision", model)
+
+        async def post(route: Route) -> str:
+            api_url, headers, body = self._vision_target(route, payload)
+            client = get_llm_client_registry().async_http_client()
+            response = await client.post(api_url, json=body, headers=headers, timeout=120.0)
+
+            if response.status_code == 403:
+                raise self._vision_forbidden(body["model"])
+
+            response.raise_for_status()
+            result = response.json()
+            timer.record_usage(result.get("usage"), body["model"])
+            return result["choices"][0]["message"]["content"]
 
         try:
-            with httpx.Client(timeout=120.0) as client:
-                response = client.post(api_url, json=payload, headers=headers)
-
-                if response.status_code == 403:
-                    print(f"[LLM] 多模态模型 '{model}' 返回 403 Forbidden")
-                    raise Exception(
-                        f"多模态模型 '{model}' 返回 403 错误，请在设置中检查视觉模型配置。"
-                        f"推荐使用: Qwen/Qwen3-VL-8B-Instruct 或 Qwen/Qwen3-VL-32B-Instruct"
-                    )
-
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            content = await self._ainstrumented(
+                timer, count_tokens(message),
+                lambda: get_llm_router().acall("vision", self._routes("vision", model), post),
+            )
+            await cache_store("vision", key, content, self.api_key)
+            return content
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 403:
-                print(f"[LLM] 多模态模型 '{model}' 返回 403 Forbidden")
-                raise Exception(
-                    f"多模态模型 '{model}' 返回 403 错误，请在设置中检查视觉模型配置。"
-                    f"推荐使用: Qwen/Qwen3-VL-8B-Instruct 或 Qwen/Qwen3-VL-32B-Instruct"
-                )
+                raise self._vision_forbidden(model)
             print(f"[LLM] 多模态调用失败: {e}")
             raise Exception(f"多模态模型调用失败: {str(e)}")
         except Exception as e:
@@ -372,10 +523,10 @@ class LLMService:
 _llm_service: LLMService = None
 
 
-def get_llm_service(api_key: str = None, model: str = None) -> LLMService:
+def get_llm_service(api_key: str = None, model: str = None, base_url: str = None) -> LLMService:
     """
     获取 LLM 服务实例
     注意：由于支持用户自定义模型，不再使用单例模式
     """
-    return LLMService(api_key=api_key, model=model)
+    return LLMService(api_key=api_key, model=model, base_url=base_url)
 
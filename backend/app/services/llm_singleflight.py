@@ -0,0 +1,124 @@
+"""
+LLM 请求合并（single-flight）
+并发的相同请求（同一篇 PDF、同一份报告、前端重复提交的术语查询）只向上游发起一次调用，
+只合并同一 API Key 的请求（键由调用方拼入 Key 摘要）：
+
+- 非流式：后到的调用者等待同一个上游任务的结果
+- 流式：上游 token 广播给所有订阅者，中途加入的订阅者先回放已生成的部分
+- 所有订阅者都离开时取消上游流，避免继续消耗 token
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.utils.metrics import get_metrics_registry
+
+COALESCED_TOTAL = get_metrics_registry().counter(
+    "athena_llm_coalesced_total",
+    "LLM requests served by joining an identical in-flight request",
+    ("kind",),
+)
+
+
+class _StreamBroadcast:
+    """单个上游流的广播状态"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """按键合并进行中的异步调用和流"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _StreamBroadcast] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 fn 或加入相同 key 的进行中调用
+        上游调用在独立任务中运行，单个调用者被取消不会影响其他等待者
+        """
+        task = self._calls.get(key)
+        if task is not None and not task.done():
+            COALESCED_TOTAL.inc(kind="call")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._calls.pop(k, None) if self._calls.get(k) is t else None)
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, producer: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        订阅 key 对应的上游流（不存在时用 producer 创建）
+        先回放已生成的块，再实时接收后续块
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is not None and not broadcast.done:
+            COALESCED_TOTAL.inc(kind="stream")
+        else:
+            broadcast = _StreamBroadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, producer))
+
+        broadcast.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(broadcast.chunks):
+                    chunk = broadcast.chunks[index]
+                    index += 1
+                    yield chunk
+                    continue
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                await broadcast.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # 没有订阅者了，立即中止上游流
+                broadcast.task.cancel()
+
+    async def _pump(self, key: str, broadcast: _StreamBroadcast, producer: Callable[[], AsyncIterator[str]]):
+        try:
+            async for chunk in producer():
+                broadcast.chunks.append(chunk)
+                broadcast.notify()
+        except asyncio.CancelledError:
+            broadcast.error = asyncio.CancelledError()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            if self._streams.get(key) is broadcast:
+                self._streams.pop(key, None)
+            broadcast.notify()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls_in_flight": len(self._calls), "streams_in_flight": len(self._streams)}
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """获取全局异步请求合并器"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
@@ -0,0 +1,402 @@
+"""
+媒体缓存代理服务
+- 代理 Twitter 头像 / 推文配图 / YouTube 缩略图，避免前端直连 pbs.twimg.com、i.ytimg.com
+- 内容寻址磁盘缓存：图片按内容 SHA-256 存储，相同图片（如默认头像）只存一份
+- 按总字节数限制缓存大小，超出后按最近访问时间（LRU）淘汰
+- 按 UI 实际使用的尺寸缩放（需要 Pillow，未安装时返回原图）
+"""
+
+import asyncio
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, urljoin, urlparse
+
+import httpx
+
+from app.config import settings
+from app.utils.background import spawn_background
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖，未安装时不做缩放
+    Image = None
+
+
+# 允许代理的上游域名（防止被当作开放代理 / SSRF）
+ALLOWED_MEDIA_HOSTS = {
+    "pbs.twimg.com",
+    "abs.twimg.com",
+    "video.twimg.com",
+    "i.ytimg.com",
+    "yt3.ggpht.com",
+    "yt3.googleusercontent.com",
+}
+
+# UI 使用的尺寸预设（像素，按 2x 屏幕计算的最长边），None 表示原图
+MEDIA_SIZES: Dict[str, Optional[int]] = {
+    "avatar_sm": 48,    # 卡片头像 w-6 / 引用推文头像 w-4
+    "avatar": 96,       # 信源列表头像 w-9、报告头像
+    "media": 320,       # 推文配图 w-36
+    "thumb": 360,       # YouTube 缩略图 w-44
+    "original": None,
+}
+
+MAX_MEDIA_BYTES = 10 * 1024 * 1024  # 单张图片上限 10MB
+MAX_MEDIA_REDIRECTS = 5  # 手动跟随重定向的次数上限（每一跳都检查域名白名单）
+
+
+class MediaNotAllowedError(Exception):
+    """URL 不在允许代理的范围内"""
+    pass
+
+
+def is_allowed_media_url(url: str) -> bool:
+    """检查 URL 是否允许代理"""
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return False
+    return parsed.scheme in ("http", "https") and (parsed.hostname or "") in ALLOWED_MEDIA_HOSTS
+
+
+def build_media_proxy_url(url: Optional[str], size: str = "original", base_url: str = "") -> Optional[str]:
+    """
+    构建媒体代理 URL
+
+    Args:
+        url: 原始媒体 URL
+        size: 尺寸预设（见 MEDIA_SIZES）
+        base_url: 后端基础地址（为空时返回相对路径）
+    """
+    if not url or not is_allowed_media_url(url):
+        return url
+    base_url = (base_url or "").rstrip("/")
+    return f"{base_url}/api/media/proxy?url={quote(url, safe='')}&size={size}"
+
+
+def _resize_image(data: bytes, content_type: str, max_side: Optional[int]) -> Tuple[bytes, str]:
+    """按最长边缩放图片，缩放失败或无需缩放时返回原图"""
+    if Image is None or not max_side:
+        return data, content_type
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if max(img.size) <= max_side:
+                return data, content_type
+            # 动图只取第一帧会丢失动画，保持原样
+            if getattr(img, "is_animated", False):
+                return data, content_type
+            img.thumbnail((max_side, max_side))
+            out = io.BytesIO()
+            if img.mode in ("RGBA", "LA", "P"):
+                img.save(out, format="PNG", optimize=True)
+                return out.getvalue(), "image/png"
+            img.convert("RGB").save(out, format="JPEG", quality=85, optimize=True)
+            return out.getvalue(), "image/jpeg"
+    except Exception as e:
+        print(f"[Media] Resize failed: {e}")
+        return data, content_type
+
+
+class MediaCache:
+    """
+    内容寻址的媒体磁盘缓存
+
+    - blobs/<sha256 前两位>/<sha256>：图片内容
+    - index.sqlite：(url, size) -> 内容摘要、类型、字节数、最近访问时间
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_dir / "index.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS media ("
+            " key TEXT PRIMARY KEY, digest TEXT NOT NULL, content_type TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_media_access ON media(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_media_digest ON media(digest)")
+        self._conn.commit()
+        self._total_bytes = self._total_blob_bytes()
+
+        # 进行中的上游请求（同一 URL 并发请求只拉取一次）
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(url: str, size: str) -> str:
+        return f"{size}|{url}"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def _total_blob_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM (SELECT digest, MAX(bytes) AS bytes FROM media GROUP BY digest)"
+        ).fetchone()
+        return int(row[0])
+
+    def get(self, url: str, size: str) -> Optional[Tuple[bytes, str, str]]:
+        """
+        读取缓存，返回 (内容, content_type, digest)
+
+        文件在锁外读取；读取前被并发淘汰删除时丢弃该条目，按未命中处理
+        """
+        key = self._key(url, size)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, content_type FROM media WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            digest, content_type = row
+            path = self._blob_path(digest)
+            if not path.exists():
+                self._conn.execute("DELETE FROM media WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE media SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        try:
+            return path.read_bytes(), content_type, digest
+        except OSError as e:
+            print(f"[Media] Cached blob unreadable, treating as miss: {e}")
+            with self._lock:
+                self._conn.execute("DELETE FROM media WHERE key = ? AND digest = ?", (key, digest))
+                self._release_blob_locked(digest)
+                self._conn.commit()
+            return None
+
+    def put(self, url: str, size: str, data: bytes, content_type: str) -> str:
+        """写入缓存，返回内容摘要"""
+        digest = hashlib.sha256(data).hexdigest()
+        key = self._key(url, size)
+        with self._lock:
+            path = self._blob_path(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                tmp.replace(path)
+                self._total_bytes += len(data)
+
+            old = self._conn.execute("SELECT digest FROM media WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (key, digest, content_type, bytes, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, digest, content_type, len(data), time.time()),
+            )
+            if old and old[0] != digest:
+                self._release_blob_locked(old[0])
+            self._conn.commit()
+            self._evict_locked()
+        return digest
+
+    def _release_blob_locked(self, digest: str):
+        """没有任何条目引用该内容时删除 blob"""
+        still_used = self._conn.execute(
+            "SELECT 1 FROM media WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone()
+        if still_used:
+            return
+        path = self._blob_path(digest)
+        try:
+            self._total_bytes -= path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict_locked(self):
+        """超出容量时按最近访问时间淘汰，直到降到容量的 90%"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, digest FROM media ORDER BY last_access ASC").fetchall()
+        removed = 0
+        for key, digest in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM media WHERE key = ?", (key,))
+            self._release_blob_locked(digest)
+            removed += 1
+        self._conn.commit()
+        if removed:
+            print(f"[Media] Evicted {removed} cache entries (now {self._total_bytes / 1024 / 1024:.1f} MB)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+            total = self._total_bytes
+        requests = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / requests * 100) if requests else 0:.1f}%",
+            "resize_enabled": Image is not None,
+        }
+
+    async def fetch(self, url: str, size: str = "original", client: httpx.AsyncClient = None) -> Tuple[bytes, str, str]:
+        """
+        获取媒体（优先读缓存，未命中时拉取上游、缩放并写入缓存）
+
+        Returns:
+            (内容, content_type, digest)
+        """
+        if size not in MEDIA_SIZES:
+            raise ValueError(f"不支持的尺寸: {size}")
+        if not is_allowed_media_url(url):
+            raise MediaNotAllowedError(f"不允许代理的媒体地址: {url}")
+
+        cached = await asyncio.to_thread(self.get, url, size)
+        if cached:
+            self.hits += 1
+            return cached
+
+        key = self._key(url, size)
+        inflight = self._inflight.get(key)
+        if inflight:
+            # 搭上进行中的拉取，不再请求上游，按命中计数
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data, content_type = await self._download(url, client)
+            data, content_type = await asyncio.to_thread(_resize_image, data, content_type, MEDIA_SIZES[size])
+            digest = await asyncio.to_thread(self.put, url, size, data, content_type)
+            result = (data, content_type, digest)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # 避免 "Future exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _download(self, url: str, client: httpx.AsyncClient = None) -> Tuple[bytes, str]:
+        """
+        从上游拉取原图
+
+        不使用客户端的自动重定向：逐跳跟随并检查每个 Location 是否在白名单内，
+        防止白名单域名重定向到内网地址；响应体流式读取，超过 MAX_MEDIA_BYTES 立即中止
+        """
+        if client is None:
+            async with httpx.AsyncClient(timeout=20.0) as own_client:
+                return await self._download(url, own_client)
+
+        for _ in range(MAX_MEDIA_REDIRECTS + 1):
+            async with client.stream("GET", url, follow_redirects=False) as response:
+                if response.is_redirect:
+                    location = urljoin(url, response.headers.get("location", ""))
+                    if not is_allowed_media_url(location):
+                        raise MediaNotAllowedError(f"上游重定向到不允许代理的地址: {location}")
+                    url = location
+                    continue
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "image/jpeg").split(";")[0].strip()
+                if not content_type.startswith("image/"):
+                    raise MediaNotAllowedError(f"上游返回的不是图片: {content_type}")
+                try:
+                    declared = int(response.headers.get("content-length") or 0)
+                except ValueError:
+                    declared = 0
+                if declared > MAX_MEDIA_BYTES:
+                    raise MediaNotAllowedError("图片过大")
+                data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    data.extend(chunk)
+                    if len(data) > MAX_MEDIA_BYTES:
+                        raise MediaNotAllowedError("图片过大")
+                return bytes(data), content_type
+        raise MediaNotAllowedError("上游重定向次数过多")
+
+
+# ==================== 爬虫后预取 ====================
+
+def collect_media_urls(items: Iterable[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """从爬取结果中收集 (url, size) 列表（去重，保持顺序）"""
+    seen = set()
+    result = []
+
+    def add(url: Optional[str], size: str):
+        if url and (url, size) not in seen and is_allowed_media_url(url):
+            seen.add((url, size))
+            result.append((url, size))
+
+    for item in items:
+        if item.get("platform") == "youtube":
+            add(item.get("thumbnail"), "thumb")
+            continue
+        add((item.get("author") or {}).get("avatar"), "avatar_sm")
+        for m in item.get("media") or []:
+            add(m.get("url"), "media")
+        qt = item.get("quoted_tweet")
+        if qt:
+            add((qt.get("author") or {}).get("avatar"), "avatar_sm")
+            for m in qt.get("media") or []:
+                add(m.get("url"), "media")
+    return result
+
+
+async def prefetch_media(items: Iterable[Dict[str, Any]], concurrency: int = 8) -> Dict[str, int]:
+    """
+    后台预取爬取结果中的媒体，让首次打开数据中心时直接命中缓存
+
+    Returns:
+        {"total": N, "fetched": N, "failed": N}
+    """
+    cache = get_media_cache()
+    targets = collect_media_urls(items)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"total": len(targets), "fetched": 0, "failed": 0}
+
+    async with httpx.AsyncClient(timeout=20.0) as client:
+        async def fetch_one(url: str, size: str):
+            async with semaphore:
+                try:
+                    await cache.fetch(url, size, client=client)
+                    stats["fetched"] += 1
+                except Exception:
+                    stats["failed"] += 1
+
+        await asyncio.gather(*(fetch_one(url, size) for url, size in targets))
+
+    print(f"[Media] Prefetch done: {stats['fetched']}/{stats['total']} cached, {stats['failed']} failed")
+    return stats
+
+
+def schedule_media_prefetch(items: List[Dict[str, Any]]):
+    """若启用了爬虫后预取，则在后台启动预取任务（不阻塞爬虫返回）"""
+    if not settings.MEDIA_PREFETCH_AFTER_CRAWL or not items:
+        return
+    # 没有运行中的事件循环（例如同步脚本调用）时跳过预取
+    spawn_background(prefetch_media(items), name="media-prefetch")
+
+
+# 全局媒体缓存实例（懒加载）
+_media_cache: Optional[MediaCache] = None
+
+
+def get_media_cache() -> MediaCache:
+    """获取媒体缓存实例（单例模式）"""
+    global _media_cache
+    if _media_cache is None:
+        cache_dir = Path(settings.MEDIA_CACHE_DIR or Path(settings.UPLOAD_DIR) / "media_cache")
+        _media_cache = MediaCache(cache_dir, settings.MEDIA_CACHE_MAX_BYTES)
+    return _media_cache
@@ -16,6 +16,7 @@ import asyncio
 import base64
 import re
 import traceback
+import time
 import uuid
 import zipfile
 import io
@@ -25,6 +26,7 @@ from pathlib import Path
 
 from app.config import settings
 from app.services.llm_service import get_llm_service
+from app.services.translation_service import segment_document, translate_units
 from app.prompts.pdf_analyzer_prompt import (
     PDF_TRANSLATION_SYSTEM_PROMPT,
     BATCH_CHART_ANALYSIS_SYSTEM_PROMPT
@@ -56,9 +58,10 @@ class PDFAnalyzerService:
         pdf_path: str = None,
         pdf_bytes: bytes = None,
         pdf_url: str = None,
-        translate: bool = False,  # 默认关闭翻译（太慢）
+        translate: bool = False,
         extract_charts: bool = True,
-        progress_callback: Callable = None
+        progress_callback: Callable = None,
+        translation_callback: Callable = None
     ) -> Dict[str, Any]:
         """
         完整的 PDF 分析流程
@@ -68,7 +71,10 @@ class PDFAnalyzerService:
         2. pdf_bytes: 文件字节内容
         3. pdf_url: 在线 PDF URL（直接传给 MinerU，无需下载）
         
-        注意：翻译功能已默认关闭，因为 LLM 翻译太慢
+        翻译在解析完成后作为后台任务启动，与图表提取并行：
+        - 未提供 translation_callback 时等待翻译完成，结果写入 translated_text
+        - 提供 translation_callback 时不等待翻译，每翻译完一段调用一次回调（见 translate_sections），
+          结果中的 translation_task 为翻译任务（返回完整译文），由调用方负责等待或取消
         """
         result = {
             "original_text": "",
@@ -76,6 +82,7 @@ class PDFAnalyzerService:
             "charts": [],
             "metadata": {}
         }
+        translation_task = None
         
         try:
             # 1. 调用 MinerU API 解析 PDF
@@ -105,13 +112,12 @@ class PDFAnalyzerService:
             
             print(f"[PDFAnalyzer] 解析完成，文本长度: {len(result['original_text'])}, 图片数量: {len(parse_result.get('images', []))}")
             
-            # 2. 翻译文本（已禁用，太慢）
-            # if translate and result["original_text"]:
-            #     if progress_callback:
-            #         await progress_callback("translating", 50)
-            #     
-            #     print(f"[PDFAnalyzer] 开始翻译...")
-            #     result["translated_text"] = await self._translate_text(result["original_text"])
+            # 2. 后台翻译文本（与图表提取、论文分析并行）
+            if translate and result["original_text"].strip():
+                print(f"[PDFAnalyzer] 开始后台翻译...")
+                translation_task = asyncio.create_task(
+                    self.translate_sections(result["original_text"], translation_callback)
+                )
             
             # 3. 处理图表（只提取，不分析）
             if extract_charts:
@@ -124,12 +130,26 @@ class PDFAnalyzerService:
                     # 直接使用图片，不进行 LLM 分析（太慢）
                     result["charts"] = self._format_images(images)
             
+            if translation_task is not None:
+                if translation_callback is None:
+                    if progress_callback:
+                        await progress_callback("translating", 80)
+                    result["translated_text"] = await translation_task
+                else:
+                    result["translation_task"] = translation_task
+            
             if progress_callback:
                 await progress_callback("complete", 100)
             
             return result
             
+        except asyncio.CancelledError:
+            if translation_task is not None:
+                translation_task.cancel()
+            raise
         except Exception as e:
+            if translation_task is not None:
+                translation_task.cancel()
             print(f"[PDFAnalyzer] PDF 分析失败: {str(e)}")
             print(f"[PDFAnalyzer] 详细错误: {traceback.format_exc()}")
             raise Exception(f"PDF 分析失败: {str(e)}")
@@ -803,46 +823,43 @@ class PDFAnalyzerService:
             "metadata": {"parser": "mineru-api-v4-direct"}
         }
     
-    async def _translate_text(self, text: str) -> str:
-        """使用 LLM 翻译文本"""
-        if not text.strip():
-            return ""
-        
-        max_chars = 3000
-        paragraphs = text.split("\n\n")
-        
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for para in paragraphs:
-            if current_length + len(para) > max_chars and current_chunk:
-                chunks.append("\n\n".join(current_chunk))
-                current_chunk = [para]
-                current_length = len(para)
-            else:
-                current_chunk.append(para)
-                current_length += len(para)
-        
-        if current_chunk:
-            chunks.append("\n\n".join(current_chunk))
-        
-        print(f"[PDFAnalyzer] 翻译分为 {len(chunks)} 个块")
-        
-        translated_chunks = []
-        for i, chunk in enumerate(chunks):
-            try:
-                print(f"[PDFAnalyzer] 翻译第 {i+1}/{len(chunks)} 块...")
-                translated = self.llm_service.chat(
-                    message=f"请将以下内容翻译成中文：\n\n{chunk}",
-                    system_prompt=PDF_TRANSLATION_SYSTEM_PROMPT
-                )
-                translated_chunks.append(translated)
-            except Exception as e:
-                print(f"[PDFAnalyzer] 翻译块 {i+1} 失败: {e}")
-                translated_chunks.append(f"[翻译失败] {chunk[:100]}...")
-        
-        return "\n\n".join(translated_chunks)
+    async def translate_sections(self, text: str, on_section: Callable = None) -> str:
+        """
+        翻译 Markdown 全文：公式、表格、图片、参考文献等原样保留，正文按 token 数分段，
+        在 PDF_TRANSLATE_CONCURRENCY 并发上限内翻译（先查翻译记忆），返回完整译文
+
+        Args:
+            on_section: 异步回调，按原文顺序每完成一段调用一次，参数为
+                        {"index", "text", "done", "total", "failed"}；各段 text 以换行拼接即为完整译文
+        """
+        units = segment_document(text, "en", "zh", settings.PDF_TRANSLATE_CHUNK_CHARS).units()
+        start = time.perf_counter()
+        sections: List[str] = []
+        failed = 0
+        async for index, section, error in translate_units(
+            self.llm_service,
+            units,
+            "en",
+            "zh",
+            concurrency=settings.PDF_TRANSLATE_CONCURRENCY,
+            feature="pdf",
+            system_prompt=PDF_TRANSLATION_SYSTEM_PROMPT,
+            keep_failed=True,
+        ):
+            if error is not None:
+                failed += 1
+                print(f"[PDFAnalyzer] 第 {index + 1}/{len(units)} 段翻译失败，保留原文: {error}")
+            sections.append(section)
+            if on_section:
+                await on_section({
+                    "index": index,
+                    "text": section,
+                    "done": index + 1,
+                    "total": len(units),
+                    "failed": error is not None,
+                })
+        print(f"[PDFAnalyzer] 翻译完成: {len(units)} 段（失败 {failed}），耗时 {time.perf_counter() - start:.1f}s")
+        return "\n".join(sections)
     
     def _format_images(self, images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """格式化图片数据（不进行 LLM 分析，直接返回）"""
@@ -13,50 +13,33 @@ from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 from collections import Counter
 
+import numpy as np
+
 from app.services.llm_service import get_llm_service
 from app.prompts.report_prompt import (
     REPORT_EXECUTIVE_SUMMARY_PROMPT,
     REPORT_POST_ANALYSIS_PROMPT,
 )
 from app.services.crawler_service import CRAWL_DATA_BASE_PATH
+from app.services.media_service import build_media_proxy_url
+from app.services.dedup_service import annotate_duplicates
+from app.services.analytics_engine import PostColumns
+from app.services.rollup_service import (
+    HOUR_SECONDS, STOP_WORDS, extract_keywords, get_rollup_store, window_start_hour,
+)
+from app.services.token_budget import context_budget, pack_items, truncate_to_tokens
 from app.config import settings
 
 REPORT_OUTPUT_DIR = CRAWL_DATA_BASE_PATH / "reports"
 MAX_REPORTS_KEEP = 30
 
-# 英文停用词（用于关键词提取）
-STOP_WORDS = {
-    "the", "a", "an", "is", "are", "was", "were", "be", "been", "being",
-    "have", "has", "had", "do", "does", "did", "will", "would", "could",
-    "should", "may", "might", "shall", "can", "need", "must", "ought",
-    "i", "me", "my", "we", "our", "you", "your", "he", "him", "his",
-    "she", "her", "it", "its", "they", "them", "their", "this", "that",
-    "these", "those", "am", "in", "on", "at", "to", "for", "of", "with",
-    "by", "from", "as", "into", "through", "during", "before", "after",
-    "about", "between", "under", "above", "up", "down", "out", "off",
-    "over", "again", "further", "then", "once", "here", "there", "when",
-    "where", "why", "how", "all", "each", "every", "both", "few", "more",
-    "most", "other", "some", "such", "no", "nor", "not", "only", "own",
-    "same", "so", "than", "too", "very", "just", "because", "but", "and",
-    "or", "if", "while", "what", "which", "who", "whom", "whose", "new",
-    "also", "like", "get", "got", "one", "two", "don", "don't", "it's",
-    "i'm", "we're", "they're", "he's", "she's", "that's", "there's",
-    "what's", "who's", "let's", "here's", "doesn't", "didn't", "won't",
-    "can't", "isn't", "aren't", "wasn't", "weren't", "hasn't", "haven't",
-    "hadn't", "couldn't", "wouldn't", "shouldn't", "mustn't", "amp",
-}
+# LLM 输入中单条推文 / 引用推文正文的 token 上限
+POST_TEXT_TOKENS = 200
+QUOTED_TEXT_TOKENS = 100
 
 
 # ==================== 工具函数 ====================
 
-def _parse_twitter_time(ts: str) -> Optional[datetime]:
-    """解析 Twitter 时间格式: 'Wed Sep 27 13:40:54 +0000 2023'"""
-    try:
-        return datetime.strptime(ts, "%a %b %d %H:%M:%S %z %Y")
-    except (ValueError, TypeError):
-        return None
-
-
 def _format_number(n: int) -> str:
     """格式化数字: 1234567 -> 1,234,567"""
     return f"{n:,}"
@@ -71,13 +54,6 @@ def _format_short_number(n: int) -> str:
     return str(n)
 
 
-def _truncate_text(text: str, max_len: int = 300) -> str:
-    """截断文本"""
-    if len(text) <= max_len:
-        return text
-    return text[:max_len] + "..."
-
-
 # ==================== 数据加载 ====================
 
 def load_posts_data(platform: str = "twitter", data_path: str = None) -> Dict[str, Any]:
@@ -105,15 +81,33 @@ def load_posts_data(platform: str = "twitter", data_path: str = None) -> Dict[st
 
 # ==================== 数据分析 ====================
 
-def _engagement_score(item: Dict[str, Any]) -> float:
-    """计算单条推文的互动分数"""
-    stats = item.get("stats", {})
-    return (
-        stats.get("likes", 0)
-        + stats.get("retweets", 0) * 2
-        + stats.get("views", 0) * 0.01
-        + stats.get("quotes", 0) * 3
-    )
+def _top_distinct_clusters(
+    items: List[Dict[str, Any]], rows: np.ndarray, scores: np.ndarray, top_n: int
+) -> List[Dict[str, Any]]:
+    """
+    按 cluster_id 对 rows 分组，每个簇保留互动最高的一条（分数相同时保持原始顺序），
+    返回互动最高的 top_n 个簇；duplicate_count 为整个簇（在 rows 范围内）被折叠的条数
+    """
+    if top_n <= 0 or len(rows) == 0:
+        return []
+    # 未标注簇的条目各自成簇
+    labels = np.array([items[i].get("cluster_id") or f"\0{i}" for i in rows], dtype=object)
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    sub = scores[rows]
+    positions = np.arange(len(rows))
+    order = np.lexsort((positions, -sub))
+    # 按分数排序后，每个簇第一次出现的位置即代表条目，代表条目之间仍保持该顺序
+    _, first = np.unique(inverse[order], return_index=True)
+    representatives = order[np.sort(first)][:top_n]
+
+    top_posts = []
+    for pos in representatives:
+        item = items[rows[pos]]
+        if item.get("cluster_id"):
+            item = dict(item)
+            item["duplicate_count"] = int(counts[inverse[pos]] - 1)
+        top_posts.append(item)
+    return top_posts
 
 
 def filter_and_analyze(
@@ -121,6 +115,8 @@ def filter_and_analyze(
     hours: int = 24,
     authors: Optional[List[str]] = None,
     top_n: int = 10,
+    collapse_duplicates: bool = True,
+    use_rollups: bool = False,
 ) -> Dict[str, Any]:
     """
     数据过滤与分析
@@ -129,89 +125,67 @@ def filter_and_analyze(
         hours: 时间窗口（小时）
         authors: 可选的作者用户名过滤列表
         top_n: Top N 推文数量
+        collapse_duplicates: Top N 中每个近重复簇只保留互动最高的一条
+        use_rollups: 关键词直接合并入库时维护的小时桶（仅适用于默认 posts.json 数据、未按作者过滤时）。
+            此时时间窗口按整点对齐，与小时桶覆盖的范围一致；小时桶的帖子数与扫描结果不一致时改为扫描正文。
+            包含同步的 SQLite 查询，异步代码中请放到线程里调用
     """
     items = posts_data.get("items", [])
-    now = datetime.now(timezone.utc)
 
-    # 解析时间
-    for item in items:
-        item["_parsed_time"] = _parse_twitter_time(item.get("created_at", ""))
+    # 旧数据没有簇信息时补充标注
+    if collapse_duplicates and items and any("cluster_id" not in item for item in items):
+        annotate_duplicates(items, "twitter")
+
+    cols = PostColumns(items)
+    now_ts = datetime.now(timezone.utc).timestamp()
 
     # 作者过滤（如果指定）
+    rows = np.arange(len(cols))
     if authors:
-        authors_lower = {a.lower().lstrip("@") for a in authors}
-        items = [
-            item for item in items
-            if (item.get("author", {}).get("username") or "").lower() in authors_lower
-        ]
-
-    # 时间窗口过滤
-    recent_items = []
-    for item in items:
-        pt = item.get("_parsed_time")
-        if pt:
-            delta = (now - pt).total_seconds() / 3600
-            if delta <= hours:
-                recent_items.append(item)
+        rows = rows[cols.author_mask(authors)]
 
-    # 如果时间窗口内推文太少，放宽到全部数据（前 50 条）
-    use_all = len(recent_items) < 5
-    analysis_items = items[:50] if use_all else recent_items
+    # 时间窗口过滤（使用小时桶时起点对齐到整点，和桶的范围一致）
+    use_rollups = use_rollups and not authors
+    window_hours = hours
+    if use_rollups:
+        window_hours = (now_ts - window_start_hour(hours, now_ts) * HOUR_SECONDS) / HOUR_SECONDS
+    recent_rows = rows[cols.window_mask(now_ts, window_hours)[rows]]
 
-    # Top N 高互动推文
-    sorted_by_engagement = sorted(analysis_items, key=_engagement_score, reverse=True)
-    top_posts = sorted_by_engagement[:top_n]
+    # 如果时间窗口内推文太少，放宽到全部数据（前 50 条）
+    use_all = len(recent_rows) < 5
+    analysis_rows = rows[:50] if use_all else recent_rows
+    analysis_items = [items[i] for i in analysis_rows]
+
+    # Top N 高互动推文（折叠近重复时先在全部分析行上按簇分组，再取前 N 个簇）
+    scores = cols.engagement()
+    if collapse_duplicates:
+        top_posts = _top_distinct_clusters(items, analysis_rows, scores, top_n)
+    else:
+        top_posts = [items[i] for i in cols.top_n(analysis_rows, top_n, scores)]
 
     # 最活跃作者（带详细信息）
-    author_post_map: Dict[str, Dict[str, Any]] = {}
-    for item in analysis_items:
-        author = item.get("author", {})
-        username = author.get("username")
-        if not username:
-            continue
-        if username not in author_post_map:
-            author_post_map[username] = {
-                "username": username,
-                "name": author.get("name") or username,
-                "avatar": author.get("avatar", ""),
-                "followers": author.get("followers", 0),
-                "verified": author.get("verified", False),
-                "post_count": 0,
-            }
-        author_post_map[username]["post_count"] += 1
-        # 更新为最新的粉丝数
-        if author.get("followers", 0) > author_post_map[username]["followers"]:
-            author_post_map[username]["followers"] = author.get("followers", 0)
-            author_post_map[username]["avatar"] = author.get("avatar", "")
-
-    top_authors_by_activity = sorted(
-        author_post_map.values(),
-        key=lambda x: x["post_count"],
-        reverse=True,
-    )[:10]
+    top_authors_by_activity = cols.author_activity(analysis_rows, limit=10)
 
-    # 关键词频率
-    all_text = " ".join(item.get("text", "") for item in analysis_items)
-    all_text = re.sub(r"https?://\S+", "", all_text)
-    all_text = re.sub(r"@\w+", "", all_text)
-    words = re.findall(r"[a-zA-Z]{3,}", all_text.lower())
-    word_freq = Counter(w for w in words if w not in STOP_WORDS)
-    top_keywords = word_freq.most_common(20)
+    # 关键词频率：优先合并小时桶，否则扫描窗口内的正文
+    top_keywords = None
+    if use_rollups and not use_all:
+        try:
+            rollup = get_rollup_store().window(hours, now=now_ts)
+            if rollup["posts"] == len(recent_rows):
+                top_keywords = rollup["top_keywords"]
+            else:
+                print(f"[Report] Rollup has {rollup['posts']} posts but scan found {len(recent_rows)}, "
+                      f"falling back to text scan")
+        except Exception as e:
+            print(f"[Report] Rollup query failed, falling back to text scan: {e}")
+    if not top_keywords:
+        word_freq = Counter()
+        for item in analysis_items:
+            word_freq.update(extract_keywords(item.get("text", "")))
+        top_keywords = word_freq.most_common(20)
 
     # 互动汇总
-    total_likes = sum(item.get("stats", {}).get("likes", 0) for item in analysis_items)
-    total_retweets = sum(item.get("stats", {}).get("retweets", 0) for item in analysis_items)
-    total_views = sum(item.get("stats", {}).get("views", 0) for item in analysis_items)
-
-    active_authors = len(set(
-        item.get("author", {}).get("username", "")
-        for item in analysis_items
-        if item.get("author", {}).get("username")
-    ))
-
-    # 清理临时字段
-    for item in posts_data.get("items", []):
-        item.pop("_parsed_time", None)
+    totals = cols.totals(analysis_rows)
 
     return {
         "total_posts": posts_data.get("total_count", len(posts_data.get("items", []))),
@@ -222,28 +196,33 @@ def filter_and_analyze(
         "top_posts": top_posts,
         "top_authors_by_activity": top_authors_by_activity,
         "top_keywords": top_keywords,
-        "total_likes": total_likes,
-        "total_retweets": total_retweets,
-        "total_views": total_views,
-        "active_authors": active_authors,
+        **totals,
         "scraped_at": posts_data.get("scraped_at", ""),
     }
 
 
 # ==================== LLM 洞察生成 ====================
 
-def build_llm_input(top_posts: List[Dict[str, Any]]) -> str:
+def build_llm_input(
+    top_posts: List[Dict[str, Any]],
+    budget: Optional[int] = None,
+    model: Optional[str] = None,
+) -> str:
     """
     构建 LLM 输入文本，只包含 Top N 推文的精简信息
-    控制总输入在 2000-3000 字以内
+    按 token 预算放入推文（默认 LLM_DOC_TOKEN_BUDGET），放不下时截断最后一条并丢弃其余
     """
-    lines = []
-    for i, post in enumerate(top_posts, 1):
+    if budget is None:
+        budget = context_budget(model=model)
+
+    def render(item: Tuple[int, Dict[str, Any]], max_text_tokens: Optional[int]) -> str:
+        i, post = item
         author = post.get("author", {})
         stats = post.get("stats", {})
         name = author.get("name") or author.get("username") or "Unknown"
         username = author.get("username", "")
-        text = _truncate_text(post.get("text", ""), 300)
+        text_tokens = POST_TEXT_TOKENS if max_text_tokens is None else min(POST_TEXT_TOKENS, max_text_tokens)
+        text = truncate_to_tokens(post.get("text", ""), text_tokens, model)
 
         line = (
             f"[{i}] @{username} ({name}, {_format_short_number(author.get('followers', 0))} followers)\n"
@@ -253,17 +232,23 @@ def build_llm_input(top_posts: List[Dict[str, Any]]) -> str:
             f"{_format_short_number(stats.get('views', 0))} views"
         )
 
-        # 引用推文
+        # 引用推文（截断最后一条时一并省略）
         qt = post.get("quoted_tweet")
-        if qt:
+        if qt and max_text_tokens is None:
             qt_author = qt.get("author", {})
-            qt_text = _truncate_text(qt.get("text", ""), 200)
+            qt_text = truncate_to_tokens(qt.get("text", ""), QUOTED_TEXT_TOKENS, model)
             line += (
                 f"\n引用推文 @{qt_author.get('username', '')}: {qt_text}"
             )
 
-        lines.append(line)
+        if post.get("duplicate_count"):
+            line += f"\n（另有 {post['duplicate_count']} 条相似帖子已合并）"
+
+        return line
 
+    lines = pack_items(list(enumerate(top_posts, 1)), render, budget, model)
+    if len(lines) < len(top_posts):
+        print(f"[Report] LLM input packed {len(lines)}/{len(top_posts)} posts within {budget} tokens")
     return "\n\n".join(lines)
 
 
@@ -273,42 +258,21 @@ async def _call_llm(
     max_tokens: int,
     llm_config: Optional[Dict[str, Any]] = None,
 ) -> str:
-    """通用 LLM 调用封装"""
+    """通用 LLM 调用封装（异步，不阻塞事件循环）"""
     config = llm_config or {}
-    api_key = config.get("api_key")
-    model = config.get("model")
-
-    llm = get_llm_service(api_key=api_key, model=model)
-
-    # 如果指定了自定义 base_url，需要重新创建 llm 实例
-    if config.get("base_url"):
-        from langchain_openai import ChatOpenAI
-        try:
-            from langchain_core.messages import HumanMessage, SystemMessage
-        except ImportError:
-            from langchain.schema import HumanMessage, SystemMessage
-
-        custom_llm = ChatOpenAI(
-            model=model or settings.LLM_MODEL,
-            openai_api_key=api_key or settings.SILICONFLOW_API_KEY,
-            openai_api_base=config["base_url"],
-            temperature=0.4,
-            max_tokens=max_tokens,
-            request_timeout=settings.LLM_REQUEST_TIMEOUT,
-        )
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=message),
-        ]
-        response = custom_llm.invoke(messages)
-        return response.content.strip()
-
-    return llm.chat(
+    llm = get_llm_service(
+        api_key=config.get("api_key"),
+        model=config.get("model"),
+        base_url=config.get("base_url"),
+    )
+    response = await llm.achat(
         message=message,
         system_prompt=system_prompt,
         temperature=0.4,
         max_tokens=max_tokens,
-    ).strip()
+        feature="report",
+    )
+    return response.strip()
 
 
 async def generate_executive_summary(
@@ -318,7 +282,9 @@ async def generate_executive_summary(
     """
     使用 LLM 生成综合性行业洞察摘要（300-500字）
     """
-    llm_input = build_llm_input(top_posts)
+    model = (llm_config or {}).get("model") or settings.LLM_MODEL
+    budget = context_budget(REPORT_EXECUTIVE_SUMMARY_PROMPT, model=model, reserve_output=1000)
+    llm_input = build_llm_input(top_posts, budget, model)
 
     try:
         return await _call_llm(
@@ -339,7 +305,9 @@ async def generate_post_analyses(
     """
     使用 LLM 生成逐帖分析。返回 {帖子序号: 分析文本}
     """
-    llm_input = build_llm_input(top_posts)
+    model = (llm_config or {}).get("model") or settings.LLM_MODEL
+    budget = context_budget(REPORT_POST_ANALYSIS_PROMPT, model=model, reserve_output=2500)
+    llm_input = build_llm_input(top_posts, budget, model)
 
     try:
         raw_output = await _call_llm(
@@ -456,6 +424,8 @@ def render_markdown_report(
         name = author.get("name") or author.get("username") or "Unknown"
         username = author.get("username", "")
         avatar = author.get("avatar", "")
+        if settings.MEDIA_PROXY_BASE_URL:
+            avatar = build_media_proxy_url(avatar, "avatar", base_url=settings.MEDIA_PROXY_BASE_URL)
         followers = _format_short_number(author.get("followers", 0))
         verified = " ✓" if author.get("verified") else ""
         text = post.get("text", "")
@@ -627,6 +597,7 @@ async def generate_report(
     storage_config: Optional[Dict[str, Any]] = None,
     llm_config: Optional[Dict[str, Any]] = None,
     data_path: str = None,
+    collapse_duplicates: bool = True,
 ) -> Dict[str, Any]:
     """
     完整报告生成流水线
@@ -639,6 +610,7 @@ async def generate_report(
         storage_config: 可选的 Supabase 存储配置
         llm_config: 可选的 LLM 配置
         data_path: 可选的自定义数据文件路径
+        collapse_duplicates: 是否折叠近重复帖子
     Returns:
         {report_url, insights, analytics_summary, filename, generated_at, format}
     """
@@ -656,11 +628,14 @@ async def generate_report(
         }
 
     # 2. 数据过滤与分析
-    analytics = filter_and_analyze(
+    analytics = await asyncio.to_thread(
+        filter_and_analyze,
         posts_data,
         hours=hours,
         authors=authors,
         top_n=top_n,
+        collapse_duplicates=collapse_duplicates,
+        use_rollups=platform == "twitter" and data_path is None,
     )
 
     report_time = datetime.now()
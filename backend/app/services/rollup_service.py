@@ -0,0 +1,415 @@
+"""
+按小时汇总的推文统计（入库时增量维护）
+
+每个小时桶记录：帖子数、互动总和、关键词计数、各作者发帖数。
+任意 hours= 时间窗口的报告或按天的趋势图，只需合并少量桶，无需重新扫描全文。
+
+同一条推文重复入库时只更新互动数的差值；正文变化时先扣除旧关键词再加入新关键词。
+posts.json 被整体覆盖时用 sync 对账，文件中已不存在的推文会扣除其贡献。
+超过 ROLLUP_RETENTION_DAYS 的小时桶和推文记录会被清理。
+时间窗口按整点对齐，窗口起点所在的小时整桶计入（见 window_start_hour）。
+SQLite 操作是同步的，异步代码通过 ingest_tweets / sync_tweets / rollup_window / rollup_trend 在线程中执行。
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.analytics_engine import parse_twitter_times
+
+# 英文停用词（用于关键词提取）
+STOP_WORDS = {
+    "the", "a", "an", "is", "are", "was", "were", "be", "been", "being",
+    "have", "has", "had", "do", "does", "did", "will", "would", "could",
+    "should", "may", "might", "shall", "can", "need", "must", "ought",
+    "i", "me", "my", "we", "our", "you", "your", "he", "him", "his",
+    "she", "her", "it", "its", "they", "them", "their", "this", "that",
+    "these", "those", "am", "in", "on", "at", "to", "for", "of", "with",
+    "by", "from", "as", "into", "through", "during", "before", "after",
+    "about", "between", "under", "above", "up", "down", "out", "off",
+    "over", "again", "further", "then", "once", "here", "there", "when",
+    "where", "why", "how", "all", "each", "every", "both", "few", "more",
+    "most", "other", "some", "such", "no", "nor", "not", "only", "own",
+    "same", "so", "than", "too", "very", "just", "because", "but", "and",
+    "or", "if", "while", "what", "which", "who", "whom", "whose", "new",
+    "also", "like", "get", "got", "one", "two", "don", "don't", "it's",
+    "i'm", "we're", "they're", "he's", "she's", "that's", "there's",
+    "what's", "who's", "let's", "here's", "doesn't", "didn't", "won't",
+    "can't", "isn't", "aren't", "wasn't", "weren't", "hasn't", "haven't",
+    "hadn't", "couldn't", "wouldn't", "shouldn't", "mustn't", "amp",
+}
+
+_URL_RE = re.compile(r"https?://\S+")
+_MENTION_RE = re.compile(r"@\w+")
+_WORD_RE = re.compile(r"[a-zA-Z]{3,}")
+
+HOUR_SECONDS = 3600
+PRUNE_INTERVAL_SECONDS = 3600  # 两次保留期清理之间的最小间隔
+
+
+def window_start_hour(hours: float, now: float) -> int:
+    """hours 小时窗口的起始小时桶（整点对齐）"""
+    return int((now - hours * HOUR_SECONDS) // HOUR_SECONDS)
+
+
+def extract_keywords(text: str) -> Counter:
+    """提取关键词计数：去掉链接和 @，取 3 个字母以上的英文单词，过滤停用词"""
+    text = _MENTION_RE.sub("", _URL_RE.sub("", text or ""))
+    return Counter(w for w in _WORD_RE.findall(text.lower()) if w not in STOP_WORDS)
+
+
+class RollupStore:
+    """SQLite 持久化的小时桶"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS tweet_contrib ("
+            " id TEXT PRIMARY KEY, hour INTEGER NOT NULL, author TEXT NOT NULL,"
+            " likes INTEGER NOT NULL, retweets INTEGER NOT NULL, views INTEGER NOT NULL,"
+            " quotes INTEGER NOT NULL, text_hash INTEGER NOT NULL, keywords TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS hourly ("
+            " hour INTEGER PRIMARY KEY, posts INTEGER NOT NULL DEFAULT 0,"
+            " likes INTEGER NOT NULL DEFAULT 0, retweets INTEGER NOT NULL DEFAULT 0,"
+            " views INTEGER NOT NULL DEFAULT 0, quotes INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS hourly_keywords ("
+            " hour INTEGER NOT NULL, word TEXT NOT NULL, count INTEGER NOT NULL,"
+            " PRIMARY KEY (hour, word));"
+            "CREATE TABLE IF NOT EXISTS hourly_authors ("
+            " hour INTEGER NOT NULL, author TEXT NOT NULL, posts INTEGER NOT NULL,"
+            " likes INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (hour, author));"
+            "CREATE INDEX IF NOT EXISTS idx_tweet_contrib_hour ON tweet_contrib(hour);"
+        )
+        self._conn.commit()
+
+    # ==================== 写入 ====================
+
+    def _bump(self, table: str, hour: int, key_col: str, key: str, **deltas):
+        cols = ", ".join(deltas)
+        placeholders = ", ".join("?" for _ in deltas)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in deltas)
+        self._conn.execute(
+            f"INSERT INTO {table} (hour, {key_col}, {cols}) VALUES (?, ?, {placeholders}) "
+            f"ON CONFLICT(hour, {key_col}) DO UPDATE SET {updates}",
+            (hour, key, *deltas.values()),
+        )
+
+    def _bump_hour(self, hour: int, **deltas):
+        cols = ", ".join(deltas)
+        placeholders = ", ".join("?" for _ in deltas)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in deltas)
+        self._conn.execute(
+            f"INSERT INTO hourly (hour, {cols}) VALUES (?, {placeholders}) "
+            f"ON CONFLICT(hour) DO UPDATE SET {updates}",
+            (hour, *deltas.values()),
+        )
+
+    def _apply(self, hour: int, author: str, stats: Dict[str, int], keywords: Dict[str, int], sign: int):
+        """把一条推文的贡献加到（sign=1）或从（sign=-1）小时桶中"""
+        self._bump_hour(
+            hour, posts=sign,
+            likes=sign * stats["likes"], retweets=sign * stats["retweets"],
+            views=sign * stats["views"], quotes=sign * stats["quotes"],
+        )
+        if author:
+            self._bump("hourly_authors", hour, "author", author, posts=sign, likes=sign * stats["likes"])
+        for word, count in keywords.items():
+            self._bump("hourly_keywords", hour, "word", word, count=sign * count)
+
+    def _remove(self, tweet_id: str) -> bool:
+        """扣除一条推文的全部贡献并删除其记录"""
+        row = self._conn.execute(
+            "SELECT hour, author, likes, retweets, views, quotes, keywords FROM tweet_contrib WHERE id = ?",
+            (tweet_id,),
+        ).fetchone()
+        if row is None:
+            return False
+        hour, author, *values, keywords_json = row
+        stats = dict(zip(("likes", "retweets", "views", "quotes"), values))
+        self._apply(hour, author, stats, json.loads(keywords_json), -1)
+        self._conn.execute("DELETE FROM tweet_contrib WHERE id = ?", (tweet_id,))
+        return True
+
+    def _prune_locked(self, now: float, force: bool = False) -> int:
+        """删除保留期之前的小时桶和推文记录，返回删除的推文数"""
+        if not force and now - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return 0
+        self._last_prune = now
+        cutoff = self.retention_cutoff(now)
+        removed = self._conn.execute("DELETE FROM tweet_contrib WHERE hour < ?", (cutoff,)).rowcount
+        for table in ("hourly", "hourly_keywords", "hourly_authors"):
+            self._conn.execute(f"DELETE FROM {table} WHERE hour < ?", (cutoff,))
+        # 扣减后归零的行没有信息量
+        self._conn.execute("DELETE FROM hourly_keywords WHERE count <= 0")
+        self._conn.execute("DELETE FROM hourly_authors WHERE posts <= 0")
+        return removed
+
+    @staticmethod
+    def retention_cutoff(now: float) -> int:
+        """保留期内最早的小时桶"""
+        return int(now // HOUR_SECONDS) - settings.ROLLUP_RETENTION_DAYS * 24
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """立即执行一次保留期清理"""
+        with self._lock:
+            removed = self._prune_locked(now if now is not None else time.time(), force=True)
+            self._conn.commit()
+        return removed
+
+    def ingest(self, items: List[Dict[str, Any]], now: Optional[float] = None) -> Dict[str, int]:
+        """增量写入推文，返回新增 / 更新 / 未变化的数量（保留期之前的推文不计入）"""
+        with self._lock:
+            result = self._ingest_locked(items, now if now is not None else time.time())
+            self._conn.commit()
+        return result
+
+    def sync(self, items: List[Dict[str, Any]], now: Optional[float] = None) -> Dict[str, int]:
+        """
+        与完整数据文件对账：写入 items，并扣除 items 中已不存在的推文的贡献
+
+        用于 posts.json 被整体覆盖之后（以及启动时的首次回填）
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            result = self._ingest_locked(items, now)
+            self._prune_locked(now, force=True)  # 先清掉保留期之前的记录，避免扣减已删除的桶
+            present = {str(item["id"]) for item in items if item.get("id")}
+            stale = [
+                row[0] for row in self._conn.execute("SELECT id FROM tweet_contrib").fetchall()
+                if row[0] not in present
+            ]
+            for tweet_id in stale:
+                self._remove(tweet_id)
+            self._conn.commit()
+        result["removed"] = len(stale)
+        return result
+
+    def _ingest_locked(self, items: List[Dict[str, Any]], now: float) -> Dict[str, int]:
+        timestamps = parse_twitter_times([item.get("created_at", "") for item in items])
+        cutoff = self.retention_cutoff(now)
+        added = updated = unchanged = 0
+        for item, ts in zip(items, timestamps):
+            tweet_id = item.get("id")
+            if not tweet_id or ts != ts:  # 缺少 ID 或时间无法解析
+                continue
+            hour = int(ts // HOUR_SECONDS)
+            if hour < cutoff:
+                # 超出保留期：已记录的旧贡献交给清理删除
+                continue
+            author = (item.get("author") or {}).get("username") or ""
+            raw = item.get("stats") or {}
+            stats = {k: int(raw.get(k) or 0) for k in ("likes", "retweets", "views", "quotes")}
+            text = item.get("text", "") or ""
+            text_hash = zlib.crc32(text.encode("utf-8"))
+
+            row = self._conn.execute(
+                "SELECT hour, author, likes, retweets, views, quotes, text_hash, keywords"
+                " FROM tweet_contrib WHERE id = ?",
+                (str(tweet_id),),
+            ).fetchone()
+            if row is None:
+                keywords = dict(extract_keywords(text))
+                self._apply(hour, author, stats, keywords, 1)
+                added += 1
+            else:
+                old_hour, old_author, *old_values, old_hash, old_keywords_json = row
+                old_stats = dict(zip(("likes", "retweets", "views", "quotes"), old_values))
+                same_bucket = old_hour == hour and old_author == author and old_hash == text_hash
+                if same_bucket and old_stats == stats:
+                    unchanged += 1
+                    continue
+                old_keywords = json.loads(old_keywords_json)
+                keywords = old_keywords
+                if not same_bucket:
+                    keywords = dict(extract_keywords(text))
+                    self._apply(old_hour, old_author, old_stats, old_keywords, -1)
+                    self._apply(hour, author, stats, keywords, 1)
+                else:
+                    # 只更新互动数差值
+                    delta = {k: stats[k] - old_stats[k] for k in stats}
+                    self._bump_hour(hour, posts=0, **delta)
+                    if author:
+                        self._bump("hourly_authors", hour, "author", author, posts=0, likes=delta["likes"])
+                updated += 1
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tweet_contrib"
+                " (id, hour, author, likes, retweets, views, quotes, text_hash, keywords)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(tweet_id), hour, author, stats["likes"], stats["retweets"], stats["views"],
+                 stats["quotes"], text_hash, json.dumps(keywords)),
+            )
+        self._prune_locked(now)
+        return {"added": added, "updated": updated, "unchanged": unchanged}
+
+    # ==================== 查询 ====================
+
+    def window(
+        self,
+        hours: int,
+        now: Optional[float] = None,
+        authors: Optional[List[str]] = None,
+        top_keywords: int = 20,
+        top_authors: int = 10,
+    ) -> Dict[str, Any]:
+        """合并最近 hours 小时的桶"""
+        now = now if now is not None else time.time()
+        # 与 PostColumns.window_mask 一致：不设上界，时间在未来的帖子同样计入
+        start_hour = window_start_hour(hours, now)
+        with self._lock:
+            if authors:
+                names = [a.lower().lstrip("@") for a in authors]
+                marks = ", ".join("?" for _ in names)
+                rows = self._conn.execute(
+                    f"SELECT author, SUM(posts), SUM(likes) FROM hourly_authors "
+                    f"WHERE hour >= ? AND LOWER(author) IN ({marks}) GROUP BY author "
+                    f"ORDER BY SUM(posts) DESC",
+                    (start_hour, *names),
+                ).fetchall()
+                return {
+                    "hours": hours,
+                    "posts": sum(r[1] for r in rows),
+                    "total_likes": sum(r[2] for r in rows),
+                    "authors": [{"username": r[0], "post_count": r[1], "likes": r[2]} for r in rows[:top_authors]],
+                }
+
+            totals = self._conn.execute(
+                "SELECT COALESCE(SUM(posts), 0), COALESCE(SUM(likes), 0), COALESCE(SUM(retweets), 0),"
+                " COALESCE(SUM(views), 0), COALESCE(SUM(quotes), 0) FROM hourly WHERE hour >= ?",
+                (start_hour,),
+            ).fetchone()
+            keywords = self._conn.execute(
+                "SELECT word, SUM(count) AS c FROM hourly_keywords WHERE hour >= ?"
+                " GROUP BY word HAVING c > 0 ORDER BY c DESC, word LIMIT ?",
+                (start_hour, top_keywords),
+            ).fetchall()
+            author_rows = self._conn.execute(
+                "SELECT author, SUM(posts) AS p, SUM(likes) FROM hourly_authors WHERE hour >= ?"
+                " GROUP BY author HAVING p > 0 ORDER BY p DESC LIMIT ?",
+                (start_hour, top_authors),
+            ).fetchall()
+            active = self._conn.execute(
+                "SELECT COUNT(*) FROM (SELECT author FROM hourly_authors WHERE hour >= ?"
+                " GROUP BY author HAVING SUM(posts) > 0)",
+                (start_hour,),
+            ).fetchone()[0]
+        return {
+            "hours": hours,
+            "posts": totals[0],
+            "total_likes": totals[1],
+            "total_retweets": totals[2],
+            "total_views": totals[3],
+            "total_quotes": totals[4],
+            "active_authors": active,
+            "top_keywords": [(w, c) for w, c in keywords],
+            "authors": [{"username": a, "post_count": p, "likes": l} for a, p, l in author_rows],
+        }
+
+    def trend(self, days: int = 7, bucket_hours: int = 24, top_keywords: int = 5,
+              now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """按 bucket_hours 聚合的趋势序列（默认按天），每个点包含帖子数、互动和热门关键词"""
+        now = now if now is not None else time.time()
+        end_hour = int(now // HOUR_SECONDS)
+        start_hour = end_hour - days * 24 + 1
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT (hour - ?) / ? AS b, SUM(posts), SUM(likes), SUM(retweets), SUM(views) FROM hourly"
+                " WHERE hour BETWEEN ? AND ? GROUP BY b",
+                (start_hour, bucket_hours, start_hour, end_hour),
+            ).fetchall()
+            kw_rows = self._conn.execute(
+                "SELECT (hour - ?) / ? AS b, word, SUM(count) AS c FROM hourly_keywords"
+                " WHERE hour BETWEEN ? AND ? GROUP BY b, word HAVING c > 0",
+                (start_hour, bucket_hours, start_hour, end_hour),
+            ).fetchall()
+
+        keywords_by_bucket: Dict[int, Counter] = {}
+        for b, word, count in kw_rows:
+            keywords_by_bucket.setdefault(b, Counter())[word] = count
+        by_bucket = {r[0]: r[1:] for r in rows}
+
+        series = []
+        n_buckets = (end_hour - start_hour) // bucket_hours + 1
+        for b in range(n_buckets):
+            posts, likes, retweets, views = by_bucket.get(b, (0, 0, 0, 0))
+            bucket_start = (start_hour + b * bucket_hours) * HOUR_SECONDS
+            series.append({
+                "start": datetime.fromtimestamp(bucket_start, tz=timezone.utc).isoformat(),
+                "posts": posts,
+                "likes": likes,
+                "retweets": retweets,
+                "views": views,
+                "top_keywords": keywords_by_bucket.get(b, Counter()).most_common(top_keywords),
+            })
+        return series
+
+
+_rollup_store: Optional[RollupStore] = None
+_rollup_store_lock = threading.Lock()
+
+
+def get_rollup_store() -> RollupStore:
+    """
+    获取全局小时桶存储（首次使用时与现有 posts.json 对账）
+
+    包含同步的 SQLite 操作，异步代码请使用下面的 ingest_tweets / sync_tweets / rollup_window / rollup_trend
+    """
+    global _rollup_store
+    if _rollup_store is None:
+        with _rollup_store_lock:
+            if _rollup_store is None:
+                db_path = Path(settings.ROLLUP_DB_PATH or Path(settings.UPLOAD_DIR) / "rollups.sqlite")
+                store = RollupStore(db_path)
+                from app.services.crawler_service import CRAWL_DATA_BASE_PATH
+                posts_path = CRAWL_DATA_BASE_PATH / "twitter" / "posts.json"
+                if posts_path.exists():
+                    # 服务未运行期间 posts.json 可能被覆盖，启动时整体对账一次
+                    try:
+                        with open(posts_path, "r", encoding="utf-8") as f:
+                            result = store.sync(json.load(f).get("items", []))
+                        print(f"[Rollup] Reconciled with posts.json: {result}")
+                    except (OSError, ValueError) as e:
+                        print(f"[Rollup] Backfill failed: {e}")
+                _rollup_store = store
+    return _rollup_store
+
+
+async def ingest_tweets(items: List[Dict[str, Any]]):
+    """爬取入库时增量更新小时桶（合并写入 posts.json 的场景）"""
+    try:
+        result = await asyncio.to_thread(lambda: get_rollup_store().ingest(items))
+        print(f"[Rollup] Ingested tweets: {result}")
+    except Exception as e:
+        print(f"[Rollup] Failed to ingest tweets: {e}")
+
+
+async def sync_tweets(items: List[Dict[str, Any]]):
+    """posts.json 被整体覆盖后对账小时桶：items 为文件中的全部推文"""
+    try:
+        result = await asyncio.to_thread(lambda: get_rollup_store().sync(items))
+        print(f"[Rollup] Synced tweets: {result}")
+    except Exception as e:
+        print(f"[Rollup] Failed to sync tweets: {e}")
+
+
+async def rollup_window(hours: int, **kwargs) -> Dict[str, Any]:
+    """在线程中查询 RollupStore.window"""
+    return await asyncio.to_thread(lambda: get_rollup_store().window(hours, **kwargs))
+
+
+async def rollup_trend(**kwargs) -> List[Dict[str, Any]]:
+    """在线程中查询 RollupStore.trend"""
+    return await asyncio.to_thread(lambda: get_rollup_store().trend(**kwargs))
@@ -0,0 +1,546 @@
+"""
+全文检索服务
+对已爬取的推文（含引用推文）、视频标题、作者名以及国内平台内容建立倒排索引：
+- BM25 排序
+- 末尾词前缀匹配（输入即搜索）
+- 平台 / 作者 / 时间过滤
+- 中文按字二元组（bigram）切分，无需额外分词依赖
+- 爬取入库时增量更新，仅重建内容发生变化的文档
+"""
+
+import bisect
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 国内平台数据目录（MediaCrawler 导出的 JSON）
+DOMESTIC_DATA_PATH = Path(__file__).parent.parent.parent.parent / "frontend" / "CrawlData"
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 前缀最多展开的词项数，避免单字母前缀扫描整个词表
+MAX_PREFIX_EXPANSIONS = 64
+
+_LATIN_RE = re.compile(r"[a-z0-9][a-z0-9_']*")
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+")
+_TOKEN_RE = re.compile(
+    r"[a-z0-9][a-z0-9_']*|[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分文本为词项
+    - 拉丁字母 / 数字：按单词切分并小写
+    - 中日韩文字：单字 + 相邻二元组，兼顾召回和精度
+    """
+    if not text:
+        return []
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        word = match.group(0)
+        if _CJK_RE.fullmatch(word):
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.strip("'"))
+    return [t for t in tokens if t]
+
+
+def _tokenize_query(query: str) -> List[str]:
+    """查询切分：中文只使用二元组（单字查询除外），减少噪声"""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer((query or "").lower()):
+        word = match.group(0)
+        if _CJK_RE.fullmatch(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.strip("'"))
+    return [t for t in tokens if t]
+
+
+def parse_timestamp(value: Any) -> float:
+    """解析各平台的时间字段为 Unix 秒，无法解析时返回 0（需要区分无效输入时用 parse_timestamp_strict）"""
+    if value in (None, ""):
+        return 0.0
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.isdigit()):
+        ts = float(value)
+        return ts / 1000 if ts > 1e11 else ts
+    text = str(value)
+    for fmt in ("%a %b %d %H:%M:%S %z %Y",):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def parse_timestamp_strict(value: Any) -> float:
+    """解析用户输入的时间（ISO 时间或 Unix 时间戳），无法解析时抛出 ValueError"""
+    text = str(value).strip()
+    if text.isdigit():
+        return parse_timestamp(text)
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise ValueError(f"无法解析的时间: {value}")
+
+
+def _doc_from_item(platform: str, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """把各平台的数据条目统一为索引文档"""
+    if platform == "twitter":
+        author = item.get("author") or {}
+        quoted = item.get("quoted_tweet") or {}
+        quoted_author = quoted.get("author") or {}
+        return {
+            "id": item.get("id"),
+            "title": item.get("text", ""),
+            "body": " ".join(filter(None, [quoted.get("text"), quoted_author.get("name")])),
+            "author": author.get("username") or item.get("source_name") or "",
+            "author_name": author.get("name") or item.get("source_name") or "",
+            "url": item.get("url"),
+            "timestamp": parse_timestamp(item.get("created_at")),
+        }
+    if platform == "youtube":
+        return {
+            "id": item.get("id"),
+            "title": item.get("title", ""),
+            "body": "",
+            "author": item.get("source_name", ""),
+            "author_name": item.get("source_name", ""),
+            "url": item.get("url"),
+            "timestamp": parse_timestamp(item.get("published_at")),
+        }
+    if platform == "bili":
+        return {
+            "id": item.get("video_id"),
+            "title": item.get("title", ""),
+            "body": item.get("desc", ""),
+            "author": item.get("user_id", ""),
+            "author_name": item.get("nickname", ""),
+            "url": item.get("video_url"),
+            "timestamp": parse_timestamp(item.get("create_time")),
+        }
+    if platform == "xhs":
+        return {
+            "id": item.get("note_id"),
+            "title": item.get("title", ""),
+            "body": " ".join(filter(None, [item.get("desc"), item.get("tag_list")])),
+            "author": item.get("user_id", ""),
+            "author_name": item.get("nickname", ""),
+            "url": item.get("note_url"),
+            "timestamp": parse_timestamp(item.get("time")),
+        }
+    if platform == "zhihu":
+        return {
+            "id": item.get("content_id"),
+            "title": item.get("title", ""),
+            "body": item.get("content_text") or item.get("desc", ""),
+            "author": item.get("user_id", ""),
+            "author_name": item.get("user_nickname", ""),
+            "url": item.get("content_url"),
+            "timestamp": parse_timestamp(item.get("created_time")),
+        }
+    return None
+
+
+class SearchIndex:
+    """
+    增量维护的倒排索引
+
+    文档以槽位（slot）编号存储，删除后槽位复用；
+    每个词项的倒排表为 {slot: tf}，检索时懒构建 NumPy 数组做向量化 BM25 打分。
+    过滤用的列（平台 / 作者 / 时间 / 文档长度）随写入逐槽位更新，删除的槽位标记为 -1（墓碑），
+    入库后的首次检索无需重建。
+    """
+
+    # 列名 -> (dtype, 空槽位的填充值)
+    _COLUMN_SPECS = {
+        "platform": (np.int16, -1),
+        "author": (np.int32, -1),
+        "author_name": (np.int32, -1),
+        "timestamp": (np.float64, 0.0),
+        "doc_len": (np.float32, 0.0),
+    }
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._docs: List[Optional[Dict[str, Any]]] = []
+        self._doc_terms: List[Optional[Dict[str, int]]] = []
+        self._doc_len: List[int] = []
+        self._slot_by_key: Dict[Tuple[str, str], int] = {}
+        self._free_slots: List[int] = []
+        self._total_len = 0
+        self._doc_count = 0
+        self._loaded = False
+
+        # 懒构建的检索缓存
+        self._sorted_terms: Optional[List[str]] = None
+        self._posting_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.full(0, fill, dtype=dtype) for name, (dtype, fill) in self._COLUMN_SPECS.items()
+        }
+        self._platform_codes: Dict[str, int] = {}
+        self._author_codes: Dict[str, int] = {}
+        self._author_name_codes: Dict[str, int] = {}
+
+    # ==================== 写入 ====================
+
+    def _invalidate(self, terms: Iterable[str]):
+        for term in terms:
+            self._posting_arrays.pop(term, None)
+
+    def _set_columns(self, slot: int, doc: Optional[Dict[str, Any]], length: int = 0):
+        """更新单个槽位的列值（doc 为 None 时写入墓碑），容量不足时按倍数扩容"""
+        capacity = len(self._columns["platform"])
+        if slot >= capacity:
+            new_capacity = max(slot + 1, capacity * 2, 1024)
+            for name, (dtype, fill) in self._COLUMN_SPECS.items():
+                grown = np.full(new_capacity, fill, dtype=dtype)
+                grown[:capacity] = self._columns[name]
+                self._columns[name] = grown
+        cols = self._columns
+        if doc is None:
+            for name, (_, fill) in self._COLUMN_SPECS.items():
+                cols[name][slot] = fill
+            return
+        cols["platform"][slot] = self._platform_codes.setdefault(doc["platform"], len(self._platform_codes))
+        cols["author"][slot] = self._author_codes.setdefault(str(doc["author"]).lower(), len(self._author_codes))
+        cols["author_name"][slot] = self._author_name_codes.setdefault(
+            str(doc["author_name"]).lower(), len(self._author_name_codes)
+        )
+        cols["timestamp"][slot] = doc["timestamp"]
+        cols["doc_len"][slot] = length
+
+    def _remove_slot(self, slot: int):
+        terms = self._doc_terms[slot] or {}
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(slot, None)
+                if not posting:
+                    del self._postings[term]
+                    self._sorted_terms = None
+        self._invalidate(terms)
+        self._total_len -= self._doc_len[slot]
+        self._doc_len[slot] = 0
+        self._docs[slot] = None
+        self._doc_terms[slot] = None
+        self._set_columns(slot, None)
+        self._free_slots.append(slot)
+        self._doc_count -= 1
+
+    def upsert(self, platform: str, item: Dict[str, Any]) -> bool:
+        """插入或更新单个条目，内容未变化时跳过。返回是否发生了变更"""
+        doc = _doc_from_item(platform, item)
+        if not doc or not doc.get("id"):
+            return False
+        text = " ".join([doc["title"] or "", doc["body"] or "", doc["author"] or "", doc["author_name"] or ""])
+        digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+        key = (platform, str(doc["id"]))
+
+        with self._lock:
+            slot = self._slot_by_key.get(key)
+            if slot is not None:
+                if self._docs[slot]["digest"] == digest:
+                    return False
+                self._remove_slot(slot)
+
+            terms: Dict[str, int] = {}
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + 1
+
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                slot = len(self._docs)
+                self._docs.append(None)
+                self._doc_terms.append(None)
+                self._doc_len.append(0)
+
+            doc["platform"] = platform
+            doc["digest"] = digest
+            self._docs[slot] = doc
+            self._doc_terms[slot] = terms
+            length = sum(terms.values())
+            self._doc_len[slot] = length
+            self._total_len += length
+            self._doc_count += 1
+            self._slot_by_key[key] = slot
+            self._set_columns(slot, doc, length)
+
+            for term, tf in terms.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = {}
+                    self._sorted_terms = None
+                posting[slot] = tf
+            self._invalidate(terms)
+            return True
+
+    def remove(self, platform: str, doc_id: str) -> bool:
+        with self._lock:
+            slot = self._slot_by_key.pop((platform, str(doc_id)), None)
+            if slot is None:
+                return False
+            self._remove_slot(slot)
+            return True
+
+    def sync_platform(self, platform: str, items: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        用某平台的完整数据集同步索引：新增/变更的条目重建，
+        不再出现的条目删除，未变化的条目不做任何处理
+        """
+        changed = 0
+        seen = set()
+        with self._lock:
+            for item in items:
+                doc = _doc_from_item(platform, item)
+                if doc and doc.get("id"):
+                    seen.add(str(doc["id"]))
+                if self.upsert(platform, item):
+                    changed += 1
+            stale = [doc_id for (p, doc_id) in self._slot_by_key if p == platform and doc_id not in seen]
+            for doc_id in stale:
+                self.remove(platform, doc_id)
+        return {"changed": changed, "removed": len(stale)}
+
+    def add_items(self, platform: str, items: List[Dict[str, Any]]) -> int:
+        """增量追加条目（不删除已有条目）"""
+        with self._lock:
+            return sum(1 for item in items if self.upsert(platform, item))
+
+    # ==================== 加载 ====================
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load_from_disk(self):
+        """从已保存的爬虫数据构建索引"""
+        from app.services.crawler_service import CRAWL_DATA_BASE_PATH
+
+        start = time.perf_counter()
+        sources = [
+            ("twitter", CRAWL_DATA_BASE_PATH / "twitter" / "posts.json"),
+            ("youtube", CRAWL_DATA_BASE_PATH / "youtube" / "videos.json"),
+        ]
+        for platform in ("bili", "xhs", "zhihu"):
+            for path in sorted((DOMESTIC_DATA_PATH / platform / "json").glob("*contents*.json")):
+                sources.append((platform, path))
+
+        with self._lock:
+            for platform, path in sources:
+                if not path.exists():
+                    continue
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"[Search] Failed to load {path}: {e}")
+                    continue
+                items = data.get("items", []) if isinstance(data, dict) else data
+                self.add_items(platform, items)
+            self._loaded = True
+        print(f"[Search] Index built: {self._doc_count} docs, {len(self._postings)} terms "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    # ==================== 检索 ====================
+
+    def _posting_array(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            posting = self._postings.get(term, {})
+            slots = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            tfs = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+            arrays = (slots, tfs)
+            self._posting_arrays[term] = arrays
+        return arrays
+
+    def _column_views(self) -> Dict[str, np.ndarray]:
+        """当前槽位范围内的列（视图，不复制）"""
+        n = len(self._docs)
+        return {name: column[:n] for name, column in self._columns.items()}
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        start = bisect.bisect_left(terms, prefix)
+        matches = []
+        for term in terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        if len(matches) > MAX_PREFIX_EXPANSIONS:
+            # 保留完全匹配，其余按文档频率取前若干个
+            matches.sort(key=lambda t: (t != prefix, -len(self._postings[t])))
+            matches = matches[:MAX_PREFIX_EXPANSIONS]
+        return matches
+
+    def search(
+        self,
+        query: str,
+        platforms: Optional[List[str]] = None,
+        author: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+        prefix: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本，所有词项需同时命中（AND），末尾词支持前缀匹配
+            platforms: 平台过滤
+            author: 作者过滤（用户名或频道名，不区分大小写）
+            since / until: 时间范围（Unix 秒）
+            prefix: 是否把最后一个拉丁词作为前缀展开
+        """
+        tokens = _tokenize_query(query)
+        if not tokens:
+            return {"total": 0, "items": []}
+
+        with self._lock:
+            cols = self._column_views()
+            n_slots = len(self._docs)
+            if self._doc_count == 0 or n_slots == 0:
+                return {"total": 0, "items": []}
+            avgdl = self._total_len / self._doc_count
+            doc_len = cols["doc_len"]
+
+            # 每个查询词对应一组索引词项（前缀展开后可能有多个）
+            unique_tokens = list(dict.fromkeys(tokens))
+            groups: List[List[str]] = []
+            for i, token in enumerate(unique_tokens):
+                if prefix and i == len(unique_tokens) - 1 and _LATIN_RE.fullmatch(token):
+                    groups.append(self._expand_prefix(token))
+                else:
+                    groups.append([token] if token in self._postings else [])
+            if any(not group for group in groups):
+                return {"total": 0, "items": []}
+
+            scores = np.zeros(n_slots, dtype=np.float32)
+            matched = np.zeros(n_slots, dtype=np.int16)
+            for group in groups:
+                group_scores = np.zeros(n_slots, dtype=np.float32)
+                for term in group:
+                    slots, tfs = self._posting_array(term)
+                    df = len(slots)
+                    idf = math.log(1 + (self._doc_count - df + 0.5) / (df + 0.5))
+                    norm = tfs + BM25_K1 * (1 - BM25_B + BM25_B * doc_len[slots] / avgdl)
+                    contrib = idf * tfs * (BM25_K1 + 1) / norm
+                    # 前缀展开的多个词项取最大值，避免常见前缀刷高分（同一倒排表内槽位唯一）
+                    group_scores[slots] = np.maximum(group_scores[slots], contrib)
+                hit = group_scores > 0
+                matched += hit
+                scores += group_scores
+
+            mask = matched == len(groups)
+            if platforms:
+                codes = [self._platform_codes[p] for p in platforms if p in self._platform_codes]
+                mask &= np.isin(cols["platform"], codes)
+            if author:
+                author_mask = np.zeros(n_slots, dtype=bool)
+                code = self._author_codes.get(author.lower())
+                if code is not None:
+                    author_mask |= cols["author"] == code
+                name_code = self._author_name_codes.get(author.lower())
+                if name_code is not None:
+                    author_mask |= cols["author_name"] == name_code
+                mask &= author_mask
+            if since:
+                mask &= cols["timestamp"] >= since
+            if until:
+                mask &= cols["timestamp"] <= until
+
+            candidates = np.flatnonzero(mask)
+            total = int(len(candidates))
+            if total == 0:
+                return {"total": 0, "items": []}
+
+            want = min(offset + limit, total)
+            cand_scores = scores[candidates]
+            if want < total:
+                top = np.argpartition(-cand_scores, want - 1)[:want]
+            else:
+                top = np.arange(total)
+            top = top[np.argsort(-cand_scores[top], kind="stable")][offset:offset + limit]
+
+            items = []
+            for idx in top:
+                slot = int(candidates[idx])
+                doc = self._docs[slot]
+                items.append({
+                    "id": doc["id"],
+                    "platform": doc["platform"],
+                    "title": doc["title"],
+                    "author": doc["author"],
+                    "author_name": doc["author_name"],
+                    "url": doc["url"],
+                    "timestamp": doc["timestamp"] or None,
+                    "score": round(float(scores[slot]), 4),
+                })
+            return {"total": total, "items": items}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_platform: Dict[str, int] = {}
+            for platform, _ in self._slot_by_key:
+                per_platform[platform] = per_platform.get(platform, 0) + 1
+            return {
+                "loaded": self._loaded,
+                "documents": self._doc_count,
+                "terms": len(self._postings),
+                "platforms": per_platform,
+            }
+
+
+_search_index: Optional[SearchIndex] = None
+
+
+def get_search_index() -> SearchIndex:
+    """获取全局检索索引（首次检索时从磁盘构建）"""
+    global _search_index
+    if _search_index is None:
+        _search_index = SearchIndex()
+    return _search_index
+
+
+def sync_search_index(platform: str, items: List[Dict[str, Any]], full: bool = True):
+    """
+    爬取入库后同步索引。索引尚未构建时跳过，首次检索会从磁盘读取最新数据。
+
+    Args:
+        full: True 表示 items 是该平台的完整数据集（删除缺失条目），False 表示仅追加
+    """
+    index = get_search_index()
+    if not index.loaded:
+        return
+    try:
+        if full:
+            result = index.sync_platform(platform, items)
+            print(f"[Search] Synced {platform}: {result['changed']} changed, {result['removed']} removed")
+        else:
+            index.add_items(platform, items)
+    except Exception as e:
+        print(f"[Search] Failed to sync {platform}: {e}")
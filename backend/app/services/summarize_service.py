@@ -0,0 +1,217 @@
+"""
+长文档分段摘要服务（map-reduce）
+超出 token 预算的论文 / 文档不再只截取开头，而是：
+
+- 按章节切分（优先使用 MinerU 输出的 Markdown 标题），过长章节再按段落切块，参考文献等章节跳过
+- map：在并发上限内逐块提炼要点，结果经 LLM 响应缓存按内容命中（feature="summary"）
+- 要点总量仍超出预算时，分组合并要点（最多 MAX_MERGE_ROUNDS 轮）
+- reduce：要点笔记交给调用方原有的提示词（论文结构化摘要 PaperSummary / 知识库 HTML 报告）完成最终一次调用
+
+整体耗时约为一轮并发 map 加一次 reduce，而不是逐块串行
+"""
+
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+try:
+    from langchain_core.messages import HumanMessage
+except ImportError:
+    from langchain.schema import HumanMessage
+
+from app.config import settings
+from app.prompts.summary_prompt import NOTES_MERGE_PROMPT, SECTION_SUMMARY_PROMPT
+from app.services.token_budget import (
+    count_tokens,
+    pack_document,
+    section_priority,
+    split_sections,
+    truncate_to_tokens,
+)
+
+SUMMARY_FEATURE = "summary"
+CONDENSED_HEADER = "[以下为原文各章节要点，原文较长，已分章节提炼]"
+MAX_MERGE_ROUNDS = 3
+
+# (章节标题, 文本)
+Chunk = Tuple[str, str]
+
+
+def _split_long_paragraph(paragraph: str, chunk_tokens: int, model: str = None) -> List[str]:
+    """按字符比例切开超长段落（没有空行分隔的大段文本）"""
+    tokens = count_tokens(paragraph, model)
+    step = max(1, len(paragraph) * chunk_tokens // max(tokens, 1))
+    return [paragraph[i:i + step] for i in range(0, len(paragraph), step)]
+
+
+def _split_body(body: str, chunk_tokens: int, model: str = None) -> List[str]:
+    """把单个章节按段落切成不超过 chunk_tokens 的块"""
+    if count_tokens(body, model) <= chunk_tokens:
+        return [body]
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for paragraph in body.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        cost = count_tokens(paragraph, model)
+        parts = [paragraph] if cost <= chunk_tokens else _split_long_paragraph(paragraph, chunk_tokens, model)
+        for part in parts:
+            part_cost = cost if len(parts) == 1 else count_tokens(part, model)
+            if current and current_tokens + part_cost > chunk_tokens:
+                pieces.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_cost
+    if current:
+        pieces.append("\n\n".join(current))
+    return pieces
+
+
+def chunk_document(text: str, chunk_tokens: int = None, model: str = None) -> List[Chunk]:
+    """
+    按章节切块：过长章节按段落拆分，相邻的短章节合并，参考文献 / 致谢跳过
+
+    Returns:
+        [(章节标题, 块文本)]，按原文顺序
+    """
+    chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+    chunks: List[Chunk] = []
+    last_tokens = 0
+    for title, body in split_sections(text):
+        if title and section_priority(title) <= 0:
+            continue
+        pieces = _split_body(body, chunk_tokens, model)
+        for index, piece in enumerate(pieces):
+            cost = count_tokens(piece, model)
+            if len(pieces) == 1 and chunks and last_tokens + cost <= chunk_tokens:
+                prev_title, prev_text = chunks[-1]
+                merged_title = " / ".join(t for t in (prev_title, title) if t)
+                chunks[-1] = (merged_title, f"{prev_text}\n\n{piece}")
+                last_tokens += cost
+                continue
+            label = title if len(pieces) == 1 else f"{title or '正文'}（{index + 1}/{len(pieces)}）"
+            chunks.append((label, piece))
+            last_tokens = cost
+    return chunks
+
+
+def render_notes(notes: List[Chunk]) -> str:
+    """把要点笔记渲染为带章节标题的 Markdown，便于 pack_document 再次按章节打包"""
+    parts = [CONDENSED_HEADER]
+    for title, note in notes:
+        parts.append(f"## {title}\n{note}" if title else note)
+    return "\n\n".join(parts)
+
+
+class DocumentSummarizer:
+    """长文档 map-reduce 摘要器（每次 condense 使用独立的并发上限）"""
+
+    def __init__(
+        self,
+        llm_service,
+        model: str = None,
+        concurrency: int = None,
+        chunk_tokens: int = None,
+        note_tokens: int = None,
+    ):
+        self.llm_service = llm_service
+        self.model = model or llm_service.small_model
+        self.concurrency = max(1, concurrency or settings.SUMMARY_CONCURRENCY)
+        self.chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+        self.note_tokens = note_tokens or settings.SUMMARY_NOTE_TOKENS
+
+    @property
+    def _max_words(self) -> int:
+        # 中文约 1 token/字，给模型留出余量
+        return max(100, self.note_tokens * 4 // 5)
+
+    async def _summarize(self, semaphore: asyncio.Semaphore, prompt: str, fallback: str) -> str:
+        async with semaphore:
+            try:
+                note = await self.llm_service.ainvoke(
+                    [HumanMessage(content=prompt)],
+                    SUMMARY_FEATURE,
+                    self.model,
+                    temperature=0.2,
+                    max_tokens=self.note_tokens,
+                    timeout=settings.LLM_REQUEST_TIMEOUT,
+                )
+                return note.strip() or fallback
+            except Exception as e:
+                # 单块失败时退化为截断原文，不影响整体分析
+                print(f"[Summarize] Chunk summary failed, using truncated text: {e}")
+                return fallback
+
+    async def _map(self, semaphore: asyncio.Semaphore, chunks: List[Chunk]) -> List[Chunk]:
+        async def summarize_chunk(title: str, text: str) -> str:
+            # 本身不长的块直接保留原文
+            if count_tokens(text, self.model) <= self.note_tokens:
+                return text
+            prompt = SECTION_SUMMARY_PROMPT.format(section=title or "开头", max_words=self._max_words, content=text)
+            return await self._summarize(semaphore, prompt, truncate_to_tokens(text, self.note_tokens, self.model))
+
+        notes = await asyncio.gather(*(summarize_chunk(title, text) for title, text in chunks))
+        return list(zip((title for title, _ in chunks), notes))
+
+    async def _merge(self, semaphore: asyncio.Semaphore, notes: List[Chunk]) -> List[Chunk]:
+        """把相邻要点按 chunk_tokens 分组合并，返回更短的要点列表"""
+        groups: List[List[Chunk]] = []
+        group_tokens = 0
+        for title, note in notes:
+            cost = count_tokens(note, self.model)
+            if groups and group_tokens + cost <= self.chunk_tokens:
+                groups[-1].append((title, note))
+                group_tokens += cost
+            else:
+                groups.append([(title, note)])
+                group_tokens = cost
+
+        async def merge_group(group: List[Chunk]) -> Chunk:
+            if len(group) == 1:
+                return group[0]
+            titles = [title for title, _ in group if title]
+            title = f"{titles[0]} ~ {titles[-1]}" if len(titles) > 1 else (titles[0] if titles else "")
+            content = render_notes(group).split("\n\n", 1)[1]
+            prompt = NOTES_MERGE_PROMPT.format(max_words=self._max_words, content=content)
+            fallback = truncate_to_tokens(content, self.note_tokens, self.model)
+            return title, await self._summarize(semaphore, prompt, fallback)
+
+        return list(await asyncio.gather(*(merge_group(group) for group in groups)))
+
+    async def condense(self, text: str, budget: int) -> str:
+        """
+        把文档压缩到 budget 个 token 以内：未超出时原样返回，否则返回分章节要点笔记
+
+        Args:
+            text: 文档全文（Markdown 或纯文本）
+            budget: 最终提示词中可用于文档内容的 token 预算
+        """
+        if not text or count_tokens(text, self.model) <= budget:
+            return text
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        chunks = chunk_document(text, self.chunk_tokens, self.model)
+        notes = await self._map(semaphore, chunks)
+
+        rounds = 0
+        while count_tokens(render_notes(notes), self.model) > budget and rounds < MAX_MERGE_ROUNDS:
+            merged = await self._merge(semaphore, notes)
+            rounds += 1
+            if len(merged) == len(notes):
+                break
+            notes = merged
+
+        condensed = render_notes(notes)
+        print(
+            f"[Summarize] {len(chunks)} chunks -> {len(notes)} notes "
+            f"({rounds} merge rounds) in {time.perf_counter() - start:.1f}s"
+        )
+        # 合并后仍超出时按章节优先级兜底打包
+        return pack_document(condensed, budget, self.model)
+
+
+async def condense_document(llm_service, text: str, budget: int, model: str = None) -> str:
+    """便捷函数：用 llm_service 把文档压缩到 token 预算内（见 DocumentSummarizer.condense）"""
+    return await DocumentSummarizer(llm_service, model=model).condense(text, budget)
@@ -278,6 +278,32 @@ class SSEEventGenerator:
         
         return self._format_event("complete", 100, "分析完成", data)
     
+    async def send_translation(self, section: Dict[str, Any]) -> Optional[str]:
+        """
+        发送一段译文（translating 事件）
+        不改变任务状态：翻译在后台进行，分析完成（complete）之后仍会继续发送
+        """
+        if self._closed or self.task.is_cancelled():
+            return None
+        
+        total = section.get("total") or 0
+        progress = int(section.get("done", 0) * 100 / total) if total else 100
+        message = f"正在翻译 {section.get('done', 0)}/{total} 段"
+        return self._format_event("translating", progress, message, {"translatedSection": section})
+    
+    async def send_translation_complete(self, total: int, failed: int, error: Optional[str] = None) -> Optional[str]:
+        """发送翻译结束事件（translated），不改变任务状态"""
+        if self._closed or self.task.is_cancelled():
+            return None
+        
+        if error:
+            message = f"翻译失败: {error}"
+        elif failed:
+            message = f"翻译完成，{failed} 段翻译失败已保留原文"
+        else:
+            message = "翻译完成"
+        return self._format_event("translated", 100, message, {"total": total, "failed": failed, "error": error})
+    
     async def send_error(self, error: str) -> str:
         """发送错误事件"""
         self.task.status = TaskStatus.ERROR
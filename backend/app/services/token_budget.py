@@ -0,0 +1,349 @@
+"""
+Token 预算打包
+按真实 token 数（tiktoken）而不是字符数控制上下文长度：中英文字符的 token 密度相差数倍，
+按字符截断要么浪费上下文窗口，要么悄悄截掉关键内容。
+
+- count_tokens / truncate_to_tokens：按模型计数与截断
+- context_budget：从模型上下文窗口中扣除提示词和输出预留，得到可用于正文的预算
+- pack_document：按章节切分论文/文档，优先放入摘要、方法、结论等高价值章节（可按问题相关度加权）
+- pack_items：按顺序放入列表条目（如 Top N 推文），放不下时截断最后一条
+
+编码文件首次使用需要下载：启动时由 preload_encodings 在后台线程中加载（有等待上限），
+请求路径从不同步加载；编码尚未就绪时按字符估算，加载失败后隔 ENCODING_RETRY_INTERVAL 秒再试。
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken 在 requirements.txt 中，缺失时退化为估算
+    tiktoken = None
+
+# 非 OpenAI 模型（Qwen / DeepSeek 等）没有对应的 tiktoken 编码，使用 cl100k_base 近似
+DEFAULT_ENCODING = "cl100k_base"
+# 编码加载失败后再次尝试的间隔（秒）
+ENCODING_RETRY_INTERVAL = 300.0
+
+# 章节标题关键词 -> 优先级（越高越先放入；0 表示不放入）
+SECTION_PRIORITIES: Sequence[Tuple[Tuple[str, ...], float]] = (
+    (("abstract", "摘要"), 1.0),
+    (("conclusion", "结论", "总结"), 0.9),
+    (("method", "approach", "model", "framework", "方法", "模型"), 0.8),
+    (("introduction", "引言", "背景"), 0.7),
+    (("result", "experiment", "evaluation", "实验", "结果", "评估"), 0.6),
+    (("discussion", "analysis", "limitation", "讨论", "分析", "局限"), 0.5),
+    (("related work", "background", "相关工作"), 0.3),
+    (("appendix", "supplementary", "附录"), 0.1),
+    (("reference", "bibliography", "acknowledg", "参考文献", "致谢"), 0.0),
+)
+DEFAULT_SECTION_PRIORITY = 0.4
+# 文档开头（标题、作者、未分节的摘要）的优先级
+PREAMBLE_PRIORITY = 0.95
+
+# 截断后剩余不足该 token 数的章节直接跳过
+MIN_SECTION_TOKENS = 64
+OMISSION_MARK = "\n\n[……]\n\n"
+
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]")
+_MD_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_PLAIN_HEADING_RE = re.compile(
+    r"^(?:\d+(?:\.\d+)*\.?\s+)?(abstract|introduction|related work|background|methods?|methodology|approach|"
+    r"experiments?|results?|evaluation|discussion|conclusions?|limitations|references|appendix|acknowledg(?:e)?ments?|"
+    r"摘要|引言|相关工作|方法|实验|结果|讨论|结论|参考文献|附录|致谢)\s*[:：]?$",
+    re.IGNORECASE,
+)
+
+
+# 已加载的编码 / 加载中的任务 / 最近一次失败时间（只缓存成功的结果）
+_encodings: Dict[str, Any] = {}
+_loading: Dict[str, Future] = {}
+_failed_at: Dict[str, float] = {}
+_encoding_lock = threading.Lock()
+
+
+def _load_encoding(name: str):
+    """在后台线程中加载编码（可能需要下载编码文件）"""
+    if settings.TIKTOKEN_CACHE_DIR:
+        os.environ.setdefault("TIKTOKEN_CACHE_DIR", settings.TIKTOKEN_CACHE_DIR)
+    try:
+        encoding = tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"[TokenBudget] tiktoken encoding '{name}' unavailable, falling back to estimate: {e}")
+        encoding = None
+    with _encoding_lock:
+        _loading.pop(name, None)
+        if encoding is None:
+            _failed_at[name] = time.monotonic()
+        else:
+            _encodings[name] = encoding
+            _failed_at.pop(name, None)
+    return encoding
+
+
+def _start_loading(name: str) -> Optional[Future]:
+    """启动后台加载；已加载、正在加载或仍在失败冷却期内时不重复启动"""
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        if name in _encodings:
+            return None
+        future = _loading.get(name)
+        if future is not None:
+            return future
+        failed = _failed_at.get(name)
+        if failed is not None and time.monotonic() - failed < ENCODING_RETRY_INTERVAL:
+            return None
+        future = _loading[name] = Future()
+
+    def run():
+        future.set_result(_load_encoding(name))
+
+    # 守护线程：下载卡住时不阻塞进程退出
+    threading.Thread(target=run, name=f"tiktoken-{name}", daemon=True).start()
+    return future
+
+
+def _get_encoding(name: str):
+    """返回已加载的编码；尚未加载时在后台开始加载并返回 None（调用方退化为估算）"""
+    encoding = _encodings.get(name)
+    if encoding is None:
+        _start_loading(name)
+    return encoding
+
+
+async def preload_encodings(timeout: float = None):
+    """启动时加载默认模型的编码，最多等待 timeout 秒（默认 TIKTOKEN_LOAD_TIMEOUT），超时后继续在后台加载"""
+    timeout = settings.TIKTOKEN_LOAD_TIMEOUT if timeout is None else timeout
+    names = {DEFAULT_ENCODING, _encoding_name(settings.LLM_MODEL)}
+    futures = [f for f in (_start_loading(name) for name in names) if f is not None]
+    if not futures:
+        return
+    try:
+        await asyncio.wait_for(asyncio.gather(*(asyncio.wrap_future(f) for f in futures)), timeout)
+    except asyncio.TimeoutError:
+        print(f"[TokenBudget] tiktoken encodings not ready after {timeout}s, estimating until loaded")
+
+
+@lru_cache(maxsize=64)
+def _encoding_name(model: str) -> str:
+    if tiktoken is not None and model:
+        try:
+            return tiktoken.encoding_name_for_model(model)
+        except (KeyError, AttributeError):
+            pass
+    return DEFAULT_ENCODING
+
+
+def get_encoding(model: str = None):
+    return _get_encoding(_encoding_name(model or settings.LLM_MODEL))
+
+
+def _estimate_tokens(text: str) -> int:
+    """无编码可用时的估算：CJK 字符约 1 token/字，其它约 4 字符/token"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return _estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = None, suffix: str = "...") -> str:
+    """截断到 max_tokens 以内（含 suffix），未超出时原样返回"""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        if _estimate_tokens(text) <= max_tokens:
+            return text
+        # 二分查找满足估算预算的最长前缀
+        lo, hi = 0, len(text)
+        budget = max_tokens - _estimate_tokens(suffix)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if _estimate_tokens(text[:mid]) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo].rstrip() + suffix
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - len(encoding.encode(suffix)))
+    # 解码可能在多字节字符中间截断，去掉末尾的替换字符
+    return encoding.decode(tokens[:keep]).rstrip("�").rstrip() + suffix
+
+
+def context_budget(
+    *fixed_texts: str,
+    model: str = None,
+    reserve_output: int = None,
+    cap: int = None,
+) -> int:
+    """
+    计算可用于正文的 token 预算
+
+    Args:
+        fixed_texts: 必须完整发送的文本（系统提示词、指令、用户问题等）
+        reserve_output: 为模型输出预留的 token（默认 MAX_TOKENS）
+        cap: 正文预算上限（默认 LLM_DOC_TOKEN_BUDGET），避免每次都塞满窗口
+    """
+    reserve_output = settings.MAX_TOKENS if reserve_output is None else reserve_output
+    cap = settings.LLM_DOC_TOKEN_BUDGET if cap is None else cap
+    fixed = sum(count_tokens(t, model) for t in fixed_texts if t)
+    # 每条消息的格式开销按 8 token 预留
+    available = settings.LLM_CONTEXT_WINDOW - reserve_output - fixed - 8 * max(1, len(fixed_texts))
+    return max(0, min(cap, available))
+
+
+# ==================== 文档打包 ====================
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    按 Markdown 标题（MinerU 输出）或常见论文章节标题切分，返回 [(标题, 正文)]
+    第一个元素是标题前的内容（标题、作者、未分节的摘要），标题为空字符串
+    """
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for line in text.splitlines():
+        stripped = line.strip()
+        heading = None
+        match = _MD_HEADING_RE.match(stripped)
+        if match:
+            # 文档开头的一级标题是论文标题，归入开头部分
+            if len(sections) == 1 and len(match.group(1)) == 1 and not "\n".join(sections[0][1]).strip():
+                sections[0][1].append(line)
+                continue
+            heading = match.group(2)
+        elif len(stripped) <= 60 and _PLAIN_HEADING_RE.match(stripped):
+            heading = stripped
+        if heading is not None:
+            sections.append((heading, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(title, "\n".join(lines).strip("\n")) for title, lines in sections if "\n".join(lines).strip()]
+
+
+def section_priority(title: str) -> float:
+    if not title:
+        return PREAMBLE_PRIORITY
+    lowered = title.lower()
+    for keywords, priority in SECTION_PRIORITIES:
+        if any(k in lowered for k in keywords):
+            return priority
+    return DEFAULT_SECTION_PRIORITY
+
+
+def _query_relevance(body: str, query_tokens: set) -> float:
+    """章节与问题的词项重合度（0~1）"""
+    if not query_tokens:
+        return 0.0
+    from app.services.search_index import tokenize
+    tokens = set(tokenize(body))
+    return len(tokens & query_tokens) / len(query_tokens)
+
+
+def pack_document(
+    text: str,
+    budget: int,
+    model: str = None,
+    query: str = None,
+) -> str:
+    """
+    在 token 预算内挑选价值最高的章节，按原文顺序拼接，被跳过的位置以 [……] 标记
+
+    Args:
+        text: 文档全文（Markdown 或纯文本）
+        budget: token 预算
+        query: 用户问题（可选），与问题相关的章节优先
+    """
+    if not text or budget <= 0:
+        return ""
+    if count_tokens(text, model) <= budget:
+        return text
+
+    sections = split_sections(text)
+    query_tokens = set()
+    if query:
+        from app.services.search_index import tokenize
+        query_tokens = set(tokenize(query))
+    priorities = [section_priority(title) for title, _ in sections]
+    relevance = [_query_relevance(body, query_tokens) for _, body in sections]
+    ranked = sorted(range(len(sections)), key=lambda i: (-(priorities[i] + relevance[i]), i))
+
+    mark_cost = count_tokens(OMISSION_MARK, model)
+    chosen = {}
+    remaining = budget
+    for i in ranked:
+        body = sections[i][1]
+        if priorities[i] <= 0 and not relevance[i]:
+            continue
+        if remaining - mark_cost < MIN_SECTION_TOKENS:
+            break
+        cost = count_tokens(body, model)
+        if cost + mark_cost <= remaining:
+            chosen[i] = body
+            remaining -= cost + mark_cost
+        else:
+            chosen[i] = truncate_to_tokens(body, remaining - mark_cost, model)
+            remaining = 0
+
+    parts = []
+    previous = -1
+    for i in sorted(chosen):
+        if parts and i != previous + 1:
+            parts.append(OMISSION_MARK.strip())
+        parts.append(chosen[i])
+        previous = i
+    if previous != len(sections) - 1 and parts:
+        parts.append(OMISSION_MARK.strip())
+    return "\n\n".join(parts)
+
+
+def pack_items(
+    items: Sequence,
+    render: Callable[[object, Optional[int]], str],
+    budget: int,
+    model: str = None,
+    separator: str = "\n\n",
+    min_item_tokens: int = MIN_SECTION_TOKENS,
+) -> List[str]:
+    """
+    按顺序（调用方已按价值排序）渲染并放入条目，直到预算用完
+
+    Args:
+        render: render(item, max_text_tokens) -> 文本；max_text_tokens 为 None 时不截断，
+                否则应把条目的正文截断到该 token 数以内
+    Returns:
+        放入的渲染文本列表
+    """
+    packed: List[str] = []
+    remaining = budget
+    sep_cost = count_tokens(separator, model)
+    for item in items:
+        text = render(item, None)
+        cost = count_tokens(text, model) + (sep_cost if packed else 0)
+        if cost <= remaining:
+            packed.append(text)
+            remaining -= cost
+            continue
+        # 放不下：截断该条目的正文，使整条刚好放入
+        overhead = count_tokens(render(item, 0), model) + (sep_cost if packed else 0)
+        text_budget = remaining - overhead
+        if text_budget >= min_item_tokens:
+            packed.append(render(item, text_budget))
+        break
+    return packed
@@ -0,0 +1,321 @@
+"""
+段落级翻译记忆
+同一段落（PDF 中的版权声明 / 固定章节、重复上传的文档）只翻译一次（推文译文另按推文 ID 保存，见 tweet_translation_service）：
+
+- 键：源语言 + 目标语言 + 模型 + 规范化段落文本（Unicode NFKC、合并空白）的 SHA-256
+- 翻译前按段落（空行分隔）查询，只把未命中的连续段落交给 LLM，命中的译文按原位置回填
+- LLM 返回的段落数与原文一致时按段落写入记忆，不一致时只使用本次结果、不写入（避免错位）
+- 存储：本地 SQLite，按总字节数 LRU 淘汰，超过 TRANSLATION_MEMORY_TTL 的条目过期
+- 请求头 X-LLM-Cache: off 同样跳过翻译记忆
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.llm_cache import llm_cache_bypass
+from app.utils.metrics import get_metrics_registry
+
+SEGMENT_SEPARATOR = "\n\n"
+
+_registry = get_metrics_registry()
+TM_LOOKUPS = _registry.counter(
+    "athena_translation_memory_lookups_total",
+    "Translation memory segment lookups by feature and result (hit / miss)",
+    ("feature", "result"),
+)
+TM_BYTES = _registry.gauge(
+    "athena_translation_memory_bytes",
+    "Total size of stored translation memory segments",
+)
+TM_EVICTIONS = _registry.counter(
+    "athena_translation_memory_evictions_total",
+    "Translation memory segments removed by reason (expired / lru)",
+    ("reason",),
+)
+
+_WHITESPACE_RE = re.compile(r"[ \t 　]+")
+
+
+def normalize_segment(text: str) -> str:
+    """规范化段落：NFKC、去掉首尾空白、行内连续空白合并为一个空格"""
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n")
+    return "\n".join(_WHITESPACE_RE.sub(" ", line).strip() for line in text.strip().split("\n"))
+
+
+def segment_key(text: str, source_lang: str, target_lang: str, model: str) -> str:
+    payload = f"{source_lang}\x1f{target_lang}\x1f{model}\x1f{normalize_segment(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """SQLite 持久化的段落翻译记忆（TTL + 按总字节数 LRU 淘汰）"""
+
+    def __init__(self, db_path: Path, max_bytes: int, ttl: int = 0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " key TEXT PRIMARY KEY, source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, model TEXT NOT NULL,"
+            " source TEXT NOT NULL, target TEXT NOT NULL, size INTEGER NOT NULL, hits INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_segments_access ON segments(last_access);"
+        )
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM segments").fetchone()[0]
+        TM_BYTES.set(self._total_bytes)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """批量查询，返回命中的 {key: 译文}，命中条目刷新访问时间"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, target, created_at FROM segments WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, target, created_at in rows:
+                    if self.ttl and created_at + self.ttl <= now:
+                        continue
+                    found[key] = target
+            if found:
+                self._conn.executemany(
+                    "UPDATE segments SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def set_many(self, entries: List[Tuple[str, str, str, str, str, str]]):
+        """批量写入 [(key, source_lang, target_lang, model, 原文, 译文)]"""
+        entries = [e for e in entries if e[5]]
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            for key, source_lang, target_lang, model, source, target in entries:
+                size = len(source.encode("utf-8")) + len(target.encode("utf-8"))
+                if size > self.max_bytes:
+                    continue
+                old = self._conn.execute("SELECT size FROM segments WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO segments"
+                    " (key, source_lang, target_lang, model, source, target, size, hits, created_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                    (key, source_lang, target_lang, model, source, target, size, now, now),
+                )
+                self._total_bytes += size - (old[0] if old else 0)
+            self._evict(now)
+            self._conn.commit()
+            TM_BYTES.set(self._total_bytes)
+
+    def _evict(self, now: float):
+        """先删除过期条目，仍超出容量时按 last_access 从旧到新删除"""
+        if self.ttl:
+            cutoff = now - self.ttl
+            expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM segments WHERE created_at <= ?", (cutoff,)
+            ).fetchone()
+            if expired[0]:
+                self._conn.execute("DELETE FROM segments WHERE created_at <= ?", (cutoff,))
+                self._total_bytes -= expired[1]
+                TM_EVICTIONS.inc(expired[0], reason="expired")
+        if self._total_bytes <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM segments ORDER BY last_access").fetchall():
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM segments WHERE key = ?", (key,))
+            self._total_bytes -= size
+            removed += 1
+        TM_EVICTIONS.inc(removed, reason="lru")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM segments")
+            self._conn.commit()
+            self._total_bytes = 0
+            TM_BYTES.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, hits = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM segments").fetchone()
+        features: Dict[str, Dict[str, Any]] = {}
+        for (feature, result), value in TM_LOOKUPS.items():
+            features.setdefault(feature, {"hit": 0, "miss": 0})[result] = int(value)
+        for counts in features.values():
+            lookups = counts["hit"] + counts["miss"]
+            counts["hit_rate"] = round(counts["hit"] / lookups, 3) if lookups else 0.0
+        return {
+            "entries": entries,
+            "lifetime_hits": hits,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "features": features,
+        }
+
+
+_memory: Optional[TranslationMemory] = None
+
+
+def get_translation_memory() -> Optional[TranslationMemory]:
+    """获取全局翻译记忆，TRANSLATION_MEMORY_ENABLED=false 时返回 None"""
+    global _memory
+    if not settings.TRANSLATION_MEMORY_ENABLED:
+        return None
+    if _memory is None:
+        db_path = Path(settings.TRANSLATION_MEMORY_PATH or Path(settings.UPLOAD_DIR) / "translation_memory.sqlite")
+        _memory = TranslationMemory(db_path, settings.TRANSLATION_MEMORY_MAX_BYTES, settings.TRANSLATION_MEMORY_TTL)
+    return _memory
+
+
+def get_translation_memory_stats() -> Dict[str, Any]:
+    memory = get_translation_memory()
+    if memory is None:
+        return {"enabled": False}
+    return {"enabled": True, **memory.stats()}
+
+
+# ==================== 按段落查询 / 回填 ====================
+
+class SegmentPlan:
+    """
+    一段文本的翻译计划：按段落查询翻译记忆，未命中的连续段落合并为一个待翻译的块
+
+    runs 按原文顺序排列，每项为 ("hit", 译文) / ("blank", 原样保留的空段) / ("miss", 待翻译原文)
+    """
+
+    def __init__(self, text: str, source_lang: str, target_lang: str, model: str, feature: str):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.model = model
+        self.feature = feature
+        self.memory = None if llm_cache_bypass.get() else get_translation_memory()
+        paragraphs = text.split(SEGMENT_SEPARATOR)
+
+        found: Dict[str, str] = {}
+        keys = [segment_key(p, source_lang, target_lang, model) if p.strip() else None for p in paragraphs]
+        if self.memory is not None:
+            try:
+                found = self.memory.get_many(k for k in keys if k)
+            except sqlite3.Error as e:
+                print(f"[TranslationMemory] Lookup failed: {e}")
+
+        self.runs: List[Tuple[str, Any]] = []
+        hits = misses = 0
+        for paragraph, key in zip(paragraphs, keys):
+            if key is None:
+                self.runs.append(("blank", paragraph))
+            elif key in found:
+                hits += 1
+                self.runs.append(("hit", found[key]))
+            else:
+                misses += 1
+                if self.runs and self.runs[-1][0] == "miss":
+                    self.runs[-1][1].append(paragraph)
+                else:
+                    self.runs.append(("miss", [paragraph]))
+        if self.memory is not None:
+            if hits:
+                TM_LOOKUPS.inc(hits, feature=feature, result="hit")
+            if misses:
+                TM_LOOKUPS.inc(misses, feature=feature, result="miss")
+        self.hits, self.misses = hits, misses
+
+    def remember(self, sources: List[str], translated: str):
+        """LLM 译文的（非空）段落数与原文一致时逐段写入翻译记忆"""
+        if self.memory is None or not translated:
+            return
+        sources = [s for s in sources if s.strip()]
+        targets = [t.strip() for t in translated.strip().split(SEGMENT_SEPARATOR) if t.strip()]
+        if len(targets) != len(sources):
+            return
+        entries = [
+            (segment_key(s, self.source_lang, self.target_lang, self.model),
+             self.source_lang, self.target_lang, self.model, normalize_segment(s), t)
+            for s, t in zip(sources, targets)
+        ]
+        try:
+            self.memory.set_many(entries)
+        except sqlite3.Error as e:
+            print(f"[TranslationMemory] Store failed: {e}")
+
+
+async def translate_with_memory(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    model: str,
+    translate_block: Callable[[str], Awaitable[str]],
+    feature: str = "translate",
+) -> str:
+    """
+    先查翻译记忆，只把未命中的连续段落交给 translate_block 翻译，按原位置拼接
+
+    Args:
+        translate_block: 异步函数，接收若干段落（空行分隔）的原文，返回译文
+        feature: 命中率统计分组（translate / pdf / tweet 等）
+    """
+    plan = SegmentPlan(text, source_lang, target_lang, model, feature)
+    if not plan.hits:
+        # 全部未命中：整块翻译（与未启用翻译记忆时的请求一致，可命中 LLM 响应缓存）
+        translated = await translate_block(text)
+        plan.remember(text.split(SEGMENT_SEPARATOR), translated)
+        return translated
+
+    parts: List[str] = []
+    for kind, value in plan.runs:
+        if kind == "miss":
+            translated = (await translate_block(SEGMENT_SEPARATOR.join(value))).strip()
+            plan.remember(value, translated)
+            parts.append(translated)
+        else:
+            parts.append(value)
+    return SEGMENT_SEPARATOR.join(parts)
+
+
+async def stream_with_memory(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    model: str,
+    stream_block: Callable[[str], AsyncIterator[str]],
+    feature: str = "translate",
+) -> AsyncIterator[str]:
+    """流式版本（同 translate_with_memory）：命中的段落整段产出，未命中的连续段落流式翻译"""
+    plan = SegmentPlan(text, source_lang, target_lang, model, feature)
+    if not plan.hits:
+        parts: List[str] = []
+        async for delta in stream_block(text):
+            parts.append(delta)
+            yield delta
+        plan.remember(text.split(SEGMENT_SEPARATOR), "".join(parts))
+        return
+    for index, (kind, value) in enumerate(plan.runs):
+        if index:
+            yield SEGMENT_SEPARATOR
+        if kind != "miss":
+            if value:
+                yield value
+            continue
+        parts: List[str] = []
+        async for delta in stream_block(SEGMENT_SEPARATOR.join(value)):
+            parts.append(delta)
+            yield delta
+        plan.remember(value, "".join(parts))
@@ -0,0 +1,393 @@
+"""
+Markdown 感知的翻译分段
+MinerU 输出的论文 Markdown 中有大量不需要（也不应该）交给 LLM 的内容，按结构解析后只翻译正文：
+
+- 原样保留：代码块、$$ / \\[ / \\begin 公式块、Markdown / HTML 表格、独占一行的图片、
+  参考文献章节（References / Bibliography / 参考文献 标题之后到下一个标题）及 [1] 开头的文献条目、
+  没有文字的段落、已经是目标语言的段落
+- 需要翻译的段落中，行内公式、行内代码、链接地址、图片、URL、HTML 标签、[1, 2] 式引用替换为 ⟦n⟧ 占位符，
+  翻译后还原（LLM 丢失的占位符追加在段末，不会丢内容）
+- 相邻的待翻译段落按 token 数（与字符数）打包成批，每批一次 LLM 调用
+
+SegmentedDocument.pieces 按原文顺序排列，以换行拼接即为原文；render 用译文替换各批后拼接
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.services.token_budget import count_tokens
+from app.utils.metrics import get_metrics_registry
+
+_registry = get_metrics_registry()
+SEGMENTS = _registry.counter(
+    "athena_translation_segments_total",
+    "Markdown blocks seen by the translation segmenter, by block kind and action (translate / skip)",
+    ("kind", "action"),
+)
+
+# ==================== 语言检测 ====================
+
+_HAN_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+_KANA_RE = re.compile(r"[぀-ヿ]")
+_HANGUL_RE = re.compile(r"[가-힯]")
+_LATIN_RE = re.compile(r"[A-Za-zÀ-ɏ]")
+# 使用拉丁字母书写的语言：源语言和目标语言都属于此类时无法按文字区分，一律翻译
+LATIN_LANGS = {"en", "fr", "de", "es", "it", "pt", "nl"}
+
+
+def detect_language(text: str) -> Optional[str]:
+    """
+    按文字粗略判断段落语言：zh / ja / ko / latin，没有文字时返回 None
+    汉字一个字约等于一个词，拉丁字母按 5 个字母一个词折算后比较
+    """
+    han = len(_HAN_RE.findall(text))
+    kana = len(_KANA_RE.findall(text))
+    hangul = len(_HANGUL_RE.findall(text))
+    latin = len(_LATIN_RE.findall(text)) / 5
+    if not (han or kana or hangul or latin):
+        return None
+    if latin > han + kana + hangul:
+        return "latin"
+    if hangul >= han + kana:
+        return "ko"
+    if kana and kana * 10 >= han:
+        return "ja"
+    return "zh"
+
+
+def needs_translation(text: str, source_lang: str, target_lang: str) -> bool:
+    """段落是否需要翻译：没有文字、或已经是目标语言时返回 False"""
+    language = detect_language(_PLACEHOLDER_RE.sub(" ", text))
+    if language is None:
+        return False
+    if target_lang in LATIN_LANGS:
+        return not (language == "latin" and source_lang not in LATIN_LANGS)
+    return language != target_lang
+
+
+# ==================== 行内占位符 ====================
+
+_PLACEHOLDER_RE = re.compile(r"⟦\s*(\d+)\s*⟧")
+_INLINE_PROTECT_RE = re.compile(
+    r"\$\$.+?\$\$"                      # 行内 $$...$$
+    r"|(?<![\\$\w])\$(?![\s\d$])[^$\n]*?(?:[^\s\d$\\]|[_^]\d)\$(?!\d)"  # 行内公式 $...$（首尾不能是空格或数字，避免误吞 $5 / $10 金额）
+    r"|\\\(.+?\\\)"                      # 行内公式 \(...\)
+    r"|`[^`\n]+`"                        # 行内代码
+    r"|!\[[^\]]*\]\([^)\s]*(?:\s+\"[^\"]*\")?\)"  # 图片（整体保留）
+    r"|(?<=\])\([^)\s]+(?:\s+\"[^\"]*\")?\)"  # 链接地址（链接文字照常翻译）
+    r"|<[^>\n]+>"                        # HTML 标签
+    r"|https?://[^\s)\]>]+"              # 裸 URL
+    r"|\[\d+(?:\s*[,–-]\s*\d+)*\]"       # [1] / [2, 3] / [4-6] 式引用
+)
+
+
+def protect_inline(text: str) -> Tuple[str, List[str]]:
+    """把不应翻译的行内片段替换为 ⟦n⟧，返回 (替换后的文本, 原片段列表)"""
+    originals: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        originals.append(match.group(0))
+        return f"⟦{len(originals) - 1}⟧"
+
+    return _INLINE_PROTECT_RE.sub(replace, text), originals
+
+
+def restore_placeholders(text: str, originals: List[str]) -> Tuple[str, List[int]]:
+    """
+    还原 ⟦n⟧ 占位符，返回 (还原后的文本, 译文中丢失的占位符序号)
+    丢失的原片段以空格分隔追加在末尾，保证公式、链接等不会因 LLM 漏掉而消失
+    """
+    if not originals:
+        return text, []
+    seen = set()
+
+    def replace(match: re.Match) -> str:
+        index = int(match.group(1))
+        if index >= len(originals):
+            return match.group(0)
+        seen.add(index)
+        return originals[index]
+
+    restored = _PLACEHOLDER_RE.sub(replace, text)
+    missing = [i for i in range(len(originals)) if i not in seen]
+    if missing:
+        restored = restored.rstrip() + " " + " ".join(originals[i] for i in missing)
+    return restored, missing
+
+
+class PlaceholderStream:
+    """流式还原占位符：未闭合的 ⟦ 之后的内容暂存，待后续增量补全后再输出"""
+
+    def __init__(self, originals: List[str]):
+        self.originals = originals
+        self.seen = set()
+        self._buffer = ""
+
+    def _restore(self, text: str) -> str:
+        def replace(match: re.Match) -> str:
+            index = int(match.group(1))
+            if index >= len(self.originals):
+                return match.group(0)
+            self.seen.add(index)
+            return self.originals[index]
+
+        return _PLACEHOLDER_RE.sub(replace, text)
+
+    def feed(self, delta: str) -> str:
+        if not self.originals:
+            return delta
+        self._buffer += delta
+        hold = self._buffer.rfind("⟦")
+        if hold == -1 or "⟧" in self._buffer[hold:] or len(self._buffer) - hold > 8:
+            hold = len(self._buffer)
+        ready, self._buffer = self._buffer[:hold], self._buffer[hold:]
+        return self._restore(ready)
+
+    def flush(self) -> str:
+        """输出剩余内容，并追加译文中丢失的原片段"""
+        tail = self._restore(self._buffer)
+        self._buffer = ""
+        missing = [self.originals[i] for i in range(len(self.originals)) if i not in self.seen]
+        if missing:
+            tail += " " + " ".join(missing)
+        return tail
+
+
+# ==================== 块级解析 ====================
+
+_FENCE_RE = re.compile(r"^\s*(`{3,}|~{3,})")
+_HEADING_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_IMAGE_LINE_RE = re.compile(r"^\s*(?:!\[[^\]]*\]\([^)]*\)\s*)+$")
+_TABLE_ROW_RE = re.compile(r"^\s*\|")
+_HTML_TABLE_RE = re.compile(r"^\s*<table\b", re.IGNORECASE)
+_HTML_BLOCK_RE = re.compile(r"^\s*<(?:div|figure|img|iframe|svg|html|p|br|hr)\b", re.IGNORECASE)
+_LATEX_ENV_RE = re.compile(r"^\s*\\begin\{([^}]+)\}")
+_REFERENCE_TITLE_RE = re.compile(
+    r"^(?:\d+\.?\s*)?(?:references?|bibliography|works cited|参考文献|參考文獻)\s*:?$", re.IGNORECASE
+)
+# 参考文献章节之外，只有「编号 + 作者（姓, 名缩写 / 名缩写 姓 / 姓 et al.）」开头且含年份的段落才视为参考文献条目，
+# 避免把 "1. Moreover, ..." 这样的普通编号列表当成参考文献
+_REFERENCE_ENTRY_RE = re.compile(
+    r"^\s*(?:\[\d+\]|\d+\.)\s+"
+    r"(?:[A-Z][\w'’-]+,\s+[A-Z]\.|(?:[A-Z]\.\s?)+[A-Z][\w'’-]+|[A-Z][\w'’-]+\s+et\s+al\.)"
+)
+_REFERENCE_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}[a-z]?\b")
+
+
+class Block:
+    """原文中连续的若干行：kind 为 paragraph / heading / code / math / table / image / html / reference / blank"""
+
+    def __init__(self, kind: str, lines: List[str], translatable: bool = False):
+        self.kind = kind
+        self.lines = lines
+        self.translatable = translatable
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def _consume_until(lines: List[str], start: int, is_end) -> int:
+    """从 start 的下一行起找到满足 is_end 的行，返回块结束位置（不含）；找不到时到文末"""
+    for i in range(start + 1, len(lines)):
+        if is_end(lines[i]):
+            return i + 1
+    return len(lines)
+
+
+def _special_block_end(lines: List[str], i: int) -> Optional[Tuple[str, int]]:
+    """第 i 行开始的是不翻译的特殊块时返回 (kind, 结束位置)，否则 None"""
+    line = lines[i]
+    stripped = line.strip()
+    fence = _FENCE_RE.match(line)
+    if fence:
+        marker = fence.group(1)
+        return "code", _consume_until(lines, i, lambda l: l.strip().startswith(marker[0] * 3))
+    if stripped.startswith("$$"):
+        if len(stripped) >= 4 and stripped.endswith("$$"):
+            return "math", i + 1
+        return "math", _consume_until(lines, i, lambda l: l.strip().endswith("$$"))
+    if stripped.startswith("\\["):
+        if stripped.endswith("\\]"):
+            return "math", i + 1
+        return "math", _consume_until(lines, i, lambda l: l.strip().endswith("\\]"))
+    env = _LATEX_ENV_RE.match(line)
+    if env:
+        end_marker = f"\\end{{{env.group(1)}}}"
+        if end_marker in line:
+            return "math", i + 1
+        return "math", _consume_until(lines, i, lambda l: end_marker in l)
+    if _HTML_TABLE_RE.match(line):
+        if "</table>" in line.lower():
+            return "table", i + 1
+        return "table", _consume_until(lines, i, lambda l: "</table>" in l.lower())
+    if _TABLE_ROW_RE.match(line):
+        end = i + 1
+        while end < len(lines) and _TABLE_ROW_RE.match(lines[end]):
+            end += 1
+        return "table", end
+    if _IMAGE_LINE_RE.match(line):
+        return "image", i + 1
+    if _HTML_BLOCK_RE.match(line):
+        end = i + 1
+        while end < len(lines) and lines[end].strip():
+            end += 1
+        return "html", end
+    return None
+
+
+def parse_blocks(text: str, source_lang: str, target_lang: str) -> List[Block]:
+    """把 Markdown 解析为块序列（每行恰好属于一个块），并标记哪些段落需要翻译"""
+    lines = text.split("\n")
+    blocks: List[Block] = []
+    in_references = False
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            end = i + 1
+            while end < len(lines) and not lines[end].strip():
+                end += 1
+            blocks.append(Block("blank", lines[i:end]))
+            i = end
+            continue
+
+        special = _special_block_end(lines, i)
+        if special:
+            kind, end = special
+            blocks.append(Block(kind, lines[i:end]))
+            i = end
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            # 参考文献章节一直持续到下一个标题
+            in_references = bool(_REFERENCE_TITLE_RE.match(heading.group(2)))
+            blocks.append(Block(
+                "heading", [line],
+                not in_references and needs_translation(heading.group(2), source_lang, target_lang),
+            ))
+            i += 1
+            continue
+
+        # 普通段落：连续的非空行，遇到特殊块或标题时结束
+        end = i + 1
+        while (end < len(lines) and lines[end].strip() and not _HEADING_RE.match(lines[end])
+               and _special_block_end(lines, end) is None):
+            end += 1
+        paragraph = lines[i:end]
+        if len(paragraph) == 1 and _REFERENCE_TITLE_RE.match(line.strip().strip("*_ ")):
+            # MinerU 有时把 References 输出为普通的单行段落
+            in_references = True
+        if in_references or (_REFERENCE_ENTRY_RE.match(line) and _REFERENCE_YEAR_RE.search("\n".join(paragraph))):
+            blocks.append(Block("reference", paragraph))
+        else:
+            protected, _ = protect_inline("\n".join(paragraph))
+            blocks.append(Block("paragraph", paragraph, needs_translation(protected, source_lang, target_lang)))
+        i = end
+    return blocks
+
+
+class Piece:
+    """文档片段：keep 原样保留，translate 为一批待翻译的原文（若干相邻段落）"""
+
+    def __init__(self, kind: str, text: str):
+        self.kind = kind
+        self.text = text
+
+
+class SegmentedDocument:
+    """按原文顺序排列的片段，以换行拼接即为原文"""
+
+    def __init__(self, pieces: List[Piece], stats: Dict[str, int]):
+        self.pieces = pieces
+        self.stats = stats
+
+    def batches(self) -> List[str]:
+        """各批待翻译原文，顺序与 render 的 translations 参数一致"""
+        return [p.text for p in self.pieces if p.kind == "translate"]
+
+    def units(self) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        流式翻译的单元：[(前置的原样保留内容, 待翻译原文)]，每个单元以一批待翻译原文结尾，
+        末尾剩余的保留内容单独成为一个无需翻译的单元（待翻译原文为 None）；没有前置内容时为 None
+        各单元的输出以换行拼接即为完整译文
+        """
+        units: List[Tuple[Optional[str], Optional[str]]] = []
+        keep: List[str] = []
+        for piece in self.pieces:
+            if piece.kind == "keep":
+                keep.append(piece.text)
+            else:
+                units.append(("\n".join(keep) if keep else None, piece.text))
+                keep = []
+        if keep or not units:
+            units.append(("\n".join(keep), None))
+        return units
+
+    def render(self, translations: List[str]) -> str:
+        """用各批译文替换待翻译片段后拼接"""
+        translated = iter(translations)
+        return "\n".join(p.text if p.kind == "keep" else next(translated).strip() for p in self.pieces)
+
+
+def segment_markdown(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    max_batch_tokens: int,
+    max_batch_chars: int = 0,
+) -> SegmentedDocument:
+    """
+    解析 Markdown，把相邻的待翻译段落打包成批（每批不超过 max_batch_tokens 个 token、max_batch_chars 个字符，
+    单个超长段落单独成批），批之间的空行和不翻译的块作为原样保留的片段
+    """
+    pieces: List[Piece] = []
+    keep: List[str] = []
+    batch: List[str] = []
+    pending_blank: List[str] = []
+    batch_tokens = batch_chars = 0
+    stats = {"blocks": 0, "translated_blocks": 0, "tokens": 0, "translated_tokens": 0}
+
+    def flush_keep():
+        if keep:
+            pieces.append(Piece("keep", "\n".join(keep)))
+            keep.clear()
+
+    def flush_batch():
+        nonlocal batch_tokens, batch_chars
+        if batch:
+            pieces.append(Piece("translate", "\n".join(batch)))
+            batch.clear()
+        keep.extend(pending_blank)
+        pending_blank.clear()
+        batch_tokens = batch_chars = 0
+
+    for block in parse_blocks(text, source_lang, target_lang):
+        if block.kind == "blank":
+            (pending_blank if batch else keep).extend(block.lines)
+            continue
+        block_text = block.text
+        tokens = count_tokens(block_text)
+        stats["blocks"] += 1
+        stats["tokens"] += tokens
+        SEGMENTS.inc(kind=block.kind, action="translate" if block.translatable else "skip")
+        if not block.translatable:
+            flush_batch()
+            keep.extend(block.lines)
+            continue
+        stats["translated_blocks"] += 1
+        stats["translated_tokens"] += tokens
+        if batch and (batch_tokens + tokens > max_batch_tokens
+                      or (max_batch_chars and batch_chars + len(block_text) > max_batch_chars)):
+            flush_batch()
+        else:
+            batch.extend(pending_blank)
+            pending_blank.clear()
+        flush_keep()
+        batch.extend(block.lines)
+        batch_tokens += tokens
+        batch_chars += len(block_text)
+    flush_batch()
+    flush_keep()
+    return SegmentedDocument(pieces, stats)
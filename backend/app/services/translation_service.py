@@ -0,0 +1,394 @@
+"""
+文本翻译服务
+按 Markdown 结构分段（translation_segmenter），只翻译正文段落，相邻段落按 token 数打包成批后并发翻译：
+
+- 公式、代码、表格、图片、参考文献和已是目标语言的段落原样保留，不交给 LLM；
+  行内公式 / 链接等替换为占位符，翻译后还原
+- 在并发上限内同时翻译多个块，按原文顺序拼接，整体耗时约等于最慢的一块
+- 单块失败时只重试该块（限流 / 5xx 已由准入控制器统一退避重试，这里覆盖超时、空结果等其它失败）
+- 任一块重试耗尽时取消其余未完成的块，整个请求失败
+- 每块先查段落翻译记忆（translation_memory），只把未命中的段落交给 LLM
+- 分段翻译（translate_units）：各单元并发翻译、按原文顺序逐段产出，可选择保留失败单元的原文继续
+- 流式翻译（stream_translation）：各块同样并发翻译，但按原文顺序产出事件——
+  当前块逐 token 推送，后续块已完成的部分缓冲到轮到它时立即补发；支持从指定块开始（断线续传）
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.llm_router import is_retryable
+from app.services.translation_memory import stream_with_memory, translate_with_memory
+from app.services.translation_segmenter import (
+    PlaceholderStream,
+    SegmentedDocument,
+    protect_inline,
+    restore_placeholders,
+    segment_markdown,
+)
+
+LANG_NAMES = {
+    "en": "英语",
+    "zh": "中文",
+    "ja": "日语",
+    "ko": "韩语",
+    "fr": "法语",
+    "de": "德语",
+    "es": "西班牙语",
+}
+
+TRANSLATE_FEATURE = "translate"
+TRANSLATE_MAX_TOKENS = 4000
+
+
+class TranslationError(Exception):
+    """翻译失败（重试耗尽），index 为失败的块序号（流式翻译中用于续传）"""
+
+    def __init__(self, message: str, index: int = None):
+        super().__init__(message)
+        self.index = index
+
+
+def build_translate_prompt(text: str, source_lang: str, target_lang: str) -> str:
+    source_name = LANG_NAMES.get(source_lang, source_lang)
+    target_name = LANG_NAMES.get(target_lang, target_lang)
+    return f"""请将以下{source_name}文本翻译成{target_name}。
+
+要求：
+1. 保持原文的段落结构和格式
+2. 保留 Markdown 标记（如 #、**、`等）
+3. 数学公式和代码不翻译
+4. 形如 ⟦1⟧ 的占位符原样保留在译文中对应的位置
+5. 专业术语保持准确性
+6. 只返回翻译结果，不要有任何解释
+
+原文：
+{text}
+
+翻译："""
+
+
+def segment_document(text: str, source_lang: str, target_lang: str, max_chunk_size: int) -> SegmentedDocument:
+    """按 Markdown 结构分段，待翻译段落打包成不超过 TRANSLATE_BATCH_TOKENS 个 token、max_chunk_size 个字符的块"""
+    return segment_markdown(text, source_lang, target_lang, settings.TRANSLATE_BATCH_TOKENS, max_chunk_size)
+
+
+def resolve_concurrency(concurrency: Optional[int]) -> int:
+    """请求指定的并发数（限制在 1 ~ TRANSLATE_MAX_CONCURRENCY），未指定时使用 TRANSLATE_CONCURRENCY"""
+    value = concurrency or settings.TRANSLATE_CONCURRENCY
+    return max(1, min(value, settings.TRANSLATE_MAX_CONCURRENCY))
+
+
+async def _translate_block(
+    llm_service,
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    retries: int = None,
+    system_prompt: str = None,
+    feature: str = TRANSLATE_FEATURE,
+) -> str:
+    """
+    调用 LLM 翻译一段文本（行内公式、链接等以占位符保护）
+    只有译文为空或可重试的上游错误（429 / 5xx / 超时，见 is_retryable）才按指数退避重试；
+    参数、鉴权等错误准入控制和路由器都不会重试，这里也直接抛出
+    """
+    retries = settings.TRANSLATE_CHUNK_RETRIES if retries is None else retries
+    protected, originals = protect_inline(text)
+    prompt = build_translate_prompt(protected, source_lang, target_lang)
+    last_error: Optional[Exception] = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(min(2 ** (attempt - 1), 8))
+        try:
+            translated = await llm_service.achat(
+                message=prompt,
+                system_prompt=system_prompt,
+                temperature=0.3,
+                max_tokens=TRANSLATE_MAX_TOKENS,
+                feature=feature,
+            )
+            translated = translated.strip()
+            if translated or not text.strip():
+                restored, missing = restore_placeholders(translated, originals)
+                if missing:
+                    print(f"[Translate] {len(missing)}/{len(originals)} placeholders lost, appended to the end")
+                return restored
+            last_error = TranslationError("empty translation")
+        except Exception as e:
+            if not is_retryable(e):
+                print(f"[Translate] Chunk failed (not retryable): {e}")
+                raise TranslationError(str(e)) from e
+            last_error = e
+        print(f"[Translate] Chunk failed (attempt {attempt + 1}/{retries + 1}): {last_error}")
+    raise TranslationError(str(last_error))
+
+
+async def translate_chunk(
+    llm_service,
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    retries: int = None,
+    feature: str = TRANSLATE_FEATURE,
+    system_prompt: str = None,
+) -> str:
+    """
+    翻译单个文本块：先查段落翻译记忆，只翻译未命中的段落
+
+    Args:
+        feature: LLM 调用的功能名（决定准入优先级、缓存 TTL）及翻译记忆的命中率统计分组
+        system_prompt: 可选的系统提示词（如 PDF 学术翻译风格）
+    """
+    async def translate_block(block: str) -> str:
+        return await _translate_block(llm_service, block, source_lang, target_lang, retries, system_prompt, feature)
+
+    return await translate_with_memory(text, source_lang, target_lang, llm_service.model, translate_block, feature)
+
+
+async def translate_chunks(
+    llm_service,
+    chunks: List[str],
+    source_lang: str,
+    target_lang: str,
+    concurrency: int = None,
+    feature: str = TRANSLATE_FEATURE,
+    system_prompt: str = None,
+) -> List[str]:
+    """
+    在并发上限内翻译所有块，按输入顺序返回译文
+
+    Raises:
+        TranslationError: 任一块重试耗尽（其余未完成的块会被取消）
+    """
+    semaphore = asyncio.Semaphore(resolve_concurrency(concurrency))
+
+    async def run(index: int, chunk: str) -> str:
+        async with semaphore:
+            start = time.perf_counter()
+            translated = await translate_chunk(
+                llm_service, chunk, source_lang, target_lang, feature=feature, system_prompt=system_prompt
+            )
+            print(f"[Translate] Chunk {index + 1}/{len(chunks)} done in {time.perf_counter() - start:.1f}s")
+            return translated
+
+    tasks = [asyncio.ensure_future(run(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def translate_text(
+    llm_service,
+    text: str,
+    source_lang: str = "en",
+    target_lang: str = "zh",
+    max_chunk_size: int = 3000,
+    concurrency: int = None,
+    feature: str = TRANSLATE_FEATURE,
+    system_prompt: str = None,
+) -> str:
+    """
+    翻译任意长度的 Markdown 文本：按结构分段后只翻译正文，各块并发翻译，译文回填到原位置
+
+    Args:
+        feature: LLM 调用的功能名及翻译记忆的命中率统计分组（见 translate_chunk）
+        system_prompt: 可选的系统提示词
+    """
+    document = segment_document(text, source_lang, target_lang, max_chunk_size)
+    chunks = document.batches()
+    stats = document.stats
+    if not chunks:
+        print(f"[Translate] Nothing to translate ({stats['blocks']} blocks skipped)")
+        return text
+    start = time.perf_counter()
+    translated = await translate_chunks(
+        llm_service, chunks, source_lang, target_lang, concurrency, feature, system_prompt
+    )
+    print(f"[Translate] {len(chunks)} chunks translated in {time.perf_counter() - start:.1f}s "
+          f"({stats['translated_blocks']}/{stats['blocks']} blocks, "
+          f"{stats['translated_tokens']}/{stats['tokens']} tokens sent)")
+    return document.render(translated)
+
+
+async def translate_units(
+    llm_service,
+    units: List[Tuple[Optional[str], Optional[str]]],
+    source_lang: str,
+    target_lang: str,
+    concurrency: int = None,
+    feature: str = TRANSLATE_FEATURE,
+    system_prompt: str = None,
+    keep_failed: bool = False,
+) -> AsyncIterator[Tuple[int, str, Optional[Exception]]]:
+    """
+    并发翻译各单元（SegmentedDocument.units()），按原文顺序产出 (序号, 单元译文, 错误)
+    各单元译文以换行拼接即为完整译文
+
+    Args:
+        keep_failed: 单元重试耗尽时保留原文并在第三项返回异常，其余单元继续翻译；
+                     为 False 时抛出 TranslationError 并取消其余单元
+
+    Raises:
+        TranslationError: keep_failed 为 False 且某单元重试耗尽（index 为该单元序号）
+    """
+    semaphore = asyncio.Semaphore(resolve_concurrency(concurrency))
+
+    async def run(source: str) -> str:
+        async with semaphore:
+            return await translate_chunk(
+                llm_service, source, source_lang, target_lang, feature=feature, system_prompt=system_prompt
+            )
+
+    tasks = [asyncio.ensure_future(run(source)) if source is not None else None for _, source in units]
+    try:
+        for index, ((keep, source), task) in enumerate(zip(units, tasks)):
+            error: Optional[Exception] = None
+            translated = source
+            if task is not None:
+                try:
+                    translated = (await task).strip()
+                except Exception as e:
+                    if not keep_failed:
+                        raise TranslationError(str(e), index) from e
+                    error = e
+            yield index, "\n".join(part for part in (keep, translated) if part is not None), error
+    finally:
+        for task in tasks:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in tasks if t is not None), return_exceptions=True)
+
+
+# ==================== 流式翻译 ====================
+
+async def stream_chunk(
+    llm_service,
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    retries: int = None,
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    流式翻译单个块，产出 ("delta", 文本)；重试前若已产出内容，先产出 ("reset", "") 通知丢弃已收到的部分。
+    与 translate_chunk 相同，只有译文为空或可重试的上游错误才重试，鉴权 / 参数错误直接抛出 TranslationError
+    与 translate_chunk 使用相同的翻译记忆、提示词和缓存键：命中记忆的段落整段产出，已翻译过的块直接回放缓存
+    """
+    retries = settings.TRANSLATE_CHUNK_RETRIES if retries is None else retries
+
+    async def stream_block(block: str) -> AsyncIterator[str]:
+        protected, originals = protect_inline(block)
+        restorer = PlaceholderStream(originals)
+        async for delta in llm_service.astream(
+            message=build_translate_prompt(protected, source_lang, target_lang),
+            temperature=0.3,
+            feature=TRANSLATE_FEATURE,
+            max_tokens=TRANSLATE_MAX_TOKENS,
+        ):
+            restored = restorer.feed(delta)
+            if restored:
+                yield restored
+        tail = restorer.flush()
+        if tail:
+            yield tail
+
+    last_error: Optional[Exception] = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(min(2 ** (attempt - 1), 8))
+        produced = False
+        try:
+            async for delta in stream_with_memory(
+                text, source_lang, target_lang, llm_service.model, stream_block, TRANSLATE_FEATURE
+            ):
+                produced = True
+                yield "delta", delta
+            if produced or not text.strip():
+                return
+            last_error = TranslationError("empty translation")
+        except Exception as e:
+            if not is_retryable(e):
+                print(f"[Translate] Stream chunk failed (not retryable): {e}")
+                raise TranslationError(str(e)) from e
+            last_error = e
+        if produced:
+            yield "reset", ""
+        print(f"[Translate] Stream chunk failed (attempt {attempt + 1}/{retries + 1}): {last_error}")
+    raise TranslationError(str(last_error))
+
+
+async def stream_translation(
+    llm_service,
+    chunks: List[Tuple[Optional[str], Optional[str]]],
+    source_lang: str,
+    target_lang: str,
+    start_chunk: int = 0,
+    concurrency: int = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    并发翻译 chunks[start_chunk:]（SegmentedDocument.units()），按原文顺序产出事件：
+
+    - {"type": "start", "total", "start_chunk"}
+    - {"type": "delta", "index", "delta"}：当前块的增量译文（原样保留的公式、表格等也作为增量推送）
+    - {"type": "reset", "index"}：该块重试，丢弃已收到的增量
+    - {"type": "chunk", "index", "text", "done", "total"}：该块完成（done 为已完成的块数，含续传前的块）
+    - {"type": "done", "total"}
+
+    各块 text 以换行拼接即为完整译文
+
+    Raises:
+        TranslationError: 某块重试耗尽（index 为该块序号，其余块会被取消）
+    """
+    total = len(chunks)
+    start_chunk = max(0, min(start_chunk, total))
+    semaphore = asyncio.Semaphore(resolve_concurrency(concurrency))
+    # 每块一个队列：翻译任务写入增量，None 表示完成，异常对象表示失败
+    queues: List[asyncio.Queue] = [asyncio.Queue() for _ in range(total)]
+
+    async def produce(index: int):
+        queue = queues[index]
+        keep, source = chunks[index]
+        prefix = keep if source is None else (keep + "\n" if keep is not None else "")
+        try:
+            if prefix:
+                queue.put_nowait(("delta", prefix))
+            if source is not None:
+                async with semaphore:
+                    async for kind, delta in stream_chunk(llm_service, source, source_lang, target_lang):
+                        queue.put_nowait((kind, delta))
+                        if kind == "reset" and prefix:
+                            queue.put_nowait(("delta", prefix))
+            queue.put_nowait(None)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    yield {"type": "start", "total": total, "start_chunk": start_chunk}
+    tasks = [asyncio.ensure_future(produce(i)) for i in range(start_chunk, total)]
+    try:
+        for index in range(start_chunk, total):
+            parts: List[str] = []
+            while True:
+                item = await queues[index].get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise TranslationError(str(item), index) from item
+                kind, delta = item
+                if kind == "reset":
+                    parts = []
+                    yield {"type": "reset", "index": index}
+                    continue
+                parts.append(delta)
+                yield {"type": "delta", "index": index, "delta": delta}
+            yield {"type": "chunk", "index": index, "text": "".join(parts), "done": index + 1, "total": total}
+        yield {"type": "done", "total": total}
+    finally:
+        # 正常结束时任务均已完成；客户端断开或失败时取消仍在翻译的块
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,416 @@
+"""
+推文批量翻译
+数据中心的推文 / 视频标题翻译：多条合并为一次 LLM 调用，结果按「推文 ID + 原文哈希 + 目标语言」持久化，
+同一条推文（内容未变）对所有用户只翻译一次：
+
+- 先查已保存的译文，再过滤掉无需翻译的文本（去掉链接后为空、已是目标语言），剩余的按条数 / token 数打包
+- 每批用 <<<T1>>> 形式的编号分隔符标记每条推文，解析时按编号取回（原文中出现的 <<< 先转义，不会串条）
+- 批量结果中缺失或为空的条目单独重译一次
+- 各批在 TWEET_TRANSLATE_CONCURRENCY 并发上限内翻译
+- 请求头 X-LLM-Cache: off 同样跳过已保存的译文
+- 可选：爬虫完成后在后台预翻译高互动推文和视频标题，译文写回数据文件，前端直接展示
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.analytics_engine import engagement_score
+from app.services.llm_cache import llm_cache_bypass
+from app.services.token_budget import count_tokens
+from app.services.translation_memory import normalize_segment
+from app.services.translation_segmenter import needs_translation
+from app.utils.background import spawn_background
+from app.utils.metrics import get_metrics_registry
+
+try:
+    from langchain_core.messages import HumanMessage
+except ImportError:
+    from langchain.schema import HumanMessage
+
+TWEET_TRANSLATE_MODEL = "Qwen/Qwen2.5-7B-Instruct"  # 7B 小模型，速度更快
+TWEET_FEATURE = "translate"
+# 爬虫后的后台预翻译：低优先级，排在用户点击翻译之后
+PRETRANSLATE_FEATURE = "pretranslate"
+
+LANGUAGE_NAMES = {"zh": "中文", "en": "英文", "ja": "日文", "ko": "韩文"}
+
+_registry = get_metrics_registry()
+TWEET_LOOKUPS = _registry.counter(
+    "athena_tweet_translations_total",
+    "Tweet translation requests by result (cached / skipped / translated / failed)",
+    ("result",),
+)
+
+_URL_RE = re.compile(r"https?://\S+")
+_WHITESPACE_RE = re.compile(r"\s+")
+_MARKER_RE = re.compile(r"<<<T(\d+)>>>")
+
+
+def clean_tweet_text(text: str) -> str:
+    """预处理推文：移除链接、合并空白"""
+    return _WHITESPACE_RE.sub(" ", _URL_RE.sub("", text or "")).strip()
+
+
+def tweet_key(tweet_id: str, text: str, target_lang: str) -> str:
+    """推文 ID + 规范化原文哈希 + 目标语言；推文被编辑后哈希变化，会重新翻译"""
+    digest = hashlib.sha256(normalize_segment(text).encode("utf-8")).hexdigest()[:32]
+    return f"{tweet_id or ''}:{digest}:{target_lang}"
+
+
+class TweetTranslationStore:
+    """SQLite 持久化的推文译文"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tweet_translations ("
+            " key TEXT PRIMARY KEY, tweet_id TEXT NOT NULL, target_lang TEXT NOT NULL,"
+            " translated TEXT NOT NULL, model TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, translated FROM tweet_translations WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def set_many(self, entries: List[Tuple[str, str, str, str, str]]):
+        """批量写入 [(key, tweet_id, target_lang, 译文, 模型)]"""
+        entries = [e for e in entries if e[3]]
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tweet_translations"
+                " (key, tweet_id, target_lang, translated, model, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(*entry, now) for entry in entries],
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM tweet_translations").fetchone()[0]
+        results = {result: int(value) for (result,), value in TWEET_LOOKUPS.items()}
+        return {"entries": entries, "results": results}
+
+
+_store: Optional[TweetTranslationStore] = None
+
+
+def get_tweet_translation_store() -> TweetTranslationStore:
+    global _store
+    if _store is None:
+        db_path = Path(settings.TWEET_TRANSLATION_PATH or Path(settings.UPLOAD_DIR) / "tweet_translations.sqlite")
+        _store = TweetTranslationStore(db_path)
+    return _store
+
+
+def get_tweet_translation_stats() -> Dict[str, Any]:
+    return get_tweet_translation_store().stats()
+
+
+# ==================== 打包翻译 ====================
+
+def build_batch_prompt(texts: List[str], target_lang: str) -> str:
+    target_name = LANGUAGE_NAMES.get(target_lang, target_lang)
+    body = "\n".join(f"<<<T{i + 1}>>>\n{text.replace('<<<', '‹‹‹')}" for i, text in enumerate(texts))
+    return f"""将以下 {len(texts)} 条社交媒体内容分别翻译成{target_name}。
+每条以 <<<T编号>>> 单独一行开头，输出时保留同样的编号行，编号行下面写对应的译文，不要合并或遗漏条目，不要添加任何解释。
+
+{body}"""
+
+
+def parse_batch_response(response: str, count: int) -> Dict[int, str]:
+    """按 <<<T编号>>> 拆分批量译文，返回 {序号（从 0 开始）: 译文}，缺失或为空的编号不在结果中"""
+    parts = _MARKER_RE.split(response or "")
+    results: Dict[int, str] = {}
+    # split 结果：[前缀, 编号, 内容, 编号, 内容, ...]
+    for i in range(1, len(parts) - 1, 2):
+        index = int(parts[i]) - 1
+        text = parts[i + 1].strip().replace("‹‹‹", "<<<")
+        if 0 <= index < count and text and index not in results:
+            results[index] = text
+    return results
+
+
+def pack_batches(texts: List[str]) -> List[List[int]]:
+    """按条数（TWEET_TRANSLATE_BATCH_SIZE）和 token 数（TRANSLATE_BATCH_TOKENS）打包，返回每批的序号"""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text) + 8
+        if current and (len(current) >= settings.TWEET_TRANSLATE_BATCH_SIZE
+                        or current_tokens + tokens > settings.TRANSLATE_BATCH_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _translate_one(llm_service, text: str, target_lang: str, feature: str = TWEET_FEATURE) -> str:
+    target_name = LANGUAGE_NAMES.get(target_lang, target_lang)
+    response = await llm_service.ainvoke(
+        [HumanMessage(content=f"将以下内容翻译成{target_name}，只返回翻译结果：\n{text}")],
+        feature,
+        temperature=0.1,  # 低温度，翻译更准确
+        max_tokens=1024,
+        timeout=30.0,
+    )
+    return response.strip()
+
+
+async def _translate_batch(
+    llm_service, texts: List[str], target_lang: str, feature: str = TWEET_FEATURE
+) -> List[Optional[str]]:
+    """翻译一批文本，返回与输入对应的译文（失败为 None）；批量结果缺失的条目单独重译"""
+    if len(texts) == 1:
+        try:
+            return [await _translate_one(llm_service, texts[0], target_lang, feature)]
+        except Exception as e:
+            print(f"[TweetTranslate] Translate failed: {e}")
+            return [None]
+
+    results: Dict[int, str] = {}
+    try:
+        response = await llm_service.ainvoke(
+            [HumanMessage(content=build_batch_prompt(texts, target_lang))],
+            feature,
+            temperature=0.1,
+            max_tokens=min(4000, 256 + sum(count_tokens(t) for t in texts) * 3),
+            timeout=60.0,
+        )
+        results = parse_batch_response(response, len(texts))
+    except Exception as e:
+        print(f"[TweetTranslate] Batch of {len(texts)} failed: {e}")
+
+    missing = [i for i in range(len(texts)) if i not in results]
+    if missing:
+        print(f"[TweetTranslate] {len(missing)}/{len(texts)} items missing from batch, translating individually")
+        singles = await asyncio.gather(
+            *(_translate_one(llm_service, texts[i], target_lang, feature) for i in missing), return_exceptions=True
+        )
+        for i, translated in zip(missing, singles):
+            if isinstance(translated, str) and translated:
+                results[i] = translated
+    return [results.get(i) for i in range(len(texts))]
+
+
+async def translate_tweets(
+    llm_service,
+    items: List[Dict[str, str]],
+    target_lang: str = "zh",
+    concurrency: int = None,
+    feature: str = TWEET_FEATURE,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    批量翻译推文
+
+    Args:
+        items: [{"id": 推文 ID, "text": 原文}]
+        concurrency: 同时进行的批数，默认 TWEET_TRANSLATE_CONCURRENCY
+        feature: LLM 功能名称（准入优先级和缓存 TTL），后台预翻译使用 PRETRANSLATE_FEATURE
+
+    Returns:
+        {推文 ID: {"translated": 译文（失败时为 None）, "source": cached / skipped / translated / failed}}
+
+    Raises:
+        ValueError: items 中存在重复 ID（结果按 ID 返回，重复会互相覆盖）
+    """
+    if len({item["id"] for item in items}) != len(items):
+        raise ValueError("translate_tweets: items 中的 id 不能重复")
+    bypass = llm_cache_bypass.get()
+    store = get_tweet_translation_store()
+    keys = {item["id"]: tweet_key(item["id"], item["text"], target_lang) for item in items}
+    cached: Dict[str, str] = {}
+    if not bypass:
+        try:
+            cached = store.get_many(list(keys.values()))
+        except sqlite3.Error as e:
+            print(f"[TweetTranslate] Lookup failed: {e}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, List[str]] = {}  # 清洗后的原文 -> 推文 ID（相同内容只翻译一次）
+    for item in items:
+        tweet_id, text = item["id"], item["text"]
+        if keys[tweet_id] in cached:
+            results[tweet_id] = {"translated": cached[keys[tweet_id]], "source": "cached"}
+            continue
+        cleaned = clean_tweet_text(text)
+        if not cleaned or not needs_translation(cleaned, "en", target_lang):
+            results[tweet_id] = {"translated": text, "source": "skipped"}
+            continue
+        pending.setdefault(cleaned, []).append(tweet_id)
+
+    texts = list(pending)
+    if texts:
+        semaphore = asyncio.Semaphore(concurrency or settings.TWEET_TRANSLATE_CONCURRENCY)
+
+        async def run(batch: List[int]) -> List[Optional[str]]:
+            async with semaphore:
+                return await _translate_batch(llm_service, [texts[i] for i in batch], target_lang, feature)
+
+        start = time.perf_counter()
+        batches = pack_batches(texts)
+        outputs = await asyncio.gather(*(run(batch) for batch in batches))
+        entries = []
+        for batch, translations in zip(batches, outputs):
+            for index, translated in zip(batch, translations):
+                for tweet_id in pending[texts[index]]:
+                    results[tweet_id] = {"translated": translated, "source": "translated" if translated else "failed"}
+                    if translated:
+                        entries.append((keys[tweet_id], tweet_id, target_lang, translated, llm_service.model))
+        print(f"[TweetTranslate] {len(texts)} texts in {len(batches)} batches, {time.perf_counter() - start:.1f}s")
+        if not bypass:
+            try:
+                store.set_many(entries)
+            except sqlite3.Error as e:
+                print(f"[TweetTranslate] Store failed: {e}")
+
+    for result in results.values():
+        TWEET_LOOKUPS.inc(result=result["source"])
+    return results
+
+
+# ==================== 爬虫后预翻译 ====================
+
+# 平台 -> (原文字段, 译文字段)
+PRETRANSLATE_FIELDS = {
+    "twitter": ("text", "translated_text"),
+    "youtube": ("title", "translated_title"),
+}
+
+
+def select_pretranslate_items(platform: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """挑选值得预翻译的条目：推文需达到互动分或粉丝数阈值，按互动分从高到低；视频标题按原顺序"""
+    if platform != "twitter":
+        return list(items)
+    selected = []
+    for item in items:
+        followers = (item.get("author") or {}).get("followers") or 0
+        if (engagement_score(item) >= settings.PRETRANSLATE_MIN_ENGAGEMENT
+                or followers >= settings.PRETRANSLATE_MIN_FOLLOWERS):
+            selected.append(item)
+    selected.sort(key=engagement_score, reverse=True)
+    return selected
+
+
+def _write_back_translations(filepath: Path, platform: str, translations: Dict[str, Tuple[str, str]]):
+    """重新读取数据文件，按 ID 合并译文后原子替换；期间原文已变化的条目不写入"""
+    source_field, target_field = PRETRANSLATE_FIELDS[platform]
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    updated = 0
+    for item in data.get("items", []):
+        entry = translations.get(item.get("id"))
+        if entry and item.get(source_field) == entry[0] and item.get(target_field) != entry[1]:
+            item[target_field] = entry[1]
+            updated += 1
+    if not updated:
+        return 0
+    tmp_path = filepath.with_suffix(filepath.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, filepath)
+    return updated
+
+
+async def pretranslate_items(platform: str, items: List[Dict[str, Any]], filepath: Optional[Path] = None) -> Dict[str, int]:
+    """
+    爬虫完成后预翻译
+
+    已保存过译文的条目直接回填（不占预算），其余按 select_pretranslate_items 挑选，
+    每次最多 PRETRANSLATE_MAX_ITEMS 条送去翻译。译文写入条目的 translated_text / translated_title 字段
+    （原地修改，爬虫接口返回的内存缓存同样可见），并合并回数据文件。
+    """
+    from app.services.llm_service import get_llm_service
+
+    source_field, target_field = PRETRANSLATE_FIELDS[platform]
+    target_lang = settings.PRETRANSLATE_TARGET_LANG
+    # 同一 ID 只取第一条（translate_tweets 要求 ID 唯一）
+    candidates = list({
+        item["id"]: item for item in reversed(items) if item.get("id") and item.get(source_field)
+    }.values())[::-1]
+    store = get_tweet_translation_store()
+    keys = {item["id"]: tweet_key(item["id"], item[source_field], target_lang) for item in candidates}
+    try:
+        cached = store.get_many(list(keys.values()))
+    except sqlite3.Error as e:
+        print(f"[Pretranslate] Lookup failed: {e}")
+        cached = {}
+
+    translations: Dict[str, Tuple[str, str]] = {}
+    pending = []
+    for item in candidates:
+        translated = cached.get(keys[item["id"]])
+        if translated:
+            translations[item["id"]] = (item[source_field], translated)
+        elif needs_translation(clean_tweet_text(item[source_field]), "en", target_lang):
+            pending.append(item)
+
+    selected = select_pretranslate_items(platform, pending)[:settings.PRETRANSLATE_MAX_ITEMS]
+    counts = {"cached": len(translations), "translated": 0, "failed": 0, "deferred": len(pending) - len(selected)}
+    if selected:
+        llm_service = get_llm_service(api_key=settings.SILICONFLOW_API_KEY, model=TWEET_TRANSLATE_MODEL)
+        results = await translate_tweets(
+            llm_service, [{"id": item["id"], "text": item[source_field]} for item in selected], target_lang,
+            feature=PRETRANSLATE_FEATURE,
+        )
+        for item in selected:
+            result = results.get(item["id"]) or {}
+            if result.get("source") in ("translated", "cached") and result.get("translated"):
+                translations[item["id"]] = (item[source_field], result["translated"])
+                counts["translated"] += 1
+            else:
+                counts["failed"] += 1
+
+    for item in candidates:
+        entry = translations.get(item["id"])
+        if entry:
+            item[target_field] = entry[1]
+
+    if filepath and translations:
+        try:
+            counts["written"] = await asyncio.to_thread(
+                _write_back_translations, Path(filepath), platform, translations
+            )
+        except (OSError, ValueError) as e:
+            print(f"[Pretranslate] Could not write back to {filepath}: {e}")
+    print(f"[Pretranslate] {platform}: {counts}")
+    return counts
+
+
+def schedule_pretranslation(platform: str, items: List[Dict[str, Any]], filepath: Optional[str] = None):
+    """若启用了爬虫后预翻译，则在后台启动预翻译任务（不阻塞爬虫返回）"""
+    if not settings.PRETRANSLATE_AFTER_CRAWL or not items:
+        return
+    if not settings.SILICONFLOW_API_KEY:
+        print("[Pretranslate] SILICONFLOW_API_KEY not set, skipping")
+        return
+    # 没有运行中的事件循环（例如同步脚本调用）时跳过预翻译
+    spawn_background(pretranslate_items(platform, items, filepath), name=f"pretranslate-{platform}")
@@ -15,6 +15,18 @@ from .resilience import (
     CRAWLER_HEALTH,
     LLM_HEALTH,
 )
+from .metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    get_metrics_registry,
+)
+from .streaming import (
+    DisconnectAwareStream,
+    wait_for_disconnect,
+)
+from .background import spawn_background
 
 __all__ = [
     "retry_async",
@@ -28,5 +40,13 @@ __all__ = [
     "MINERU_HEALTH",
     "CRAWLER_HEALTH",
     "LLM_HEALTH",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "get_metrics_registry",
+    "DisconnectAwareStream",
+    "wait_for_disconnect",
+    "spawn_background",
 ]
 
@@ -0,0 +1,35 @@
+"""
+后台任务工具
+事件循环只对任务保持弱引用：create_task 后不保存引用的任务可能在完成前被回收，
+异常也无人读取。这里统一持有后台任务的引用，任务结束后移除并记录异常。
+"""
+
+import asyncio
+from typing import Coroutine, Optional, Set
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _on_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        print(f"[Background] Task {task.get_name()} failed: {type(error).__name__}: {error}")
+
+
+def spawn_background(coro: Coroutine, name: str = None) -> Optional[asyncio.Task]:
+    """
+    在当前事件循环中启动后台任务并保持引用
+
+    没有运行中的事件循环（例如同步脚本调用）时关闭协程并返回 None
+    """
+    try:
+        task = asyncio.get_running_loop().create_task(coro, name=name)
+    except RuntimeError:
+        coro.close()
+        return None
+    _background_tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
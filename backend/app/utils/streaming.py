@@ -0,0 +1,67 @@
+"""
+流式响应工具
+在转发上游流（LLM token、翻译进度等）时监听客户端断开，
+断开后立即关闭上游异步生成器，而不是等到下一个块写入失败才发现
+"""
+
+import asyncio
+from contextlib import suppress
+from typing import AsyncIterator
+
+from starlette.requests import Request
+
+# 轮询客户端连接状态的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.25
+
+
+async def wait_for_disconnect(request: Request, interval: float = DISCONNECT_POLL_INTERVAL):
+    """客户端断开时返回"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+class DisconnectAwareStream:
+    """
+    包装上游异步迭代器：等待下一块的同时监听客户端断开
+
+    用法：
+        stream = DisconnectAwareStream(request, llm_service.astream(...))
+        async for chunk in stream:
+            ...
+        if stream.disconnected:
+            ...
+    """
+
+    def __init__(self, request: Request, source: AsyncIterator, interval: float = DISCONNECT_POLL_INTERVAL):
+        self.request = request
+        self.source = source
+        self.interval = interval
+        self.disconnected = False
+
+    async def __aiter__(self):
+        watcher = asyncio.ensure_future(wait_for_disconnect(self.request, self.interval))
+        iterator = self.source.__aiter__()
+        next_chunk = None
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+                done, _ = await asyncio.wait({next_chunk, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if next_chunk not in done:
+                    # 客户端已断开：停止读取上游，finally 中取消并关闭上游生成器
+                    self.disconnected = True
+                    return
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            watcher.cancel()
+            if next_chunk is not None and not next_chunk.done():
+                next_chunk.cancel()
+                with suppress(asyncio.CancelledError, StopAsyncIteration):
+                    await next_chunk
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                with suppress(Exception):
+                    await aclose()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+filter_and_analyze 基准测试
+
+生成 10k / 100k / 1M 条合成推文，对比逐条 Python 循环的参考实现与列式 NumPy 实现的耗时，
+并校验两者的 Top N、活跃作者和汇总结果一致。
+
+Usage:
+    cd backend
+    python -m benchmarks.analytics_bench
+    python -m benchmarks.analytics_bench --sizes 10000 100000 --hours 72
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.report_service import STOP_WORDS, filter_and_analyze  # noqa: E402
+
+_WORDS = ("model agent reasoning scaling inference training open source benchmark compute "
+          "release paper research robotics multimodal coding latency token context").split()
+
+
+def generate_posts(n: int, n_authors: int = 2000, span_hours: int = 24 * 14, seed: int = 7,
+                   window_hours: int = 24) -> Dict[str, Any]:
+    """生成合成推文；窗口边界前后 15 分钟内不放帖子，避免两次运行之间 now 变化导致结果不同"""
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    authors = [
+        {"username": f"user{i}", "name": f"User {i}", "avatar": f"https://pbs.twimg.com/{i}.jpg",
+         "followers": rnd.randint(100, 2_000_000), "verified": rnd.random() < 0.3}
+        for i in range(n_authors)
+    ]
+    items = []
+    for i in range(n):
+        age = rnd.randint(0, span_hours * 3600)
+        if abs(age - window_hours * 3600) < 900:
+            age += 1800
+        created = now - timedelta(seconds=age)
+        items.append({
+            "id": str(10**18 + i),
+            "text": " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(8, 30))),
+            "author": dict(authors[rnd.randrange(n_authors)]),
+            "stats": {
+                "likes": rnd.randint(0, 20000),
+                "retweets": rnd.randint(0, 3000),
+                "replies": rnd.randint(0, 500),
+                "views": rnd.randint(0, 3_000_000),
+                "quotes": rnd.randint(0, 300),
+            },
+            "created_at": created.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+        })
+    return {"items": items, "total_count": n, "scraped_at": now.isoformat()}
+
+
+# ==================== 参考实现（逐条循环，用于对比） ====================
+
+def _engagement_score(item: Dict[str, Any]) -> float:
+    stats = item.get("stats", {})
+    return (
+        stats.get("likes", 0)
+        + stats.get("retweets", 0) * 2
+        + stats.get("views", 0) * 0.01
+        + stats.get("quotes", 0) * 3
+    )
+
+
+def reference_filter_and_analyze(posts_data: Dict[str, Any], hours: int = 24,
+                                 authors: Optional[List[str]] = None, top_n: int = 10) -> Dict[str, Any]:
+    items = posts_data.get("items", [])
+    now = datetime.now(timezone.utc)
+    parsed = {}
+    for item in items:
+        try:
+            parsed[id(item)] = datetime.strptime(item.get("created_at", ""), "%a %b %d %H:%M:%S %z %Y")
+        except (ValueError, TypeError):
+            parsed[id(item)] = None
+    if authors:
+        authors_lower = {a.lower().lstrip("@") for a in authors}
+        items = [i for i in items if (i.get("author", {}).get("username") or "").lower() in authors_lower]
+    recent = [i for i in items if parsed[id(i)] and (now - parsed[id(i)]).total_seconds() / 3600 <= hours]
+    use_all = len(recent) < 5
+    analysis = items[:50] if use_all else recent
+    top_posts = sorted(analysis, key=_engagement_score, reverse=True)[:top_n]
+
+    author_map: Dict[str, Dict[str, Any]] = {}
+    for item in analysis:
+        author = item.get("author", {})
+        username = author.get("username")
+        if not username:
+            continue
+        if username not in author_map:
+            author_map[username] = {
+                "username": username, "name": author.get("name") or username,
+                "avatar": author.get("avatar", ""), "followers": author.get("followers", 0),
+                "verified": author.get("verified", False), "post_count": 0,
+            }
+        author_map[username]["post_count"] += 1
+        if author.get("followers", 0) > author_map[username]["followers"]:
+            author_map[username]["followers"] = author.get("followers", 0)
+            author_map[username]["avatar"] = author.get("avatar", "")
+    top_authors = sorted(author_map.values(), key=lambda x: x["post_count"], reverse=True)[:10]
+
+    all_text = " ".join(item.get("text", "") for item in analysis)
+    all_text = re.sub(r"https?://\S+", "", all_text)
+    all_text = re.sub(r"@\w+", "", all_text)
+    words = re.findall(r"[a-zA-Z]{3,}", all_text.lower())
+    top_keywords = Counter(w for w in words if w not in STOP_WORDS).most_common(20)
+
+    return {
+        "analysis_posts_count": len(analysis),
+        "top_posts": top_posts,
+        "top_authors_by_activity": top_authors,
+        "top_keywords": top_keywords,
+        "total_likes": sum(i.get("stats", {}).get("likes", 0) for i in analysis),
+        "total_retweets": sum(i.get("stats", {}).get("retweets", 0) for i in analysis),
+        "total_views": sum(i.get("stats", {}).get("views", 0) for i in analysis),
+        "active_authors": len({i.get("author", {}).get("username") for i in analysis
+                               if i.get("author", {}).get("username")}),
+    }
+
+
+def _check_equal(ref: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    diffs = []
+    for key in ("analysis_posts_count", "total_likes", "total_retweets", "total_views", "active_authors"):
+        if ref[key] != new[key]:
+            diffs.append(f"{key}: {ref[key]} != {new[key]}")
+    if [p["id"] for p in ref["top_posts"]] != [p["id"] for p in new["top_posts"]]:
+        diffs.append("top_posts differ")
+    if ref["top_authors_by_activity"] != new["top_authors_by_activity"]:
+        diffs.append("top_authors_by_activity differ")
+    return diffs
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="filter_and_analyze 基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-reference", action="store_true", help="不运行参考实现（1M 时较慢）")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        print(f"[Bench] Generating {n} posts...", flush=True)
+        data = generate_posts(n, window_hours=args.hours)
+
+        def run_new():
+            return filter_and_analyze(data, hours=args.hours, top_n=args.top_n, collapse_duplicates=False)
+
+        new_s = _timed(run_new, args.repeat)
+        row = {"posts": n, "columnar_s": round(new_s, 4)}
+
+        if not args.skip_reference:
+            ref_s = _timed(lambda: reference_filter_and_analyze(data, hours=args.hours, top_n=args.top_n), args.repeat)
+            diffs = _check_equal(
+                reference_filter_and_analyze(data, hours=args.hours, top_n=args.top_n), run_new()
+            )
+            row.update({
+                "reference_s": round(ref_s, 4),
+                "speedup": round(ref_s / new_s, 2) if new_s else None,
+                "equal": not diffs,
+            })
+            if diffs:
+                print(f"[Bench] MISMATCH at n={n}: {diffs}")
+        results.append(row)
+        print(f"[Bench] {row}", flush=True)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "analytics", "created_at": datetime.now().isoformat(),
+                       "config": {"hours": args.hours, "top_n": args.top_n}, "results": results}, f, indent=2)
+        print(f"[Bench] Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+海外信源爬虫基准测试
+
+启动本地模拟上游（twitterapi.io / YouTube 频道页 + RSS / FireCrawl），
+生成指定数量的临时信源，驱动 crawl_all_overseas（进程内）或 run_crawler.py（子进程），
+统计以下指标并保存结果，便于回归对比：
+- sources/s 吞吐
+- 单信源耗时 p50 / p95
+- 峰值内存（RSS）
+- 写入的数据字节数
+
+Usage:
+    cd backend
+    python -m benchmarks.crawler_bench --sizes 10 100 1000
+    python -m benchmarks.crawler_bench --sizes 100 --latency-ms 200 --error-rate 0.05
+    python -m benchmarks.crawler_bench --sizes 100 --mode script
+    python -m benchmarks.crawler_bench --sizes 100 --baseline latest
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 回归判定阈值：吞吐下降或延迟/内存上升超过该比例视为回归
+REGRESSION_THRESHOLD = 0.10
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _peak_rss_kb() -> int:
+    """当前进程的峰值 RSS（KB），优先读取 /proc 的 VmHWM"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def build_sources(n: int, base_url: str, youtube_ratio: float) -> Dict[str, List[Dict[str, str]]]:
+    """生成 n 个临时信源，YouTube 频道指向模拟上游"""
+    n_youtube = int(round(n * youtube_ratio))
+    n_twitter = n - n_youtube
+    return {
+        "youtube": [
+            {"name": f"Channel {i}", "url": f"{base_url}/youtube/@bench_channel_{i}/videos"}
+            for i in range(n_youtube)
+        ],
+        "twitter": [
+            {"name": f"bench_user_{i}", "url": f"https://x.com/bench_user_{i}"}
+            for i in range(n_twitter)
+        ],
+    }
+
+
+def bench_env(base_url: str, sources_path: Path, data_dir: Path) -> Dict[str, str]:
+    # 入库钩子写入的 SQLite（小时桶、LLM 缓存、译文库、媒体缓存）放到临时目录，
+    # 不碰仓库里的 uploads；放在 data_dir 之外，不计入写入字节数
+    upload_dir = data_dir.parent / "uploads"
+    env = dict(os.environ)
+    env.update({
+        "UPLOAD_DIR": str(upload_dir),
+        "ROLLUP_DB_PATH": str(upload_dir / "rollups.sqlite"),
+        "LLM_CACHE_PATH": str(upload_dir / "llm_cache.sqlite"),
+        "TWEET_TRANSLATION_PATH": str(upload_dir / "tweet_translations.sqlite"),
+        "TRANSLATION_MEMORY_PATH": str(upload_dir / "translation_memory.sqlite"),
+        "MEDIA_CACHE_DIR": str(upload_dir / "media_cache"),
+        "PRETRANSLATE_AFTER_CRAWL": "false",
+        "TWITTER_API_URL": f"{base_url}/twitter/user/last_tweets",
+        "TWITTER_API_KEY": "bench",
+        "FIRECRAWL_API_URL": f"{base_url}/v1/scrape",
+        "YOUTUBE_RSS_URL": f"{base_url}/feeds/videos.xml",
+        "CRAWLER_SOURCES_PATH": str(sources_path),
+        "CRAWL_DATA_DIR": str(data_dir),
+        "MEDIA_PREFETCH_AFTER_CRAWL": "false",
+        "PYTHONIOENCODING": "utf-8",
+    })
+    return env
+
+
+async def _run_inprocess() -> Dict[str, Any]:
+    """在当前进程中运行 crawl_all_overseas，并记录每个信源的耗时"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services import crawler_service
+
+    latencies: List[float] = []
+    failures = 0
+
+    def timed(fn):
+        async def wrapper(source):
+            nonlocal failures
+            start = time.perf_counter()
+            result = await fn(source)
+            latencies.append(time.perf_counter() - start)
+            if result.get("error"):
+                failures += 1
+            return result
+        return wrapper
+
+    crawler_service.crawl_twitter_source = timed(crawler_service.crawl_twitter_source)
+    crawler_service.crawl_youtube_source = timed(crawler_service.crawl_youtube_source)
+
+    start = time.perf_counter()
+    result = await crawler_service.crawl_all_overseas()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": elapsed,
+        "latencies": latencies,
+        "failed_sources": failures,
+        "items": result["twitter"].get("total_posts", 0) + result["youtube"].get("total_videos", 0),
+    }
+
+
+def run_worker() -> None:
+    """子进程入口：环境变量已由父进程设置，结果以 JSON 输出到最后一行"""
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = asyncio.run(_run_inprocess())
+    stats["peak_rss_kb"] = _peak_rss_kb()
+    print(json.dumps(stats))
+
+
+def run_script(env: Dict[str, str]) -> Dict[str, Any]:
+    """以子进程方式运行 run_crawler.py，只统计总耗时和峰值内存"""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "run_crawler.py")],
+        cwd=str(BACKEND_DIR), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"run_crawler.py exited with status {status}")
+    return {"elapsed_s": elapsed, "latencies": [], "failed_sources": None, "items": None,
+            "peak_rss_kb": rusage.ru_maxrss}
+
+
+def run_one(n: int, base_url: str, mode: str, youtube_ratio: float) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="crawler_bench_") as tmp:
+        tmp_path = Path(tmp)
+        sources_path = tmp_path / "sources.json"
+        data_dir = tmp_path / "crawl-data"
+        sources = build_sources(n, base_url, youtube_ratio)
+        sources_path.write_text(json.dumps(sources, ensure_ascii=False), encoding="utf-8")
+        env = bench_env(base_url, sources_path, data_dir)
+
+        if mode == "script":
+            stats = run_script(env)
+        else:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.crawler_bench", "--worker"],
+                cwd=str(BACKEND_DIR), env=env, capture_output=True, text=True, check=True,
+            )
+            stats = json.loads(out.stdout.strip().splitlines()[-1])
+
+        bytes_written = _dir_bytes(data_dir) if data_dir.exists() else 0
+
+    latencies = stats.pop("latencies")
+    elapsed = stats["elapsed_s"]
+    return {
+        "sources": n,
+        "twitter_sources": len(sources["twitter"]),
+        "youtube_sources": len(sources["youtube"]),
+        "mode": mode,
+        "elapsed_s": round(elapsed, 3),
+        "sources_per_s": round(n / elapsed, 2) if elapsed else 0.0,
+        "p50_source_ms": round(_percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_source_ms": round(_percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "peak_rss_mb": round(stats["peak_rss_kb"] / 1024, 1),
+        "bytes_written": bytes_written,
+        "items": stats.get("items"),
+        "failed_sources": stats.get("failed_sources"),
+    }
+
+
+def start_mock(port: int, latency_ms: float, jitter_ms: float, error_rate: float) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_upstreams", "--port", str(port),
+         "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms), "--error-rate", str(error_rate)],
+        cwd=str(BACKEND_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats", timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("mock upstream failed to start")
+
+
+def load_baseline(spec: str) -> Optional[Dict[str, Any]]:
+    if spec == "latest":
+        candidates = sorted(RESULTS_DIR.glob("crawler_*.json"))
+        if not candidates:
+            return None
+        path = candidates[-1]
+    else:
+        path = Path(spec)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["_path"] = str(path)
+    return data
+
+
+def compare(current: List[Dict[str, Any]], baseline: Dict[str, Any]) -> List[str]:
+    """与基线结果对比，返回回归描述列表"""
+    regressions = []
+    base_by_key = {(r["sources"], r["mode"]): r for r in baseline.get("results", [])}
+    checks = [
+        ("sources_per_s", False),
+        ("p95_source_ms", True),
+        ("peak_rss_mb", True),
+    ]
+    for row in current:
+        base = base_by_key.get((row["sources"], row["mode"]))
+        if not base:
+            continue
+        for key, higher_is_worse in checks:
+            cur, old = row.get(key), base.get(key)
+            if not cur or not old:
+                continue
+            change = (cur - old) / old
+            if (change > REGRESSION_THRESHOLD) if higher_is_worse else (change < -REGRESSION_THRESHOLD):
+                regressions.append(f"n={row['sources']} {key}: {old} -> {cur} ({change:+.1%})")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'sources':>8} {'mode':>8} {'elapsed_s':>10} {'src/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'rss_mb':>8} {'bytes':>12} {'failed':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['sources']:>8} {r['mode']:>8} {r['elapsed_s']:>10} {r['sources_per_s']:>8} "
+              f"{str(r['p50_source_ms']):>8} {str(r['p95_source_ms']):>8} {r['peak_rss_mb']:>8} "
+              f"{r['bytes_written']:>12} {str(r['failed_sources']):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="海外信源爬虫基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="信源数量（10 ~ 5000）")
+    parser.add_argument("--mode", choices=["inprocess", "script"], default="inprocess",
+                        help="inprocess: 驱动 crawl_all_overseas；script: 运行 run_crawler.py")
+    parser.add_argument("--youtube-ratio", type=float, default=0.3, help="YouTube 信源占比")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", help="基线结果文件路径，或 latest 表示最近一次结果")
+    parser.add_argument("--no-save", action="store_true", help="不保存结果文件")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker()
+        return
+
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    mock = start_mock(port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"[Bench] Mock upstream at {base_url} (latency={args.latency_ms}ms, error_rate={args.error_rate})")
+
+    results = []
+    try:
+        for n in args.sizes:
+            print(f"[Bench] Crawling {n} sources ({args.mode})...", flush=True)
+            results.append(run_one(n, base_url, args.mode, args.youtube_ratio))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print()
+    print_table(results)
+
+    output = {
+        "benchmark": "crawler",
+        "created_at": datetime.now().isoformat(),
+        "config": {
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "youtube_ratio": args.youtube_ratio,
+        },
+        "results": results,
+    }
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"crawler_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"\n[Bench] Results saved to {path}")
+
+    if baseline:
+        regressions = compare(results, baseline)
+        print(f"\n[Bench] Compared with {baseline['_path']}")
+        if regressions:
+            print("[Bench] REGRESSIONS:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("[Bench] No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+LLM 接口压测
+
+启动本地 OpenAI 兼容桩服务（benchmarks/mock_llm.py）和后端（uvicorn，LLM_BASE_URL 指向桩服务、关闭响应缓存），
+以 N 个并发虚拟用户（闭环：每个用户收到响应后再发下一个请求，各自使用独立的 X-API-Key）压测：
+- chat:      POST /api/chat/stream（SSE，额外统计首个 content 事件的到达时间）
+- translate: POST /api/translate
+- paper:     POST /api/paper/analyze（上传合成 PDF）
+- report:    POST /api/report/generate（合成推文数据）
+
+每个接口、每个并发级别统计：
+- 端到端延迟 p50 / p95 / p99、吞吐（req/s）、错误数
+- 事件循环延迟：压测期间每 PROBE_INTERVAL 秒请求一次 GET /health，
+  其耗时减去空载基线即为后端事件循环被阻塞的程度（同步调用、CPU 密集任务都会体现在这里）
+- 上游（桩服务）的请求数和最大并发
+
+不访问 SiliconFlow，不消耗额度。结果保存到 results/，可与基线对比。
+
+Usage:
+    cd backend
+    python -m benchmarks.llm_load_bench --users 1 10 50
+    python -m benchmarks.llm_load_bench --endpoints chat translate --users 20 --requests 10 --ttft-ms 500
+    python -m benchmarks.llm_load_bench --users 10 --error-rate 0.05 --baseline latest
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.analytics_bench import generate_posts
+from benchmarks.crawler_bench import BACKEND_DIR, RESULTS_DIR, REGRESSION_THRESHOLD, _free_port, _percentile
+
+ENDPOINTS = ("chat", "translate", "paper", "report")
+# 事件循环探测间隔（秒）
+PROBE_INTERVAL = 0.05
+REQUEST_TIMEOUT = 600
+
+_PARAGRAPH = (
+    "Large language models have shown remarkable abilities across a wide range of tasks. "
+    "However, their inference cost grows with context length, and serving them at scale "
+    "requires careful batching, caching and scheduling. In this work we study how retrieval, "
+    "distillation and speculative decoding interact under realistic traffic."
+)
+
+
+def build_pdf(title: str, pages: int = 6) -> bytes:
+    """生成带章节标题的合成论文 PDF（标题不同则内容不同，避免相同请求被单飞合并）"""
+    import fitz
+
+    sections = ["Abstract", "1 Introduction", "2 Method", "3 Experiments", "4 Conclusion", "References"]
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        heading = f"{title}\n\n" if i == 0 else ""
+        text = f"{heading}{sections[i % len(sections)]}\n\n" + "\n\n".join([_PARAGRAPH] * 6)
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def bench_env(llm_url: str, tmp_path: Path) -> Dict[str, str]:
+    """后端环境：LLM 指向桩服务，数据 / 上传 / 爬虫配置都放在临时目录，关闭自动爬虫和日报"""
+    crawler_config = tmp_path / "crawler_config.json"
+    crawler_config.write_text(json.dumps({"auto_crawl_enabled": False}), encoding="utf-8")
+    env = dict(os.environ)
+    env.update({
+        "LLM_BASE_URL": llm_url,
+        "LLM_ENDPOINTS": "",
+        "LLM_CACHE_ENABLED": "false",
+        "SILICONFLOW_API_KEY": "bench",
+        "CRAWL_DATA_DIR": str(tmp_path / "crawl-data"),
+        "UPLOAD_DIR": str(tmp_path / "uploads"),
+        "CRAWLER_CONFIG_PATH": str(crawler_config),
+        "ENABLE_AUTO_CRAWL": "false",
+        "ENABLE_AUTO_REPORT": "false",
+        "SUPABASE_URL": "",
+        "SUPABASE_KEY": "",
+        "PYTHONIOENCODING": "utf-8",
+    })
+    return env
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, name: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} exited with status {proc.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{name} failed to start")
+
+
+def start_mock_llm(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_llm", "--port", str(port),
+         "--ttft-ms", str(args.ttft_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+         "--output-tokens", str(args.output_tokens), "--error-rate", str(args.error_rate)],
+        cwd=str(BACKEND_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    _wait_ready(f"http://127.0.0.1:{port}/_stats", proc, "mock LLM")
+    return proc
+
+
+def start_backend(port: int, env: Dict[str, str], log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w", encoding="utf-8")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=str(BACKEND_DIR), env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    _wait_ready(f"http://127.0.0.1:{port}/health", proc, f"backend (see {log_path})")
+    return proc
+
+
+# ==================== 请求 ====================
+
+class Scenario:
+    """单个接口的请求构造与响应校验"""
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.base_url = base_url
+
+    def prepare(self, user: int, seq: int) -> Any:
+        """构造请求体（不计入延迟）；每个请求内容不同，避免命中单飞合并"""
+        tag = f"[{user}-{seq}]"
+        if self.name == "chat":
+            return {"session_id": f"bench-{user}", "message": f"{tag} 解释一下 speculative decoding"}
+        if self.name == "translate":
+            return {"text": f"{tag} " + " ".join([_PARAGRAPH] * 4), "source_lang": "en", "target_lang": "zh"}
+        if self.name == "paper":
+            return build_pdf(f"Benchmark Paper {tag}")
+        return {"hours": 24 * 14, "top_n": 10}
+
+    async def send(self, session: aiohttp.ClientSession, user: int, payload: Any) -> Dict[str, Any]:
+        """发送一次请求，返回 {ttft}（仅流式接口）；失败时抛出异常"""
+        headers = {"X-API-Key": f"bench-user-{user}"}
+        if self.name == "chat":
+            return await self._chat(session, headers, payload)
+        if self.name == "translate":
+            async with session.post(f"{self.base_url}/api/translate", json=payload, headers=headers) as resp:
+                await self._check(resp)
+        elif self.name == "paper":
+            form = aiohttp.FormData()
+            form.add_field("file", payload, filename="paper.pdf", content_type="application/pdf")
+            async with session.post(f"{self.base_url}/api/paper/analyze", data=form, headers=headers) as resp:
+                await self._check(resp)
+        elif self.name == "report":
+            # 报告使用服务端配置的 Key（SILICONFLOW_API_KEY）
+            async with session.post(f"{self.base_url}/api/report/generate", json=payload) as resp:
+                data = await self._check(resp)
+                if not data.get("filename"):
+                    raise RuntimeError("report skipped: no posts data")
+        return {}
+
+    async def _chat(self, session: aiohttp.ClientSession, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        ttft = None
+        async with session.post(f"{self.base_url}/api/chat/stream", json=payload, headers=headers) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {(await resp.text())[:200]}")
+            async for raw in resp.content:
+                line = raw.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("type") == "content" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif event.get("type") == "error":
+                    raise RuntimeError(event.get("message") or event.get("error") or "stream error")
+        if ttft is None:
+            raise RuntimeError("stream finished without content")
+        return {"ttft": ttft}
+
+    @staticmethod
+    async def _check(resp: aiohttp.ClientResponse) -> Dict[str, Any]:
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}: {(await resp.text())[:200]}")
+        return await resp.json()
+
+
+async def _probe_loop(session: aiohttp.ClientSession, base_url: str, samples: List[float], stop: asyncio.Event):
+    """压测期间周期性请求 /health，记录其耗时"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            async with session.get(f"{base_url}/health") as resp:
+                await resp.read()
+            samples.append(time.perf_counter() - start)
+        except aiohttp.ClientError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), PROBE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def measure_idle_probe(base_url: str, n: int = 40) -> float:
+    """空载时 /health 的中位耗时，作为事件循环延迟的基线"""
+    samples = []
+    async with aiohttp.ClientSession() as session:
+        for _ in range(n):
+            start = time.perf_counter()
+            async with session.get(f"{base_url}/health") as resp:
+                await resp.read()
+            samples.append(time.perf_counter() - start)
+    return _percentile(samples, 50)
+
+
+def _mock_stats(mock_url: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"{mock_url}/_stats", timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+async def run_level(scenario: Scenario, users: int, requests_per_user: int, idle_probe: float,
+                    mock_url: str) -> Dict[str, Any]:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors: List[str] = []
+    before = _mock_stats(mock_url)
+
+    async def user_loop(session: aiohttp.ClientSession, user: int):
+        for seq in range(requests_per_user):
+            payload = await asyncio.to_thread(scenario.prepare, user, seq)
+            start = time.perf_counter()
+            try:
+                info = await scenario.send(session, user, payload)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {str(e)[:160]}")
+                continue
+            latencies.append(time.perf_counter() - start)
+            if info.get("ttft") is not None:
+                ttfts.append(info["ttft"])
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    probes: List[float] = []
+    stop = asyncio.Event()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        probe = asyncio.create_task(_probe_loop(session, scenario.base_url, probes, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(user_loop(session, user) for user in range(users)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    after = _mock_stats(mock_url)
+    lags = [max(0.0, p - idle_probe) for p in probes]
+
+    def ms(values: List[float], pct: float) -> Optional[float]:
+        return round(_percentile(values, pct) * 1000, 1) if values else None
+
+    return {
+        "endpoint": scenario.name,
+        "users": users,
+        "requests": users * requests_per_user,
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": ms(latencies, 50),
+        "p95_ms": ms(latencies, 95),
+        "p99_ms": ms(latencies, 99),
+        "ttft_p50_ms": ms(ttfts, 50),
+        "ttft_p95_ms": ms(ttfts, 95),
+        "loop_lag_p50_ms": ms(lags, 50),
+        "loop_lag_p99_ms": ms(lags, 99),
+        "loop_lag_max_ms": round(max(lags) * 1000, 1) if lags else None,
+        "upstream_requests": after["requests"] - before["requests"],
+        "upstream_errors": after["errors"] - before["errors"],
+        "upstream_max_inflight": after["max_inflight"],
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+
+# ==================== 结果 ====================
+
+def load_baseline(spec: str) -> Optional[Dict[str, Any]]:
+    if spec == "latest":
+        candidates = sorted(RESULTS_DIR.glob("llm_load_*.json"))
+        if not candidates:
+            return None
+        path = candidates[-1]
+    else:
+        path = Path(spec)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["_path"] = str(path)
+    return data
+
+
+def compare(current: List[Dict[str, Any]], baseline: Dict[str, Any]) -> List[str]:
+    """与基线结果对比，返回回归描述列表"""
+    regressions = []
+    base_by_key = {(r["endpoint"], r["users"]): r for r in baseline.get("results", [])}
+    checks = [
+        ("throughput_rps", False),
+        ("p95_ms", True),
+        ("p99_ms", True),
+        ("loop_lag_p99_ms", True),
+    ]
+    for row in current:
+        base = base_by_key.get((row["endpoint"], row["users"]))
+        if not base:
+            continue
+        for key, higher_is_worse in checks:
+            cur, old = row.get(key), base.get(key)
+            if not cur or not old:
+                continue
+            change = (cur - old) / old
+            if (change > REGRESSION_THRESHOLD) if higher_is_worse else (change < -REGRESSION_THRESHOLD):
+                regressions.append(f"{row['endpoint']} users={row['users']} {key}: {old} -> {cur} ({change:+.1%})")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = (f"{'endpoint':>10} {'users':>6} {'reqs':>6} {'errors':>7} {'req/s':>8} {'p50_ms':>9} {'p95_ms':>9} "
+              f"{'p99_ms':>9} {'ttft_p50':>9} {'lag_p99':>8} {'lag_max':>8} {'upstream':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['endpoint']:>10} {r['users']:>6} {r['requests']:>6} {r['errors']:>7} {r['throughput_rps']:>8} "
+              f"{str(r['p50_ms']):>9} {str(r['p95_ms']):>9} {str(r['p99_ms']):>9} {str(r['ttft_p50_ms']):>9} "
+              f"{str(r['loop_lag_p99_ms']):>8} {str(r['loop_lag_max_ms']):>8} {r['upstream_requests']:>9}")
+    for r in results:
+        for error in r["sample_errors"]:
+            print(f"[Bench] {r['endpoint']} users={r['users']} error: {error}")
+
+
+async def warm_up(scenario: Scenario) -> None:
+    """每个接口先发一次不计入统计的请求（首次导入、建立连接池等）"""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as session:
+        try:
+            await scenario.send(session, -1, scenario.prepare(-1, 0))
+        except Exception as e:
+            print(f"[Bench] {scenario.name} warm-up failed: {e}")
+
+
+async def run_all(args: argparse.Namespace, backend_url: str, mock_url: str) -> List[Dict[str, Any]]:
+    idle_probe = await measure_idle_probe(backend_url)
+    print(f"[Bench] Idle /health probe: {idle_probe * 1000:.1f}ms")
+    results = []
+    for name in args.endpoints:
+        scenario = Scenario(name, backend_url)
+        await warm_up(scenario)
+        for users in args.users:
+            print(f"[Bench] {name}: {users} users x {args.requests} requests...", flush=True)
+            results.append(await run_level(scenario, users, args.requests, idle_probe, mock_url))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 接口压测（本地桩服务，不消耗额度）")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50], help="并发用户数（可多个级别）")
+    parser.add_argument("--requests", type=int, default=5, help="每个用户的请求数")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-sec", type=float, default=60)
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--posts", type=int, default=2000, help="报告压测使用的合成推文数")
+    parser.add_argument("--baseline", help="基线结果文件路径，或 latest 表示最近一次结果")
+    parser.add_argument("--no-save", action="store_true", help="不保存结果文件")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    with tempfile.TemporaryDirectory(prefix="llm_load_bench_") as tmp:
+        tmp_path = Path(tmp)
+        data_dir = tmp_path / "crawl-data"
+        (data_dir / "twitter").mkdir(parents=True)
+        with open(data_dir / "twitter" / "posts.json", "w", encoding="utf-8") as f:
+            json.dump(generate_posts(args.posts, n_authors=200), f, ensure_ascii=False)
+
+        mock_port, backend_port = _free_port(), _free_port()
+        mock_url = f"http://127.0.0.1:{mock_port}"
+        backend_url = f"http://127.0.0.1:{backend_port}"
+        mock = start_mock_llm(mock_port, args)
+        backend = None
+        try:
+            env = bench_env(f"{mock_url}/v1", tmp_path)
+            backend = start_backend(backend_port, env, tmp_path / "backend.log")
+            print(f"[Bench] Mock LLM at {mock_url} (ttft={args.ttft_ms}ms, {args.tokens_per_sec} tokens/s, "
+                  f"error_rate={args.error_rate}); backend at {backend_url}")
+            results = asyncio.run(run_all(args, backend_url, mock_url))
+        finally:
+            for proc in (backend, mock):
+                if proc:
+                    proc.terminate()
+                    proc.wait()
+
+    print()
+    print_table(results)
+
+    output = {
+        "benchmark": "llm_load",
+        "created_at": datetime.now().isoformat(),
+        "config": {
+            "requests_per_user": args.requests,
+            "ttft_ms": args.ttft_ms,
+            "tokens_per_sec": args.tokens_per_sec,
+            "output_tokens": args.output_tokens,
+            "error_rate": args.error_rate,
+            "posts": args.posts,
+        },
+        "results": results,
+    }
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"llm_load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"\n[Bench] Results saved to {path}")
+
+    if baseline:
+        regressions = compare(results, baseline)
+        print(f"\n[Bench] Compared with {baseline['_path']}")
+        if regressions:
+            print("[Bench] REGRESSIONS:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("[Bench] No regressions")
+
+
+if __name__ == "__main__":
+    main()
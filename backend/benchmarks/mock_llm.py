@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+LLM 压测用的本地 OpenAI 兼容桩服务
+
+实现 POST /v1/chat/completions（流式 SSE 与非流式 JSON，消息内容支持纯文本和 text / image_url 多段），
+不调用任何真实模型，用于在不消耗 SiliconFlow 额度的情况下压测对话、翻译、论文分析和报告生成：
+- 首 token 延迟（TTFT）、输出速度（tokens/s）、输出长度可配置，并带抖动
+- 按比例注入 429（带 Retry-After）/ 5xx 错误
+- 返回 usage（prompt / completion tokens），请求中的 max_tokens 会限制输出长度
+- 提示词要求 JSON 时返回合法 JSON，便于论文结构化分析等按 JSON 解析的流程走通
+- 提示词含 <<<T编号>>> 分隔符（推文批量翻译）时按同样的编号逐条回复
+- GET /_stats 返回请求数、流式请求数、图片数、错误数和 token 统计
+
+将后端指向桩服务：LLM_BASE_URL=http://127.0.0.1:18765/v1（或在 LLM_ENDPOINTS 中配置端点）
+
+Usage:
+    cd backend
+    python -m benchmarks.mock_llm --port 18765 --ttft-ms 300 --tokens-per-sec 60
+    python -m benchmarks.mock_llm --port 18765 --error-rate 0.05 --retry-after 1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from aiohttp import web
+
+
+# 每个输出 token 对应的文本片段
+_FILLER = (
+    "模型 在 长 上下文 任务 上 的 表现 取决于 训练 数据 的 质量 与 推理 时 的 检索 策略 ，"
+    "实验 表明 在 相同 算力 下 蒸馏 的 小 模型 可以 接近 大 模型 的 效果 。"
+).split()
+_BATCH_MARKER_RE = re.compile(r"^<<<T\d+>>>$", re.MULTILINE)
+# 流式输出的最小发送间隔（秒）：tokens/s 很高时按时间片合并多个 token，避免每个 token 一次 sleep
+STREAM_TICK = 0.02
+
+
+class MockLLMConfig:
+    """桩服务的行为配置与统计"""
+
+    def __init__(
+        self,
+        ttft_ms: float = 300,
+        tokens_per_sec: float = 60,
+        output_tokens: int = 200,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        error_statuses: Tuple[int, ...] = (429, 500, 502, 503),
+        retry_after: float = 1.0,
+        seed: int = 42,
+    ):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.output_tokens = output_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.streamed = 0
+        self.images = 0
+        self.errors = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def jittered(self, value: float) -> float:
+        """按 ±jitter 比例随机扰动"""
+        if not self.jitter:
+            return value
+        return max(0.0, value * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "streamed": self.streamed,
+            "images": self.images,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """拼接所有消息的文本内容，返回 (文本, 图片数)"""
+    texts: List[str] = []
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    texts.append(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+    return "\n".join(texts), images
+
+
+def _estimate_tokens(text: str) -> int:
+    """与 app.services.token_budget 的估算一致：CJK 约 1 token/字，其它约 4 字符/token"""
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def build_reply(prompt: str, n_tokens: int) -> List[str]:
+    """构造 n_tokens 个输出片段；提示词要求 JSON 时把填充文本包装为合法 JSON，含批量编号时按编号逐条回复"""
+    words = [_FILLER[i % len(_FILLER)] for i in range(max(1, n_tokens))]
+    markers = _BATCH_MARKER_RE.findall(prompt)
+    if markers:
+        # 每条分到的 token 数相同，编号行单独作为一个片段
+        per_item = max(1, len(words) // len(markers))
+        pieces: List[str] = []
+        for i, marker in enumerate(markers):
+            pieces.append(("\n" if i else "") + marker + "\n")
+            pieces.extend(words[i * per_item:(i + 1) * per_item] or words[:1])
+        return pieces
+    if "json" not in prompt.lower():
+        return words
+    text = json.dumps({"content": "".join(words), "stub": True}, ensure_ascii=False)
+    # 按 token 数大致均分，保证流式拼接后仍是同一段 JSON
+    step = max(1, len(text) // len(words))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def _chunk_payload(completion_id: str, model: str, created: int, delta: Dict[str, Any],
+                   finish_reason: str = None, usage: Dict[str, int] = None) -> str:
+    payload: Dict[str, Any] = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+    }
+    if usage is not None:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(config: MockLLMConfig) -> web.Application:
+    def error_response() -> web.Response:
+        config.errors += 1
+        status = config.random.choice(config.error_statuses)
+        headers = {"Retry-After": f"{config.retry_after:g}"} if status == 429 and config.retry_after else {}
+        body = {"error": {"message": "simulated upstream error", "type": "mock_error", "code": status}}
+        return web.json_response(body, status=status, headers=headers)
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        config.requests += 1
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return web.json_response({"error": {"message": "invalid JSON body"}}, status=400)
+        messages = body.get("messages") or []
+        if not messages:
+            return web.json_response({"error": {"message": "messages is required"}}, status=400)
+
+        if config.error_rate and config.random.random() < config.error_rate:
+            # 错误在等待首 token 之前返回，与真实上游的限流 / 过载表现一致
+            await asyncio.sleep(config.jittered(config.ttft_ms) / 1000 / 4)
+            return error_response()
+
+        prompt, images = _message_text(messages)
+        config.images += images
+        prompt_tokens = _estimate_tokens(prompt) + 8 * len(messages) + 256 * images
+        n_tokens = int(config.jittered(config.output_tokens))
+        if body.get("max_tokens"):
+            n_tokens = min(n_tokens, int(body["max_tokens"]))
+        pieces = build_reply(prompt, n_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces),
+        }
+        config.prompt_tokens += prompt_tokens
+        config.completion_tokens += len(pieces)
+
+        model = body.get("model") or "mock-llm"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        ttft = config.jittered(config.ttft_ms) / 1000
+        per_token = 1 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+        config.inflight += 1
+        config.max_inflight = max(config.max_inflight, config.inflight)
+        try:
+            if not body.get("stream"):
+                await asyncio.sleep(ttft + per_token * len(pieces))
+                return web.json_response({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(pieces)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                })
+
+            config.streamed += 1
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+            await response.prepare(request)
+            await asyncio.sleep(ttft)
+            await response.write(_chunk_payload(completion_id, model, created, {"role": "assistant", "content": ""}).encode())
+            batch = max(1, int(STREAM_TICK / per_token)) if per_token else len(pieces)
+            for start in range(0, len(pieces), batch):
+                if start:
+                    await asyncio.sleep(per_token * batch)
+                # 每个片段单独一个 chunk，与真实上游逐 token 推送一致
+                data = "".join(
+                    _chunk_payload(completion_id, model, created, {"content": piece})
+                    for piece in pieces[start:start + batch]
+                )
+                await response.write(data.encode())
+            await response.write(_chunk_payload(completion_id, model, created, {}, finish_reason="stop").encode())
+            if (body.get("stream_options") or {}).get("include_usage"):
+                await response.write(_chunk_payload(completion_id, model, created, {}, usage=usage).encode())
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            config.inflight -= 1
+
+    async def models(request: web.Request) -> web.Response:
+        return web.json_response({"object": "list", "data": [{"id": "mock-llm", "object": "model"}]})
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(config.stats())
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/chat/completions", chat_completions)
+    app.router.add_get("/v1/models", models)
+    app.router.add_get("/_stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 压测用的 OpenAI 兼容桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="首 token 延迟（毫秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=60, help="输出速度，0 表示不限速")
+    parser.add_argument("--output-tokens", type=int, default=200, help="每次回复的 token 数")
+    parser.add_argument("--jitter", type=float, default=0.2, help="延迟与输出长度的随机扰动比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误注入比例（0~1）")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 500, 502, 503])
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒），0 表示不返回")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        output_tokens=args.output_tokens,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_statuses=tuple(args.error_statuses),
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    print(f"[MockLLM] Listening on http://{args.host}:{args.port}/v1 "
+          f"(ttft={args.ttft_ms}ms, {args.tokens_per_sec} tokens/s, error_rate={args.error_rate})")
+    web.run_app(create_app(config), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
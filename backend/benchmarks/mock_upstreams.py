@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+爬虫基准测试用的本地模拟上游
+
+模拟以下外部服务，返回与真实接口结构一致的数据：
+- twitterapi.io   GET  /twitter/user/last_tweets?userName=xxx
+- YouTube 频道页  GET  /youtube/@handle/videos  （包含 channelId meta 标签）
+- YouTube RSS     GET  /feeds/videos.xml?channel_id=UCxxx
+- FireCrawl       POST /v1/scrape
+
+可配置延迟、抖动和错误率，用于在不访问外网的情况下压测爬虫。
+
+Usage:
+    cd backend
+    python -m benchmarks.mock_upstreams --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+
+TWEETS_PER_USER = 20
+VIDEOS_PER_CHANNEL = 15
+
+_SAMPLE_TEXTS = [
+    "Scaling laws keep holding up. The next generation of models will be trained on far more compute than anything we have today.",
+    "New paper: we show that small models distilled from reasoning traces can match much larger ones on math benchmarks.",
+    "Open-sourcing our inference stack today. 3x throughput on the same hardware, details in the thread below.",
+    "Agents are going to change how software gets written. Most of the work is in evaluation, not in the model.",
+    "Hot take: long context is underrated. Retrieval is a workaround, not a solution.",
+    "We just shipped a new multimodal model that can read charts, diagrams and handwritten notes.",
+]
+
+
+class MockConfig:
+    """模拟上游的行为配置"""
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, error_rate: float = 0.0, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+
+def _stable_int(value: str) -> int:
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:12], 16)
+
+
+def _channel_id(handle: str) -> str:
+    return "UC" + hashlib.md5(handle.encode("utf-8")).hexdigest()[:22]
+
+
+def build_tweets_payload(username: str) -> Dict[str, Any]:
+    """按 twitterapi.io 的原始格式构造推文数据"""
+    base_id = _stable_int(username) * 1000
+    now = datetime.now(timezone.utc)
+    author = {
+        "userName": username,
+        "name": username.replace("_", " ").title(),
+        "profilePicture": f"https://pbs.twimg.com/profile_images/{base_id}/avatar_normal.jpg",
+        "followers": 1000 + _stable_int(username) % 1_000_000,
+        "isBlueVerified": True,
+        "profileBio": {"description": f"Researcher @{username}. Opinions are my own."},
+    }
+    tweets: List[Dict[str, Any]] = []
+    for i in range(TWEETS_PER_USER):
+        tweet_id = str(base_id + i)
+        tweet = {
+            "id": tweet_id,
+            "url": f"https://x.com/{username}/status/{tweet_id}",
+            "text": _SAMPLE_TEXTS[(base_id + i) % len(_SAMPLE_TEXTS)],
+            "author": author,
+            "likeCount": (base_id + i * 37) % 5000,
+            "retweetCount": (base_id + i * 11) % 800,
+            "replyCount": (base_id + i * 7) % 300,
+            "viewCount": (base_id + i * 997) % 2_000_000,
+            "quoteCount": i * 3,
+            "bookmarkCount": i * 5,
+            "createdAt": (now - timedelta(hours=i * 3)).strftime("%a %b %d %H:%M:%S +0000 %Y"),
+        }
+        if i % 4 == 0:
+            tweet["extendedEntities"] = {
+                "media": [{"type": "photo", "media_url_https": f"https://pbs.twimg.com/media/{tweet_id}.jpg"}]
+            }
+        if i % 5 == 0:
+            tweet["quoted_tweet"] = {
+                "id": str(base_id + 500 + i),
+                "url": f"https://x.com/someone/status/{base_id + 500 + i}",
+                "text": _SAMPLE_TEXTS[i % len(_SAMPLE_TEXTS)],
+                "author": {"userName": "someone", "name": "Someone", "followers": 42},
+                "likeCount": 10,
+                "createdAt": (now - timedelta(days=1)).strftime("%a %b %d %H:%M:%S +0000 %Y"),
+            }
+        tweets.append(tweet)
+    return {"status": "success", "data": {"tweets": tweets}}
+
+
+def build_channel_page(handle: str) -> str:
+    """构造包含 channelId 的频道页面 HTML"""
+    return (
+        "<!DOCTYPE html><html><head>"
+        f'<meta itemprop="channelId" content="{_channel_id(handle)}">'
+        f"<title>{handle} - YouTube</title>"
+        "</head><body>" + ("<div></div>" * 200) + "</body></html>"
+    )
+
+
+def build_rss_feed(channel_id: str) -> str:
+    """构造 YouTube RSS Feed"""
+    now = datetime.now(timezone.utc)
+    entries = []
+    for i in range(VIDEOS_PER_CHANNEL):
+        video_id = hashlib.md5(f"{channel_id}:{i}".encode("utf-8")).hexdigest()[:11]
+        published = (now - timedelta(days=i)).isoformat()
+        entries.append(
+            "<entry>"
+            f"<id>yt:video:{video_id}</id>"
+            f"<yt:videoId>{video_id}</yt:videoId>"
+            f"<yt:channelId>{channel_id}</yt:channelId>"
+            f"<title>Episode {i}: {_SAMPLE_TEXTS[i % len(_SAMPLE_TEXTS)][:60]}</title>"
+            f"<published>{published}</published>"
+            "</entry>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{channel_id}</title>" + "".join(entries) + "</feed>"
+    )
+
+
+def build_firecrawl_payload(url: str) -> Dict[str, Any]:
+    """构造 FireCrawl 抓取结果（markdown 格式）"""
+    lines = []
+    for i in range(VIDEOS_PER_CHANNEL):
+        video_id = hashlib.md5(f"{url}:{i}".encode("utf-8")).hexdigest()[:11]
+        lines.append(f"[Video {i}](https://www.youtube.com/watch?v={video_id}) {i * 1000} views")
+    return {
+        "success": True,
+        "data": {
+            "markdown": "\n".join(lines),
+            "metadata": {"ogTitle": url.rstrip("/").split("/")[-2] if "/" in url else url},
+        },
+    }
+
+
+def create_app(config: MockConfig) -> web.Application:
+    @web.middleware
+    async def simulate(request: web.Request, handler):
+        config.requests += 1
+        delay = max(0.0, config.latency_ms + config.random.uniform(-config.jitter_ms, config.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+        if config.error_rate and config.random.random() < config.error_rate:
+            config.errors += 1
+            status = config.random.choice([429, 500, 502, 503])
+            return web.Response(status=status, text="simulated upstream error")
+        return await handler(request)
+
+    async def last_tweets(request: web.Request) -> web.Response:
+        username = request.query.get("userName", "")
+        if not username:
+            return web.json_response({"status": "error", "msg": "userName required"}, status=400)
+        return web.json_response(build_tweets_payload(username))
+
+    async def channel_page(request: web.Request) -> web.Response:
+        return web.Response(text=build_channel_page(request.match_info["handle"]), content_type="text/html")
+
+    async def rss_feed(request: web.Request) -> web.Response:
+        channel_id = request.query.get("channel_id", "")
+        return web.Response(text=build_rss_feed(channel_id), content_type="application/atom+xml")
+
+    async def firecrawl(request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response(build_firecrawl_payload(body.get("url", "")))
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response({"requests": config.requests, "errors": config.errors})
+
+    app = web.Application(middlewares=[simulate])
+    app.router.add_get("/twitter/user/last_tweets", last_tweets)
+    app.router.add_get("/youtube/{handle}/videos", channel_page)
+    app.router.add_get("/feeds/videos.xml", rss_feed)
+    app.router.add_post("/v1/scrape", firecrawl)
+    app.router.add_get("/_stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫基准测试模拟上游")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50, help="平均响应延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="延迟抖动（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 429/5xx 的比例")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    print(f"[Mock] Listening on http://{args.host}:{args.port} "
+          f"(latency={args.latency_ms}ms, jitter={args.jitter_ms}ms, error_rate={args.error_rate})", flush=True)
+    web.run_app(create_app(config), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+列式分析引擎的单元测试
+
+filter_and_analyze 改为 PostColumns 向量化实现后，结果应与原先逐条循环的实现一致。
+这里保留一份原实现作为参照，在随机生成的帖子上逐字段比较。
+可直接运行，也可用 pytest 执行
+"""
+
+import os
+import random
+import re
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.services.analytics_engine import PostColumns, engagement_score, parse_twitter_times
+from app.services.report_service import filter_and_analyze
+from app.services.rollup_service import STOP_WORDS
+
+TWITTER_TIME_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+
+
+# ==================== 原实现（参照） ====================
+
+def _reference_parse_time(ts):
+    try:
+        return datetime.strptime(ts, TWITTER_TIME_FORMAT)
+    except (ValueError, TypeError):
+        return None
+
+
+def _reference_score(item):
+    stats = item.get("stats", {})
+    return (
+        stats.get("likes", 0)
+        + stats.get("retweets", 0) * 2
+        + stats.get("views", 0) * 0.01
+        + stats.get("quotes", 0) * 3
+    )
+
+
+def reference_filter_and_analyze(posts_data, hours=24, authors=None, top_n=10):
+    """改造前 report_service.filter_and_analyze 的逐条循环实现"""
+    items = posts_data.get("items", [])
+    now = datetime.now(timezone.utc)
+    parsed = {id(item): _reference_parse_time(item.get("created_at", "")) for item in items}
+
+    if authors:
+        authors_lower = {a.lower().lstrip("@") for a in authors}
+        items = [
+            item for item in items
+            if (item.get("author", {}).get("username") or "").lower() in authors_lower
+        ]
+
+    recent_items = []
+    for item in items:
+        pt = parsed[id(item)]
+        if pt and (now - pt).total_seconds() / 3600 <= hours:
+            recent_items.append(item)
+
+    use_all = len(recent_items) < 5
+    analysis_items = items[:50] if use_all else recent_items
+
+    top_posts = sorted(analysis_items, key=_reference_score, reverse=True)[:top_n]
+
+    author_post_map = {}
+    for item in analysis_items:
+        author = item.get("author", {})
+        username = author.get("username")
+        if not username:
+            continue
+        if username not in author_post_map:
+            author_post_map[username] = {
+                "username": username,
+                "name": author.get("name") or username,
+                "avatar": author.get("avatar", ""),
+                "followers": author.get("followers", 0),
+                "verified": author.get("verified", False),
+                "post_count": 0,
+            }
+        author_post_map[username]["post_count"] += 1
+        if author.get("followers", 0) > author_post_map[username]["followers"]:
+            author_post_map[username]["followers"] = author.get("followers", 0)
+            author_post_map[username]["avatar"] = author.get("avatar", "")
+    top_authors = sorted(author_post_map.values(), key=lambda x: x["post_count"], reverse=True)[:10]
+
+    all_text = " ".join(item.get("text", "") for item in analysis_items)
+    all_text = re.sub(r"https?://\S+", "", all_text)
+    all_text = re.sub(r"@\w+", "", all_text)
+    words = re.findall(r"[a-zA-Z]{3,}", all_text.lower())
+    top_keywords = Counter(w for w in words if w not in STOP_WORDS).most_common(20)
+
+    return {
+        "analysis_posts_count": len(analysis_items),
+        "used_full_data": use_all,
+        "top_posts": top_posts,
+        "top_authors_by_activity": top_authors,
+        "top_keywords": top_keywords,
+        "total_likes": sum(item.get("stats", {}).get("likes", 0) for item in analysis_items),
+        "total_retweets": sum(item.get("stats", {}).get("retweets", 0) for item in analysis_items),
+        "total_views": sum(item.get("stats", {}).get("views", 0) for item in analysis_items),
+        "active_authors": len({
+            item.get("author", {}).get("username", "")
+            for item in analysis_items
+            if item.get("author", {}).get("username")
+        }),
+    }
+
+
+# ==================== 测试数据 ====================
+
+WORDS = ["model", "agent", "release", "benchmark", "reasoning", "open", "source", "weights", "the", "and"]
+USERS = ["alice", "Bob", "carol", "dave", "erin", "frank", None]
+
+
+def _make_posts(seed, count=300):
+    """随机帖子：含重复分数、缺失字段、非 UTC 时区和无法解析的时间"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(count):
+        tz = timezone(timedelta(hours=rng.choice([0, 0, 8, -5])))
+        created = (now - timedelta(hours=rng.uniform(-1, 72))).astimezone(tz)
+        created_at = created.strftime(TWITTER_TIME_FORMAT)
+        if rng.random() < 0.03:
+            created_at = rng.choice(["", "not a date", "2024-01-01T00:00:00Z"])
+        username = rng.choice(USERS)
+        author = {"name": (username or "").title(), "avatar": f"avatar-{i}", "followers": rng.choice([0, 10, 100, 1000])}
+        if username:
+            author["username"] = username
+        if rng.random() < 0.2:
+            author["verified"] = True
+        stats = {"likes": rng.choice([0, 1, 5, 10, 100]), "retweets": rng.choice([0, 1, 3])}
+        if rng.random() < 0.7:
+            stats["views"] = rng.choice([0, 100, 1000, 5000])
+        if rng.random() < 0.3:
+            stats["quotes"] = rng.choice([0, 1, 2])
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        if rng.random() < 0.2:
+            text += " https://example.com/x @someone"
+        items.append({"id": str(10_000 + i), "text": text, "created_at": created_at, "author": author, "stats": stats})
+    return {"items": items, "total_count": len(items), "scraped_at": now.isoformat()}
+
+
+def _assert_equivalent(posts_data, **kwargs):
+    expected = reference_filter_and_analyze(posts_data, **kwargs)
+    actual = filter_and_analyze(posts_data, collapse_duplicates=False, **kwargs)
+    for key, value in expected.items():
+        if key == "top_posts":
+            assert [p["id"] for p in actual[key]] == [p["id"] for p in value], f"{kwargs} top_posts"
+        else:
+            assert actual[key] == value, f"{kwargs} {key}: {actual[key]} != {value}"
+
+
+# ==================== 测试 ====================
+
+def test_parse_twitter_times_matches_strptime():
+    values = [
+        "Wed Sep 27 13:40:54 +0000 2023",
+        "Thu Feb 29 23:59:59 +0800 2024",
+        "Mon Jan 01 00:00:00 -0530 2024",
+        "Xyz Foo 01 00:00:00 +0000 2024",
+        "",
+        None,
+        "2024-01-01T00:00:00Z",
+    ]
+    parsed = parse_twitter_times(values)
+    for value, ts in zip(values, parsed):
+        expected = _reference_parse_time(value)
+        if expected is None:
+            assert np.isnan(ts), value
+        else:
+            assert ts == expected.timestamp(), value
+
+
+def test_engagement_matches_reference():
+    posts = _make_posts(1)["items"]
+    cols = PostColumns(posts)
+    scores = cols.engagement()
+    for item, score in zip(posts, scores):
+        assert abs(score - _reference_score(item)) < 1e-9
+        assert abs(engagement_score(item) - _reference_score(item)) < 1e-9
+
+
+def test_filter_and_analyze_matches_reference():
+    for seed in range(5):
+        posts_data = _make_posts(seed)
+        for hours in (1, 24, 48):
+            _assert_equivalent(posts_data, hours=hours)
+        _assert_equivalent(posts_data, hours=24, top_n=3)
+        _assert_equivalent(posts_data, hours=24, authors=["@ALICE", "bob"])
+
+
+def test_filter_and_analyze_sparse_window():
+    """窗口内少于 5 条时放宽到前 50 条"""
+    posts_data = _make_posts(7, count=120)
+    _assert_equivalent(posts_data, hours=0)
+    result = filter_and_analyze(posts_data, hours=0, collapse_duplicates=False)
+    assert result["used_full_data"] and result["analysis_posts_count"] == 50
+
+
+def test_top_n_ties_keep_original_order():
+    cols = PostColumns([{"id": str(i), "stats": {"likes": like}} for i, like in enumerate([5, 9, 5, 9, 1, 5])])
+    rows = np.arange(len(cols))
+    assert cols.top_n(rows, 4).tolist() == [1, 3, 0, 2]
+    assert cols.top_n(rows, 10).tolist() == [1, 3, 0, 2, 5, 4]
+    assert cols.top_n(rows, 0).tolist() == []
+
+
+def test_empty_posts():
+    result = filter_and_analyze({"items": []}, collapse_duplicates=False)
+    assert result["analysis_posts_count"] == 0
+    assert result["top_posts"] == [] and result["top_authors_by_activity"] == []
+    assert result["total_likes"] == 0 and result["active_authors"] == 0
+
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith("test_") and callable(func)]
+    failed = 0
+    for name, func in tests:
+        try:
+            func()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 通过")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
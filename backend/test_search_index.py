@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+全文检索与近重复聚类的单元测试
+
+覆盖 SearchIndex 的 BM25 排序、过滤和增量更新，以及 NearDuplicateIndex 的 MinHash 聚类。
+可直接运行，也可用 pytest 执行
+"""
+
+import os
+import sys
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.dedup_service import NearDuplicateIndex, collapse_to_canonical
+from app.services.search_index import SearchIndex, tokenize
+
+
+def _tweet(tweet_id, text, username="alice", created_at="Wed Sep 27 13:40:54 +0000 2023", likes=0):
+    return {
+        "id": tweet_id,
+        "text": text,
+        "author": {"username": username, "name": username.title()},
+        "url": f"https://x.com/{username}/status/{tweet_id}",
+        "created_at": created_at,
+        "stats": {"likes": likes},
+    }
+
+
+def _ids(result):
+    return [item["id"] for item in result["items"]]
+
+
+# ==================== BM25 检索 ====================
+
+def test_tokenize_latin_and_cjk():
+    tokens = tokenize("OpenAI's GPT-5 发布了新模型")
+    assert "openai's" in tokens and "gpt" in tokens and "5" in tokens
+    assert any("模型" in t for t in tokens), tokens
+
+
+def test_bm25_ranking():
+    index = SearchIndex()
+    index.add_items("twitter", [
+        _tweet("1", "transformer models are great"),
+        _tweet("2", "transformer transformer transformer architecture deep dive"),
+        _tweet("3", "a long post about cooking pasta and also one mention of transformer " + "filler " * 30),
+        _tweet("4", "nothing relevant here"),
+    ])
+    result = index.search("transformer")
+    assert result["total"] == 3
+    # 词频高、文档短的排在前面，长文档被长度归一化压低
+    assert _ids(result) == ["2", "1", "3"]
+    scores = [item["score"] for item in result["items"]]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+
+
+def test_bm25_rare_term_weighs_more():
+    index = SearchIndex()
+    index.add_items("twitter", [
+        _tweet("1", "model model update"),
+        _tweet("2", "model update update"),
+        _tweet("3", "model release today"),
+        _tweet("4", "model benchmark today"),
+    ])
+    # 所有词需同时命中；两篇文档长度相同，稀有词 update 的 IDF 更高，出现两次的排在前面
+    assert _ids(index.search("model update", prefix=False)) == ["2", "1"]
+    assert _ids(index.search("release benchmark", prefix=False)) == []
+
+
+def test_prefix_and_filters():
+    index = SearchIndex()
+    index.add_items("twitter", [
+        _tweet("1", "reasoning models", username="alice", created_at="Mon Jan 01 00:00:00 +0000 2024"),
+        _tweet("2", "reasonable pricing", username="bob", created_at="Mon Jan 01 00:00:00 +0000 2024"),
+        _tweet("3", "reason enough", username="bob", created_at="Sun Jan 01 00:00:00 +0000 2023"),
+    ])
+    index.add_items("youtube", [
+        {"id": "v1", "title": "Reasoning explained", "source_name": "Channel", "published_at": "2024-01-02T00:00:00Z"},
+    ])
+    assert sorted(_ids(index.search("reason"))) == ["1", "2", "3", "v1"]
+    assert index.search("reason", prefix=False)["total"] == 1
+    assert sorted(_ids(index.search("reason", platforms=["twitter"]))) == ["1", "2", "3"]
+    assert sorted(_ids(index.search("reason", author="BOB"))) == ["2", "3"]
+    since = 1704067200  # 2024-01-01T00:00:00Z
+    assert sorted(_ids(index.search("reason", since=since))) == ["1", "2", "v1"]
+    assert _ids(index.search("reason", until=since - 1)) == ["3"]
+
+
+def test_pagination():
+    index = SearchIndex()
+    index.add_items("twitter", [_tweet(str(i), "agent " * (i + 1) + "word " * 5) for i in range(10)])
+    full = _ids(index.search("agent", limit=10))
+    assert len(full) == 10
+    pages = _ids(index.search("agent", limit=3)) + _ids(index.search("agent", limit=3, offset=3)) \
+        + _ids(index.search("agent", limit=4, offset=6))
+    assert pages == full
+    assert index.search("agent", limit=3)["total"] == 10
+
+
+def test_incremental_update_and_sync():
+    index = SearchIndex()
+    items = [_tweet("1", "alpha beta"), _tweet("2", "beta gamma")]
+    index.sync_platform("twitter", items)
+    assert sorted(_ids(index.search("beta"))) == ["1", "2"]
+
+    # 未变化的条目跳过，文本变化的条目重建
+    assert index.upsert("twitter", _tweet("1", "alpha beta")) is False
+    assert index.upsert("twitter", _tweet("1", "alpha delta")) is True
+    assert _ids(index.search("beta")) == ["2"]
+    assert _ids(index.search("delta")) == ["1"]
+
+    # 完整数据集同步时删除不再出现的条目，槽位复用
+    result = index.sync_platform("twitter", [_tweet("2", "beta gamma"), _tweet("3", "epsilon beta")])
+    assert result == {"changed": 1, "removed": 1}
+    assert sorted(_ids(index.search("beta"))) == ["2", "3"]
+    assert index.search("delta")["total"] == 0
+    assert index.stats()["documents"] == 2
+
+
+# ==================== MinHash 近重复聚类 ====================
+
+BASE = "OpenAI announces new reasoning model with improved benchmark results across math and code tasks today"
+UNRELATED = "Weekend hiking trip photos from the mountains with friends and a very happy dog"
+
+
+def _cluster_items():
+    return [
+        _tweet("1001", BASE, likes=5),
+        _tweet("1002", BASE + " wow", likes=50),
+        _tweet("1003", BASE + " nice", likes=1),
+        _tweet("1004", UNRELATED, likes=100),
+    ]
+
+
+def test_minhash_clusters_near_duplicates():
+    items = _cluster_items()
+    result = NearDuplicateIndex().annotate(items)
+    assert result == {"clusters": 1, "duplicates": 2}
+    by_id = {item["id"]: item for item in items}
+    for tweet_id in ("1001", "1002", "1003"):
+        # cluster_id 为簇内最小 ID，代表条目为互动最高的一条
+        assert by_id[tweet_id]["cluster_id"] == "1001"
+        assert by_id[tweet_id]["canonical_id"] == "1002"
+        assert by_id[tweet_id]["cluster_size"] == 3
+    assert by_id["1004"]["cluster_id"] == "1004" and by_id["1004"]["cluster_size"] == 1
+    assert [item["id"] for item in collapse_to_canonical(items)] == ["1002", "1004"]
+
+
+def test_minhash_order_independent():
+    forward = _cluster_items()
+    backward = list(reversed(_cluster_items()))
+    NearDuplicateIndex().annotate(forward)
+    NearDuplicateIndex().annotate(backward)
+    fields = lambda items: {i["id"]: (i["cluster_id"], i["canonical_id"], i["cluster_size"]) for i in items}
+    assert fields(forward) == fields(backward)
+
+
+def test_minhash_edit_splits_cluster():
+    index = NearDuplicateIndex()
+    items = _cluster_items()
+    index.annotate(items)
+
+    # 条目文本变化后不再与原簇相似，应被拆分出去
+    edited = _cluster_items()
+    edited[0]["text"] = "Completely different announcement about quarterly earnings and revenue growth in Europe"
+    result = index.annotate(edited)
+    by_id = {item["id"]: item for item in edited}
+    assert by_id["1001"]["cluster_id"] == "1001" and by_id["1001"]["cluster_size"] == 1
+    assert by_id["1002"]["cluster_id"] == by_id["1003"]["cluster_id"] == "1002"
+    assert by_id["1002"]["cluster_size"] == 2
+    assert result == {"clusters": 1, "duplicates": 1}
+
+
+def test_minhash_short_text_not_clustered():
+    items = [_tweet("1", "ok"), _tweet("2", "ok")]
+    NearDuplicateIndex().annotate(items)
+    assert items[0]["cluster_id"] != items[1]["cluster_id"]
+
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith("test_") and callable(func)]
+    failed = 0
+    for name, func in tests:
+        try:
+            func()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 通过")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+翻译相关的单元测试
+
+覆盖 Markdown 分段（segment_markdown → render / units 还原原文）、
+推文批量译文解析（parse_batch_response）和段落级翻译记忆的查询计划（SegmentPlan）。
+可直接运行，也可用 pytest 执行
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services import translation_memory
+from app.services.translation_memory import SegmentPlan, TranslationMemory, segment_key, normalize_segment
+from app.services.translation_segmenter import segment_markdown
+from app.services.tweet_translation_service import build_batch_prompt, parse_batch_response
+
+SAMPLE_MARKDOWN = """# Introduction
+
+Large language models have shown strong results on reasoning benchmarks, see [1, 2] and $x^2$.
+
+We propose a new method that uses `retrieval` to improve factual accuracy.
+
+
+```python
+def main():
+    return 42
+```
+
+$$
+E = mc^2
+$$
+
+| Model | Score |
+| --- | --- |
+| A | 1.0 |
+
+![figure](images/fig1.png)
+
+这一段已经是中文，不需要翻译。
+
+Our experiments cover three datasets and two model sizes.
+
+## References
+
+[1] Smith et al. Attention is all you need. 2017.
+[2] Doe. Another paper. 2020.
+"""
+
+
+# ==================== segment_markdown ====================
+
+def test_segment_render_roundtrip():
+    """用原文作为“译文”渲染时应得到原文"""
+    doc = segment_markdown(SAMPLE_MARKDOWN, "en", "zh", max_batch_tokens=2000)
+    batches = doc.batches()
+    assert batches, "应至少有一批待翻译内容"
+    assert doc.render(batches) == SAMPLE_MARKDOWN
+    assert "\n".join(p.text for p in doc.pieces) == SAMPLE_MARKDOWN
+
+
+def test_segment_skips_code_formula_and_references():
+    doc = segment_markdown(SAMPLE_MARKDOWN, "en", "zh", max_batch_tokens=2000)
+    translated = "\n".join(doc.batches())
+    for skipped in ("def main()", "E = mc^2", "| Model | Score |", "![figure]", "这一段已经是中文", "Smith et al."):
+        assert skipped not in translated, f"不应翻译: {skipped}"
+    for kept in ("Large language models", "We propose", "Our experiments"):
+        assert kept in translated, f"应翻译: {kept}"
+
+
+def test_segment_units_roundtrip():
+    """units 的输出（前置保留内容 + 原文）以换行拼接应得到原文"""
+    for max_tokens in (2000, 20, 1):
+        doc = segment_markdown(SAMPLE_MARKDOWN, "en", "zh", max_batch_tokens=max_tokens)
+        outputs = []
+        for keep, source in doc.units():
+            outputs.append("\n".join(part for part in (keep, source) if part is not None))
+        assert "\n".join(outputs) == SAMPLE_MARKDOWN, f"max_batch_tokens={max_tokens}"
+        assert [source for _, source in doc.units() if source is not None] == doc.batches()
+
+
+def test_segment_render_replaces_batches():
+    """render 按顺序替换各批，保留内容原样输出"""
+    doc = segment_markdown(SAMPLE_MARKDOWN, "en", "zh", max_batch_tokens=1)
+    batches = doc.batches()
+    assert len(batches) >= 3, "max_batch_tokens 很小时每个段落单独成批"
+    rendered = doc.render([f"  <译文 {i}>\n" for i in range(len(batches))])
+    for i in range(len(batches)):
+        assert f"<译文 {i}>" in rendered
+    assert rendered.index("<译文 0>") < rendered.index("def main()") < rendered.index(f"<译文 {len(batches) - 1}>")
+    assert "Large language models" not in rendered
+
+
+def test_segment_without_translatable_text():
+    text = "```\ncode only\n```"
+    doc = segment_markdown(text, "en", "zh", max_batch_tokens=2000)
+    assert doc.batches() == []
+    assert doc.units() == [(text, None)]
+    assert doc.render([]) == text
+
+
+# ==================== parse_batch_response ====================
+
+def test_parse_batch_response_basic():
+    response = "<<<T1>>>\n第一条\n<<<T2>>>\n第二条\n\n<<<T3>>>\n第三条"
+    assert parse_batch_response(response, 3) == {0: "第一条", 1: "第二条", 2: "第三条"}
+
+
+def test_parse_batch_response_missing_and_invalid():
+    """缺失、为空、越界的编号不在结果中，重复编号取第一个"""
+    response = "前缀说明\n<<<T1>>>\n甲\n<<<T3>>>\n\n<<<T5>>>\n越界\n<<<T1>>>\n重复\n<<<T0>>>\n零"
+    assert parse_batch_response(response, 3) == {0: "甲"}
+    assert parse_batch_response("", 2) == {}
+    assert parse_batch_response(None, 2) == {}
+    assert parse_batch_response("没有编号的回复", 1) == {}
+
+
+def test_parse_batch_response_restores_escaped_markers():
+    """原文中的 <<< 在提示词中被转义，解析时还原"""
+    texts = ["a <<<T2>>> b", "plain"]
+    prompt = build_batch_prompt(texts, "zh")
+    assert prompt.count("<<<T2>>>") == 1, "原文中的编号标记应被转义"
+    response = "<<<T1>>>\n甲 ‹‹‹T2>>> 乙\n<<<T2>>>\n丙"
+    assert parse_batch_response(response, 2) == {0: "甲 <<<T2>>> 乙", 1: "丙"}
+
+
+# ==================== SegmentPlan ====================
+
+def _with_memory(func):
+    """在临时 SQLite 翻译记忆上运行 func，结束后恢复全局实例"""
+    previous = translation_memory._memory
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = TranslationMemory(Path(tmp) / "tm.sqlite", max_bytes=10 * 1024 * 1024)
+        translation_memory._memory = memory
+        try:
+            func(memory)
+        finally:
+            translation_memory._memory = previous
+            memory._conn.close()
+
+
+def test_segment_plan_runs():
+    def run(memory):
+        model = "test-model"
+        text = "Alpha paragraph.\n\nBeta paragraph.\n\n\n\nGamma paragraph.\n\nDelta paragraph."
+        memory.set_many([
+            (segment_key(s, "en", "zh", model), "en", "zh", model, normalize_segment(s), t)
+            for s, t in [("Beta paragraph.", "乙段"), ("Delta   paragraph.", "丁段")]
+        ])
+        plan = SegmentPlan(text, "en", "zh", model, "test")
+        assert plan.runs == [
+            ("miss", ["Alpha paragraph."]),
+            ("hit", "乙段"),
+            ("blank", ""),
+            ("miss", ["Gamma paragraph."]),
+            ("hit", "丁段"),
+        ]
+        assert (plan.hits, plan.misses) == (2, 2)
+
+        # 其它语言对 / 模型不命中，相邻未命中的段落合并为一块
+        other = SegmentPlan(text, "en", "ja", model, "test")
+        assert other.runs == [
+            ("miss", ["Alpha paragraph.", "Beta paragraph."]),
+            ("blank", ""),
+            ("miss", ["Gamma paragraph.", "Delta paragraph."]),
+        ]
+        assert (other.hits, other.misses) == (0, 4)
+
+    _with_memory(run)
+
+
+def test_segment_plan_remember():
+    def run(memory):
+        model = "test-model"
+        sources = ["First.", "", "Second."]
+        plan = SegmentPlan("\n\n".join(sources), "en", "zh", model, "test")
+        assert plan.hits == 0
+
+        # 段落数不一致时不写入，避免错位
+        plan.remember(sources, "只有一段译文")
+        assert SegmentPlan("First.", "en", "zh", model, "test").hits == 0
+
+        plan.remember(sources, "第一段。\n\n第二段。\n")
+        again = SegmentPlan("First.\n\nSecond.", "en", "zh", model, "test")
+        assert again.runs == [("hit", "第一段。"), ("hit", "第二段。")]
+
+    _with_memory(run)
+
+
+def main():
+    tests = [(name, func) for name, func in globals().items() if name.startswith("test_") and callable(func)]
+    failed = 0
+    for name, func in tests:
+        try:
+            func()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 通过")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
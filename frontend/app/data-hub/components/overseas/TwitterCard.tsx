@@ -3,9 +3,10 @@
 import { useState, useRef, useEffect } from 'react'
 import { Heart, MessageCircle, Repeat2, Eye, Clock, Languages, Loader2, Sparkles, ChevronUp } from 'lucide-react'
 import type { TwitterItem } from './types'
-import { formatTime, formatNumber } from './utils'
-import { DEFAULT_AVATAR, API_BASE } from './constants'
+import { formatTime, formatNumber, proxyMedia } from './utils'
+import { DEFAULT_AVATAR } from './constants'
 import { useAppStore } from '@/stores/useAppStore'
+import { requestTranslation } from '../../lib/translationBatcher'
 
 interface TwitterCardProps {
   item: TwitterItem
@@ -15,8 +16,9 @@ interface TwitterCardProps {
 
 export function TwitterCard({ item, isSelected, onClick }: TwitterCardProps) {
   const [isTranslating, setIsTranslating] = useState(false)
-  const [translatedText, setTranslatedText] = useState<string | null>(null)
-  const [showTranslation, setShowTranslation] = useState(false)
+  // 已预翻译的推文直接显示译文
+  const [translatedText, setTranslatedText] = useState<string | null>(item.translated_text || null)
+  const [showTranslation, setShowTranslation] = useState(!!item.translated_text)
   const [isTextExpanded, setIsTextExpanded] = useState(false)
   const [isTextClamped, setIsTextClamped] = useState(false)
   const textRef = useRef<HTMLParagraphElement>(null)
@@ -32,24 +34,11 @@ export function TwitterCard({ item, isSelected, onClick }: TwitterCardProps) {
 
     setIsTranslating(true)
     try {
-      const response = await fetch(`${API_BASE}/api/crawler/translate`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'X-API-Key': apiKey || '',
-        },
-        body: JSON.stringify({
-          text: item.text,
-          target_language: 'zh',
-        }),
-      })
-
-      if (!response.ok) {
+      const translated = await requestTranslation(item.id, item.text, apiKey || '')
+      if (!translated) {
         throw new Error('翻译失败')
       }
-
-      const result = await response.json()
-      setTranslatedText(result.translated)
+      setTranslatedText(translated)
       setShowTranslation(true)
     } catch (error) {
       console.error('Translation error:', error)
@@ -88,7 +77,7 @@ export function TwitterCard({ item, isSelected, onClick }: TwitterCardProps) {
           {/* 头部：头像、作者、时间、翻译按钮 */}
           <div className="flex items-center gap-2 mb-2">
             <img 
-              src={item.author.avatar} 
+              src={proxyMedia(item.author.avatar, 'avatar_sm')} 
               alt={item.author.name}
               className="w-6 h-6 rounded-full object-cover flex-shrink-0"
               onError={(e) => {
@@ -171,7 +160,7 @@ export function TwitterCard({ item, isSelected, onClick }: TwitterCardProps) {
             >
               <div className="flex items-center gap-2 mb-1.5">
                 <img
-                  src={item.quoted_tweet.author.avatar}
+                  src={proxyMedia(item.quoted_tweet.author.avatar, 'avatar_sm')}
                   alt={item.quoted_tweet.author.name}
                   className="w-4 h-4 rounded-full object-cover flex-shrink-0"
                   onError={(e) => {
@@ -193,7 +182,7 @@ export function TwitterCard({ item, isSelected, onClick }: TwitterCardProps) {
               </p>
               {item.quoted_tweet.media && item.quoted_tweet.media.length > 0 && item.quoted_tweet.media[0].url && (
                 <img
-                  src={item.quoted_tweet.media[0].url}
+                  src={proxyMedia(item.quoted_tweet.media[0].url, 'media')}
                   alt="Quoted media"
                   className="mt-2 rounded-md max-h-32 object-cover"
                   onError={(e) => { (e.target as HTMLImageElement).style.display = 'none' }}
@@ -245,7 +234,7 @@ export function TwitterCard({ item, isSelected, onClick }: TwitterCardProps) {
         {hasMedia && (
           <div className="w-36 flex-shrink-0 bg-gray-100">
             <img 
-              src={item.media![0].url} 
+              src={proxyMedia(item.media![0].url, 'media')} 
               alt="Media"
               className="w-full h-full object-cover"
               onError={(e) => { (e.target as HTMLImageElement).style.display = 'none' }}
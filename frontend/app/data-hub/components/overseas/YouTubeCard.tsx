@@ -3,9 +3,9 @@
 import { useState } from 'react'
 import { Play, Youtube, Clock, Languages, Loader2, Sparkles } from 'lucide-react'
 import type { YouTubeItem } from './types'
-import { formatTime } from './utils'
-import { API_BASE } from './constants'
+import { formatTime, proxyMedia } from './utils'
 import { useAppStore } from '@/stores/useAppStore'
+import { requestTranslation } from '../../lib/translationBatcher'
 
 interface YouTubeCardProps {
   item: YouTubeItem
@@ -18,8 +18,9 @@ export function YouTubeCard({ item, isSelected, onClick }: YouTubeCardProps) {
   const publishTime = item.published_at || item.scraped_at
   
   const [isTranslating, setIsTranslating] = useState(false)
-  const [translatedTitle, setTranslatedTitle] = useState<string | null>(null)
-  const [showTranslation, setShowTranslation] = useState(false)
+  // 已预翻译的标题直接显示译文
+  const [translatedTitle, setTranslatedTitle] = useState<string | null>(item.translated_title || null)
+  const [showTranslation, setShowTranslation] = useState(!!item.translated_title)
   const apiKey = useAppStore((state) => state.apiKey)
 
   const handleTranslate = async (e: React.MouseEvent) => {
@@ -32,24 +33,11 @@ export function YouTubeCard({ item, isSelected, onClick }: YouTubeCardProps) {
 
     setIsTranslating(true)
     try {
-      const response = await fetch(`${API_BASE}/api/crawler/translate`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'X-API-Key': apiKey || '',
-        },
-        body: JSON.stringify({
-          text: item.title,
-          target_language: 'zh',
-        }),
-      })
-
-      if (!response.ok) {
+      const translated = await requestTranslation(item.id, item.title, apiKey || '')
+      if (!translated) {
         throw new Error('翻译失败')
       }
-
-      const result = await response.json()
-      setTranslatedTitle(result.translated)
+      setTranslatedTitle(translated)
       setShowTranslation(true)
     } catch (error) {
       console.error('Translation error:', error)
@@ -131,7 +119,7 @@ export function YouTubeCard({ item, isSelected, onClick }: YouTubeCardProps) {
         {/* 右侧缩略图 */}
         <div className="relative w-44 flex-shrink-0 bg-gray-100 group">
           <img 
-            src={thumbnail} 
+            src={proxyMedia(thumbnail, 'thumb')} 
             alt={item.title}
             className="w-full h-full object-cover"
             onError={(e) => {
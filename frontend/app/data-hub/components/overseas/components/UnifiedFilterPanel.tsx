@@ -16,6 +16,7 @@ import Image from 'next/image'
 import { Button } from '@/components/ui/button'
 import { SORT_OPTIONS } from '../constants'
 import type { OverseasPlatform, SortOrder } from '../types'
+import { proxyMedia } from '../utils'
 import type { SourceAccount, DateRange, FilterPanelProps } from './types'
 
 // X Logo 组件
@@ -379,7 +380,7 @@ export function UnifiedFilterPanel({
                         <div className="relative flex-shrink-0">
                           {account.avatar ? (
                             <img 
-                              src={account.avatar} 
+                              src={proxyMedia(account.avatar, 'avatar')} 
                               alt={account.name}
                               className="w-9 h-9 rounded-full object-cover border border-gray-200"
                               onError={(e) => {
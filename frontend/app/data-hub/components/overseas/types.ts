@@ -48,6 +48,7 @@ export interface TwitterItem {
   quoted_tweet?: QuotedTweet
   created_at: string
   scraped_at: string
+  translated_text?: string  // 爬虫后预翻译的译文
   // AI 分析字段
   summary?: string
   ai_summary?: string
@@ -65,6 +66,7 @@ export interface YouTubeItem {
   description?: string
   published_at?: string
   scraped_at: string
+  translated_title?: string  // 爬虫后预翻译的标题
   // AI 分析字段
   summary?: string
   ai_summary?: string
@@ -6,7 +6,7 @@ import type { OverseasItem, TwitterItem, YouTubeItem } from './types'
 import { formatDateKey, formatDisplayDate } from '../../lib/utils'
 
 // 从基础设施层导入并重新导出通用工具函数
-export { formatNumber, formatTime, formatDateKey, formatDisplayDate } from '../../lib/utils'
+export { formatNumber, formatTime, formatDateKey, formatDisplayDate, proxyMedia } from '../../lib/utils'
 
 /**
  * 获取内容的发布时间
@@ -134,6 +134,16 @@ export const crawlerApi = {
       method: 'POST',
       body: JSON.stringify({ text, api_key: apiKey }),
     }),
+
+  /**
+   * 批量翻译推文 / 视频标题（已翻译过的条目直接返回保存的译文）
+   */
+  translateBatch: (items: { id: string; text: string }[], apiKey: string, targetLanguage = 'zh') =>
+    apiFetch('/api/crawler/translate/batch', {
+      method: 'POST',
+      headers: { 'X-API-Key': apiKey },
+      body: JSON.stringify({ items, target_language: targetLanguage }),
+    }),
 }
 
 /**
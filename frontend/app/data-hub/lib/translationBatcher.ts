@@ -0,0 +1,81 @@
+/**
+ * 卡片翻译请求合并器
+ *
+ * 同一时间窗口内各卡片发起的翻译请求合并为一次 /translate/batch 调用，
+ * 相同 ID 的请求共享同一个结果；批接口要求 ID 唯一，同 ID 不同原文时先发出当前批次。
+ */
+
+import { crawlerApi } from './api'
+
+const FLUSH_DELAY_MS = 50
+const MAX_BATCH_ITEMS = 200 // 与后端 TRANSLATE_BATCH_MAX_ITEMS 一致
+
+interface PendingEntry {
+  text: string
+  waiters: { resolve: (translated: string | null) => void; reject: (error: Error) => void }[]
+}
+
+let pending = new Map<string, PendingEntry>()
+let pendingApiKey = ''
+let pendingLanguage = 'zh'
+let flushTimer: ReturnType<typeof setTimeout> | null = null
+
+async function flush() {
+  if (flushTimer) {
+    clearTimeout(flushTimer)
+    flushTimer = null
+  }
+  const batch = pending
+  const apiKey = pendingApiKey
+  const targetLanguage = pendingLanguage
+  pending = new Map()
+  if (batch.size === 0) return
+
+  const items = Array.from(batch, ([id, entry]) => ({ id, text: entry.text }))
+  try {
+    const result = await crawlerApi.translateBatch(items, apiKey, targetLanguage)
+    const translations = result.translations || {}
+    batch.forEach((entry, id) => {
+      const translated = translations[id]?.translated ?? null
+      entry.waiters.forEach(w => w.resolve(translated))
+    })
+  } catch (error) {
+    const err = error instanceof Error ? error : new Error(String(error))
+    batch.forEach(entry => entry.waiters.forEach(w => w.reject(err)))
+  }
+}
+
+/**
+ * 请求翻译一条内容，返回译文（失败时为 null）
+ */
+export function requestTranslation(
+  id: string,
+  text: string,
+  apiKey: string,
+  targetLanguage = 'zh'
+): Promise<string | null> {
+  const existing = pending.get(id)
+  if (
+    pending.size > 0 &&
+    (apiKey !== pendingApiKey || targetLanguage !== pendingLanguage || (existing && existing.text !== text))
+  ) {
+    void flush()
+  }
+
+  return new Promise((resolve, reject) => {
+    pendingApiKey = apiKey
+    pendingLanguage = targetLanguage
+    const entry = pending.get(id)
+    if (entry) {
+      entry.waiters.push({ resolve, reject })
+    } else {
+      pending.set(id, { text, waiters: [{ resolve, reject }] })
+    }
+
+    if (pending.size >= MAX_BATCH_ITEMS) {
+      void flush()
+    } else if (!flushTimer) {
+      flushTimer = setTimeout(() => void flush(), FLUSH_DELAY_MS)
+    }
+  })
+}
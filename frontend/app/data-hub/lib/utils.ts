@@ -2,6 +2,39 @@
  * 数据中心通用工具函数
  */
 
+import { API_BASE } from './constants'
+
+/** 后端媒体代理支持的尺寸预设（与 backend media_service.MEDIA_SIZES 保持一致） */
+export type MediaSize = 'avatar_sm' | 'avatar' | 'media' | 'thumb' | 'original'
+
+const PROXIED_MEDIA_HOSTS = [
+  'pbs.twimg.com',
+  'abs.twimg.com',
+  'video.twimg.com',
+  'i.ytimg.com',
+  'yt3.ggpht.com',
+  'yt3.googleusercontent.com',
+]
+
+/**
+ * 将头像 / 配图 / 缩略图地址转换为后端媒体代理地址
+ * 由后端缓存并缩放到 UI 使用的尺寸，非白名单域名保持原样
+ *
+ * @param url - 原始媒体地址
+ * @param size - 尺寸预设
+ * @returns 代理地址
+ */
+export function proxyMedia(url: string | undefined | null, size: MediaSize = 'original'): string {
+  if (!url) return ''
+  try {
+    const host = new URL(url).hostname
+    if (!PROXIED_MEDIA_HOSTS.includes(host)) return url
+  } catch {
+    return url
+  }
+  return `${API_BASE}/api/media/proxy?url=${encodeURIComponent(url)}&size=${size}`
+}
+
 /**
  * 格式化数字
  * 优先使用"万"单位（符合中文习惯），回退到 K/M（国际惯例）
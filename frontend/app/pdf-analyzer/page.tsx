@@ -185,13 +185,13 @@ export default function PDFAnalyzerPage() {
     await startAnalysis({
       file,
       url,
-      translate: false,
+      translate: true,
       extractCharts: enableChartExtraction,
       enablePaperAnalysis: enablePaperAnalysis
     })
   }, [file, url, enableChartExtraction, startAnalysis, cancelTranslation])
 
-  // 自动翻译已关闭，用户可通过顶部"翻译"按钮手动触发
+  // 译文由后端在解析完成后后台翻译、通过 SSE 逐段推送（result.translatedText），也可通过顶部"翻译"按钮手动触发
 
   // 分析完成后，优先渲染图片，然后逐张顺序进行AI分析
   const analyzeAbortRef = useRef<AbortController | null>(null)
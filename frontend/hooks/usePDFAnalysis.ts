@@ -6,6 +6,7 @@
  * 2. 处理 SSE 流的创建、监听和清理
  * 3. 提供取消任务的功能
  * 4. 处理重试和错误
+ * 5. 接收后端后台翻译逐段推送的译文（translating / translated 事件，可能在 complete 之后到达）
  */
 
 import { useState, useRef, useCallback, useEffect } from 'react'
@@ -71,9 +72,18 @@ export interface UsePDFAnalysisReturn {
   hasResult: boolean
 }
 
+// 后台翻译推送的一段译文（各段 text 以换行拼接即为完整译文）
+interface TranslatedSection {
+  index: number
+  text: string
+  done: number
+  total: number
+  failed: boolean
+}
+
 // SSE 事件数据类型
 interface SSEEventData {
-  status: AnalysisStatus
+  status: AnalysisStatus | 'translated'
   progress: number
   message: string
   data?: {
@@ -86,6 +96,10 @@ interface SSEEventData {
       summary: any
       paperText: string
     }
+    translatedSection?: TranslatedSection
+    total?: number
+    failed?: number
+    error?: string | null
   }
 }
 
@@ -102,6 +116,7 @@ export function usePDFAnalysis(apiKey: string, mineruApiKey: string): UsePDFAnal
   const abortControllerRef = useRef<AbortController | null>(null)
   const readerRef = useRef<ReadableStreamDefaultReader | null>(null)
   const isCleaningUp = useRef(false)
+  const translatedSectionsRef = useRef<string[]>([])
   
   // 清理函数
   const cleanup = useCallback(async () => {
@@ -189,6 +204,7 @@ export function usePDFAnalysis(apiKey: string, mineruApiKey: string): UsePDFAnal
     setStatusMessage(url ? '正在准备从 URL 解析...' : '正在准备上传文件...')
     setResult(null)  // 清空旧的分析结果，避免图片混淆
     setTaskId(null)
+    translatedSectionsRef.current = []
     
     // 创建新的 AbortController
     abortControllerRef.current = new AbortController()
@@ -260,6 +276,23 @@ export function usePDFAnalysis(apiKey: string, mineruApiKey: string): UsePDFAnal
                 
                 const eventData: SSEEventData = JSON.parse(rawData)
                 
+                // 后台翻译事件：不改变分析状态，按段拼接译文
+                if (eventData.status === 'translating' && eventData.data?.translatedSection) {
+                  const section = eventData.data.translatedSection
+                  translatedSectionsRef.current[section.index] = section.text
+                  const translatedText = translatedSectionsRef.current.join('\n')
+                  setResult(prev => prev ? { ...prev, translatedText } : prev)
+                  continue
+                }
+                if (eventData.status === 'translated') {
+                  if (eventData.data?.error) {
+                    toast.error(eventData.message)
+                  } else if (eventData.data?.failed) {
+                    toast.warning(eventData.message)
+                  }
+                  continue
+                }
+                
                 // 更新状态
                 setStatus(eventData.status)
                 setProgress(eventData.progress)
@@ -269,7 +302,7 @@ export function usePDFAnalysis(apiKey: string, mineruApiKey: string): UsePDFAnal
                 if (eventData.status === 'complete' && eventData.data) {
                   const analysisResult: AnalysisResult = {
                     originalText: eventData.data.originalText || '',
-                    translatedText: eventData.data.translatedText || '',
+                    translatedText: eventData.data.translatedText || translatedSectionsRef.current.join('\n'),
                     charts: eventData.data.charts || [],
                     metadata: eventData.data.metadata || {},
                     paperAnalysis: eventData.data.paperAnalysis
@@ -336,6 +369,7 @@ export function usePDFAnalysis(apiKey: string, mineruApiKey: string): UsePDFAnal
     setErrorMessage('')
     setResult(null)
     setTaskId(null)
+    translatedSectionsRef.current = []
   }, [cleanup])
   
   // 计算属性